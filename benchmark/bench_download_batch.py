@@ -0,0 +1,155 @@
+"""
+比较下载阶段逐个合约下载（download_history_data）与批量下载（download_history_data2）的耗时（完全离线）
+
+用QMTOperator.download_barData执行完整的下载阶段（规划、按 周期+时间范围 分组、worker调度、回调跟踪、失败合约单独重试、
+按合约更新下载日志），QMT换成benchmark.synthetic.FakeXtdata（每次调用固定开销 + 每个合约的耗时，数据中心串行处理），
+数据库换成内存中的模拟对象；在临时目录中执行（复制config/app.ini），不影响项目的数据目录。对每个 batch_size x workers 组合记录耗时、QMT调用次数和完成的合约数。
+
+用法（在项目根目录执行）:
+    python -m benchmark.bench_download_batch
+    python -m benchmark.bench_download_batch --codes 500 --batch-sizes 1,20,100 --workers 1,4 --call-ms 50 --code-ms 5 --fail 0.02
+    python -m benchmark.bench_download_batch --json bench_download.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+import numpy as np
+import pandas as pd
+from benchmark.synthetic import FakeXtdata
+
+class FakeMysqlOperator:
+    """内存中的log_save和历史成本，只实现下载阶段用到的方法"""
+
+    def __init__(self, df_log_save: pd.DataFrame):
+        self.df_log_save = df_log_save
+        self.list_download_done = []
+
+    def get_all_log_save(self, str_instrument_category: str = None) -> pd.DataFrame:
+        return self.df_log_save.copy()
+
+    def get_plan_cost(self) -> pd.DataFrame:
+        return pd.DataFrame()
+
+    def upsert_plan_cost(self, list_cost: list) -> bool:
+        return True
+
+    def update_log_save_download(self, instrument_long_id: str, begin_datetime: str, end_datetime: str) -> bool:
+        self.list_download_done.append(instrument_long_id)
+        return True
+
+def make_log_save(int_codes: int) -> pd.DataFrame:
+    """int_codes个期货合约的log_save，上次下载都结束于同一时间（与日常增量下载一致）"""
+    return pd.DataFrame({
+        'InstrumentLongID': [f"c{int_idx:04d}.SF" for int_idx in range(int_codes)],
+        'InstrumentCategory': "FUTURE",
+        'XTExchangeID': "SF",
+        'ExchangeCName': "上期所",
+        'instrument_CName': "模拟",
+        'init_datetime': "20250101000000",
+        'download_begin_datetime': "20250101000000",
+        'download_end_datetime': "20251219180000",
+        'save_begin_datetime': "20250101000000",
+        'save_end_datetime': "20251219180000",
+    })
+
+def load_qmt_operator(fake_xtdata: FakeXtdata):
+    """导入QMTOperator并把行情接口换成模拟数据源（离线环境没有安装xtquant时以模拟模块代替）"""
+    try:
+        import xtquant  # noqa: F401
+    except ImportError:
+        module_xtquant = types.ModuleType("xtquant")
+        module_xtquant.xtdata = fake_xtdata
+        module_xtquant.xtdatacenter = types.SimpleNamespace()
+        sys.modules["xtquant"] = module_xtquant
+    import operation.QMTOperator as module_qmt_operator
+    import operation.MarketDataCache as module_market_data_cache
+    module_qmt_operator.xtdata = fake_xtdata
+    module_market_data_cache.xtdata = fake_xtdata
+    module_market_data_cache.MarketDataCache.configure("off")
+    return module_qmt_operator.QMTOperator
+
+def run_once(int_codes: int, int_batch: int, int_workers: int, float_call_seconds: float, float_code_seconds: float,
+             float_fail: float, int_seed: int = 0) -> dict:
+    """执行一次完整的下载阶段"""
+    rng = np.random.default_rng(int_seed)
+    df_log_save = make_log_save(int_codes)
+    set_fail = set(df_log_save['InstrumentLongID'][rng.random(int_codes) < float_fail])
+    fake_xtdata = FakeXtdata(float_call_seconds, float_code_seconds, set_fail)
+    QMTOperator = load_qmt_operator(fake_xtdata)
+
+    obj_qmt_operator = QMTOperator(None, None)
+    obj_mysql_operator = FakeMysqlOperator(df_log_save)
+    obj_qmt_operator.mysql_operator = obj_mysql_operator
+    obj_qmt_operator.work_planner.mysql_operator = obj_mysql_operator
+    obj_qmt_operator.work_planner.catalog = None
+    obj_qmt_operator.work_planner.int_workers = int_workers
+    obj_qmt_operator.int_download_batch = int_batch
+
+    time_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        obj_qmt_operator.download_barData(df_log_save, "FUTURE", "20250101000000", "20251226180000")
+    float_seconds = time.perf_counter() - time_start
+    int_units = int_codes * len(QMTOperator.DICT_PERIOD["FUTURE"])
+    return {
+        'codes': int_codes,
+        'units': int_units,
+        'batch_size': int_batch,
+        'workers': int_workers,
+        'seconds': float_seconds,
+        'units_per_second': int_units / float_seconds if float_seconds > 0 else None,
+        'qmt_calls': fake_xtdata.int_calls,
+        'batch_failed_codes': len(set_fail),
+        'instruments_done': len(set(obj_mysql_operator.list_download_done)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="逐个合约下载与批量下载的耗时比较（模拟数据源）")
+    parser.add_argument('--codes', type=int, default=200, help='合约数（每个合约6个周期）')
+    parser.add_argument('--batch-sizes', default='1,10,50,200', help='每批合约数，逗号分隔，1为逐个合约下载')
+    parser.add_argument('--workers', default='1,4', help='worker数，逗号分隔')
+    parser.add_argument('--call-ms', type=float, default=20.0, help='模拟每次调用的固定开销（毫秒）')
+    parser.add_argument('--code-ms', type=float, default=2.0, help='模拟每个合约的下载耗时（毫秒）')
+    parser.add_argument('--fail', type=float, default=0.01, help='批量下载中回调报错（需单独重试）的合约比例')
+    parser.add_argument('--json', default=None, help='结果保存为JSON文件')
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    # 在临时目录中执行，目录数据库等文件不写入项目目录
+    str_cwd = os.getcwd()
+    str_work_dir = tempfile.mkdtemp(prefix="bench_download_")
+    os.makedirs(os.path.join(str_work_dir, "config"))
+    shutil.copy(os.path.join("config", "app.ini"), os.path.join(str_work_dir, "config", "app.ini"))
+    os.chdir(str_work_dir)
+    try:
+        list_result = run_all(args)
+    finally:
+        os.chdir(str_cwd)
+        shutil.rmtree(str_work_dir, ignore_errors=True)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': list_result}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.json}")
+
+def run_all(args) -> list:
+    """执行全部 batch_size x workers 组合并打印结果"""
+    list_result = []
+    print(f"{'batch':>6} {'workers':>7} {'耗时(秒)':>9} {'单元/秒':>9} {'QMT调用':>8} {'重试合约':>8} {'完成合约':>8}")
+    for int_workers in [int(s) for s in args.workers.split(',') if s.strip()]:
+        for int_batch in [int(s) for s in args.batch_sizes.split(',') if s.strip()]:
+            dict_result = run_once(args.codes, int_batch, int_workers, args.call_ms / 1000, args.code_ms / 1000,
+                                   args.fail if int_batch > 1 else 0.0)
+            list_result.append(dict_result)
+            print(f"{int_batch:>6} {int_workers:>7} {dict_result['seconds']:>9.2f} {dict_result['units_per_second']:>9.1f} "
+                  f"{dict_result['qmt_calls']:>8} {dict_result['batch_failed_codes']:>8} {dict_result['instruments_done']:>8}")
+    return list_result
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+比较pkl与Arrow IPC（Feather v2）文件的加载性能
+
+对每个pkl文件先生成同名的不压缩arrow文件，然后在独立子进程中分别用
+    pickle:         pd.read_pickle
+    feather_table:  utility.read_feather_mmap（内存映射，返回Arrow表）
+    feather_numpy:  utility.read_feather_mmap + utility.feather_to_numpy（零拷贝NumPy视图）
+加载，每种方式先冷加载（尽量清除该文件的页缓存）再热加载，记录加载耗时、全列扫描耗时和峰值内存。
+
+用法（在项目根目录执行）:
+    python -m benchmark.bench_feather_load barData/FUTURE/上期所-白银-ag00.SF-none-tick.pkl barData/FUTURE/上期所-白银-ag00.SF-none-1m.pkl
+    python -m benchmark.bench_feather_load --json bench_feather.json <pkl文件...>
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+LIST_LOADER = ["pickle", "feather_table", "feather_numpy"]
+
+def get_peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），无法获取时返回None"""
+    # Linux优先读取VmHWM：exec后重新计数，ru_maxrss会继承父进程的峰值
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for str_line in f:
+                if str_line.startswith('VmHWM:'):
+                    return int(str_line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        int_maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return int_maxrss / 1024 / 1024 if sys.platform == "darwin" else int_maxrss / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        obj_info = psutil.Process().memory_info()
+        return getattr(obj_info, 'peak_wset', obj_info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+def format_mb(float_mb) -> str:
+    """格式化内存数值，None显示为N/A"""
+    return "N/A" if float_mb is None else f"{float_mb:.1f}MB"
+
+def drop_page_cache(str_file_path: str) -> bool:
+    """尽量把文件从操作系统页缓存中清除，只在支持posix_fadvise的系统上有效"""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    int_fd = os.open(str_file_path, os.O_RDONLY)
+    try:
+        os.fsync(int_fd)
+        os.posix_fadvise(int_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return True
+    finally:
+        os.close(int_fd)
+
+def run_worker(str_loader: str, str_file_path: str):
+    """子进程：加载一次并输出JSON结果"""
+    import numpy as np
+    import pandas as pd
+    from utility import utility
+
+    float_rss_before = get_peak_rss_mb()
+    time_start = time.perf_counter()
+    if str_loader == "pickle":
+        df = pd.read_pickle(utility.resolve_read_path(str_file_path))
+        float_load = time.perf_counter() - time_start
+        list_arrays = [df[c].to_numpy() for c in df.columns if np.issubdtype(df[c].dtype, np.number)]
+    else:
+        table = utility.read_feather_mmap(str_file_path)
+        if str_loader == "feather_numpy":
+            dict_array = utility.feather_to_numpy(table)
+        float_load = time.perf_counter() - time_start
+        if str_loader == "feather_table":
+            dict_array = utility.feather_to_numpy(table)
+        list_arrays = [a for a in dict_array.values() if np.issubdtype(a.dtype, np.number)]
+
+    # 全列扫描，使内存映射的页真正读入
+    time_scan_start = time.perf_counter()
+    float_checksum = float(sum(np.nansum(a) for a in list_arrays))
+    float_scan = time.perf_counter() - time_scan_start
+    float_rss_after = get_peak_rss_mb()
+
+    print(json.dumps({
+        'load_seconds': float_load,
+        'scan_seconds': float_scan,
+        'peak_rss_mb': float_rss_after,
+        'peak_rss_delta_mb': None if float_rss_before is None else float_rss_after - float_rss_before,
+        'checksum': float_checksum,
+    }))
+
+def convert_to_arrow(str_pkl_path: str) -> str:
+    """把pkl转换为同名的不压缩arrow文件（已存在则跳过）"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    from utility import utility
+
+    str_arrow_path = os.path.splitext(str_pkl_path)[0] + ".arrow"
+    if not os.path.exists(str_arrow_path):
+        df = pd.read_pickle(utility.resolve_read_path(str_pkl_path))
+        df.index = df.index.astype(str)
+        table = pa.Table.from_pandas(df, preserve_index=True).combine_chunks()
+        feather.write_feather(table, str_arrow_path, compression='uncompressed', chunksize=max(table.num_rows, 1))
+    return str_arrow_path
+
+def resolve_path(str_file_path: str) -> str:
+    """逻辑文件当前版本的物理路径（版本快照）"""
+    from utility import utility
+    return utility.resolve_read_path(str_file_path)
+
+def run_once(str_loader: str, str_file_path: str, bool_cold: bool) -> dict:
+    """启动子进程执行一次加载"""
+    bool_dropped = drop_page_cache(resolve_path(str_file_path)) if bool_cold else False
+    result = subprocess.run([sys.executable, "-m", "benchmark.bench_feather_load", "--worker", str_loader, str_file_path],
+                            capture_output=True, text=True, check=True)
+    dict_result = json.loads(result.stdout.strip().splitlines()[-1])
+    dict_result.update({'loader': str_loader, 'cold': bool_cold, 'cache_dropped': bool_dropped})
+    return dict_result
+
+def main():
+    parser = argparse.ArgumentParser(description="pkl与Arrow IPC加载性能比较")
+    parser.add_argument('files', nargs='+', help='pkl文件路径')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--json', default=None, help='结果保存为JSON文件')
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.files[0])
+        return
+
+    list_result = []
+    for str_pkl_path in args.files:
+        str_arrow_path = convert_to_arrow(str_pkl_path)
+        print(f"\n文件: {str_pkl_path}")
+        print(f"pkl大小: {os.path.getsize(resolve_path(str_pkl_path)) / 1024 / 1024:.1f}MB，arrow大小: {os.path.getsize(str_arrow_path) / 1024 / 1024:.1f}MB")
+        for str_loader in LIST_LOADER:
+            str_file_path = str_pkl_path if str_loader == "pickle" else str_arrow_path
+            for bool_cold in [True, False]:
+                dict_result = run_once(str_loader, str_file_path, bool_cold)
+                dict_result['file'] = str_pkl_path
+                list_result.append(dict_result)
+                print(f"  {str_loader:<14} {'冷' if bool_cold else '热'}加载: {dict_result['load_seconds'] * 1000:8.1f}ms "
+                      f"扫描: {dict_result['scan_seconds'] * 1000:8.1f}ms 峰值内存: {format_mb(dict_result['peak_rss_mb'])} "
+                      f"(加载增量 {format_mb(dict_result['peak_rss_delta_mb'])})"
+                      f"{'' if dict_result['cache_dropped'] or not bool_cold else ' [未能清除页缓存]'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(list_result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.json}")
+
+if __name__ == "__main__":
+    main()
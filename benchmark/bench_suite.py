@@ -0,0 +1,285 @@
+"""
+utility和存储热点函数的微基准测试（完全离线，使用benchmark.synthetic生成的模拟数据）
+
+数据集（--scale为1时）:
+    1m:   5年1分钟K线（约42万行）
+    tick: 1年3秒tick，五档为列表列（约168万行）
+    追加：新数据为1个月1分钟K线（或1周tick），与已有文件末尾的重叠比例为0%、50%、90%
+每个用例在独立子进程中执行：先准备数据（不计时），再执行--repeat次取中位数耗时，最后在tracemalloc下再执行一次记录峰值内存
+（包含NumPy/pandas的分配）。结果保存为JSON，可以保存为基线并与基线比较，耗时或峰值内存超过基线的(1 + 阈值)倍时标记为回归。
+
+用法（在项目根目录执行）:
+    python -m benchmark.bench_suite                                   运行全部用例，结果保存到benchmark/results/
+    python -m benchmark.bench_suite --case append --scale 0.1         只运行名称包含append的用例，数据量为10%
+    python -m benchmark.bench_suite --save-baseline                   运行并保存为基线（benchmark/results/baseline.json）
+    python -m benchmark.bench_suite --compare                         运行并与基线比较，有回归时退出码为1
+    python -m benchmark.bench_suite --list                            列出用例
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+STR_RESULT_DIR = os.path.join("benchmark", "results")
+STR_BASELINE_PATH = os.path.join(STR_RESULT_DIR, "baseline.json")
+# 1个月1分钟K线、1周tick的行数（与synthetic的交易时段一致）
+INT_MONTH_1M_ROWS = 21 * 345
+INT_WEEK_TICK_ROWS = 5 * 6900
+
+def _bar_1m(float_scale: float):
+    from benchmark.synthetic import make_bar_frame
+    return make_bar_frame(5.0 * float_scale)
+
+def _tick(float_scale: float):
+    from benchmark.synthetic import make_tick_frame
+    return make_tick_frame(1.0 * float_scale)
+
+def _append_case(func_append_name: str, str_ext: str, func_data, int_new_rows: int, float_overlap: float):
+    """
+    追加用例：每次执行前在新的临时目录写入已有文件（不计时），计时的部分为一次完整的追加（读取、合并、排序去重、写回）
+    """
+    def build(float_scale: float) -> dict:
+        from utility import utility
+        from benchmark.synthetic import split_for_append
+
+        df_full = func_data(float_scale)
+        df_existing, df_new = split_for_append(df_full, int_new_rows, float_overlap)
+        del df_full
+        func_append = getattr(utility, func_append_name)
+        list_dir = []
+
+        def prepare():
+            str_dir = tempfile.mkdtemp(prefix="bench_suite_")
+            list_dir.append(str_dir)
+            str_file_path = os.path.join(str_dir, f"bench.{str_ext}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                func_append(df_existing.copy(), str_file_path)
+            return str_file_path, df_new.copy()
+
+        def run(tuple_arg):
+            str_file_path, df = tuple_arg
+            with contextlib.redirect_stdout(io.StringIO()):
+                if not func_append(df, str_file_path):
+                    raise RuntimeError(f"{func_append_name}返回失败")
+
+        def cleanup():
+            for str_dir in list_dir:
+                shutil.rmtree(str_dir, ignore_errors=True)
+
+        return {'rows': len(df_existing) + len(df_new) - int(len(df_new) * float_overlap), 'prepare': prepare, 'run': run, 'cleanup': cleanup}
+    return build
+
+def _timestamp_case(str_func_name: str):
+    """时间戳转换用例：5年1分钟K线的time列"""
+    def build(float_scale: float) -> dict:
+        from utility import utility
+        arr_time = _bar_1m(float_scale)['time'].to_numpy()
+        func = getattr(utility, str_func_name)
+        return {'rows': len(arr_time), 'prepare': lambda: arr_time, 'run': func}
+    return build
+
+def _build_save_pyarrow(float_scale: float) -> dict:
+    """save_pyarrow：5年1分钟K线写parquet"""
+    from utility import utility
+    df = _bar_1m(float_scale)
+    str_dir = tempfile.mkdtemp(prefix="bench_suite_")
+
+    def run(_):
+        with contextlib.redirect_stdout(io.StringIO()):
+            utility().save_pyarrow(df, os.path.join(str_dir, "bench.parquet"))
+
+    return {'rows': len(df), 'prepare': lambda: None, 'run': run, 'cleanup': lambda: shutil.rmtree(str_dir, ignore_errors=True)}
+
+def _build_index_to_epoch_ms(float_scale: float) -> dict:
+    """index_to_epoch_ms：字符串索引（原有pkl格式）解析为毫秒时间戳"""
+    from utility import utility
+    df = _bar_1m(float_scale).drop(columns=['time'])
+    df.index = df.index.astype(str)
+    return {'rows': len(df), 'prepare': lambda: df, 'run': utility.index_to_epoch_ms}
+
+def _build_flatten_tick(float_scale: float) -> dict:
+    """flatten_tick_levels：1年tick的五档列表列展开"""
+    from utility import utility
+    df = _tick(float_scale)
+    return {'rows': len(df), 'prepare': lambda: df, 'run': utility.flatten_tick_levels}
+
+# 用例名称 -> 构建函数(float_scale) -> {'rows', 'prepare', 'run', 可选'cleanup'}
+DICT_CASE = {
+    "batch_timestamp_to_datetime_1m": _timestamp_case("batch_timestamp_to_datetime"),
+    "batch_timestamp_to_string_17_1m": _timestamp_case("batch_timestamp_to_string_17"),
+    "index_to_epoch_ms_1m_str": _build_index_to_epoch_ms,
+    "append_to_pkl_1m_overlap0": _append_case("append_to_pkl", "pkl", _bar_1m, INT_MONTH_1M_ROWS, 0.0),
+    "append_to_pkl_1m_overlap50": _append_case("append_to_pkl", "pkl", _bar_1m, INT_MONTH_1M_ROWS, 0.5),
+    "append_to_pkl_1m_overlap90": _append_case("append_to_pkl", "pkl", _bar_1m, INT_MONTH_1M_ROWS, 0.9),
+    "append_to_pkl_tick_overlap50": _append_case("append_to_pkl", "pkl", _tick, INT_WEEK_TICK_ROWS, 0.5),
+    "append_to_pkl_i64_1m_overlap50": _append_case("append_to_pkl_i64", "i64.pkl", _bar_1m, INT_MONTH_1M_ROWS, 0.5),
+    "append_to_feather_1m_overlap50": _append_case("append_to_feather", "arrow", _bar_1m, INT_MONTH_1M_ROWS, 0.5),
+    "save_pyarrow_1m": _build_save_pyarrow,
+    "flatten_tick_levels_tick": _build_flatten_tick,
+}
+
+def run_worker(str_case: str, float_scale: float, int_repeat: int):
+    """子进程：执行一个用例并输出JSON结果"""
+    from benchmark.bench_feather_load import get_peak_rss_mb
+
+    time_setup_start = time.perf_counter()
+    dict_case = DICT_CASE[str_case](float_scale)
+    float_setup = time.perf_counter() - time_setup_start
+    try:
+        list_seconds = []
+        for _ in range(int_repeat):
+            arg = dict_case['prepare']()
+            time_start = time.perf_counter()
+            dict_case['run'](arg)
+            list_seconds.append(time.perf_counter() - time_start)
+        # 峰值内存单独测一次，避免tracemalloc的开销影响计时
+        arg = dict_case['prepare']()
+        tracemalloc.start()
+        dict_case['run'](arg)
+        _, int_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if 'cleanup' in dict_case:
+            dict_case['cleanup']()
+    float_median = statistics.median(list_seconds)
+    print(json.dumps({
+        'rows': dict_case['rows'],
+        'seconds': float_median,
+        'seconds_min': min(list_seconds),
+        'seconds_all': list_seconds,
+        'rows_per_second': dict_case['rows'] / float_median if float_median > 0 else None,
+        'peak_mb': int_peak / 1024 / 1024,
+        'rss_hwm_mb': get_peak_rss_mb(),
+        'setup_seconds': float_setup,
+    }))
+
+def run_case(str_case: str, float_scale: float, int_repeat: int) -> dict:
+    """启动子进程执行一个用例"""
+    result = subprocess.run([sys.executable, "-m", "benchmark.bench_suite", "--worker", str_case,
+                             "--scale", str(float_scale), "--repeat", str(int_repeat)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"退出码 {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def get_meta(float_scale: float, int_repeat: int) -> dict:
+    """运行环境信息，与基线比较时提示环境差异"""
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    return {
+        'time': datetime.now().strftime('%Y%m%d%H%M%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'scale': float_scale,
+        'repeat': int_repeat,
+    }
+
+def compare(dict_run: dict, dict_baseline: dict, float_time_threshold: float, float_memory_threshold: float) -> list:
+    """
+    与基线比较
+
+    Returns:
+        list: 回归列表 [(用例, 说明)]
+    """
+    list_regression = []
+    if dict_run['meta']['scale'] != dict_baseline['meta']['scale']:
+        print(f"警告：数据规模与基线不同（{dict_run['meta']['scale']} != {dict_baseline['meta']['scale']}），只比较吞吐量")
+    for str_case, dict_result in dict_run['results'].items():
+        dict_base = dict_baseline['results'].get(str_case)
+        if dict_base is None or 'error' in dict_result or 'error' in dict_base:
+            continue
+        if dict_result['rows'] == dict_base['rows']:
+            float_time_ratio = dict_result['seconds'] / dict_base['seconds'] if dict_base['seconds'] > 0 else 1.0
+        else:
+            float_time_ratio = dict_base['rows_per_second'] / dict_result['rows_per_second'] if dict_result['rows_per_second'] else 1.0
+        float_memory_ratio = dict_result['peak_mb'] / dict_base['peak_mb'] if dict_base['peak_mb'] > 0 else 1.0
+        dict_result['time_ratio'] = float_time_ratio
+        dict_result['memory_ratio'] = float_memory_ratio
+        if float_time_ratio > 1 + float_time_threshold:
+            list_regression.append((str_case, f"耗时为基线的 {float_time_ratio:.2f} 倍"))
+        if dict_result['rows'] == dict_base['rows'] and float_memory_ratio > 1 + float_memory_threshold:
+            list_regression.append((str_case, f"峰值内存为基线的 {float_memory_ratio:.2f} 倍"))
+    return list_regression
+
+def main():
+    parser = argparse.ArgumentParser(description="utility和存储热点函数的微基准测试")
+    parser.add_argument('--case', default=None, help='只运行名称包含该字符串的用例')
+    parser.add_argument('--scale', type=float, default=1.0, help='数据规模（1为5年1分钟K线、1年tick）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个用例计时的次数（取中位数）')
+    parser.add_argument('--json', default=None, help='结果文件，默认benchmark/results/bench_时间.json')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--compare', action='store_true', help='与基线比较并标记回归')
+    parser.add_argument('--baseline', default=STR_BASELINE_PATH, help='基线文件')
+    parser.add_argument('--time-threshold', type=float, default=0.2, help='耗时回归阈值（比例）')
+    parser.add_argument('--memory-threshold', type=float, default=0.2, help='峰值内存回归阈值（比例）')
+    parser.add_argument('--list', action='store_true', help='列出用例')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.scale, args.repeat)
+        return
+    list_case = [s for s in DICT_CASE if args.case is None or args.case in s]
+    if args.list:
+        print("\n".join(list_case))
+        return
+
+    dict_run = {'meta': get_meta(args.scale, args.repeat), 'results': {}}
+    print(f"共 {len(list_case)} 个用例，数据规模 {args.scale}，每个用例计时 {args.repeat} 次")
+    print(f"  {'用例':<34}{'行数':>10}{'耗时(中位数)':>14}{'行/秒':>14}{'峰值内存':>12}")
+    for str_case in list_case:
+        dict_result = run_case(str_case, args.scale, args.repeat)
+        dict_run['results'][str_case] = dict_result
+        if 'error' in dict_result:
+            print(f"  {str_case:<34} 出错: {dict_result['error']}")
+            continue
+        print(f"  {str_case:<34}{dict_result['rows']:>10}{dict_result['seconds'] * 1000:>12.1f}ms"
+              f"{dict_result['rows_per_second']:>14.0f}{dict_result['peak_mb']:>10.1f}MB")
+
+    list_regression = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\n基线文件不存在: {args.baseline}，先使用--save-baseline保存基线")
+        else:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                dict_baseline = json.load(f)
+            list_regression = compare(dict_run, dict_baseline, args.time_threshold, args.memory_threshold)
+            print(f"\n与基线（{dict_baseline['meta']['time']}）比较：")
+            for str_case, dict_result in dict_run['results'].items():
+                if 'time_ratio' in dict_result:
+                    print(f"  {str_case:<34}耗时 {dict_result['time_ratio']:.2f}x  峰值内存 {dict_result['memory_ratio']:.2f}x")
+            if list_regression:
+                print(f"\n【回归】共 {len(list_regression)} 项：")
+                for str_case, str_detail in list_regression:
+                    print(f"  {str_case}: {str_detail}")
+            else:
+                print("\n没有发现回归")
+    dict_run['regressions'] = [{'case': c, 'detail': d} for c, d in list_regression]
+
+    os.makedirs(STR_RESULT_DIR, exist_ok=True)
+    str_json_path = args.json or os.path.join(STR_RESULT_DIR, f"bench_{dict_run['meta']['time']}.json")
+    for str_path in [str_json_path] + ([args.baseline] if args.save_baseline else []):
+        with open(str_path, 'w', encoding='utf-8') as f:
+            json.dump(dict_run, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {str_path}")
+    if list_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
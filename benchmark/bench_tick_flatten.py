@@ -0,0 +1,134 @@
+"""
+比较tick五档列表列与展开后定长数值列的文件大小和加载速度
+
+对每个tick文件分别生成
+    list_pkl:   五档为列表列的pkl（原有格式）
+    flat_pkl:   utility.flatten_tick_levels展开后的pkl
+    list_arrow: 五档为列表列的不压缩arrow
+    flat_arrow: 展开后的不压缩arrow
+写入临时目录，记录文件大小，并在独立子进程中测量加载耗时（读取文件 + 取出四个五档字段的[n, 5]数组）和峰值内存。
+没有真实文件时可以用--synthetic生成模拟tick数据。
+
+用法（在项目根目录执行）:
+    python -m benchmark.bench_tick_flatten barData/FUTURE/上期所-白银-ag00.SF-none-tick.pkl
+    python -m benchmark.bench_tick_flatten --synthetic 1000000 --json bench_tick.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmark.bench_feather_load import drop_page_cache, format_mb, get_peak_rss_mb, resolve_path
+
+LIST_VARIANT = ["list_pkl", "flat_pkl", "list_arrow", "flat_arrow"]
+
+def make_synthetic(int_rows: int):
+    """生成int_rows行模拟tick数据（五档为列表列）"""
+    from benchmark.synthetic import make_tick_frame
+    return make_tick_frame(int_rows=int_rows)
+
+def write_variants(df_src, str_dir: str) -> dict:
+    """写出四种格式，返回 格式 -> 文件路径"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    from utility import utility
+
+    df_list = utility.unflatten_tick_levels(df_src)
+    df_flat = utility.flatten_tick_levels(df_list)
+    dict_path = {}
+    for str_variant, df in [("list", df_list), ("flat", df_flat)]:
+        dict_path[f"{str_variant}_pkl"] = os.path.join(str_dir, f"{str_variant}.pkl")
+        df.to_pickle(dict_path[f"{str_variant}_pkl"])
+        dict_path[f"{str_variant}_arrow"] = os.path.join(str_dir, f"{str_variant}.arrow")
+        table = pa.Table.from_pandas(df, preserve_index=True).combine_chunks()
+        feather.write_feather(table, dict_path[f"{str_variant}_arrow"], compression='uncompressed', chunksize=max(table.num_rows, 1))
+    return dict_path
+
+def run_worker(str_variant: str, str_file_path: str):
+    """子进程：加载一次并取出五档数组，输出JSON结果"""
+    import numpy as np
+    import pandas as pd
+    import pyarrow.feather as feather
+    from utility import utility
+
+    float_rss_before = get_peak_rss_mb()
+    time_start = time.perf_counter()
+    if str_variant.endswith("pkl"):
+        df = pd.read_pickle(str_file_path)
+    else:
+        df = feather.read_table(str_file_path, memory_map=True).to_pandas()
+    float_load = time.perf_counter() - time_start
+    time_level_start = time.perf_counter()
+    float_checksum = float(sum(np.sum(utility.tick_level_array(df, f), dtype='float64') for f in utility.LIST_TICK_LEVEL_FIELD))
+    float_level = time.perf_counter() - time_level_start
+    print(json.dumps({
+        'load_seconds': float_load,
+        'level_seconds': float_level,
+        'peak_rss_mb': get_peak_rss_mb(),
+        'peak_rss_delta_mb': None if float_rss_before is None else get_peak_rss_mb() - float_rss_before,
+        'checksum': float_checksum,
+    }))
+
+def run_once(str_variant: str, str_file_path: str, bool_cold: bool) -> dict:
+    """启动子进程执行一次加载"""
+    bool_dropped = drop_page_cache(str_file_path) if bool_cold else False
+    result = subprocess.run([sys.executable, "-m", "benchmark.bench_tick_flatten", "--worker", str_variant, str_file_path],
+                            capture_output=True, text=True, check=True)
+    dict_result = json.loads(result.stdout.strip().splitlines()[-1])
+    dict_result.update({'variant': str_variant, 'cold': bool_cold, 'cache_dropped': bool_dropped})
+    return dict_result
+
+def bench_frame(str_name: str, df_src, list_result: list):
+    """对一份tick数据执行比较"""
+    str_dir = tempfile.mkdtemp(prefix="bench_tick_")
+    try:
+        time_start = time.perf_counter()
+        dict_path = write_variants(df_src, str_dir)
+        print(f"\n数据: {str_name}，{len(df_src)} 行，生成文件耗时 {time.perf_counter() - time_start:.2f}秒")
+        float_base_size = os.path.getsize(dict_path["list_pkl"])
+        for str_variant in LIST_VARIANT:
+            int_size = os.path.getsize(dict_path[str_variant])
+            print(f"  {str_variant:<11} 大小: {int_size / 1024 / 1024:8.1f}MB ({int_size / float_base_size:.2f}x)")
+            for bool_cold in [True, False]:
+                dict_result = run_once(str_variant, dict_path[str_variant], bool_cold)
+                dict_result.update({'file': str_name, 'rows': len(df_src), 'bytes': int_size})
+                list_result.append(dict_result)
+                print(f"    {'冷' if bool_cold else '热'}加载: {dict_result['load_seconds'] * 1000:8.1f}ms "
+                      f"取五档数组: {dict_result['level_seconds'] * 1000:8.1f}ms 峰值内存: {format_mb(dict_result['peak_rss_mb'])} "
+                      f"(加载增量 {format_mb(dict_result['peak_rss_delta_mb'])})"
+                      f"{'' if dict_result['cache_dropped'] or not bool_cold else ' [未能清除页缓存]'}")
+    finally:
+        shutil.rmtree(str_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="tick五档列表列与展开列的大小和加载速度比较")
+    parser.add_argument('files', nargs='*', help='tick的pkl文件路径')
+    parser.add_argument('--synthetic', type=int, default=0, help='生成指定行数的模拟tick数据')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--json', default=None, help='结果保存为JSON文件')
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.files[0])
+        return
+    if not args.files and not args.synthetic:
+        parser.error("需要指定tick文件或--synthetic")
+
+    import pandas as pd
+
+    list_result = []
+    for str_file_path in args.files:
+        bench_frame(str_file_path, pd.read_pickle(resolve_path(str_file_path)), list_result)
+    if args.synthetic:
+        bench_frame(f"synthetic-{args.synthetic}", make_synthetic(args.synthetic), list_result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(list_result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.json}")
+
+if __name__ == "__main__":
+    main()
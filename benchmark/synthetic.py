@@ -0,0 +1,156 @@
+"""
+基准测试用的模拟数据（完全离线，不依赖QMT）
+
+数据形状与QMT返回的一致：
+    K线: time（UTC毫秒）, open, high, low, close, volume, amount, settelementPrice, openInterest, preClose, suspendFlag
+    tick: time, lastPrice, open, high, low, lastClose, amount, volume, pvolume, stockStatus, openInt, lastSettlementPrice,
+          askPrice, bidPrice, askVol, bidVol（五档为每行一个长度5的Python列表）
+索引为东八区DatetimeIndex（与QMTOperator._prepare_bar_frame的结果一致）。
+交易日按工作日计算，期货交易时段为 21:00-23:00, 09:00-10:15, 10:30-11:30, 13:30-15:00。
+"""
+import numpy as np
+import pandas as pd
+
+# 期货交易时段（东八区，分钟）：(开始, 结束)，夜盘属于下一个交易日，这里按自然日处理即可
+LIST_SESSION = [(9 * 60, 10 * 60 + 15), (10 * 60 + 30, 11 * 60 + 30), (13 * 60 + 30, 15 * 60), (21 * 60, 23 * 60)]
+INT_CN_OFFSET_MS = 8 * 3600 * 1000
+INT_LEVELS = 5
+
+def get_trading_days(int_days: int, str_end: str = "2025-12-31") -> pd.DatetimeIndex:
+    """截至str_end的最近int_days个工作日"""
+    return pd.bdate_range(end=str_end, periods=int_days)
+
+def get_session_offsets_ms(int_step_ms: int) -> np.ndarray:
+    """一个交易日内各时间点相对当日零点的毫秒数（按步长取，左闭右开）"""
+    list_offset = [np.arange(int_begin * 60000, int_end * 60000, int_step_ms, dtype='int64') for int_begin, int_end in LIST_SESSION]
+    return np.concatenate(list_offset)
+
+def make_times(int_days: int, int_step_ms: int) -> np.ndarray:
+    """int_days个交易日、每int_step_ms一条的UTC毫秒时间戳（升序）"""
+    arr_day_ms = get_trading_days(int_days).to_numpy(dtype='datetime64[ms]').astype('int64') - INT_CN_OFFSET_MS
+    return (arr_day_ms[:, None] + get_session_offsets_ms(int_step_ms)[None, :]).ravel()
+
+def to_cn_index(arr_time: np.ndarray) -> pd.DatetimeIndex:
+    """UTC毫秒 -> 东八区不带时区的DatetimeIndex"""
+    return pd.DatetimeIndex((arr_time + INT_CN_OFFSET_MS).astype('datetime64[ms]'))
+
+def make_bar_frame(float_years: float = 5.0, int_period_ms: int = 60000, int_seed: int = 0) -> pd.DataFrame:
+    """
+    模拟K线
+
+    Args:
+        float_years: 年数（每年244个交易日）
+        int_period_ms: K线周期（毫秒），默认1分钟
+        int_seed: 随机种子
+    """
+    rng = np.random.default_rng(int_seed)
+    arr_time = make_times(max(int(float_years * 244), 1), int_period_ms)
+    int_rows = len(arr_time)
+    arr_close = 5000 + np.cumsum(rng.normal(0, 2, int_rows)).round(0)
+    arr_open = np.append(arr_close[0], arr_close[:-1])
+    arr_spread = np.abs(rng.normal(0, 2, int_rows)).round(0)
+    df = pd.DataFrame({
+        'time': arr_time,
+        'open': arr_open,
+        'high': np.maximum(arr_open, arr_close) + arr_spread,
+        'low': np.minimum(arr_open, arr_close) - arr_spread,
+        'close': arr_close,
+        'volume': rng.integers(0, 2000, int_rows).astype('float64'),
+        'amount': rng.integers(0, 2000, int_rows) * arr_close * 15.0,
+        'settelementPrice': 0.0,
+        'openInterest': (200000 + np.cumsum(rng.integers(-100, 101, int_rows))).astype('float64'),
+        'preClose': np.append(arr_close[0], arr_close[:-1]),
+        'suspendFlag': 0.0,
+    }, index=to_cn_index(arr_time))
+    return df
+
+def make_tick_frame(float_years: float = 1.0, int_step_ms: int = 3000, int_rows: int = None, int_seed: int = 0) -> pd.DataFrame:
+    """
+    模拟tick（五档为列表列）
+
+    Args:
+        float_years: 年数（每年244个交易日）
+        int_step_ms: 两笔tick的间隔（毫秒）
+        int_rows: 指定时只取最后int_rows行（用于按行数生成）
+        int_seed: 随机种子
+    """
+    rng = np.random.default_rng(int_seed)
+    if int_rows is not None:
+        int_per_day = len(get_session_offsets_ms(int_step_ms))
+        arr_time = make_times(int(np.ceil(int_rows / int_per_day)), int_step_ms)[-int_rows:]
+    else:
+        arr_time = make_times(max(int(float_years * 244), 1), int_step_ms)
+    int_rows = len(arr_time)
+    arr_last = 5000 + np.cumsum(rng.integers(-1, 2, int_rows)).astype('float64')
+    arr_step = np.arange(1, INT_LEVELS + 1, dtype='float64')
+    arr_volume = np.cumsum(rng.integers(0, 50, int_rows))
+    df = pd.DataFrame({
+        'time': arr_time,
+        'lastPrice': arr_last,
+        'open': arr_last[0],
+        'high': np.maximum.accumulate(arr_last),
+        'low': np.minimum.accumulate(arr_last),
+        'lastClose': arr_last[0],
+        'amount': arr_volume * 5000.0 * 15,
+        'volume': arr_volume,
+        'pvolume': arr_volume,
+        'stockStatus': 0,
+        'openInt': 100000 + rng.integers(-500, 500, int_rows),
+        'lastSettlementPrice': arr_last[0],
+        # 与QMT返回一致：每行为Python列表
+        'askPrice': (arr_last[:, None] + arr_step).tolist(),
+        'bidPrice': (arr_last[:, None] - arr_step).tolist(),
+        'askVol': rng.integers(1, 300, (int_rows, INT_LEVELS)).tolist(),
+        'bidVol': rng.integers(1, 300, (int_rows, INT_LEVELS)).tolist(),
+    }, index=to_cn_index(arr_time))
+    return df
+
+def split_for_append(df_full: pd.DataFrame, int_new_rows: int, float_overlap: float) -> tuple:
+    """
+    把完整数据切成 已有文件 和 新数据：新数据共int_new_rows行，其中float_overlap比例与已有数据的末尾重叠
+
+    Returns:
+        tuple: (df_existing, df_new)
+    """
+    int_new_rows = min(int_new_rows, len(df_full) // 2)
+    int_overlap = int(int_new_rows * float_overlap)
+    int_existing_end = len(df_full) - (int_new_rows - int_overlap)
+    return df_full.iloc[:int_existing_end].copy(), df_full.iloc[int_existing_end - int_overlap:].copy()
+
+class FakeXtdata:
+    """
+    模拟xtdata的下载接口（不产生数据，只模拟耗时），用于比较逐个合约下载和批量下载
+
+    耗时模型：每次调用固定开销float_call_seconds（请求、数据中心调度）+ 每个合约float_code_seconds；
+    数据中心串行处理请求（多个worker线程的调用排队执行）。set_fail_batch中的合约在批量下载中回调报错，单独下载时成功。
+    """
+
+    def __init__(self, float_call_seconds: float = 0.05, float_code_seconds: float = 0.005, set_fail_batch: set = None):
+        import threading
+        self.float_call_seconds = float_call_seconds
+        self.float_code_seconds = float_code_seconds
+        self.set_fail_batch = set_fail_batch or set()
+        self.lock = threading.Lock()
+        self.int_calls = 0
+        self.int_codes = 0
+
+    def _serve(self, int_codes: int):
+        import time
+        with self.lock:
+            self.int_calls += 1
+            self.int_codes += int_codes
+            time.sleep(self.float_call_seconds + self.float_code_seconds * int_codes)
+
+    def download_history_data(self, stock_code, period, start_time='', end_time='', incrementally=None):
+        self._serve(1)
+
+    def download_history_data2(self, stock_list, period, start_time='', end_time='', callback=None, incrementally=None):
+        self._serve(len(stock_list))
+        for int_idx, str_code in enumerate(stock_list):
+            if callback is not None:
+                callback({'finished': int_idx + 1, 'total': len(stock_list), 'stockcode': str_code,
+                          'message': "模拟下载失败" if str_code in self.set_fail_batch else ''})
+
+    def get_trading_dates(self, market, start_time='', end_time='', count=-1):
+        arr_day = pd.bdate_range(start_time, end_time).to_numpy(dtype='datetime64[ms]').astype('int64') - INT_CN_OFFSET_MS
+        return arr_day.tolist()
@@ -0,0 +1,38 @@
+"""
+共享内存K线缓存服务
+
+研究进程通过operation.SharedBarCache.SharedBarCacheClient请求 (合约, 周期, 字段)，
+服务只加载一次文件到共享内存，多个进程零拷贝读取同一份数据。配置见app.ini的[cache]。
+
+用法（在项目根目录执行）:
+    python cache_daemon.py
+    python cache_daemon.py --stats     查看运行中服务的缓存状态
+"""
+import argparse
+import signal
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description="共享内存K线缓存服务")
+    parser.add_argument('--stats', action='store_true', help='查看运行中服务的缓存状态')
+    args = parser.parse_args()
+
+    from operation.SharedBarCache import SharedBarCacheServer, SharedBarCacheClient
+
+    if args.stats:
+        with SharedBarCacheClient() as client:
+            dict_stats = client.stats()
+        print(f"缓存 {dict_stats['entries']} 项（失效待释放 {dict_stats['stale']} 项），"
+              f"已用 {dict_stats['used_bytes'] / 1024 / 1024:.1f}MB / {dict_stats['budget_bytes'] / 1024 / 1024:.0f}MB")
+        for str_key, int_refcount in dict_stats['refcount'].items():
+            print(f"  {str_key}: 引用 {int_refcount}")
+        return
+    # kill/停止服务时也走正常退出流程，释放全部共享内存段
+    signal.signal(signal.SIGTERM, lambda int_signum, frame: sys.exit(0))
+    try:
+        SharedBarCacheServer().serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        print("【缓存】服务停止")
+
+if __name__ == "__main__":
+    main()
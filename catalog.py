@@ -0,0 +1,51 @@
+"""
+本地K线文件目录的命令行工具
+
+用法（在项目根目录执行）:
+    python catalog.py scan [--root barData]            扫描已有文件补录到目录（首次启用目录时执行一次）
+    python catalog.py show [--id ag00.SF] [--period 1m] 显示目录记录（行数、时间范围、大小）
+    python catalog.py verify [--workers 8]              并行重新计算哈希，报告内容变化或丢失的文件
+"""
+import argparse
+import configparser
+
+def main():
+    parser = argparse.ArgumentParser(description="本地K线文件目录")
+    parser.add_argument('command', choices=['scan', 'show', 'verify'])
+    parser.add_argument('--root', default=None, help='scan的数据目录，默认为[path] data_save_path')
+    parser.add_argument('--id', default=None, help='show的合约长代码')
+    parser.add_argument('--period', default=None, help='show的周期')
+    parser.add_argument('--workers', type=int, default=None, help='verify的并行线程数')
+    args = parser.parse_args()
+
+    import pandas as pd
+    from operation.BarCatalog import BarCatalog
+    from utility import utility
+
+    obj_catalog = BarCatalog()
+    if args.command == "scan":
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        obj_catalog.scan(args.root or config.get('path', 'data_save_path'))
+    elif args.command == "show":
+        df = obj_catalog.query(args.id, args.period)
+        if df.empty:
+            print("目录中没有记录")
+        else:
+            for str_column in ['MinTime', 'MaxTime']:
+                df[str_column] = [None if pd.isna(v) else dt.strftime('%Y-%m-%d %H:%M:%S')
+                                  for v, dt in zip(df[str_column], utility.batch_timestamp_to_datetime(df[str_column].fillna(0)))]
+            pd.set_option('display.width', 200)
+            pd.set_option('display.max_columns', 20)
+            print(df[['Path', 'Format', 'RowCount', 'MinTime', 'MaxTime', 'ByteSize']].to_string(index=False))
+            print(f"\n共 {len(df)} 个文件，{df['RowCount'].sum()} 行，{df['ByteSize'].sum() / 1024 / 1024:.1f}MB")
+    elif args.command == "verify":
+        df_result = obj_catalog.verify(args.workers)
+        df_bad = df_result[df_result['status'] != "ok"]
+        print(f"校验 {len(df_result)} 个文件，一致 {len(df_result) - len(df_bad)} 个，异常 {len(df_bad)} 个")
+        if not df_bad.empty:
+            print(df_bad.to_string(index=False))
+    obj_catalog.close()
+
+if __name__ == "__main__":
+    main()
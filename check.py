@@ -3,6 +3,7 @@ import pandas as pd
 import pickle
 import os
 from datetime import datetime
+from utility import utility
 
 def check_future_data():
     """
@@ -14,7 +15,8 @@ def check_future_data():
     try:
         # 读取pkl文件
         print(f"\n开始读取文件: {file_path}")
-        df = pd.read_pickle(file_path)
+        # 已迁移为int64毫秒索引格式的文件通过兼容读取还原为datetime索引
+        df = utility.read_bar_pkl(file_path)
         
         # 显示基本信息
         print("\n数据基本信息:")
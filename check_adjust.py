@@ -0,0 +1,40 @@
+import configparser
+from datetime import datetime
+
+def check_adjust(list_sample: list, list_period: list):
+    """
+    抽样校验本地复权因子计算的等比前复权价格是否与QMT的front_ratio逐位一致
+    """
+    from connect.QMTConnect import QMTConnect
+    from operation.AdjustFactorOperator import AdjustFactorOperator
+
+    # 连接QMT
+    obj_qmt = QMTConnect()
+    if not obj_qmt.connect():
+        return None
+
+    config = configparser.ConfigParser()
+    config.read('./config/app.ini')
+    dt_begin = config.get('download', 'init_begin')
+    dt_end = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    obj_adjust = AdjustFactorOperator()
+    dict_report = {}
+    for str_period in list_period:
+        print(f"\n开始校验 {str_period} 周期...")
+        df_report = obj_adjust.verify_against_qmt(list_sample, str_period, dt_begin, dt_end)
+        print(df_report)
+        print(f"逐位一致: {int(df_report['bitwise_equal'].sum())}/{len(df_report)}")
+        dict_report[str_period] = df_report
+    return dict_report
+
+if __name__ == "__main__":
+    # 创建日志重定向器
+    from logPrintRedirector import logPrintRedirector
+    redirector = logPrintRedirector()
+
+    # 使用重定向器记录输出
+    with redirector.redirect_to_file():
+        print("开始校验本地复权结果...")
+        # 抽样：覆盖沪深主板、科创板、创业板，以及分红送转频繁的股票
+        check_adjust(["600000.SH", "600519.SH", "688981.SH", "000001.SZ", "000651.SZ", "300750.SZ"], ["1d", "1m"])
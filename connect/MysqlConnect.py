@@ -2,11 +2,34 @@ import mysql.connector
 import pandas as pd
 import configparser
 import os
+from contextlib import contextmanager
 
 class MysqlConnect:
-    def __init__(self):
-        """初始化MySQL操作器，从配置文件读取连接信息"""
+    # 服务模式下启用的连接池大小，0表示不使用连接池（每个实例单独建立连接）
+    int_pool_size = 0
+    # 连接池，按是否允许LOAD DATA LOCAL INFILE分别建立
+    _dict_pool = {}
+
+    @classmethod
+    def enable_pool(cls, int_pool_size: int):
+        """
+        启用进程内连接池：之后所有实例的connect从池中取连接，disconnect把连接还回池中而不真正关闭，
+        使长期运行的服务在多次任务之间保持数据库连接
+
+        Args:
+            int_pool_size: 每个连接池的大小
+        """
+        cls.int_pool_size = int_pool_size
+
+    def __init__(self, bool_local_infile: bool = False):
+        """
+        初始化MySQL操作器，从配置文件读取连接信息
+        
+        Args:
+            bool_local_infile: 是否允许LOAD DATA LOCAL INFILE（批量导入时使用）
+        """
         self.conn = None
+        self.bool_local_infile = bool_local_infile
         self._load_config()
         self.cursor = None
         
@@ -30,15 +53,35 @@ class MysqlConnect:
             self.password = "111111"
             self.database = "hd_database"
             
-    def connect(self):
-        """建立数据库连接"""
-        try:
-            self.conn = mysql.connector.connect(
+    def _get_pool(self):
+        """获取（必要时创建）当前配置对应的连接池"""
+        from mysql.connector import pooling
+        str_pool_name = f"qmt_{'infile' if self.bool_local_infile else 'default'}"
+        if str_pool_name not in MysqlConnect._dict_pool:
+            MysqlConnect._dict_pool[str_pool_name] = pooling.MySQLConnectionPool(
+                pool_name=str_pool_name,
+                pool_size=MysqlConnect.int_pool_size,
                 host=self.host,
                 user=self.user,
                 password=self.password,
-                database=self.database
+                database=self.database,
+                allow_local_infile=self.bool_local_infile
             )
+        return MysqlConnect._dict_pool[str_pool_name]
+
+    def connect(self):
+        """建立数据库连接"""
+        try:
+            if MysqlConnect.int_pool_size > 0:
+                self.conn = self._get_pool().get_connection()
+            else:
+                self.conn = mysql.connector.connect(
+                    host=self.host,
+                    user=self.user,
+                    password=self.password,
+                    database=self.database,
+                    allow_local_infile=self.bool_local_infile
+                )
             print(f"数据库连接成功。")
             return True
         except Exception as e:
@@ -46,10 +89,32 @@ class MysqlConnect:
             return False
             
     def disconnect(self):
-        """关闭数据库连接"""
+        """关闭数据库连接（使用连接池时为还回池中）"""
         if self.conn and self.conn.is_connected():
             self.conn.close()
             self.conn = None
+
+    def ping(self) -> bool:
+        """
+        检查连接是否可用，断开时自动重连
+
+        Returns:
+            bool: 连接可用返回True
+        """
+        if not self.conn:
+            return self.connect()
+        try:
+            self.conn.ping(reconnect=True, attempts=3, delay=1)
+            return True
+        except Exception as e:
+            print(f"数据库连接检查失败: {str(e)}")
+            # 使用连接池时把失效连接还回池中，避免占用池的名额
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+            return self.connect()
             
     def execute(self, query, values=None):
         """执行SQL语句"""
@@ -69,7 +134,54 @@ class MysqlConnect:
         except Exception as e:
             print(f"执行SQL出错: {str(e)}")
             return False
-            
+
+    def executemany(self, query, list_values):
+        """
+        批量执行SQL语句，一次提交
+
+        Args:
+            query: SQL语句
+            list_values: 参数列表，每个元素为一个tuple
+        """
+        if not list_values:
+            return True
+        if not self.conn:
+            if not self.connect():
+                return False
+
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(query, list_values)
+            self.conn.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            print(f"批量执行SQL出错: {str(e)}")
+            return False
+
+    @contextmanager
+    def transaction(self):
+        """
+        在一个事务中执行多条语句（如 SELECT ... FOR UPDATE 后 UPDATE），正常结束时提交，出错时回滚并抛出异常
+
+        Yields:
+            cursor: 本事务使用的游标
+        """
+        if not self.conn:
+            if not self.connect():
+                raise ConnectionError("数据库连接失败")
+        # 结束之前的查询隐式开启的事务，使本事务读到最新提交的数据
+        self.conn.commit()
+        cursor = self.conn.cursor()
+        try:
+            yield cursor
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
     def query(self, query, params=None) -> pd.DataFrame:
         """
         执行查询语句并返回DataFrame
@@ -1,7 +1,5 @@
 import configparser
 import os
-from xtquant import xtdatacenter as xtdc
-from xtquant import xtdata
 
 class QMTConnect:
     def __init__(self):
@@ -24,6 +22,8 @@ class QMTConnect:
             
     def connect(self):
         """连接迅投服务器"""
+        # xtquant加载较慢，在真正连接时才导入
+        from xtquant import xtdatacenter as xtdc
         xtdc.set_token(self.token)
         try:
             xtdc.init()
@@ -35,6 +35,34 @@ class QMTConnect:
             print(f"连接QMT服务器失败: {str(e)}")
             self.connected = False
             return False
+
+    def health_check(self) -> bool:
+        """
+        检查数据中心会话是否可用：查询一次上交所最近的交易日
+
+        Returns:
+            bool: 会话可用返回True
+        """
+        if not self.connected:
+            return False
+        try:
+            from xtquant import xtdata
+            return len(xtdata.get_trading_dates('SH', count=1)) > 0
+        except Exception as e:
+            print(f"QMT健康检查失败: {str(e)}")
+            return False
+
+    def reconnect(self) -> bool:
+        """关闭（如果支持）并重新初始化数据中心"""
+        from xtquant import xtdatacenter as xtdc
+        func_shutdown = getattr(xtdc, 'shutdown', None)
+        if func_shutdown is not None:
+            try:
+                func_shutdown()
+            except Exception as e:
+                print(f"关闭QMT数据中心出错: {str(e)}")
+        self.connected = False
+        return self.connect()
             
     @property
     def is_connected(self):
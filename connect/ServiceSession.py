@@ -0,0 +1,60 @@
+import configparser
+import time
+from connect.QMTConnect import QMTConnect
+from connect.MysqlConnect import MysqlConnect
+
+class ServiceSession:
+    """
+    服务模式下长期保持的会话
+
+    进程启动时初始化一次QMT数据中心和数据库连接池，之后每次定时任务复用；
+    每次使用前做健康检查，不可用时自动重新初始化（最多重试max_retries次）。
+    """
+
+    def __init__(self):
+        """从app.ini的[service]读取连接池大小和重试参数"""
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.int_max_retries = config.getint('service', 'max_retries', fallback=3)
+        self.float_retry_wait = config.getfloat('service', 'retry_wait_seconds', fallback=60)
+        MysqlConnect.enable_pool(config.getint('service', 'db_pool_size', fallback=4))
+        self.obj_qmt = QMTConnect()
+        self.obj_mysql_connect = MysqlConnect()
+        # 各阶段耗时，用于报告启动延迟
+        self.dict_timing = {}
+
+    def start(self) -> bool:
+        """
+        初始化QMT数据中心和数据库连接
+
+        Returns:
+            bool: 都成功返回True
+        """
+        time_start = time.perf_counter()
+        bool_qmt = self.obj_qmt.connect()
+        self.dict_timing['qmt_init'] = time.perf_counter() - time_start
+        time_start = time.perf_counter()
+        bool_mysql = self.obj_mysql_connect.connect()
+        self.dict_timing['mysql_connect'] = time.perf_counter() - time_start
+        return bool_qmt and bool_mysql
+
+    def ensure(self) -> bool:
+        """
+        健康检查，不可用时重新初始化
+
+        Returns:
+            bool: 检查（或重新初始化）后会话可用返回True
+        """
+        for int_try in range(self.int_max_retries + 1):
+            bool_qmt = self.obj_qmt.health_check() or self.obj_qmt.reconnect()
+            bool_mysql = self.obj_mysql_connect.ping()
+            if bool_qmt and bool_mysql:
+                return True
+            if int_try < self.int_max_retries:
+                print(f"【服务】会话不可用（QMT: {bool_qmt}，数据库: {bool_mysql}），{self.float_retry_wait:.0f}秒后第{int_try + 1}次重试...")
+                time.sleep(self.float_retry_wait)
+        return False
+
+    def close(self):
+        """关闭数据库连接"""
+        self.obj_mysql_connect.disconnect()
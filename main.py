@@ -1,37 +1,81 @@
 import time
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-from joblib import dump, load
 import configparser
-import time
-from datetime import datetime, timedelta
-
-from xtquant import xtdata
-from xtquant import xtdatacenter as xtdc
+import argparse
+from datetime import datetime
 
-from connect.QMTConnect import QMTConnect
-from connect.MysqlConnect import MysqlConnect
-from operation.MysqlOperator import MysqlOperator
-from operation.QMTOperator import QMTOperator
-from utility import utility
 from logPrintRedirector import logPrintRedirector
 
 import warnings
 warnings.filterwarnings("ignore")
 
+# 进程启动时间，用于统计启动到第一次下载的延迟
+TIME_PROCESS_START = time.perf_counter()
 
-def download_and_save():
-    # 连接QMT
+
+def connect_qmt():
+    """
+    连接QMT，连接失败时退出；行情缓存为replay模式时所有查询都从缓存读取，不连接QMT，返回None
+    """
+    from operation.MarketDataCache import MarketDataCache
+    if MarketDataCache.get_mode() == "replay":
+        print("【行情缓存】replay模式，不连接QMT")
+        return None
+    from connect.QMTConnect import QMTConnect
     obj_qmt = QMTConnect()
     if not obj_qmt.connect():
         exit()
+    return obj_qmt
+
+def download_and_save(obj_qmt=None, obj_mysql_connect=None, time_run_start=None, bool_resume=False):
+    """
+    下载并保存期货、股票数据
+
+    Args:
+        obj_qmt: 已连接的QMTConnect（服务模式下复用），None时新建连接（replay模式不连接）
+        obj_mysql_connect: 已连接的MysqlConnect（服务模式下复用），None时新建连接
+        time_run_start: 本次任务开始的perf_counter时间，用于统计到第一次下载的延迟，None时使用进程启动时间
+        bool_resume: 断点续跑：跳过下载阶段，按log_save中上次下载的时间范围重跑保存阶段
+                     （保存阶段的查询与崩溃前相同，[market_cache] mode=record时命中已录制的行情）
+    """
+    # xtquant、pandas等较重的模块在真正执行任务时才导入，空闲的定时循环不加载
+    time_import_start = time.perf_counter()
+    from xtquant import xtdata
+    from connect.MysqlConnect import MysqlConnect
+    from operation.MysqlOperator import MysqlOperator
+    from operation.QMTOperator import QMTOperator
+    from operation.StockShardOperator import StockShardOperator
+    from operation.ContinuousOperator import ContinuousOperator
+    from operation.RunHooks import RunHooks
+    float_import_seconds = time.perf_counter() - time_import_start
+    time_run_start = TIME_PROCESS_START if time_run_start is None else time_run_start
+
+    # 连接QMT
+    bool_own_session = obj_mysql_connect is None
+    if bool_own_session:
+        obj_qmt = connect_qmt()
         
-    # 连接数据库
-    obj_mysql_connect = MysqlConnect()
-    if not obj_mysql_connect.connect():
-        exit()
+        # 连接数据库
+        obj_mysql_connect = MysqlConnect()
+        if not obj_mysql_connect.connect():
+            exit()
         
+    # 分阶段性能分析、进度接口和运行历史（未开启的钩子不做任何事）
+    with RunHooks.run():
+        _run_stages(obj_qmt, obj_mysql_connect, time_run_start, float_import_seconds, bool_resume)
+
+    # 断开数据库连接（服务模式下连接由会话保持）
+    if bool_own_session:
+        obj_mysql_connect.disconnect()
+
+def _run_stages(obj_qmt, obj_mysql_connect, time_run_start, float_import_seconds, bool_resume=False):
+    """download_and_save的各个处理阶段，bool_resume时跳过下载阶段"""
+    from operation.MysqlOperator import MysqlOperator
+    from operation.QMTOperator import QMTOperator
+    from operation.StockShardOperator import StockShardOperator
+    from operation.ContinuousOperator import ContinuousOperator
+    from operation.RunHooks import RunHooks
+    from operation.JobLeaseOperator import JobLeaseOperator
+
     # 创建数据库操作器
     obj_mysql_operator = MysqlOperator(obj_mysql_connect)
     # 创建QMT操作器
@@ -42,7 +86,10 @@ def download_and_save():
 
     # 初始化并获取交易所信息
     print("初始化交易所数据...")
-    obj_mysql_operator.init_exchange()
+    with RunHooks.stage("init"):
+        obj_mysql_operator.init_exchange()
+        obj_mysql_operator.init_instrument_hash()
+        obj_mysql_operator.init_plan_cost()
     
     # 记录总开始时间
     time_total_start = time.time()
@@ -52,91 +99,368 @@ def download_and_save():
     print("\n开始处理期货数据...")
     time_future_start = time.time()
     
-    # 获得期货交易所信息
-    print("获取期货交易所信息...")
-    df_exchange_info = obj_mysql_operator.get_exchange(instrument_category="FUTURE")
-    
-    # 获取所有连续合约列表
-    print("获取所有连续合约列表...")
-    list_all_futures = xtdata.get_stock_list_in_sector('连续合约')
-    # 过滤出包含"00."的合约
-    list_continuous_futures = [str_future for str_future in list_all_futures if "00." in str_future]
-    
-    # 更新并获取期货连续合约详细信息
-    print("更新并获取期货连续合约详细信息...")
-    df_future_detail = obj_qmt_operator.get_instrument_detail(df_exchange_info, list_continuous_futures, "FUTURE")
-    
-    # 初始化并保存日志
-    print("初始化数据下载日志表...")
-    df_save_log = obj_mysql_operator.init_save_log(df_future_detail)
+    with RunHooks.stage("FUTURE_prepare"):
+        # 获得期货交易所信息
+        print("获取期货交易所信息...")
+        df_exchange_info = obj_mysql_operator.get_exchange(instrument_category="FUTURE")
+        
+        # 获取所有连续合约列表
+        print("获取所有连续合约列表...")
+        list_all_futures = obj_qmt_operator.market_data_cache.call('get_stock_list_in_sector', '连续合约', bool_fresh=True)
+        # 过滤出包含"00."的合约
+        list_continuous_futures = [str_future for str_future in list_all_futures if "00." in str_future]
+        
+        # 更新并获取期货连续合约详细信息
+        print("更新并获取期货连续合约详细信息...")
+        df_future_detail = obj_qmt_operator.get_instrument_detail(df_exchange_info, list_continuous_futures, "FUTURE")
+        
+        # 初始化并保存日志
+        print("初始化数据下载日志表...")
+        df_save_log = obj_mysql_operator.init_save_log(df_future_detail)
     
     # 下载数据
     config.read('./config/app.ini')
     dt_init_begin = config.get('download', 'init_begin')
     # dt_init_end = "20240801000001"
     # dt_init_end = "20250101000001"
-    dt_init_end = datetime.now().strftime('%Y%m%d%H%M%S')
-    print("开始下载期货数据...")
-    obj_qmt_operator.download_barData(df_save_log, str_instrument_category="FUTURE", dt_init_begin=dt_init_begin, dt_init_end=dt_init_end)
-    
-    # 保存数据
-    print("开始保存期货数据...")
-    obj_qmt_operator.save_barData(str_instrument_category="FUTURE")
+    if bool_resume:
+        # 断点续跑沿用崩溃前的下载结束时间（股票锚点和连续合约的查询与崩溃前一致）
+        df_log_save_all = obj_mysql_operator.get_all_log_save()
+        dt_init_end = df_log_save_all['download_end_datetime'].dropna().max() if not df_log_save_all.empty else None
+        dt_init_end = str(dt_init_end) if dt_init_end else datetime.now().strftime('%Y%m%d%H%M%S')
+    else:
+        # record模式记录本次的结束时间，replay模式沿用录制时的结束时间，查询参数与录制时一致
+        dt_init_end = obj_qmt_operator.market_data_cache.resolve_run_end(datetime.now().strftime('%Y%m%d%H%M%S'))
+    print(f"\n【启动耗时】从启动到开始第一次下载: {time.perf_counter() - time_run_start:.2f}秒（其中模块导入 {float_import_seconds:.2f}秒）")
+    if bool_resume:
+        # 断点续跑不写入新的下载结束时间，保存阶段的时间范围（和行情缓存的键）与崩溃前相同
+        print("【断点续跑】跳过下载阶段，按log_save中上次下载的时间范围重跑保存阶段"
+              + ("（分布式模式的单元由租约重试，这里只在本机保存）" if JobLeaseOperator.is_enabled() else ""))
+        print("开始保存期货数据...")
+        with RunHooks.stage("FUTURE_save"):
+            obj_qmt_operator.save_barData(str_instrument_category="FUTURE", bool_resume=True)
+    elif JobLeaseOperator.is_enabled():
+        # 分布式：发布工作单元，由各机器的worker（python main.py --worker）和本进程共同下载保存
+        print("开始分布式下载保存期货数据...")
+        with RunHooks.stage("FUTURE_distributed"):
+            obj_mysql_operator.init_job_lease()
+            JobLeaseOperator(obj_qmt_operator, obj_mysql_operator).run_coordinator(df_save_log, "FUTURE", dt_init_begin, dt_init_end)
+    else:
+        print("开始下载期货数据...")
+        with RunHooks.stage("FUTURE_download"):
+            obj_qmt_operator.download_barData(df_save_log, str_instrument_category="FUTURE", dt_init_begin=dt_init_begin, dt_init_end=dt_init_end)
+
+        # 保存数据
+        print("开始保存期货数据...")
+        with RunHooks.stage("FUTURE_save"):
+            obj_qmt_operator.save_barData(str_instrument_category="FUTURE")
+
+    # 由具体合约本地构建主力连续和持仓加权连续
+    if config.getboolean('continuous', 'enable', fallback=False):
+        print("开始构建期货连续合约...")
+        with RunHooks.stage("FUTURE_continuous"):
+            obj_continuous_operator = ContinuousOperator(obj_qmt_operator.market_data_cache)
+            obj_continuous_operator.run(df_future_detail, dt_init_end)
     
     # 计算期货数据处理时间
     time_future_elapsed = time.time() - time_future_start
     print(f"\n期货数据处理完成，耗时: {time_future_elapsed:.2f}秒")
     
     # 获取股票数据
-    # 股票每次重新保存数据，以防止有复权和等比前复权
+    # 股票按 交易所-板块 分片处理：只增量保存不复权数据，有新除权除息的股票刷新本地复权因子
     # ******************************************
-    # print("\n开始处理股票数据...")
-    # time_stock_start = time.time()
+    print("\n开始处理股票数据...")
+    time_stock_start = time.time()
     
-    # # 获得股票交易所信息
-    # print("获取股票交易所信息...")
-    # df_exchange_info = obj_mysql_operator.get_exchange(instrument_category="STOCK")
-
-    # # 获取各个股票列表
-    # print("获取所有股票列表...")
-    # list_all_stocks = []
-    # for idx, row in df_exchange_info.iterrows():
-    #     list_all_stocks = list_all_stocks + xtdata.get_stock_list_in_sector(row['ExchangeCName'])
-
-    # # 更新并获取股票合约详细信息
-    # print("更新并获取股票合约详细信息...")
-    # df_stock_detail = obj_qmt_operator.get_instrument_detail(df_exchange_info, list_all_stocks, "STOCK")
-
-    # # 初始化并保存日志
-    # print("初始化股票数据下载日志表...")
-    # df_save_log = obj_mysql_operator.init_save_log(df_stock_detail, str_instrument_category="STOCK")
-
-    # # 下载数据
-    # config.read('./config/app.ini')
-    # dt_init_begin = config.get('download', 'init_begin')
-    # dt_init_end = datetime.now().strftime('%Y%m%d%H%M%S')
-    # print("开始下载股票数据...")
-    # obj_qmt_operator.download_barData(df_save_log, str_instrument_category="STOCK", dt_init_begin=dt_init_begin, dt_init_end=dt_init_end)
-    
-    # # 保存数据
-    # print("开始保存期货数据...")
-    # obj_qmt_operator.save_barData(str_instrument_category="FUTSTOCKURE")
+    with RunHooks.stage("STOCK_prepare"):
+        # 获得股票交易所信息
+        print("获取股票交易所信息...")
+        df_exchange_info = obj_mysql_operator.get_exchange(instrument_category="STOCK")
+
+        # 获取各个股票列表
+        print("获取所有股票列表...")
+        list_all_stocks = []
+        for idx, row in df_exchange_info.iterrows():
+            list_all_stocks = list_all_stocks + obj_qmt_operator.market_data_cache.call('get_stock_list_in_sector', row['ExchangeCName'],
+                                                                                         bool_fresh=True)
+
+        # 更新并获取股票合约详细信息
+        print("更新并获取股票合约详细信息...")
+        df_stock_detail = obj_qmt_operator.get_instrument_detail(df_exchange_info, list_all_stocks, "STOCK")
+
+        # 初始化并保存日志
+        print("初始化股票数据下载日志表...")
+        df_save_log = obj_mysql_operator.init_save_log(df_stock_detail, str_instrument_category="STOCK")
+        obj_mysql_operator.init_stock_shard_log()
+
+    # 按分片下载并保存数据
+    float_time_budget = config.getfloat('stock', 'time_budget')
+    float_default_seconds_per_code = config.getfloat('stock', 'default_seconds_per_code')
+    print("开始分片下载并保存股票数据...")
+    obj_stock_shard_operator = StockShardOperator(obj_qmt_operator, obj_mysql_operator)
+    obj_stock_shard_operator.run(df_save_log, dt_init_begin, dt_init_end, float_time_budget, float_default_seconds_per_code, bool_resume)
     
-    # # 计算股票数据处理时间
-    # time_stock_elapsed = time.time() - time_stock_start
-    # print(f"\n股票数据处理完成，耗时: {time_stock_elapsed:.2f}秒")
+    # 计算股票数据处理时间
+    time_stock_elapsed = time.time() - time_stock_start
+    print(f"\n股票数据处理完成，耗时: {time_stock_elapsed:.2f}秒")
     
     # 计算总耗时
     time_total_elapsed = time.time() - time_total_start
     print(f"\n所有数据处理完成，总耗时: {time_total_elapsed:.2f}秒")
     print(f"其中：")
     print(f"期货数据处理耗时: {time_future_elapsed:.2f}秒")
-    # print(f"股票数据处理耗时: {time_stock_elapsed:.2f}秒")
+    print(f"股票数据处理耗时: {time_stock_elapsed:.2f}秒")
+
+def plan_only():
+    """
+    预演：只根据log_save和历史成本构建执行计划，打印预估耗时和数据量，不下载也不保存
+    """
+    from connect.MysqlConnect import MysqlConnect
+    from operation.MysqlOperator import MysqlOperator
+    from operation.QMTOperator import QMTOperator
+
+    # 连接数据库
+    obj_mysql_connect = MysqlConnect()
+    if not obj_mysql_connect.connect():
+        exit()
+    obj_mysql_operator = MysqlOperator(obj_mysql_connect)
+    obj_mysql_operator.init_plan_cost()
+    obj_qmt_operator = QMTOperator(None, obj_mysql_connect)
+
+    config = configparser.ConfigParser()
+    config.read('./config/app.ini')
+    dt_init_begin = config.get('download', 'init_begin')
+    dt_init_end = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    float_total_seconds = 0
+    float_total_bytes = 0
+    for str_category in ["FUTURE", "STOCK"]:
+        df_save_log = obj_mysql_operator.get_all_log_save(str_category)
+        if df_save_log.empty:
+            continue
+        for str_stage in ["download", "save"]:
+            list_queues = obj_qmt_operator.plan_barData(df_save_log, str_category, str_stage, dt_init_begin, dt_init_end)
+            float_makespan, float_bytes = obj_qmt_operator.work_planner.print_plan(list_queues, f"{str_category} {str_stage}")
+            float_total_seconds += float_makespan
+            # 数据量以保存阶段为准
+            if str_stage == "save":
+                float_total_bytes += float_bytes
 
-    # 断开数据库连接
+    print(f"\n【执行计划】预估总耗时: {float_total_seconds:.0f}秒，预估数据量: {float_total_bytes / 1024 / 1024:.1f}MB")
     obj_mysql_connect.disconnect()
 
+def run_worker(str_batch_id: str = None, str_worker_id: str = None):
+    """
+    分布式worker：从log_job_lease领取工作单元下载并保存，指定批次时该批次结束后退出，否则一直等待新的批次
+
+    Args:
+        str_batch_id: 只处理该批次
+        str_worker_id: worker标识，默认为 主机名-进程号
+    """
+    from connect.MysqlConnect import MysqlConnect
+    from operation.MysqlOperator import MysqlOperator
+    from operation.QMTOperator import QMTOperator
+    from operation.JobLeaseOperator import JobLeaseOperator
+    from operation.RunHooks import RunHooks
+
+    obj_qmt = connect_qmt()
+    obj_mysql_connect = MysqlConnect()
+    if not obj_mysql_connect.connect():
+        exit()
+    obj_mysql_operator = MysqlOperator(obj_mysql_connect)
+    obj_mysql_operator.init_job_lease()
+    obj_mysql_operator.init_plan_cost()
+    obj_job_lease_operator = JobLeaseOperator(QMTOperator(obj_qmt, obj_mysql_connect), obj_mysql_operator, str_worker_id)
+    try:
+        with RunHooks.run() as dict_run:
+            try:
+                with RunHooks.stage("worker"):
+                    obj_job_lease_operator.run_worker(str_batch_id, bool_until_done=str_batch_id is not None)
+            except KeyboardInterrupt:
+                dict_run['error'] = "KeyboardInterrupt"
+                print("\nworker被用户中断，未完成单元的租约到期后由其他worker重新领取")
+    finally:
+        obj_mysql_connect.disconnect()
+
+def history_report(int_baseline_runs: int = None):
+    """
+    打印最近一次运行相对此前各次运行（滚动基线）的性能退化
+
+    Args:
+        int_baseline_runs: 基线运行次数，默认取[history] baseline_runs
+    """
+    from connect.MysqlConnect import MysqlConnect
+    from operation.MysqlOperator import MysqlOperator
+    from operation.RunHistory import RunHistory
+
+    obj_mysql_connect = MysqlConnect()
+    if not obj_mysql_connect.connect():
+        exit()
+    try:
+        RunHistory.report(MysqlOperator(obj_mysql_connect), int_baseline_runs)
+    finally:
+        obj_mysql_connect.disconnect()
+
+def repair(str_instrument_category: str, list_instrument_long_id: list = None, list_period: list = None, bool_dry_run: bool = False):
+    """
+    缺口修补：扫描本地数据与交易日历比较，只下载并合并缺失的时间范围
+
+    Args:
+        str_instrument_category: 品种类型，"FUTURE"或"STOCK"
+        list_instrument_long_id: 可选，只修补这些合约
+        list_period: 可选，只修补这些周期
+        bool_dry_run: 只打印缺口，不下载
+    """
+    from connect.MysqlConnect import MysqlConnect
+    from operation.QMTOperator import QMTOperator
+    from operation.GapRepairOperator import GapRepairOperator
+    from operation.RunHooks import RunHooks
+
+    obj_qmt = connect_qmt()
+    obj_mysql_connect = MysqlConnect()
+    if not obj_mysql_connect.connect():
+        exit()
+    obj_gap_repair_operator = GapRepairOperator(QMTOperator(obj_qmt, obj_mysql_connect))
+    str_stage = f"{str_instrument_category}_repair"
+    try:
+        with RunHooks.run(), RunHooks.stage(str_stage):
+            obj_gap_repair_operator.repair(str_instrument_category, list_instrument_long_id, list_period, bool_dry_run)
+    finally:
+        obj_mysql_connect.disconnect()
+
+def gc_snapshots():
+    """清理各数据目录中被替代超过保留时间（[snapshot] grace_seconds）的旧快照版本"""
+    from utility import utility
+
+    config = configparser.ConfigParser()
+    config.read('./config/app.ini')
+    list_root = [config.get('path', 'future_data_path'), config.get('path', 'stock_data_path'),
+                 config.get('daily', 'data_path', fallback='barData/DAILY'), config.get('continuous', 'data_path', fallback='barData/CONTINUOUS')]
+    int_total_files = 0
+    int_total_bytes = 0
+    for str_root in list_root:
+        int_files, int_bytes = utility.gc_snapshots(str_root)
+        int_total_files += int_files
+        int_total_bytes += int_bytes
+    print(f"【快照】清理旧版本 {int_total_files} 个，释放 {int_total_bytes / 1024 / 1024:.1f}MB")
+
+def is_run_time(dt_now: datetime) -> bool:
+    """是否满足执行条件：周五且晚于18:00且早于19:00"""
+    return dt_now.weekday() == 4 and 18 <= dt_now.hour <= 19
+
+def run_service():
+    """
+    服务模式：进程启动时初始化一次QMT数据中心和数据库连接池并一直保持，
+    每小时做一次健康检查（不可用时自动重新初始化），满足执行条件时复用会话执行任务，
+    并报告从启动（或任务触发）到开始第一次下载的耗时
+    """
+    from connect.ServiceSession import ServiceSession
+
+    config = configparser.ConfigParser()
+    config.read('./config/app.ini')
+    float_check_seconds = config.getfloat('service', 'check_interval_seconds', fallback=3600)
+
+    print("服务模式启动，初始化QMT数据中心和数据库连接池...")
+    obj_session = ServiceSession()
+    obj_session.start()
+    print(f"【服务】QMT初始化 {obj_session.dict_timing['qmt_init']:.2f}秒，数据库连接 {obj_session.dict_timing['mysql_connect']:.2f}秒，"
+          f"进程启动至今 {time.perf_counter() - TIME_PROCESS_START:.2f}秒")
+    bool_first_run = True
+    try:
+        while True:
+            try:
+                beg_time = datetime.now()
+                bool_healthy = obj_session.ensure()
+                if is_run_time(beg_time):
+                    if not bool_healthy:
+                        print("【服务】会话不可用，跳过本次任务")
+                    else:
+                        print(f"\n当前时间: {beg_time.strftime('%Y-%m-%d %H:%M:%S')}，满足执行条件，复用会话执行数据下载任务...")
+                        # 第一次任务从进程启动算起（包含初始化），之后从任务触发算起（会话已预热）
+                        time_run_start = TIME_PROCESS_START if bool_first_run else time.perf_counter()
+                        bool_first_run = False
+                        redirector = logPrintRedirector()
+                        with redirector.redirect_to_file():
+                            download_and_save(obj_session.obj_qmt, obj_session.obj_mysql_connect, time_run_start)
+                        print(f"数据下载任务执行完成，共耗时：{(datetime.now() - beg_time).total_seconds():.2f}秒...")
+                else:
+                    print(f"\r当前时间: {beg_time.strftime('%Y-%m-%d %H:%M:%S')} - 会话{'正常' if bool_healthy else '异常'}，等待执行条件（周五且晚于18:00 早于19:00）...")
+                # 本次任务替代的旧快照版本在保留时间之后的检查中删除
+                gc_snapshots()
+                time.sleep(float_check_seconds)
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                print(f"\n发生错误: {str(e)}")
+                print("5分钟后重试...")
+                time.sleep(300)
+    except KeyboardInterrupt:
+        print("\n程序被用户中断")
+    finally:
+        obj_session.close()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QMT数据下载")
+    parser.add_argument('--plan', action='store_true', help='只打印执行计划（预估耗时和数据量），不执行')
+    parser.add_argument('--service', action='store_true', help='服务模式：保持QMT会话和数据库连接池，定时复用')
+    parser.add_argument('--resume', action='store_true',
+                        help='断点续跑：立即执行一次，跳过下载阶段，按上次下载的时间范围重跑保存（配合--market-cache record命中已录制的行情）')
+    parser.add_argument('--profile', choices=['sampling', 'deterministic'], default=None,
+                        help='开启分阶段性能分析（覆盖[profile]配置），结果写入[profile] output_dir')
+    parser.add_argument('--profile-instruments', default=None, help='单独输出性能分析结果的合约，逗号分隔')
+    parser.add_argument('--market-cache', choices=['off', 'record', 'replay'], default=None,
+                        help='行情查询缓存模式（覆盖[market_cache] mode），replay只从缓存读取，不访问QMT')
+    parser.add_argument('--distributed', action='store_true',
+                        help='分布式模式（覆盖[distributed] enable）：期货的下载保存发布为工作单元，由本进程和各worker共同处理')
+    parser.add_argument('--worker', action='store_true', help='作为分布式worker运行，从数据库领取工作单元')
+    parser.add_argument('--batch', default=None, help='worker只处理该批次，批次结束后退出')
+    parser.add_argument('--worker-id', default=None, help='worker标识，默认为 主机名-进程号')
+    parser.add_argument('--history-report', action='store_true', help='打印最近一次运行相对滚动基线的性能退化（阶段和合约），不执行')
+    parser.add_argument('--history-runs', type=int, default=None, help='退化报告的基线运行次数（覆盖[history] baseline_runs）')
+    parser.add_argument('--repair', nargs='?', const='FUTURE', choices=['FUTURE', 'STOCK'], default=None,
+                        help='缺口修补：扫描本地数据，只下载并合并缺失的交易日（默认FUTURE）')
+    parser.add_argument('--repair-instruments', default=None, help='只修补这些合约，逗号分隔')
+    parser.add_argument('--repair-periods', default=None, help='只修补这些周期，逗号分隔（覆盖[repair] periods）')
+    parser.add_argument('--repair-dry-run', action='store_true', help='只打印缺口，不下载')
+    parser.add_argument('--gc-snapshots', action='store_true', help='清理各数据目录中被替代超过保留时间的旧快照版本，不执行')
+    args = parser.parse_args()
+    if args.distributed:
+        from operation.JobLeaseOperator import JobLeaseOperator
+        JobLeaseOperator.configure(True)
+    if args.market_cache:
+        from operation.MarketDataCache import MarketDataCache
+        MarketDataCache.configure(args.market_cache)
+    if args.profile or args.profile_instruments:
+        from operation.StageProfiler import StageProfiler
+        StageProfiler.configure(args.profile or 'sampling',
+                                None if args.profile_instruments is None else [s.strip() for s in args.profile_instruments.split(',') if s.strip()])
+    if args.plan:
+        plan_only()
+        exit()
+    if args.history_report:
+        history_report(args.history_runs)
+        exit()
+    if args.gc_snapshots:
+        gc_snapshots()
+        exit()
+    if args.repair:
+        repair(args.repair,
+               None if args.repair_instruments is None else [s.strip() for s in args.repair_instruments.split(',') if s.strip()],
+               None if args.repair_periods is None else [s.strip() for s in args.repair_periods.split(',') if s.strip()],
+               args.repair_dry_run)
+        exit()
+    if args.worker:
+        run_worker(args.batch, args.worker_id)
+        exit()
+    if args.resume:
+        redirector = logPrintRedirector()
+        with redirector.redirect_to_file():
+            download_and_save(bool_resume=True)
+        exit()
+    if args.service:
+        run_service()
+        exit()
+
     # 每一个小时检查一次，当前是否是周五，并且是否晚于18:00 是则运行download_and_save()
     print("程序启动，开始监控...")
     while True:
@@ -144,12 +468,8 @@ if __name__ == "__main__":
             # 获取当前时间
             beg_time = datetime.now()
             
-            # 检查是否是周五（weekday()返回0-6，其中0是周一，4是周五）
-            is_friday = beg_time.weekday() == 4
-            is_after_18 = beg_time.hour >= 18
-            is_before_19 = beg_time.hour <= 19
             # 如果是周五且晚于18:00，执行下载任务
-            if is_friday and is_after_18 and is_before_19:
+            if is_run_time(beg_time):
                 print(f"\n当前时间: {beg_time.strftime('%Y-%m-%d %H:%M:%S')}")
                 print("满足执行条件（周五且晚于18:00且早于19:00），开始执行数据下载任务...")
                 # 创建重定向器实例
@@ -0,0 +1,164 @@
+"""
+将barData下已有的pkl文件迁移为int64毫秒索引格式（同目录同名，扩展名为i64.pkl）
+
+每个文件：读取 -> 转换为int64毫秒索引（优先使用time列）-> 稳定排序去重 -> 写临时文件并校验 -> 校验通过后提交（版本快照或原子替换）：
+    1. 索引严格递增（已排序且无重复）
+    2. 行数等于原文件中不重复时间的个数
+    3. 数值列校验和（按列的字节MD5，含转换为毫秒时间戳的索引）与原文件去重后一致，数值列之和与原文件去重后一致
+多进程并行，按文件大小从大到小分配；每完成一个文件把结果追加到清单文件，
+再次运行时跳过大小和修改时间都未变化且已校验通过的文件，因此可以随时中断后继续。
+
+用法（在项目根目录执行）:
+    python migrate_pkl.py
+    python migrate_pkl.py --root barData/FUTURE --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+STR_MANIFEST_NAME = ".migrate_i64.jsonl"
+
+def calc_checksum(df, arr_ms) -> str:
+    """
+    数值列和毫秒时间戳的字节MD5，用于校验迁移后的文件与原文件完全一致
+
+    Args:
+        df: 数据
+        arr_ms: 每行的int64毫秒时间戳（原文件为索引转换的结果，迁移后的文件为int64索引）
+    """
+    import numpy as np
+    obj_md5 = hashlib.md5(np.ascontiguousarray(np.asarray(arr_ms, dtype='int64')).tobytes())
+    for str_column in sorted(df.columns, key=str):
+        arr_value = df[str_column].to_numpy()
+        if np.issubdtype(arr_value.dtype, np.number):
+            obj_md5.update(str(str_column).encode('utf-8'))
+            obj_md5.update(np.ascontiguousarray(arr_value).tobytes())
+    return obj_md5.hexdigest()
+
+def numeric_sums(df) -> dict:
+    """数值列之和，用于与原文件比较"""
+    import numpy as np
+    return {str(c): float(np.nansum(df[c].to_numpy(dtype='float64'))) for c in df.columns if np.issubdtype(df[c].dtype, np.number)}
+
+def migrate_file(str_pkl_path: str) -> dict:
+    """
+    迁移单个文件（在子进程中执行）
+
+    Returns:
+        dict: 迁移结果，status为ok或error
+    """
+    import numpy as np
+    import pandas as pd
+    from utility import utility
+
+    time_start = time.time()
+    str_read_path = utility.resolve_read_path(str_pkl_path)
+    obj_stat = os.stat(str_read_path)
+    dict_result = {'src': str_pkl_path, 'size': obj_stat.st_size, 'mtime': obj_stat.st_mtime}
+    try:
+        df_src = pd.read_pickle(str_read_path)
+        df_i64 = utility.to_i64_frame(df_src)
+        # 原文件去重后的数值列之和（相同时间保留最后一条，与to_i64_frame一致）
+        arr_ms = utility.index_to_epoch_ms(df_src)
+        df_src_dedup = df_src.iloc[np.argsort(arr_ms, kind='stable')]
+        df_src_dedup = df_src_dedup[~pd.Index(np.sort(arr_ms, kind='stable')).duplicated(keep='last')]
+        int_src_unique = len(np.unique(arr_ms))
+        # 由原文件独立计算（不经过to_i64_frame），转换出错时与迁移后的文件不一致
+        str_checksum = calc_checksum(df_src_dedup, utility.index_to_epoch_ms(df_src_dedup))
+
+        str_i64_path = str_pkl_path[:-len("pkl")] + utility.STR_I64_EXT
+        str_tmp_path = f"{str_i64_path}.tmp{os.getpid()}"
+        df_i64.to_pickle(str_tmp_path)
+        df_check = pd.read_pickle(str_tmp_path)
+
+        arr_index = df_check.index.to_numpy(dtype='int64')
+        list_error = []
+        if len(arr_index) > 1 and not bool(np.all(np.diff(arr_index) > 0)):
+            list_error.append("索引不是严格递增")
+        if len(df_check) != int_src_unique:
+            list_error.append(f"行数不一致: {len(df_check)} != {int_src_unique}")
+        if calc_checksum(df_check, arr_index) != str_checksum:
+            list_error.append("校验和与原文件不一致")
+        dict_src_sums = numeric_sums(df_src_dedup)
+        dict_dst_sums = numeric_sums(df_check)
+        for str_column, float_sum in dict_src_sums.items():
+            if not np.isclose(float_sum, dict_dst_sums.get(str_column, np.nan), rtol=1e-12, atol=0.0, equal_nan=True):
+                list_error.append(f"{str_column}列之和不一致")
+        if list_error:
+            os.remove(str_tmp_path)
+            dict_result.update({'status': 'error', 'error': "；".join(list_error)})
+        else:
+            # 校验通过的临时文件作为新版本提交
+            utility.commit_file(str_i64_path, lambda p: os.replace(str_tmp_path, p))
+            dict_result.update({'status': 'ok', 'dst': str_i64_path, 'rows_src': len(df_src), 'rows': len(df_check),
+                                'checksum': str_checksum})
+    except Exception as e:
+        dict_result.update({'status': 'error', 'error': str(e)})
+    dict_result['seconds'] = time.time() - time_start
+    return dict_result
+
+def load_manifest(str_manifest_path: str) -> dict:
+    """读取清单，返回 源文件 -> 最后一次成功的结果"""
+    dict_done = {}
+    if os.path.exists(str_manifest_path):
+        with open(str_manifest_path, 'r', encoding='utf-8') as f:
+            for str_line in f:
+                if not str_line.strip():
+                    continue
+                dict_result = json.loads(str_line)
+                if dict_result.get('status') == 'ok':
+                    dict_done[dict_result['src']] = dict_result
+    return dict_done
+
+def list_pending(str_root: str, dict_done: dict) -> list:
+    """列出需要迁移的pkl文件（未迁移过，或迁移后源文件有变化），按大小从大到小"""
+    from utility import utility
+
+    list_file = []
+    for str_path in utility.iter_logical_files(str_root):
+        if not str_path.endswith(".pkl") or str_path.endswith(".i64.pkl"):
+            continue
+        obj_stat = os.stat(utility.resolve_read_path(str_path))
+        dict_prev = dict_done.get(str_path)
+        if (dict_prev is not None and dict_prev['size'] == obj_stat.st_size and dict_prev['mtime'] == obj_stat.st_mtime
+                and utility.file_exists(dict_prev.get('dst', ''))):
+            continue
+        list_file.append((obj_stat.st_size, str_path))
+    return [str_path for _, str_path in sorted(list_file, reverse=True)]
+
+def main():
+    parser = argparse.ArgumentParser(description="pkl文件迁移为int64毫秒索引格式")
+    parser.add_argument('--root', default='barData', help='数据目录')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数，默认为CPU核数')
+    args = parser.parse_args()
+
+    str_manifest_path = os.path.join(args.root, STR_MANIFEST_NAME)
+    dict_done = load_manifest(str_manifest_path)
+    list_file = list_pending(args.root, dict_done)
+    print(f"已迁移 {len(dict_done)} 个文件，待迁移 {len(list_file)} 个，并行进程数 {args.workers}")
+    if not list_file:
+        return
+
+    time_start = time.time()
+    int_ok, int_error = 0, 0
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as executor, \
+            open(str_manifest_path, 'a', encoding='utf-8') as f_manifest:
+        dict_future = {executor.submit(migrate_file, str_path): str_path for str_path in list_file}
+        for int_cnt, future in enumerate(as_completed(dict_future), start=1):
+            dict_result = future.result()
+            f_manifest.write(json.dumps(dict_result, ensure_ascii=False) + "\n")
+            f_manifest.flush()
+            if dict_result['status'] == 'ok':
+                int_ok += 1
+                print(f"[{int_cnt}/{len(list_file)}] {dict_result['src']} 完成: {dict_result['rows_src']} -> {dict_result['rows']} 行，"
+                      f"耗时 {dict_result['seconds']:.2f}秒")
+            else:
+                int_error += 1
+                print(f"[{int_cnt}/{len(list_file)}] {dict_result['src']} 失败: {dict_result['error']}")
+    print(f"\n迁移完成：成功 {int_ok} 个，失败 {int_error} 个，总耗时 {time.time() - time_start:.2f}秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import configparser
+import os
+import numpy as np
+import pandas as pd
+from xtquant import xtdata
+from operation.MarketDataCache import MarketDataCache
+from utility import utility
+
+class AdjustFactorOperator:
+    """
+    本地复权因子操作器
+
+    股票只保存不复权K线，另为每只股票保存一份紧凑的除权因子序列（除权日 + 除权系数dr）。
+    读取时按需向量化计算等比前复权 / 等比后复权价格，新的除权除息只需刷新因子文件，
+    不会使历史K线文件失效。
+    """
+
+    # 需要复权的价格字段，数据中存在的才会被处理
+    LIST_PRICE_FIELD = ['open', 'high', 'low', 'close', 'preClose', 'lastPrice', 'lastClose']
+
+    def __init__(self, str_factor_path: str = None, market_data_cache: MarketDataCache = None):
+        """
+        初始化复权因子操作器
+
+        Args:
+            str_factor_path: 因子文件目录，默认为 stock_data_path/factor
+            market_data_cache: 行情缓存（save_factors的查询经过它），默认新建
+        """
+        if str_factor_path is None:
+            config = configparser.ConfigParser()
+            config.read('./config/app.ini')
+            str_factor_path = f"{config.get('path', 'stock_data_path')}/factor"
+        self.str_factor_path = str_factor_path
+        self.market_data_cache = MarketDataCache() if market_data_cache is None else market_data_cache
+
+    def get_factor_file_path(self, str_instrument_long_id: str) -> str:
+        """获取因子文件路径"""
+        return f"{self.str_factor_path}/{str_instrument_long_id}-factor.pkl"
+
+    @staticmethod
+    def build_factor(df_divid: pd.DataFrame) -> pd.DataFrame:
+        """
+        将xtdata.get_divid_factors的结果压缩为因子序列
+
+        Args:
+            df_divid: get_divid_factors返回的DataFrame，index为除权日(YYYYMMDD)，包含dr列
+
+        Returns:
+            pd.DataFrame: 列为time（除权日0点的毫秒时间戳，东八区）和dr（除权系数），按time升序
+        """
+        if df_divid is None or df_divid.empty:
+            return pd.DataFrame({'time': np.array([], dtype='int64'), 'dr': np.array([], dtype='float64')})
+        # 除权日按东八区0点换算为毫秒时间戳，与K线的time列可直接比较
+        dt_ex = pd.to_datetime(df_divid.index.astype(str).str[:8], format='%Y%m%d') - pd.Timedelta(hours=8)
+        df_factor = pd.DataFrame({
+            'time': dt_ex.values.astype('datetime64[ms]').astype('int64'),
+            'dr': df_divid['dr'].to_numpy(dtype='float64'),
+        })
+        return df_factor.sort_values('time').reset_index(drop=True)
+
+    def save_factors(self, list_instrument_long_id: list) -> list:
+        """
+        获取并保存一批股票的复权因子序列（整体覆盖）
+
+        Args:
+            list_instrument_long_id: 股票长代码列表
+
+        Returns:
+            list: 成功保存的股票长代码
+        """
+        os.makedirs(self.str_factor_path, exist_ok=True)
+        list_saved = []
+        for str_code in list_instrument_long_id:
+            try:
+                df_factor = self.build_factor(self.market_data_cache.call('get_divid_factors', str_code, bool_fresh=True))
+                utility.commit_file(self.get_factor_file_path(str_code), df_factor.to_pickle)
+                list_saved.append(str_code)
+            except Exception as e:
+                print(f"【复权因子】{str_code} 保存出错: {str(e)}")
+        print(f"【复权因子】共 {len(list_instrument_long_id)} 只股票，成功保存 {len(list_saved)} 只")
+        return list_saved
+
+    def load_factor(self, str_instrument_long_id: str) -> pd.DataFrame:
+        """
+        读取股票的复权因子序列，没有因子文件时返回空序列（即不需要复权）
+        """
+        str_file_path = self.get_factor_file_path(str_instrument_long_id)
+        if not utility.file_exists(str_file_path):
+            return self.build_factor(None)
+        return pd.read_pickle(utility.resolve_read_path(str_file_path))
+
+    @classmethod
+    def adjust(cls, df_bar: pd.DataFrame, df_factor: pd.DataFrame, str_dividend_type: str = "front_ratio") -> pd.DataFrame:
+        """
+        向量化计算等比复权价格
+
+        对每根K线，用searchsorted找到其时间之前（含当日）已发生的除权次数idx，
+        arr_cum为除权系数的累乘（首位补1）：
+            等比后复权: price * arr_cum[idx]
+            等比前复权: price / (arr_cum[-1] / arr_cum[idx])，即除以之后所有除权系数之积
+
+        Args:
+            df_bar: 不复权K线，必须包含time列（毫秒时间戳）
+            df_factor: build_factor得到的因子序列
+            str_dividend_type: "front_ratio"等比前复权，"back_ratio"等比后复权，"none"不复权
+
+        Returns:
+            pd.DataFrame: 复权后的K线（新对象，不修改df_bar）
+        """
+        if str_dividend_type == "none" or df_factor is None or df_factor.empty or df_bar.empty:
+            return df_bar.copy()
+
+        arr_time = df_bar['time'].to_numpy(dtype='int64')
+        arr_cum = np.concatenate(([1.0], np.cumprod(df_factor['dr'].to_numpy(dtype='float64'))))
+        arr_idx = np.searchsorted(df_factor['time'].to_numpy(dtype='int64'), arr_time, side='right')
+
+        if str_dividend_type == "front_ratio":
+            arr_after = arr_cum[-1] / arr_cum[arr_idx]
+            df_adjusted = df_bar.copy()
+            for str_field in cls.LIST_PRICE_FIELD:
+                if str_field in df_adjusted.columns:
+                    df_adjusted[str_field] = df_adjusted[str_field].to_numpy(dtype='float64') / arr_after
+        elif str_dividend_type == "back_ratio":
+            arr_before = arr_cum[arr_idx]
+            df_adjusted = df_bar.copy()
+            for str_field in cls.LIST_PRICE_FIELD:
+                if str_field in df_adjusted.columns:
+                    df_adjusted[str_field] = df_adjusted[str_field].to_numpy(dtype='float64') * arr_before
+        else:
+            raise ValueError(f"不支持的复权类型: {str_dividend_type}")
+        return df_adjusted
+
+    def read_adjusted(self, str_file_path: str, str_instrument_long_id: str, str_dividend_type: str = "front_ratio") -> pd.DataFrame:
+        """
+        读取不复权pkl文件并按本地因子计算复权价格
+
+        Args:
+            str_file_path: 不复权数据pkl文件路径（文件名中dividend_type为none）
+            str_instrument_long_id: 股票长代码
+            str_dividend_type: "front_ratio"、"back_ratio"或"none"
+
+        Returns:
+            pd.DataFrame: 复权后的K线
+        """
+        df_bar = pd.read_pickle(utility.resolve_read_path(str_file_path))
+        return self.adjust(df_bar, self.load_factor(str_instrument_long_id), str_dividend_type)
+
+    def verify_against_qmt(self, list_instrument_long_id: list, str_period: str = "1d",
+                           dt_begin: str = "", dt_end: str = "") -> pd.DataFrame:
+        """
+        将本地复权结果与QMT的front_ratio逐位比较
+
+        同一时间窗口内分别从QMT获取不复权和等比前复权数据，用本地因子对不复权数据复权，
+        再与QMT结果做逐位（bit-for-bit）比较。
+
+        Args:
+            list_instrument_long_id: 抽样的股票长代码列表
+            str_period: 周期
+            dt_begin: 开始时间
+            dt_end: 结束时间
+
+        Returns:
+            pd.DataFrame: 每只股票一行，列为InstrumentLongID, rows, bitwise_equal, max_abs_diff
+        """
+        list_fields = ['time', 'open', 'high', 'low', 'close']
+        dict_none = xtdata.get_market_data_ex(list_fields, list_instrument_long_id, period=str_period, dividend_type='none',
+                                              start_time=dt_begin, end_time=dt_end, count=-1, fill_data=False)
+        dict_front = xtdata.get_market_data_ex(list_fields, list_instrument_long_id, period=str_period, dividend_type='front_ratio',
+                                               start_time=dt_begin, end_time=dt_end, count=-1, fill_data=False)
+        list_report = []
+        for str_code in list_instrument_long_id:
+            df_local = self.adjust(dict_none[str_code], self.build_factor(xtdata.get_divid_factors(str_code)), "front_ratio")
+            arr_local = np.ascontiguousarray(df_local[list_fields[1:]].to_numpy(dtype='float64'))
+            arr_qmt = np.ascontiguousarray(dict_front[str_code][list_fields[1:]].to_numpy(dtype='float64'))
+            bool_equal = arr_local.shape == arr_qmt.shape and np.array_equal(arr_local.view('int64'), arr_qmt.view('int64'))
+            float_max_diff = float(np.max(np.abs(arr_local - arr_qmt))) if arr_local.shape == arr_qmt.shape and arr_local.size else np.nan
+            list_report.append({
+                'InstrumentLongID': str_code,
+                'rows': len(arr_local),
+                'bitwise_equal': bool_equal,
+                'max_abs_diff': float_max_diff,
+            })
+            print(f"【复权校验】{str_code} 行数: {len(arr_local)} 逐位一致: {bool_equal} 最大绝对误差: {float_max_diff}")
+        return pd.DataFrame(list_report)
@@ -0,0 +1,288 @@
+import configparser
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utility import utility
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+class BarCatalog:
+    """
+    本地K线文件目录（catalog）
+
+    sink写入文件前先把该文件的记录标记为dirty（mark_dirty），文件提交后再写入元数据并清除标记（record，一个事务）：
+        路径、合约、周期、复权类型、格式、行数、最小/最大时间、字节数、内容哈希、修改时间
+    两步之间崩溃时记录保持dirty，get_entry/get_range不返回dirty记录（规划退回到读取文件大小），scan时重新补录，
+    因此目录中未标记dirty的记录总是与文件一致。
+    规划、读取和数据检查直接查询目录即可知道本地有哪些数据、覆盖什么时间范围，不需要打开文件。
+    内容哈希默认不在写入时计算（[catalog] hash_on_write，大文件每次写入都重新哈希整个文件开销很大），
+    verify时对没有哈希的记录在大小和修改时间一致的前提下补算并保存作为基准。
+    哈希优先使用xxhash（xxh3_64，可选依赖），未安装时退化为md5，算法名称与哈希一起保存，校验时使用相同算法。
+    """
+
+    INT_HASH_CHUNK = 4 * 1024 * 1024
+    # 扩展名 -> 格式名，i64.pkl需要在pkl之前判断
+    LIST_FORMAT = [("i64.pkl", "pickle_i64"), ("pkl", "pickle"), ("parquet", "parquet"), ("arrow", "feather")]
+
+    def __init__(self, str_db_path: str = None):
+        """
+        打开（必要时创建）目录数据库
+
+        Args:
+            str_db_path: SQLite文件路径，默认取app.ini的[catalog] path
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.str_db_path = str_db_path or config.get('catalog', 'path', fallback='barData/catalog.sqlite')
+        self.int_verify_workers = config.getint('catalog', 'verify_workers', fallback=8)
+        self.bool_hash_on_write = config.getboolean('catalog', 'hash_on_write', fallback=False)
+        os.makedirs(os.path.dirname(self.str_db_path) or ".", exist_ok=True)
+        # 多个worker线程共享一个连接，写入由锁串行
+        self.conn = sqlite3.connect(self.str_db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS bar_catalog (
+                    Path TEXT PRIMARY KEY,
+                    InstrumentLongID TEXT NOT NULL,
+                    Period TEXT NOT NULL,
+                    DividendType TEXT NOT NULL,
+                    Format TEXT NOT NULL,
+                    RowCount INTEGER,
+                    MinTime INTEGER,
+                    MaxTime INTEGER,
+                    ByteSize INTEGER,
+                    ContentHash TEXT,
+                    HashAlgo TEXT,
+                    FileMtime REAL,
+                    UpdatedAt TEXT,
+                    Dirty INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # 旧版本创建的目录没有Dirty列
+            if "Dirty" not in [r[1] for r in self.conn.execute("PRAGMA table_info(bar_catalog)").fetchall()]:
+                self.conn.execute("ALTER TABLE bar_catalog ADD COLUMN Dirty INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_bar_catalog_instrument ON bar_catalog (InstrumentLongID, Period, DividendType)")
+            self.conn.commit()
+
+    @staticmethod
+    def get_hash_algo() -> str:
+        """当前可用的哈希算法"""
+        return "xxh3_64" if xxhash is not None else "md5"
+
+    @classmethod
+    def hash_file(cls, str_file_path: str, str_algo: str = None) -> str:
+        """
+        分块计算文件内容哈希
+
+        Args:
+            str_file_path: 文件路径
+            str_algo: 算法，默认取get_hash_algo()
+        """
+        str_algo = str_algo or cls.get_hash_algo()
+        if str_algo == "xxh3_64":
+            if xxhash is None:
+                raise RuntimeError("目录中的哈希使用xxhash计算，当前环境未安装xxhash")
+            obj_hash = xxhash.xxh3_64()
+        else:
+            obj_hash = hashlib.new(str_algo)
+        with open(str_file_path, 'rb') as f:
+            while True:
+                bytes_chunk = f.read(cls.INT_HASH_CHUNK)
+                if not bytes_chunk:
+                    break
+                obj_hash.update(bytes_chunk)
+        return obj_hash.hexdigest()
+
+    @classmethod
+    def get_format(cls, str_file_path: str) -> str:
+        """由扩展名判断文件格式"""
+        for str_ext, str_format in cls.LIST_FORMAT:
+            if str_file_path.endswith("." + str_ext):
+                return str_format
+        return os.path.splitext(str_file_path)[1].lstrip(".")
+
+    @staticmethod
+    def normalize_path(str_file_path: str) -> str:
+        """统一为使用/分隔的路径，作为主键"""
+        return os.path.normpath(str_file_path).replace(os.sep, "/")
+
+    def mark_dirty(self, str_file_path: str):
+        """写入文件之前调用：已有记录标记为dirty，直到record更新为止不再被规划使用"""
+        with self.lock:
+            self.conn.execute("UPDATE bar_catalog SET Dirty = 1 WHERE Path = ?", (self.normalize_path(str_file_path),))
+            self.conn.commit()
+
+    def record(self, str_file_path: str, str_instrument_long_id: str, str_period: str, str_dividend_type: str, dict_stats: dict,
+               bool_hash: bool = None):
+        """
+        写入文件后记录（或更新）其元数据并清除dirty标记
+
+        Args:
+            str_file_path: 文件路径
+            str_instrument_long_id: 合约长代码
+            str_period: 周期
+            str_dividend_type: 复权类型
+            dict_stats: utility.fill_frame_stats填入的统计信息（rows, min_time, max_time）
+            bool_hash: 是否计算内容哈希，默认取[catalog] hash_on_write
+        """
+        # 路径记录逻辑文件，大小和哈希取当前版本的物理文件
+        str_read_path = utility.resolve_read_path(str_file_path)
+        obj_stat = os.stat(str_read_path)
+        str_algo, str_hash = None, None
+        if self.bool_hash_on_write if bool_hash is None else bool_hash:
+            str_algo = self.get_hash_algo()
+            str_hash = self.hash_file(str_read_path, str_algo)
+        tuple_value = (self.normalize_path(str_file_path), str_instrument_long_id, str_period, str_dividend_type,
+                       self.get_format(str_file_path), dict_stats.get('rows'), dict_stats.get('min_time'), dict_stats.get('max_time'),
+                       obj_stat.st_size, str_hash, str_algo, obj_stat.st_mtime, time.strftime('%Y%m%d%H%M%S'))
+        with self.lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO bar_catalog (Path, InstrumentLongID, Period, DividendType, Format, RowCount, MinTime, MaxTime,
+                                                    ByteSize, ContentHash, HashAlgo, FileMtime, UpdatedAt, Dirty)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+            """, tuple_value)
+            self.conn.commit()
+
+    def query(self, str_instrument_long_id: str = None, str_period: str = None, str_dividend_type: str = None,
+              str_format: str = None) -> pd.DataFrame:
+        """
+        查询目录，参数为None表示不过滤
+
+        Returns:
+            pd.DataFrame: bar_catalog中满足条件的记录
+        """
+        list_where, list_param = [], []
+        for str_column, value in [("InstrumentLongID", str_instrument_long_id), ("Period", str_period),
+                                  ("DividendType", str_dividend_type), ("Format", str_format)]:
+            if value is not None:
+                list_where.append(f"{str_column} = ?")
+                list_param.append(value)
+        query = "SELECT * FROM bar_catalog" + (" WHERE " + " AND ".join(list_where) if list_where else "")
+        with self.lock:
+            return pd.read_sql_query(query, self.conn, params=list_param)
+
+    def get_entry(self, str_file_path: str) -> dict:
+        """获取单个文件的记录，不存在或为dirty（写入后未更新）返回None"""
+        with self.lock:
+            cursor = self.conn.execute("SELECT * FROM bar_catalog WHERE Path = ? AND Dirty = 0", (self.normalize_path(str_file_path),))
+            tuple_row = cursor.fetchone()
+            list_column = [desc[0] for desc in cursor.description]
+        return None if tuple_row is None else dict(zip(list_column, tuple_row))
+
+    def get_range(self, str_instrument_long_id: str, str_period: str, str_dividend_type: str = "none") -> tuple:
+        """
+        本地已有数据的时间范围（所有格式中最大的覆盖范围，不含dirty记录）
+
+        Returns:
+            tuple: (最小毫秒时间戳, 最大毫秒时间戳)，没有记录时为(None, None)
+        """
+        df = self.query(str_instrument_long_id, str_period, str_dividend_type)
+        df = df[df['Dirty'] == 0]
+        if df.empty or df['MinTime'].isna().all():
+            return None, None
+        return int(df['MinTime'].min()), int(df['MaxTime'].max())
+
+    def scan(self, str_root: str, func_parse=None):
+        """
+        扫描目录下已有的文件补录到目录（首次启用、目录丢失或写入中途崩溃后使用），已记录、不是dirty且修改时间未变化的文件跳过
+
+        Args:
+            str_root: 数据目录
+            func_parse: 文件名 -> (合约长代码, 周期, 复权类型)，默认按utility.get_bar_file_path的命名规则解析
+        """
+        func_parse = func_parse or self.parse_file_name
+        int_cnt = 0
+        for str_path in utility.iter_logical_files(str_root):
+            str_format = self.get_format(str_path)
+            if str_format not in dict(self.LIST_FORMAT).values():
+                continue
+            tuple_key = func_parse(os.path.basename(str_path))
+            if tuple_key is None:
+                continue
+            str_read_path = utility.resolve_read_path(str_path)
+            dict_entry = self.get_entry(str_path)
+            if dict_entry is not None and dict_entry['FileMtime'] == os.stat(str_read_path).st_mtime:
+                continue
+            try:
+                if str_format == "feather":
+                    df = utility.read_feather_mmap(str_path).to_pandas()
+                elif str_format == "parquet":
+                    df = pd.read_parquet(str_read_path)
+                else:
+                    df = pd.read_pickle(str_read_path)
+                dict_stats = {}
+                utility.fill_frame_stats(df, dict_stats)
+                self.record(str_path, *tuple_key, dict_stats)
+                int_cnt += 1
+            except Exception as e:
+                print(f"【目录】{str_path} 补录出错: {str(e)}")
+        print(f"【目录】扫描 {str_root} 完成，补录 {int_cnt} 个文件")
+
+    @classmethod
+    def parse_file_name(cls, str_name: str):
+        """
+        解析 {交易所}-{品种名称}-{合约长代码}-{复权类型}-{周期}.{扩展名}
+
+        Returns:
+            tuple: (合约长代码, 周期, 复权类型)，不符合命名规则返回None
+        """
+        for str_ext, _ in cls.LIST_FORMAT:
+            if str_name.endswith("." + str_ext):
+                list_part = str_name[:-len(str_ext) - 1].split("-")
+                if len(list_part) < 5:
+                    return None
+                return list_part[-3], list_part[-1], list_part[-2]
+        return None
+
+    def verify(self, int_workers: int = None) -> pd.DataFrame:
+        """
+        并行重新计算所有已记录文件的哈希并与目录比较；写入时没有计算哈希的记录，大小和修改时间一致时补算并保存作为基准
+
+        Returns:
+            pd.DataFrame: 每个文件的校验结果，status为ok、changed（内容变化）、missing（文件不存在）、dirty（写入后未更新目录）或error
+        """
+        df_catalog = self.query()
+        list_baseline = []
+
+        def check(tuple_row):
+            str_path, str_hash, str_algo, int_size, float_mtime, int_dirty = tuple_row
+            str_read_path = utility.resolve_read_path(str_path)
+            if not os.path.exists(str_read_path):
+                return str_path, "missing", None
+            if int_dirty:
+                return str_path, "dirty", "写入后未更新目录，执行 python catalog.py scan 重新补录"
+            try:
+                if os.path.getsize(str_read_path) != int_size:
+                    return str_path, "changed", "大小不一致"
+                if str_hash is None or pd.isna(str_hash):
+                    if os.stat(str_read_path).st_mtime != float_mtime:
+                        return str_path, "changed", "修改时间不一致"
+                    str_algo = self.get_hash_algo()
+                    list_baseline.append((self.hash_file(str_read_path, str_algo), str_algo, str_path))
+                    return str_path, "ok", "补算哈希"
+                return str_path, ("ok" if self.hash_file(str_read_path, str_algo) == str_hash else "changed"), None
+            except Exception as e:
+                return str_path, "error", str(e)
+
+        list_task = list(df_catalog[['Path', 'ContentHash', 'HashAlgo', 'ByteSize', 'FileMtime', 'Dirty']].itertuples(index=False, name=None))
+        with ThreadPoolExecutor(max_workers=int_workers or self.int_verify_workers) as executor:
+            list_result = list(executor.map(check, list_task))
+        if list_baseline:
+            with self.lock:
+                self.conn.executemany("UPDATE bar_catalog SET ContentHash = ?, HashAlgo = ? WHERE Path = ? AND Dirty = 0", list_baseline)
+                self.conn.commit()
+        return pd.DataFrame(list_result, columns=['Path', 'status', 'detail'])
+
+    def close(self):
+        """关闭数据库"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,332 @@
+import configparser
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from connect.MysqlConnect import MysqlConnect
+from operation.BarCatalog import BarCatalog
+from operation.DailySummary import DailySummary
+from operation.RunProgress import RunProgress
+from operation.RunHistory import RunHistory
+from utility import utility
+
+class BarSink:
+    """
+    K线数据落地（sink）基类
+
+    保存阶段每次从QMT获取一份数据后，依次交给配置的所有sink写入，
+    各sink统计自己写入的行数和耗时，用于输出吞吐量报告。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        """初始化统计信息"""
+        self.int_rows = 0
+        self.float_seconds = 0.0
+        self.lock_stats = threading.Lock()
+        # 本地文件目录，由create_sinks设置，文件sink写入后更新
+        self.catalog = None
+
+    def _write(self, df: pd.DataFrame, row: pd.Series, str_period: str, str_dividend_type: str) -> int:
+        """
+        子类实现的写入逻辑
+
+        Returns:
+            int: 写入后本地文件增加的字节数（非文件sink返回0）
+        """
+        raise NotImplementedError
+
+    def write(self, df: pd.DataFrame, row: pd.Series, str_period: str, str_dividend_type: str) -> int:
+        """
+        写入一份数据并累计统计
+
+        Args:
+            df: 已排序去重的K线数据，index为时间
+            row: log_save中该合约的记录
+            str_period: 周期
+            str_dividend_type: 复权类型
+
+        Returns:
+            int: 写入后本地文件增加的字节数
+        """
+        if df is None or df.empty:
+            return 0
+        time_start = time.time()
+        int_bytes = self._write(df, row, str_period, str_dividend_type)
+        with self.lock_stats:
+            self.int_rows += len(df)
+            self.float_seconds += time.time() - time_start
+        RunProgress.add(len(df), int_bytes)
+        RunHistory.add(self.name, len(df), int_bytes)
+        return int_bytes
+
+    def _write_file(self, func_append, str_ext: str, df: pd.DataFrame, row: pd.Series, str_period: str, str_dividend_type: str) -> int:
+        """
+        文件sink的通用写入：写入前把目录记录标记为dirty，调用utility的追加函数，写入成功后更新目录并清除标记
+        （写入失败或中途崩溃时记录保持dirty，规划不再使用过期的大小和时间范围）；
+        追加函数返回False时抛出异常（该单元记为失败，不更新保存日志）
+
+        Returns:
+            int: 写入后文件增加的字节数
+        """
+        str_file_path = utility.get_bar_file_path(self.str_data_save_path, row, str_period, str_dividend_type, str_ext)
+        int_size_before = os.path.getsize(utility.resolve_read_path(str_file_path)) if utility.file_exists(str_file_path) else 0
+        dict_stats = {}
+        if self.catalog is not None:
+            self.catalog.mark_dirty(str_file_path)
+        if not func_append(df, str_file_path, dict_stats):
+            raise RuntimeError(f"写入 {str_file_path} 失败")
+        if self.catalog is not None:
+            self.catalog.record(str_file_path, row['InstrumentLongID'], str_period, str_dividend_type, dict_stats)
+        int_size_after = os.path.getsize(utility.resolve_read_path(str_file_path)) if utility.file_exists(str_file_path) else 0
+        return max(int_size_after - int_size_before, 0)
+
+    def close(self):
+        """释放资源"""
+        pass
+
+    def report(self):
+        """打印写入吞吐量"""
+        float_rows_per_second = self.int_rows / self.float_seconds if self.float_seconds > 0 else 0.0
+        print(f"【{self.name}】写入 {self.int_rows} 行，耗时 {self.float_seconds:.2f}秒，{float_rows_per_second:.0f} 行/秒")
+
+    @staticmethod
+    def create_sinks(str_data_save_path: str) -> list:
+        """
+        根据app.ini中[sink] sinks配置创建sink列表，默认只有pickle
+        [catalog] enable时所有sink共享一个本地文件目录，文件sink写入后更新
+
+        Args:
+            str_data_save_path: 该品种的数据保存目录
+
+        Returns:
+            list: BarSink实例列表
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        list_name = [s.strip() for s in config.get('sink', 'sinks', fallback='pickle').split(',') if s.strip()]
+        list_sinks = []
+        obj_catalog = BarCatalog() if config.getboolean('catalog', 'enable', fallback=True) else None
+        for str_name in list_name:
+            if str_name == "pickle":
+                list_sinks.append(PickleSink(str_data_save_path))
+            elif str_name == "pickle_i64":
+                list_sinks.append(PickleI64Sink(str_data_save_path))
+            elif str_name == "parquet":
+                list_sinks.append(ParquetSink(str_data_save_path))
+            elif str_name == "feather":
+                list_sinks.append(FeatherSink(str_data_save_path))
+            elif str_name == "mysql":
+                list_sinks.append(MysqlSink(config.getint('sink', 'mysql_batch_rows', fallback=5000),
+                                            config.get('sink', 'mysql_method', fallback='insert')))
+            elif str_name == "daily":
+                list_sinks.append(DailySummarySink())
+            else:
+                print(f"未知的sink类型: {str_name}，已忽略")
+        for obj_sink in list_sinks:
+            obj_sink.catalog = obj_catalog
+        return list_sinks
+
+
+class PickleSink(BarSink):
+    """追加写入pkl文件（原有的落地方式）"""
+
+    name = "pickle"
+
+    def __init__(self, str_data_save_path: str):
+        super().__init__()
+        self.str_data_save_path = str_data_save_path
+
+    def _write(self, df, row, str_period, str_dividend_type) -> int:
+        return self._write_file(utility.append_to_pkl, "pkl", df, row, str_period, str_dividend_type)
+
+
+class PickleI64Sink(BarSink):
+    """追加写入int64毫秒索引格式的pkl文件（migrate_pkl.py迁移后的格式），扩展名为i64.pkl"""
+
+    name = "pickle_i64"
+
+    def __init__(self, str_data_save_path: str):
+        super().__init__()
+        self.str_data_save_path = str_data_save_path
+
+    def _write(self, df, row, str_period, str_dividend_type) -> int:
+        return self._write_file(utility.append_to_pkl_i64, utility.STR_I64_EXT, df, row, str_period, str_dividend_type)
+
+
+class ParquetSink(BarSink):
+    """追加写入Parquet文件，与pkl文件同目录同名，扩展名为parquet"""
+
+    name = "parquet"
+
+    def __init__(self, str_data_save_path: str):
+        super().__init__()
+        self.str_data_save_path = str_data_save_path
+
+    def _write(self, df, row, str_period, str_dividend_type) -> int:
+        return self._write_file(utility.append_to_parquet, "parquet", df, row, str_period, str_dividend_type)
+
+
+class FeatherSink(BarSink):
+    """追加写入不压缩的Arrow IPC（Feather v2）文件，供回测进程内存映射零拷贝读取，扩展名为arrow"""
+
+    name = "feather"
+
+    def __init__(self, str_data_save_path: str):
+        super().__init__()
+        self.str_data_save_path = str_data_save_path
+
+    def _write(self, df, row, str_period, str_dividend_type) -> int:
+        return self._write_file(utility.append_to_feather, "arrow", df, row, str_period, str_dividend_type)
+
+
+class DailySummarySink(BarSink):
+    """增量维护按交易日的日度汇总（见DailySummary），只处理不复权的数据"""
+
+    name = "daily"
+
+    def __init__(self):
+        super().__init__()
+        self.daily_summary = DailySummary()
+
+    def _write(self, df, row, str_period, str_dividend_type) -> int:
+        if str_dividend_type == "none":
+            self.daily_summary.update(df, row, str_period)
+        return 0
+
+    def close(self):
+        self.daily_summary.close()
+
+
+class MysqlSink(BarSink):
+    """
+    批量写入MySQL
+
+    每个周期一张表（bar_tick, bar_1m, ...），按InstrumentLongID做KEY分区，
+    主键为(InstrumentLongID, DividendType, time)，重复写入时以新数据为准。
+    写入方式：
+        insert: 每批int_batch_rows行拼成一条多行INSERT ... ON DUPLICATE KEY UPDATE
+        load_data: 写临时CSV后用LOAD DATA LOCAL INFILE ... REPLACE导入（需服务端开启local_infile）
+    """
+
+    name = "mysql"
+
+    # K线周期的字段
+    LIST_BAR_FIELD = ['open', 'high', 'low', 'close', 'volume', 'amount', 'settelementPrice', 'openInterest', 'preClose', 'suspendFlag']
+    # tick的标量字段和五档列表字段（列表以逗号拼接的字符串保存）
+    LIST_TICK_FIELD = ['lastPrice', 'open', 'high', 'low', 'lastClose', 'amount', 'volume', 'pvolume', 'stockStatus',
+                       'openInt', 'lastSettlementPrice', 'askPrice', 'bidPrice', 'askVol', 'bidVol']
+    LIST_TICK_LIST_FIELD = ['askPrice', 'bidPrice', 'askVol', 'bidVol']
+    INT_PARTITIONS = 16
+
+    def __init__(self, int_batch_rows: int = 5000, str_method: str = "insert"):
+        super().__init__()
+        self.int_batch_rows = int_batch_rows
+        self.str_method = str_method
+        self.mysql_connect = MysqlConnect(bool_local_infile=(str_method == "load_data"))
+        self.mysql_connect.connect()
+        self.set_table_ready = set()
+        # 单独的连接在多个worker线程间共享，写入需串行
+        self.lock_conn = threading.Lock()
+
+    def get_fields(self, str_period: str) -> list:
+        """获取周期对应的字段列表"""
+        return self.LIST_TICK_FIELD if str_period == "tick" else self.LIST_BAR_FIELD
+
+    def _ensure_table(self, str_period: str) -> str:
+        """确保周期表存在，返回表名"""
+        str_table = f"bar_{str_period}"
+        if str_table in self.set_table_ready:
+            return str_table
+        list_col_def = []
+        for str_field in self.get_fields(str_period):
+            if str_field in self.LIST_TICK_LIST_FIELD:
+                list_col_def.append(f"`{str_field}` VARCHAR(255)")
+            else:
+                list_col_def.append(f"`{str_field}` DOUBLE")
+        create_query = f"""
+            CREATE TABLE IF NOT EXISTS {str_table} (
+                InstrumentLongID VARCHAR(32) NOT NULL,
+                DividendType VARCHAR(16) NOT NULL,
+                `time` BIGINT NOT NULL,
+                {', '.join(list_col_def)},
+                PRIMARY KEY (InstrumentLongID, DividendType, `time`)
+            )
+            PARTITION BY KEY(InstrumentLongID) PARTITIONS {self.INT_PARTITIONS}
+        """
+        if not self.mysql_connect.execute(create_query):
+            raise RuntimeError(f"创建表 {str_table} 失败")
+        self.set_table_ready.add(str_table)
+        return str_table
+
+    def _to_records(self, df: pd.DataFrame, row: pd.Series, str_period: str, str_dividend_type: str) -> pd.DataFrame:
+        """转换为与表结构一致的DataFrame，缺失字段补空"""
+        list_fields = self.get_fields(str_period)
+        # 表中五档仍以逗号拼接的字符串保存
+        df = utility.unflatten_tick_levels(df)
+        df_out = pd.DataFrame({
+            'InstrumentLongID': row['InstrumentLongID'],
+            'DividendType': str_dividend_type,
+            'time': df['time'].to_numpy(dtype='int64'),
+        })
+        for str_field in list_fields:
+            if str_field not in df.columns:
+                df_out[str_field] = None
+            elif str_field in self.LIST_TICK_LIST_FIELD:
+                df_out[str_field] = [",".join(str(v) for v in x) if isinstance(x, (list, tuple, np.ndarray)) else x
+                                     for x in df[str_field].to_numpy()]
+            else:
+                df_out[str_field] = df[str_field].to_numpy()
+        return df_out
+
+    def _insert(self, str_table: str, df_records: pd.DataFrame):
+        """多行INSERT分批写入，任何一批失败即抛出异常（该单元记为失败，不更新保存日志）"""
+        list_cols = list(df_records.columns)
+        str_cols = ", ".join(f"`{c}`" for c in list_cols)
+        str_row_placeholder = "(" + ", ".join(["%s"] * len(list_cols)) + ")"
+        str_update = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in list_cols[3:])
+        df_records = df_records.astype(object).where(df_records.notna(), None)
+        list_rows = list(df_records.itertuples(index=False, name=None))
+        for int_start in range(0, len(list_rows), self.int_batch_rows):
+            list_batch = list_rows[int_start:int_start + self.int_batch_rows]
+            query = (f"INSERT INTO {str_table} ({str_cols}) VALUES "
+                     + ", ".join([str_row_placeholder] * len(list_batch))
+                     + f" ON DUPLICATE KEY UPDATE {str_update}")
+            if not self.mysql_connect.execute(query, tuple(v for tuple_row in list_batch for v in tuple_row)):
+                raise RuntimeError(f"写入 {str_table} 失败：第 {int_start + 1}-{int_start + len(list_batch)} 行（共 {len(list_rows)} 行）")
+
+    def _load_data(self, str_table: str, df_records: pd.DataFrame):
+        """写临时CSV后LOAD DATA LOCAL INFILE导入，被服务器拒绝或导入失败时抛出异常"""
+        list_cols = list(df_records.columns)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8', newline='') as f:
+            str_csv_path = f.name
+            # 空值写为\N，MySQL读入为NULL
+            df_records.to_csv(f, index=False, header=False, na_rep='\\N')
+        try:
+            query = f"""
+                LOAD DATA LOCAL INFILE '{str_csv_path.replace(os.sep, '/')}'
+                REPLACE INTO TABLE {str_table}
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                LINES TERMINATED BY '\\n'
+                ({', '.join(f'`{c}`' for c in list_cols)})
+            """
+            if not self.mysql_connect.execute(query):
+                raise RuntimeError(f"LOAD DATA导入 {str_table} 失败（{len(df_records)} 行），请检查服务器local_infile设置")
+        finally:
+            os.remove(str_csv_path)
+
+    def _write(self, df, row, str_period, str_dividend_type) -> int:
+        df_records = self._to_records(df, row, str_period, str_dividend_type)
+        with self.lock_conn:
+            str_table = self._ensure_table(str_period)
+            if self.str_method == "load_data":
+                self._load_data(str_table, df_records)
+            else:
+                self._insert(str_table, df_records)
+        return 0
+
+    def close(self):
+        self.mysql_connect.disconnect()
@@ -0,0 +1,430 @@
+import configparser
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from operation.MarketDataCache import MarketDataCache
+from utility import utility
+
+class ContinuousOperator:
+    """
+    本地构建期货连续合约
+
+    由各个具体合约的K线构建：
+        主力连续：按换月规则逐日选出主力合约，拼接主力合约的K线；另保存换月记录（换月日、价差、价比），
+                  读取时按需向量化计算差值/比例后复权，新的换月不会使已保存的原始拼接序列失效
+        持仓加权连续：每根K线按各合约持仓量加权平均价格，成交量、持仓量求和
+    换月判断只使用前一交易日的日线数据，避免未来函数。每次运行只重算最后一个已保存交易日及之后的尾部。
+    """
+
+    INT_DAY_MS = 86400000
+    # 东八区偏移
+    INT_CN_OFFSET_MS = 8 * 3600 * 1000
+    # 18:00之后的夜盘归属下一交易日
+    INT_NIGHT_SHIFT_MS = 6 * 3600 * 1000
+    LIST_PRICE_FIELD = ['open', 'high', 'low', 'close']
+    LIST_FIELD = ['time', 'open', 'high', 'low', 'close', 'volume', 'amount', 'openInterest']
+
+    def __init__(self, market_data_cache: MarketDataCache = None):
+        """
+        从app.ini的[continuous]读取换月规则和保存路径
+
+        Args:
+            market_data_cache: 行情缓存（合约列表和K线的查询经过它），默认新建
+        """
+        self.market_data_cache = MarketDataCache() if market_data_cache is None else market_data_cache
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.str_data_save_path = config.get('continuous', 'data_path', fallback='barData/CONTINUOUS')
+        self.list_period = [s.strip() for s in config.get('continuous', 'periods', fallback='1m,1d').split(',') if s.strip()]
+        self.str_roll_field = config.get('continuous', 'roll_field', fallback='openInterest')
+        self.bool_forward_only = config.getboolean('continuous', 'forward_only', fallback=True)
+        self.float_switch_ratio = config.getfloat('continuous', 'switch_ratio', fallback=1.0)
+        self.dt_init_begin = config.get('download', 'init_begin')
+
+    # ---------------------------------------------------------------
+    # 向量化计算
+    # ---------------------------------------------------------------
+    @classmethod
+    def trading_day_key(cls, arr_time: np.ndarray) -> np.ndarray:
+        """日内K线的毫秒时间戳 -> 交易日序号（夜盘归属下一自然日，再由searchsorted对齐到下一个交易日）"""
+        return (np.asarray(arr_time, dtype='int64') + cls.INT_CN_OFFSET_MS + cls.INT_NIGHT_SHIFT_MS) // cls.INT_DAY_MS
+
+    @classmethod
+    def daily_key(cls, arr_time: np.ndarray) -> np.ndarray:
+        """日线的毫秒时间戳 -> 交易日序号"""
+        return (np.asarray(arr_time, dtype='int64') + cls.INT_CN_OFFSET_MS) // cls.INT_DAY_MS
+
+    @classmethod
+    def align_trading_day(cls, arr_time: np.ndarray, str_period: str, arr_day_key: np.ndarray) -> np.ndarray:
+        """
+        K线时间 -> 所属交易日序号
+
+        日内K线先按18:00划分到自然日，再对齐到不早于该自然日的第一个交易日（处理周五夜盘归属下周一），
+        超出arr_day_key范围的保持自然日序号
+
+        Args:
+            arr_time: 毫秒时间戳
+            str_period: 周期
+            arr_day_key: 已排序的交易日序号（来自日线）
+        """
+        arr_bar_key = cls.daily_key(arr_time) if str_period == "1d" else cls.trading_day_key(arr_time)
+        if len(arr_day_key) == 0:
+            return arr_bar_key
+        arr_pos = np.searchsorted(arr_day_key, arr_bar_key, side='left')
+        return np.where(arr_pos < len(arr_day_key), arr_day_key[np.minimum(arr_pos, len(arr_day_key) - 1)], arr_bar_key)
+
+    @staticmethod
+    def pivot(dict_bars: dict, str_field: str) -> pd.DataFrame:
+        """
+        将多个合约的K线按time对齐为宽表
+
+        Args:
+            dict_bars: 合约代码 -> K线DataFrame（包含time列）
+            str_field: 字段名
+
+        Returns:
+            pd.DataFrame: index为time，列为合约代码（按代码排序，即按到期先后），缺失为NaN
+        """
+        dict_series = {}
+        for str_code in sorted(dict_bars.keys()):
+            df = dict_bars[str_code]
+            if df is None or df.empty or str_field not in df.columns:
+                continue
+            dict_series[str_code] = pd.Series(df[str_field].to_numpy(dtype='float64'), index=df['time'].to_numpy(dtype='int64'))
+        if not dict_series:
+            return pd.DataFrame()
+        df_wide = pd.DataFrame(dict_series).sort_index()
+        return df_wide[~df_wide.index.duplicated(keep='last')]
+
+    @staticmethod
+    def select_main(df_rank: pd.DataFrame, df_close: pd.DataFrame, str_init_contract: str = None,
+                    bool_forward_only: bool = True, float_switch_ratio: float = 1.0, bool_first_is_prev: bool = False) -> pd.Series:
+        """
+        逐日选出主力合约
+
+        第i个交易日使用第i-1个交易日的排名字段（持仓量或成交量）决定：
+            - 候选为排名字段最大的合约（forward_only时只在当前主力及更远月份中选）
+            - 候选超过当前主力的float_switch_ratio倍才换月
+            - 当前主力当日没有行情（已到期）时强制换到候选
+
+        Args:
+            df_rank: 日线排名字段宽表（index为日线time，列按到期先后排序）
+            df_close: 日线收盘价宽表，与df_rank同形状，用于判断合约当日是否有行情
+            str_init_contract: 第一个交易日之前的主力合约（增量更新时传入），None表示从头选择
+            bool_forward_only: 是否只允许向更远月份换月
+            float_switch_ratio: 换月阈值
+            bool_first_is_prev: 第一行是否只作为前一交易日的排名（增量更新时传入），不参与选择也不输出
+
+        Returns:
+            pd.Series: index与df_rank相同（bool_first_is_prev时去掉第一行），值为当日主力合约代码
+        """
+        list_code = list(df_rank.columns)
+        arr_rank = df_rank.to_numpy(dtype='float64')
+        arr_has_bar = ~np.isnan(df_close.to_numpy(dtype='float64'))
+        # 前一交易日的排名，第一天使用当天
+        arr_prev_rank = np.vstack([arr_rank[:1], arr_rank[:-1]]) if len(arr_rank) else arr_rank
+        arr_prev_rank = np.where(np.isnan(arr_prev_rank), -np.inf, arr_prev_rank)
+        int_skip = 1 if bool_first_is_prev else 0
+        arr_rank, arr_has_bar, arr_prev_rank = arr_rank[int_skip:], arr_has_bar[int_skip:], arr_prev_rank[int_skip:]
+
+        int_current = list_code.index(str_init_contract) if str_init_contract in list_code else -1
+        arr_main = np.empty(len(arr_rank), dtype=np.int64)
+        for i in range(len(arr_rank)):
+            arr_score = np.where(arr_has_bar[i], arr_prev_rank[i], -np.inf)
+            if bool_forward_only and int_current >= 0:
+                arr_score[:int_current] = -np.inf
+            int_candidate = int(np.argmax(arr_score))
+            if int_current < 0 or not arr_has_bar[i, int_current]:
+                int_current = int_candidate
+            elif int_candidate != int_current and arr_score[int_candidate] > arr_prev_rank[i, int_current] * float_switch_ratio:
+                int_current = int_candidate
+            arr_main[i] = int_current
+        return pd.Series(np.asarray(list_code, dtype=object)[arr_main], index=df_rank.index[int_skip:])
+
+    @classmethod
+    def build_rolls(cls, sr_main: pd.Series, df_close: pd.DataFrame) -> pd.DataFrame:
+        """
+        由逐日主力得到换月记录
+
+        Args:
+            sr_main: select_main的结果
+            df_close: 日线收盘价宽表
+
+        Returns:
+            pd.DataFrame: 列为day_key（换月后的第一个交易日）, from_contract, to_contract,
+                          diff（前一日新旧合约收盘价差）, ratio（前一日新旧合约收盘价比）
+        """
+        arr_main = sr_main.to_numpy()
+        arr_change = np.flatnonzero(arr_main[1:] != arr_main[:-1]) + 1
+        arr_day_key = cls.daily_key(sr_main.index.to_numpy())
+        list_roll = []
+        for i in arr_change:
+            float_old = df_close.iloc[i - 1][arr_main[i - 1]]
+            float_new = df_close.iloc[i - 1][arr_main[i]]
+            list_roll.append({
+                'day_key': int(arr_day_key[i]),
+                'from_contract': arr_main[i - 1],
+                'to_contract': arr_main[i],
+                'diff': float_new - float_old,
+                'ratio': float_new / float_old if float_old else np.nan,
+            })
+        return pd.DataFrame(list_roll, columns=['day_key', 'from_contract', 'to_contract', 'diff', 'ratio'])
+
+    @classmethod
+    def build_main_series(cls, dict_bars: dict, sr_main: pd.Series, str_period: str, arr_all_day_key: np.ndarray = None) -> pd.DataFrame:
+        """
+        按逐日主力拼接某周期的主力连续序列（不复权）
+
+        Args:
+            dict_bars: 合约代码 -> 该周期K线
+            sr_main: select_main的结果（index为日线time）
+            str_period: 周期
+            arr_all_day_key: 用于对齐交易日的全部交易日序号，默认为sr_main的交易日；不属于sr_main交易日的K线被丢弃
+
+        Returns:
+            pd.DataFrame: 列为LIST_FIELD + contract, trading_day
+        """
+        df_close = cls.pivot(dict_bars, 'close')
+        if df_close.empty or sr_main.empty:
+            return pd.DataFrame(columns=cls.LIST_FIELD + ['contract', 'trading_day'])
+        arr_time = df_close.index.to_numpy(dtype='int64')
+        arr_day_key = cls.daily_key(sr_main.index.to_numpy())
+        arr_bar_day = cls.align_trading_day(arr_time, str_period, arr_day_key if arr_all_day_key is None else arr_all_day_key)
+        arr_pos = np.minimum(np.searchsorted(arr_day_key, arr_bar_day, side='left'), len(arr_day_key) - 1)
+        arr_valid = arr_day_key[arr_pos] == arr_bar_day
+        list_code = list(df_close.columns)
+        dict_col = {str_code: idx for idx, str_code in enumerate(list_code)}
+        # 主力合约不在本周期数据中的交易日标记为-1
+        arr_main_col = np.array([dict_col.get(c, -1) for c in sr_main.to_numpy()], dtype=np.int64)[arr_pos]
+        arr_valid &= arr_main_col >= 0
+        arr_row = np.arange(len(arr_time))
+
+        dict_out = {'time': arr_time}
+        for str_field in cls.LIST_FIELD[1:]:
+            df_wide = cls.pivot(dict_bars, str_field).reindex(index=df_close.index, columns=list_code)
+            arr_wide = df_wide.to_numpy(dtype='float64')
+            dict_out[str_field] = np.where(arr_valid, arr_wide[arr_row, np.maximum(arr_main_col, 0)], np.nan)
+        dict_out['contract'] = np.asarray(list_code, dtype=object)[np.maximum(arr_main_col, 0)]
+        dict_out['trading_day'] = arr_bar_day
+        df_main = pd.DataFrame(dict_out)
+        df_main = df_main[arr_valid & ~np.isnan(df_main['close'].to_numpy())]
+        return df_main.reset_index(drop=True)
+
+    @classmethod
+    def build_weighted_series(cls, dict_bars: dict, str_period: str, arr_all_day_key: np.ndarray = None) -> pd.DataFrame:
+        """
+        构建持仓量加权连续序列
+
+        价格 = Σ(价格 × 持仓量) / Σ持仓量（只统计该时刻有行情的合约），成交量、成交额、持仓量为各合约之和
+
+        Args:
+            dict_bars: 合约代码 -> 该周期K线
+            str_period: 周期
+            arr_all_day_key: 用于对齐交易日的全部交易日序号
+
+        Returns:
+            pd.DataFrame: 列为LIST_FIELD + trading_day
+        """
+        df_oi = cls.pivot(dict_bars, 'openInterest')
+        if df_oi.empty:
+            return pd.DataFrame(columns=cls.LIST_FIELD + ['trading_day'])
+        list_code = list(df_oi.columns)
+        arr_weight = np.nan_to_num(df_oi.to_numpy(dtype='float64'), nan=0.0)
+        dict_out = {'time': df_oi.index.to_numpy(dtype='int64')}
+        for str_field in cls.LIST_PRICE_FIELD:
+            arr_price = cls.pivot(dict_bars, str_field).reindex(index=df_oi.index, columns=list_code).to_numpy(dtype='float64')
+            arr_w = np.where(np.isnan(arr_price), 0.0, arr_weight)
+            arr_sum_w = arr_w.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                dict_out[str_field] = np.where(arr_sum_w > 0, np.nansum(arr_price * arr_w, axis=1) / arr_sum_w, np.nan)
+        for str_field in ['volume', 'amount']:
+            dict_out[str_field] = cls.pivot(dict_bars, str_field).reindex(index=df_oi.index, columns=list_code).sum(axis=1, min_count=1).to_numpy()
+        dict_out['openInterest'] = arr_weight.sum(axis=1)
+        arr_time = dict_out['time']
+        dict_out['trading_day'] = cls.align_trading_day(arr_time, str_period, np.asarray([] if arr_all_day_key is None else arr_all_day_key, dtype='int64'))
+        df_weighted = pd.DataFrame(dict_out)
+        return df_weighted[~np.isnan(df_weighted['close'].to_numpy())].reset_index(drop=True)
+
+    @classmethod
+    def back_adjust(cls, df_main: pd.DataFrame, df_roll: pd.DataFrame, str_method: str = "ratio") -> pd.DataFrame:
+        """
+        对主力连续序列做后复权调整（以最新主力合约价格为基准，调整换月之前的历史价格）
+
+        Args:
+            df_main: build_main_series的结果（需要trading_day列）
+            df_roll: build_rolls的结果
+            str_method: "none"不调整，"diff"差值调整（加上之后所有换月价差），"ratio"比例调整（乘以之后所有换月价比）
+
+        Returns:
+            pd.DataFrame: 调整后的序列（新对象）
+        """
+        df_adjusted = df_main.copy()
+        if str_method == "none" or df_roll is None or df_roll.empty or df_main.empty:
+            return df_adjusted
+        arr_roll_key = df_roll['day_key'].to_numpy(dtype='int64')
+        arr_idx = np.searchsorted(arr_roll_key, df_main['trading_day'].to_numpy(dtype='int64'), side='right')
+        if str_method == "diff":
+            # 之后所有换月价差之和：后缀和
+            arr_suffix = np.concatenate((np.cumsum(df_roll['diff'].to_numpy(dtype='float64')[::-1])[::-1], [0.0]))
+            for str_field in cls.LIST_PRICE_FIELD:
+                df_adjusted[str_field] = df_adjusted[str_field].to_numpy(dtype='float64') + arr_suffix[arr_idx]
+        elif str_method == "ratio":
+            arr_suffix = np.concatenate((np.cumprod(df_roll['ratio'].to_numpy(dtype='float64')[::-1])[::-1], [1.0]))
+            for str_field in cls.LIST_PRICE_FIELD:
+                df_adjusted[str_field] = df_adjusted[str_field].to_numpy(dtype='float64') * arr_suffix[arr_idx]
+        else:
+            raise ValueError(f"不支持的调整方式: {str_method}")
+        return df_adjusted
+
+    # ---------------------------------------------------------------
+    # 文件读写与增量更新
+    # ---------------------------------------------------------------
+    def get_file_path(self, str_product_long_id: str, str_kind: str, str_period: str = None) -> str:
+        """连续合约文件路径，str_kind为main、weighted、roll或days"""
+        if str_period is None:
+            return f"{self.str_data_save_path}/{str_product_long_id}-{str_kind}.pkl"
+        return f"{self.str_data_save_path}/{str_product_long_id}-{str_kind}-{str_period}.pkl"
+
+    def read_main(self, str_product_long_id: str, str_period: str, str_method: str = "ratio") -> pd.DataFrame:
+        """
+        读取主力连续序列并按需后复权
+
+        Args:
+            str_product_long_id: 品种长代码，如"ag.SF"
+            str_period: 周期
+            str_method: "none"、"diff"或"ratio"
+        """
+        df_main = pd.read_pickle(utility.resolve_read_path(self.get_file_path(str_product_long_id, "main", str_period)))
+        df_roll = self._read_pkl(self.get_file_path(str_product_long_id, "roll"))
+        return self.back_adjust(df_main, df_roll, str_method)
+
+    def get_contract_list(self, str_product_id: str, str_xt_exchange_id: str, str_exchange_cname: str) -> list:
+        """
+        获取品种的全部具体合约（包括已到期合约）
+
+        Args:
+            str_product_id: 品种代码，如"ag"
+            str_xt_exchange_id: 迅投市场代码，如"SF"
+            str_exchange_cname: 交易所中文名，即QMT板块名，如"上期所"
+        """
+        list_code = (self.market_data_cache.call('get_stock_list_in_sector', str_exchange_cname, bool_fresh=True)
+                     + self.market_data_cache.call('get_stock_list_in_sector', f"过期{str_exchange_cname}", bool_fresh=True))
+        obj_pattern = re.compile(rf"^{re.escape(str_product_id)}\d{{3,4}}\.{re.escape(str_xt_exchange_id)}$")
+        return sorted(set(c for c in list_code if obj_pattern.match(c)))
+
+    def _fetch_bars(self, list_contract: list, str_period: str, dt_begin: str, dt_end: str) -> dict:
+        """下载并获取一批具体合约的K线"""
+        for str_code in list_contract:
+            try:
+                self.market_data_cache.download_history_data(str_code, str_period, start_time=dt_begin, end_time=dt_end)
+            except Exception as e:
+                print(f"【连续合约】{str_code} {str_period}周期下载出错: {str(e)}")
+        dict_result = self.market_data_cache.get_market_data_ex(self.LIST_FIELD, list_contract, period=str_period, dividend_type='none',
+                                                                start_time=dt_begin, end_time=dt_end, count=-1, fill_data=False)
+        return {str_code: df for str_code, df in dict_result.items() if df is not None and not df.empty}
+
+    @staticmethod
+    def _merge_tail(df_existing: pd.DataFrame, df_tail: pd.DataFrame, int_from_key: int, str_key: str = 'trading_day') -> pd.DataFrame:
+        """丢弃已有数据中int_from_key及之后的部分，拼接新计算的尾部"""
+        if df_existing is None or df_existing.empty:
+            return df_tail.reset_index(drop=True)
+        df_keep = df_existing[df_existing[str_key].to_numpy(dtype='int64') < int_from_key]
+        return pd.concat([df_keep, df_tail[df_tail[str_key].to_numpy(dtype='int64') >= int_from_key]], axis=0).reset_index(drop=True)
+
+    @staticmethod
+    def _read_pkl(str_file_path: str) -> pd.DataFrame:
+        return pd.read_pickle(utility.resolve_read_path(str_file_path)) if utility.file_exists(str_file_path) else None
+
+    def update_product(self, str_product_id: str, str_xt_exchange_id: str, str_exchange_cname: str, dt_end: str):
+        """
+        增量更新一个品种的主力连续和持仓加权连续序列
+
+        只重算最后一个已保存交易日及之后的部分：获取数据从该交易日前若干自然日开始（保证有前一交易日的日线用于换月判断），
+        换月判断以前一交易日的主力合约为初始状态。
+
+        Args:
+            str_product_id: 品种代码，如"ag"
+            str_xt_exchange_id: 迅投市场代码，如"SF"
+            str_exchange_cname: 交易所中文名
+            dt_end: 本次更新截止时间
+        """
+        str_product_long_id = f"{str_product_id}.{str_xt_exchange_id}"
+        time_start = time.time()
+        os.makedirs(self.str_data_save_path, exist_ok=True)
+        list_contract = self.get_contract_list(str_product_id, str_xt_exchange_id, str_exchange_cname)
+        if not list_contract:
+            print(f"【连续合约】{str_product_long_id} 没有找到具体合约，跳过")
+            return
+
+        # 逐日主力记录：day_key, contract
+        str_days_path = self.get_file_path(str_product_long_id, "days")
+        df_days = self._read_pkl(str_days_path)
+        if df_days is None or df_days.empty:
+            int_from_key = 0
+            str_init_contract = None
+            dt_begin = self.dt_init_begin
+        else:
+            # 重算最后一个已保存交易日，前一交易日的主力作为初始状态
+            int_from_key = int(df_days['day_key'].iloc[-1])
+            str_init_contract = df_days['contract'].iloc[-2] if len(df_days) > 1 else None
+            dt_begin = pd.Timestamp((int_from_key - 10) * self.INT_DAY_MS, unit='ms').strftime('%Y%m%d%H%M%S')
+
+        # 日线决定逐日主力
+        dict_daily = self._fetch_bars(list_contract, "1d", dt_begin, dt_end)
+        df_rank = self.pivot(dict_daily, self.str_roll_field)
+        df_close = self.pivot(dict_daily, 'close').reindex(index=df_rank.index, columns=df_rank.columns)
+        if df_rank.empty:
+            print(f"【连续合约】{str_product_long_id} 没有日线数据，跳过")
+            return
+        # 从int_from_key开始选择，增量更新时带上前一交易日作为换月判断的排名依据
+        arr_day_key = self.daily_key(df_rank.index.to_numpy())
+        int_first = int(np.searchsorted(arr_day_key, int_from_key, side='left'))
+        bool_has_prev = int_first > 0 and str_init_contract is not None
+        int_rank_start = int_first - 1 if bool_has_prev else int_first
+        sr_main = self.select_main(df_rank.iloc[int_rank_start:], df_close.iloc[int_rank_start:], str_init_contract,
+                                   self.bool_forward_only, self.float_switch_ratio, bool_has_prev)
+        # 换月记录需要前一交易日的收盘价，因此带上前一交易日一起计算
+        if bool_has_prev:
+            sr_with_prev = pd.concat([pd.Series([str_init_contract], index=df_rank.index[int_first - 1:int_first]), sr_main])
+            df_roll_tail = self.build_rolls(sr_with_prev, df_close.iloc[int_first - 1:])
+        else:
+            df_roll_tail = self.build_rolls(sr_main, df_close.iloc[int_first:])
+
+        df_days_tail = pd.DataFrame({'day_key': self.daily_key(sr_main.index.to_numpy()), 'contract': sr_main.to_numpy()})
+        df_days = self._merge_tail(df_days, df_days_tail, int_from_key, 'day_key')
+        str_roll_path = self.get_file_path(str_product_long_id, "roll")
+        df_roll = self._merge_tail(self._read_pkl(str_roll_path), df_roll_tail, int_from_key, 'day_key')
+
+        # 各周期拼接主力连续和持仓加权连续
+        for str_period in self.list_period:
+            dict_bars = dict_daily if str_period == "1d" else self._fetch_bars(list_contract, str_period, dt_begin, dt_end)
+            df_main_tail = self.build_main_series(dict_bars, sr_main, str_period, arr_day_key)
+            df_weighted_tail = self.build_weighted_series(dict_bars, str_period, arr_day_key)
+            for str_kind, df_tail in [("main", df_main_tail), ("weighted", df_weighted_tail)]:
+                str_file_path = self.get_file_path(str_product_long_id, str_kind, str_period)
+                df_merged = self._merge_tail(self._read_pkl(str_file_path), df_tail, int_from_key)
+                df_merged.index = utility.batch_timestamp_to_datetime(df_merged['time'])
+                utility.commit_file(str_file_path, df_merged.to_pickle)
+            print(f"【连续合约】{str_product_long_id} {str_period}周期更新 主力 {len(df_main_tail)} 行，加权 {len(df_weighted_tail)} 行")
+
+        # 最后保存状态，保证中途失败时下次从上次完整状态重算
+        utility.commit_file(str_roll_path, df_roll.to_pickle)
+        utility.commit_file(str_days_path, df_days.to_pickle)
+        print(f"【连续合约】{str_product_long_id} 更新完成，换月 {len(df_roll)} 次，耗时: {time.time() - time_start:.2f}秒")
+
+    def run(self, df_future_detail: pd.DataFrame, dt_end: str):
+        """
+        更新全部品种的连续合约
+
+        Args:
+            df_future_detail: get_instrument_detail返回的期货连续合约详情（需要ProductID, XTExchangeID, ExchangeCName）
+            dt_end: 本次更新截止时间
+        """
+        df_product = df_future_detail[['ProductID', 'XTExchangeID', 'ExchangeCName']].drop_duplicates()
+        for _, row in df_product.iterrows():
+            try:
+                self.update_product(row['ProductID'], row['XTExchangeID'], row['ExchangeCName'], dt_end)
+            except Exception as e:
+                print(f"【连续合约】{row['ProductID']}.{row['XTExchangeID']} 更新出错: {str(e)}")
@@ -0,0 +1,231 @@
+import configparser
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from connect.MysqlConnect import MysqlConnect
+from utility import utility
+
+class DailySummary:
+    """
+    按交易日汇总的日度统计（每个合约一个小文件，可选同步到MySQL），保存阶段增量维护
+
+    由1m K线得到：开高低收、成交量、成交额、VWAP（成交额/成交量，期货含合约乘数，股票成交量单位为手）、
+    收盘持仓量、K线数、首根/末根K线时间（交易时段范围）；由tick得到：tick数、首笔/末笔tick时间。
+    每次写入只对新获取的数据做向量化汇总（按交易日分段reduceat），时间不晚于已汇总部分、且所在交易日已有汇总的行跳过（避免重复累加；缺口修补补回的整日数据仍会汇总），
+    再与已有汇总中涉及的交易日合并（首/末取先后、高低取极值、量额和计数相加），整表很小，直接重写；
+    开启mysql时只把变化的交易日批量写入bar_daily_summary。日度查询只读汇总，不需要打开原始的1m/tick文件。
+
+    交易日：18:00之后的夜盘归属下一自然日，落在周六/周日的顺延到周一（节假日前没有夜盘）。
+    文件：{data_path}/{交易所}-{品种名称}-{合约长代码}-daily.parquet
+    """
+
+    INT_DAY_MS = 86400000
+    INT_CN_OFFSET_MS = 8 * 3600 * 1000
+    INT_NIGHT_SHIFT_MS = 6 * 3600 * 1000
+
+    # 1m汇总列、tick汇总列
+    LIST_BAR_COLUMN = ['Open', 'High', 'Low', 'Close', 'Volume', 'Amount', 'OpenInterest', 'BarCount', 'FirstBarTime', 'LastBarTime']
+    LIST_TICK_COLUMN = ['TickCount', 'FirstTickTime', 'LastTickTime']
+    LIST_COLUMN = ['TradeDate'] + LIST_BAR_COLUMN + ['VWAP'] + LIST_TICK_COLUMN
+    # 合并时的规则
+    LIST_SUM_COLUMN = ['Volume', 'Amount', 'BarCount', 'TickCount']
+    LIST_MIN_COLUMN = ['Low', 'FirstBarTime', 'FirstTickTime']
+    LIST_MAX_COLUMN = ['High', 'LastBarTime', 'LastTickTime']
+
+    # 同一合约的1m和tick单元可能在不同worker线程中同时写入，按文件加锁
+    _lock = threading.Lock()
+    _dict_lock = {}
+
+    def __init__(self):
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.str_data_path = config.get('daily', 'data_path', fallback='barData/DAILY')
+        self.set_period = set(s.strip() for s in config.get('daily', 'periods', fallback='1m,tick').split(',') if s.strip())
+        self.bool_mysql = config.getboolean('daily', 'mysql', fallback=False)
+        self.mysql_connect = None
+        self.bool_table_ready = False
+        self.lock_conn = threading.Lock()
+
+    def get_file_path(self, row) -> str:
+        return f"{self.str_data_path}/{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']}-daily.parquet"
+
+    @classmethod
+    def trading_day(cls, arr_time: np.ndarray) -> np.ndarray:
+        """毫秒时间戳 -> 交易日（1970-01-01起的天数）：夜盘归属下一自然日，周六/周日顺延到周一"""
+        arr_day = (np.asarray(arr_time, dtype='int64') + cls.INT_CN_OFFSET_MS + cls.INT_NIGHT_SHIFT_MS) // cls.INT_DAY_MS
+        # 1970-01-01为周四，(天数 + 3) % 7 为周一=0的星期
+        arr_weekday = (arr_day + 3) % 7
+        return arr_day + np.where(arr_weekday == 5, 2, np.where(arr_weekday == 6, 1, 0))
+
+    @classmethod
+    def summarize(cls, df: pd.DataFrame, str_period: str) -> pd.DataFrame:
+        """
+        按交易日向量化汇总（df已按时间排序）
+
+        Returns:
+            pd.DataFrame: TradeDate为交易日天数，1m为LIST_BAR_COLUMN，tick为LIST_TICK_COLUMN
+        """
+        arr_time = df['time'].to_numpy(dtype='int64')
+        arr_day = cls.trading_day(arr_time)
+        arr_start = np.flatnonzero(np.r_[True, arr_day[1:] != arr_day[:-1]])
+        arr_end = np.r_[arr_start[1:], len(arr_day)] - 1
+        dict_out = {'TradeDate': arr_day[arr_start]}
+        if str_period == "tick":
+            dict_out['TickCount'] = np.diff(np.r_[arr_start, len(arr_day)])
+            dict_out['FirstTickTime'] = arr_time[arr_start]
+            dict_out['LastTickTime'] = arr_time[arr_end]
+            return pd.DataFrame(dict_out)
+
+        def column(str_field):
+            return df[str_field].to_numpy(dtype='float64') if str_field in df.columns else np.full(len(df), np.nan)
+
+        dict_out['Open'] = column('open')[arr_start]
+        dict_out['High'] = np.fmax.reduceat(column('high'), arr_start)
+        dict_out['Low'] = np.fmin.reduceat(column('low'), arr_start)
+        dict_out['Close'] = column('close')[arr_end]
+        dict_out['Volume'] = np.add.reduceat(np.nan_to_num(column('volume')), arr_start)
+        dict_out['Amount'] = np.add.reduceat(np.nan_to_num(column('amount')), arr_start)
+        dict_out['OpenInterest'] = column('openInterest')[arr_end]
+        dict_out['BarCount'] = np.diff(np.r_[arr_start, len(arr_day)])
+        dict_out['FirstBarTime'] = arr_time[arr_start]
+        dict_out['LastBarTime'] = arr_time[arr_end]
+        return pd.DataFrame(dict_out)
+
+    @classmethod
+    def merge(cls, df_existing: pd.DataFrame, df_new: pd.DataFrame, str_period: str) -> tuple:
+        """
+        把新汇总合并进已有汇总（新汇总的行都晚于已有汇总中同来源的数据）
+
+        Returns:
+            tuple: (合并后的完整汇总, 变化的交易日行)
+        """
+        list_column = cls.LIST_TICK_COLUMN if str_period == "tick" else cls.LIST_BAR_COLUMN
+        str_first = 'FirstTickTime' if str_period == "tick" else 'FirstBarTime'
+        df_all = df_existing.set_index('TradeDate').reindex(columns=cls.LIST_COLUMN[1:])
+        df_new = df_new.set_index('TradeDate')
+        df_old = df_all.reindex(df_new.index)
+        # 该交易日是否已有同来源的数据
+        sr_has_old = df_old[str_first].notna()
+        df_merged = df_old.copy()
+        for str_column in list_column:
+            sr_new, sr_old = df_new[str_column], df_old[str_column]
+            if str_column in cls.LIST_SUM_COLUMN:
+                df_merged[str_column] = sr_new + sr_old.fillna(0)
+            elif str_column in cls.LIST_MIN_COLUMN:
+                df_merged[str_column] = np.fmin(sr_new, sr_old)
+            elif str_column in cls.LIST_MAX_COLUMN:
+                df_merged[str_column] = np.fmax(sr_new, sr_old)
+            elif str_column == 'Open':
+                df_merged[str_column] = sr_old.where(sr_has_old, sr_new)
+            else:
+                # 收盘价、持仓量取最新
+                df_merged[str_column] = sr_new
+        df_merged['VWAP'] = (df_merged['Amount'] / df_merged['Volume']).where(df_merged['Volume'] > 0)
+        df_all = pd.concat([df_all.drop(index=df_new.index, errors='ignore'), df_merged]).sort_index()
+        return df_all.rename_axis('TradeDate').reset_index(), df_merged.rename_axis('TradeDate').reset_index()
+
+    @classmethod
+    def read_file(cls, str_file_path: str) -> pd.DataFrame:
+        """读取汇总文件，TradeDate为交易日天数；不存在时返回空表"""
+        if not utility.file_exists(str_file_path):
+            return pd.DataFrame({c: pd.Series(dtype='float64') for c in cls.LIST_COLUMN}).astype({'TradeDate': 'int64'})
+        df = pd.read_parquet(utility.resolve_read_path(str_file_path))
+        df['TradeDate'] = (df['TradeDate'].to_numpy(dtype='datetime64[D]')).astype('int64')
+        return df
+
+    def update(self, df: pd.DataFrame, row, str_period: str) -> int:
+        """
+        用一次保存的数据增量更新汇总
+
+        Returns:
+            int: 变化的交易日数
+        """
+        if str_period not in self.set_period or df is None or df.empty:
+            return 0
+        str_file_path = self.get_file_path(row)
+        with self._lock:
+            lock_file = self._dict_lock.setdefault(str_file_path, threading.Lock())
+        with lock_file:
+            df_existing = self.read_file(str_file_path)
+            # 已汇总到的最后时间之前、且所在交易日已有该来源汇总的行（重叠获取的部分）跳过
+            str_last = 'LastTickTime' if str_period == "tick" else 'LastBarTime'
+            if df_existing[str_last].notna().any():
+                arr_time = df['time'].to_numpy(dtype='int64')
+                arr_done_day = df_existing.loc[df_existing[str_last].notna(), 'TradeDate'].to_numpy(dtype='int64')
+                df = df[(arr_time > int(df_existing[str_last].max())) | ~np.isin(self.trading_day(arr_time), arr_done_day)]
+                if df.empty:
+                    return 0
+            df_all, df_changed = self.merge(df_existing, self.summarize(df, str_period), str_period)
+            df_out = df_all.copy()
+            df_out['TradeDate'] = df_out['TradeDate'].to_numpy(dtype='int64').astype('datetime64[D]')
+            table = pa.Table.from_pandas(df_out, preserve_index=False)
+            utility.commit_file(str_file_path, lambda str_path: pq.write_table(table, str_path))
+            if self.bool_mysql:
+                self._upsert_mysql(row['InstrumentLongID'], df_changed)
+            return len(df_changed)
+
+    def _ensure_table(self):
+        if self.bool_table_ready:
+            return
+        list_col_def = [f"`{c}` {'BIGINT' if c.endswith(('Time', 'Count')) else 'DOUBLE'}" for c in self.LIST_COLUMN[1:]]
+        self.mysql_connect.execute(f"""
+            CREATE TABLE IF NOT EXISTS bar_daily_summary (
+                InstrumentLongID VARCHAR(32) NOT NULL,
+                TradeDate DATE NOT NULL,
+                {', '.join(list_col_def)},
+                PRIMARY KEY (InstrumentLongID, TradeDate)
+            )
+        """)
+        self.bool_table_ready = True
+
+    def _upsert_mysql(self, str_instrument_long_id: str, df_changed: pd.DataFrame):
+        """变化的交易日批量写入MySQL（与文件一致的完整行）"""
+        list_column = self.LIST_COLUMN[1:]
+        df_records = df_changed[list_column].astype(object).where(df_changed[list_column].notna(), None)
+        arr_date = df_changed['TradeDate'].to_numpy(dtype='int64').astype('datetime64[D]').astype(str)
+        list_values = [(str_instrument_long_id, str_date) + tuple(tuple_row)
+                       for str_date, tuple_row in zip(arr_date, df_records.itertuples(index=False, name=None))]
+        query = f"""
+            INSERT INTO bar_daily_summary (InstrumentLongID, TradeDate, {', '.join(f'`{c}`' for c in list_column)})
+            VALUES ({', '.join(['%s'] * (len(list_column) + 2))})
+            ON DUPLICATE KEY UPDATE {', '.join(f'`{c}` = VALUES(`{c}`)' for c in list_column)}
+        """
+        with self.lock_conn:
+            if self.mysql_connect is None:
+                self.mysql_connect = MysqlConnect()
+                self.mysql_connect.connect()
+            self._ensure_table()
+            self.mysql_connect.executemany(query, list_values)
+
+    def load(self, list_row: list, str_begin: str = None, str_end: str = None) -> pd.DataFrame:
+        """
+        读取多个合约的日度汇总（不打开原始K线文件）
+
+        Args:
+            list_row: log_save中的合约记录（需包含ExchangeCName, instrument_CName, InstrumentLongID）
+            str_begin: 开始交易日（YYYYMMDD，含）
+            str_end: 结束交易日（YYYYMMDD，含）
+
+        Returns:
+            pd.DataFrame: InstrumentLongID, TradeDate（datetime64）及各汇总列
+        """
+        list_df = []
+        for row in list_row:
+            df = self.read_file(self.get_file_path(row))
+            df.insert(0, 'InstrumentLongID', row['InstrumentLongID'])
+            list_df.append(df)
+        if not list_df:
+            return pd.DataFrame(columns=['InstrumentLongID'] + self.LIST_COLUMN)
+        df = pd.concat(list_df, ignore_index=True)
+        df['TradeDate'] = df['TradeDate'].to_numpy(dtype='int64').astype('datetime64[D]')
+        if str_begin is not None:
+            df = df[df['TradeDate'] >= pd.Timestamp(str_begin)]
+        if str_end is not None:
+            df = df[df['TradeDate'] <= pd.Timestamp(str_end)]
+        return df.reset_index(drop=True)
+
+    def close(self):
+        if self.mysql_connect is not None:
+            self.mysql_connect.disconnect()
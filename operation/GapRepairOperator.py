@@ -0,0 +1,356 @@
+import configparser
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from operation.QMTOperator import QMTOperator
+from operation.BarSink import BarSink
+from operation.DailySummary import DailySummary
+from utility import utility
+
+class GapRepairOperator:
+    """
+    按缺口定向修补本地数据
+
+    download_barData中某个周期失败后，该周期在本地文件中留下缺口，原来只能重置log_save从init_begin重新下载全部数据。
+    修补模式（python main.py --repair）对每个 (合约, 周期)：
+        1. 只读取本地文件的时间列（feather/parquet按列读取，pkl读取整个文件），按交易日（夜盘归属下一交易日）统计每日行数
+        2. 与交易所交易日历（xtdata.get_trading_dates）比较，得到缺失的交易日；[repair] short_periods中的周期另外检查
+           行数不足当日中位数short_ratio倍的交易日（中途中断的残缺交易日）
+        3. 连续的缺口交易日合并为一个时间范围（从前一交易日18:00到最后一个缺口交易日17:59:59，超过max_days_per_request的拆分），
+           只对这些范围调用download_history_data和get_market_data_ex，写入全部sink（与原有数据合并去重）
+    范围：有本地文件时从第一个已保存的交易日开始（更早的数据受QMT历史深度限制，不视为缺口），没有文件时从log_save的init_datetime开始，
+    到log_save的保存结束时间为止，并限制在合约上市日期到到期日之间。
+    QMT确认下载完成（download_history_data2回调无错误）但也没有数据的范围（停牌、无成交的远月合约等）记入log_gap_repair（Status为empty），
+    [repair] empty_retry_days天内的修补跳过这些交易日，之后重新检查；下载没有确认完成的记为failed，下次修补重试。
+    只修补不复权数据（与保存阶段一致）。
+    """
+
+    # [sink]中的文件sink -> 扩展名，按此顺序选择读取时间列的文件
+    DICT_SINK_EXT = {"feather": "arrow", "parquet": "parquet", "pickle_i64": utility.STR_I64_EXT, "pickle": "pkl"}
+    INT_DAY_MS = 86400000
+
+    def __init__(self, qmt_operator: QMTOperator):
+        """
+        初始化修补操作器
+
+        Args:
+            qmt_operator: QMT操作器（复用其行情缓存、工作规划器和数据整理）
+        """
+        self.qmt_operator = qmt_operator
+        self.mysql_operator = qmt_operator.mysql_operator
+        self.market_data_cache = qmt_operator.market_data_cache
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.list_period = [s.strip() for s in config.get('repair', 'periods', fallback='tick,1m,5m,15m,1h,1d').split(',') if s.strip()]
+        self.set_short_period = set(s.strip() for s in config.get('repair', 'short_periods', fallback='1m,5m').split(',') if s.strip())
+        self.float_short_ratio = config.getfloat('repair', 'short_ratio', fallback=0.5)
+        self.int_max_days = max(config.getint('repair', 'max_days_per_request', fallback=20), 1)
+        self.int_empty_retry_days = config.getint('repair', 'empty_retry_days', fallback=30)
+        list_sink = [s.strip() for s in config.get('sink', 'sinks', fallback='pickle').split(',') if s.strip()]
+        self.str_read_ext = next((self.DICT_SINK_EXT[s] for s in self.DICT_SINK_EXT if s in list_sink), None)
+
+    @staticmethod
+    def read_stored_times(str_file_path: str) -> np.ndarray:
+        """
+        读取本地文件的int64毫秒时间戳，文件不存在返回None
+        """
+        if not utility.file_exists(str_file_path):
+            return None
+        if str_file_path.endswith(".arrow"):
+            table = utility.read_feather_mmap(str_file_path, ['time'])
+            return table.column('time').to_numpy().astype('int64')
+        if str_file_path.endswith(".parquet"):
+            table = pq.read_table(utility.resolve_read_path(str_file_path), columns=['time'])
+            return table.column('time').to_numpy().astype('int64')
+        return utility.index_to_epoch_ms(pd.read_pickle(utility.resolve_read_path(str_file_path)))
+
+    @staticmethod
+    def _to_day(dt_value) -> int:
+        """14位时间字符串或8位日期 -> 1970-01-01起的天数"""
+        return int(np.datetime64(datetime.strptime(str(dt_value)[:8], '%Y%m%d').date(), 'D').astype('int64'))
+
+    @staticmethod
+    def _day_to_str(int_day: int) -> str:
+        return str(np.datetime64(int(int_day), 'D')).replace('-', '')
+
+    def get_expected_days(self, row, int_begin_day: int, int_end_day: int) -> np.ndarray:
+        """
+        交易所交易日（天数），多取开始日之前的几个交易日，用于确定第一个缺口的窗口开始时间
+        """
+        list_trading_date = self.market_data_cache.call('get_trading_dates', row['XTExchangeID'],
+                                                        self._day_to_str(int_begin_day - 15), self._day_to_str(int_end_day))
+        arr_day = (np.asarray(list_trading_date or [], dtype='int64') + utility.INT_CN_OFFSET_MS) // self.INT_DAY_MS
+        return np.unique(arr_day)
+
+    def get_scan_range(self, row, arr_time: np.ndarray) -> tuple:
+        """
+        检查的交易日范围 (开始天数, 结束天数)，没有可检查的范围返回None
+        """
+        dt_end = row.get('save_end_datetime') or row.get('download_end_datetime')
+        if dt_end is None or pd.isna(dt_end):
+            return None
+        int_end_day = self._to_day(dt_end)
+        if arr_time is not None and len(arr_time) > 0:
+            int_begin_day = int(DailySummary.trading_day(np.array([arr_time.min()]))[0])
+        else:
+            dt_begin = row.get('init_datetime') or row.get('download_begin_datetime')
+            if dt_begin is None or pd.isna(dt_begin):
+                return None
+            int_begin_day = self._to_day(dt_begin)
+        # 限制在上市日期到到期日之间
+        try:
+            dict_detail = self.market_data_cache.call('get_instrument_detail', row['InstrumentLongID'], True) or {}
+        except Exception:
+            dict_detail = {}
+        for str_field in ['CreateDate', 'OpenDate']:
+            str_date = str(dict_detail.get(str_field) or '')
+            if len(str_date) == 8 and str_date.isdigit() and str_date > '19000101':
+                int_begin_day = max(int_begin_day, self._to_day(str_date))
+        str_expire = str(dict_detail.get('ExpireDate') or '')
+        if len(str_expire) == 8 and str_expire.isdigit() and '19000101' < str_expire < '99990101':
+            int_end_day = min(int_end_day, self._to_day(str_expire))
+        if int_begin_day > int_end_day:
+            return None
+        return int_begin_day, int_end_day
+
+    def find_gaps(self, arr_time: np.ndarray, arr_expected_day: np.ndarray, int_begin_day: int, int_end_day: int,
+                  str_period: str, set_skip_day: set = None) -> list:
+        """
+        计算缺口
+
+        Args:
+            arr_time: 本地数据的毫秒时间戳（None表示没有文件）
+            arr_expected_day: 交易所交易日（天数，已排序，包含开始日之前的交易日）
+            int_begin_day: 检查开始的交易日
+            int_end_day: 检查结束的交易日
+            str_period: 周期
+            set_skip_day: 已确认QMT也没有数据的交易日
+
+        Returns:
+            list: [{'kind': missing/short, 'begin': 窗口开始, 'end': 窗口结束, 'begin_day', 'end_day', 'days': 交易日数,
+                    'list_day': 交易日天数列表, 'old_rows': 本地已有行数}, ...]
+        """
+        if arr_time is not None and len(arr_time) > 0:
+            arr_day, arr_count = np.unique(DailySummary.trading_day(arr_time), return_counts=True)
+        else:
+            arr_day, arr_count = np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+        dict_count = dict(zip(arr_day.tolist(), arr_count.tolist()))
+        set_skip_day = set_skip_day or set()
+
+        # 每个交易日的缺口类型
+        float_short_rows = 0.0
+        if str_period in self.set_short_period and self.float_short_ratio > 0 and len(arr_count) > 0:
+            float_short_rows = float(np.median(arr_count)) * self.float_short_ratio
+        list_kind = []
+        for int_day in arr_expected_day.tolist():
+            if int_day < int_begin_day or int_day > int_end_day or int_day in set_skip_day:
+                list_kind.append(None)
+            elif int_day not in dict_count:
+                list_kind.append("missing")
+            elif dict_count[int_day] < float_short_rows:
+                list_kind.append("short")
+            else:
+                list_kind.append(None)
+
+        # 相邻（在交易日历中连续）且类型相同的交易日合并，超过int_max_days的拆分
+        list_gap = []
+        int_idx = 0
+        while int_idx < len(list_kind):
+            str_kind = list_kind[int_idx]
+            if str_kind is None:
+                int_idx += 1
+                continue
+            int_last = int_idx
+            while (int_last + 1 < len(list_kind) and list_kind[int_last + 1] == str_kind
+                   and int_last + 1 - int_idx < self.int_max_days):
+                int_last += 1
+            list_day = arr_expected_day[int_idx:int_last + 1].tolist()
+            # 从前一交易日18:00（包含夜盘）到最后一个缺口交易日17:59:59
+            int_prev_day = int(arr_expected_day[int_idx - 1]) if int_idx > 0 else list_day[0] - 1
+            list_gap.append({
+                'kind': str_kind,
+                'begin': f"{self._day_to_str(int_prev_day)}180000",
+                'end': f"{self._day_to_str(list_day[-1])}175959",
+                'begin_day': list_day[0],
+                'end_day': list_day[-1],
+                'days': len(list_day),
+                'list_day': list_day,
+                'old_rows': int(sum(dict_count.get(d, 0) for d in list_day)),
+            })
+            int_idx = int_last + 1
+        return list_gap
+
+    def scan_unit(self, dict_unit: dict) -> list:
+        """扫描一个 (合约, 周期) 的缺口"""
+        row = dict_unit['row']
+        str_file_path = utility.get_bar_file_path(dict_unit['data_save_path'], row, dict_unit['period'], "none", self.str_read_ext)
+        arr_time = self.read_stored_times(str_file_path)
+        tuple_range = self.get_scan_range(row, arr_time)
+        if tuple_range is None:
+            return []
+        arr_expected_day = self.get_expected_days(row, *tuple_range)
+        return self.find_gaps(arr_time, arr_expected_day, tuple_range[0], tuple_range[1], dict_unit['period'], dict_unit['set_skip_day'])
+
+    def _repair_unit(self, dict_unit: dict):
+        """
+        扫描并修补一个 (合约, 周期)，在worker线程中执行，结果记入dict_unit['list_gap']
+
+        Returns:
+            int: 写入后文件增加的字节数；False: 修补失败
+        """
+        row = dict_unit['row']
+        str_code = row['InstrumentLongID']
+        str_period = dict_unit['period']
+        try:
+            list_gap = self.scan_unit(dict_unit)
+        except Exception as e:
+            print(f"【修补】{str_code} {str_period} 扫描出错: {str(e)}")
+            return False
+        dict_unit['list_gap'] = list_gap
+        if not list_gap:
+            return 0
+        print(f"【修补】{str_code} {str_period} 发现 {len(list_gap)} 个缺口，共 {sum(g['days'] for g in list_gap)} 个交易日: "
+              + ", ".join(f"{g['kind']} {self._day_to_str(g['begin_day'])}-{self._day_to_str(g['end_day'])}" for g in list_gap[:5])
+              + (" ..." if len(list_gap) > 5 else ""))
+        if dict_unit['dry_run']:
+            for dict_gap in list_gap:
+                dict_gap['status'] = "found"
+            return 0
+
+        int_bytes = 0
+        bool_failed = False
+        for dict_gap in list_gap:
+            try:
+                bool_confirmed = self._download_confirmed(str_code, str_period, dict_gap['begin'], dict_gap['end'])
+                dict_result = self.market_data_cache.get_market_data_ex([], [str_code], period=str_period, dividend_type="none",
+                                                                        start_time=dict_gap['begin'], end_time=dict_gap['end'],
+                                                                        count=-1, fill_data=False)
+                df_temp = dict_result.get(str_code)
+                # 缺口交易日内的新行数不多于本地已有行数时，QMT也没有更多数据
+                int_new_rows = 0
+                if df_temp is not None and not df_temp.empty:
+                    arr_day = DailySummary.trading_day(df_temp['time'].to_numpy(dtype='int64'))
+                    int_new_rows = int(np.isin(arr_day, dict_gap['list_day']).sum())
+                dict_gap['rows'] = int_new_rows
+                if int_new_rows <= dict_gap['old_rows']:
+                    if bool_confirmed:
+                        dict_gap['status'] = "empty"
+                    else:
+                        # 下载没有确认完成（QMT会话中断、服务器限流等），不能断定QMT没有数据，下次修补重试
+                        print(f"【修补】{str_code} {str_period} {dict_gap['begin']}-{dict_gap['end']} 下载未确认完成且没有新数据，下次重试")
+                        dict_gap['status'] = "failed"
+                        bool_failed = True
+                    continue
+                df_temp = self.qmt_operator._prepare_bar_frame(df_temp, str_period)
+                for obj_sink in dict_unit['list_sinks']:
+                    int_bytes += obj_sink.write(df_temp, row, str_period, "none")
+                dict_gap['status'] = "filled"
+            except Exception as e:
+                print(f"【修补】{str_code} {str_period} {dict_gap['begin']}-{dict_gap['end']} 出错: {str(e)}")
+                dict_gap['status'] = "failed"
+                bool_failed = True
+        return False if bool_failed else int_bytes
+
+    def _download_confirmed(self, str_code: str, str_period: str, str_begin: str, str_end: str) -> bool:
+        """
+        下载一个缺口范围，返回QMT是否确认下载完成
+        download_history_data失败时可能不报错，改用download_history_data2，回调报告该合约完成且没有错误信息才算确认
+        """
+        dict_message = {}
+
+        def on_progress(dict_data):
+            if dict_data.get('stockcode') == str_code:
+                dict_message[str_code] = dict_data.get('message') or ''
+
+        try:
+            self.market_data_cache.download_history_data2([str_code], str_period, start_time=str_begin, end_time=str_end,
+                                                          callback=on_progress)
+        except Exception as e:
+            print(f"【修补】{str_code} {str_period} {str_begin}-{str_end} 下载出错: {str(e)}")
+            return False
+        if dict_message.get(str_code) != '':
+            print(f"【修补】{str_code} {str_period} {str_begin}-{str_end} 下载未确认完成: {dict_message.get(str_code, '没有回调')}")
+            return False
+        return True
+
+    def repair(self, str_instrument_category: str = "FUTURE", list_instrument_long_id: list = None, list_period: list = None,
+               bool_dry_run: bool = False) -> pd.DataFrame:
+        """
+        扫描并修补一个品种类型的缺口
+
+        Args:
+            str_instrument_category: 品种类型，"FUTURE"为期货，"STOCK"为股票
+            list_instrument_long_id: 可选，只修补这些合约
+            list_period: 可选，覆盖[repair] periods
+            bool_dry_run: 只扫描并打印缺口，不下载
+
+        Returns:
+            pd.DataFrame: 各缺口的结果，列为InstrumentLongID, Period, Kind, StartTime, EndTime, TradeDays, OldRows, NewRows, Status
+        """
+        time_start = datetime.now()
+        if self.str_read_ext is None:
+            print("【修补】[sink] sinks中没有文件sink，无法扫描本地数据")
+            return pd.DataFrame()
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        if str_instrument_category == "FUTURE":
+            str_data_save_path = config.get('path', 'future_data_path')
+        elif str_instrument_category == "STOCK":
+            str_data_save_path = config.get('path', 'stock_data_path')
+        list_period = [p for p in (list_period or self.list_period) if p in self.qmt_operator.DICT_PERIOD[str_instrument_category]]
+
+        df_log = self.qmt_operator._merge_log_save(self.mysql_operator.get_all_log_save(str_instrument_category), str_instrument_category)
+        if list_instrument_long_id is not None:
+            df_log = df_log[df_log['InstrumentLongID'].isin(list_instrument_long_id)]
+        # 已确认QMT没有数据的交易日（超过empty_retry_days天的重新检查）
+        self.mysql_operator.init_gap_repair()
+        dict_skip_day = {}
+        df_empty = self.mysql_operator.get_gap_repair_empty(list(df_log['InstrumentLongID']), self.int_empty_retry_days)
+        for row_empty in df_empty.itertuples(index=False):
+            set_day = dict_skip_day.setdefault((row_empty.InstrumentLongID, row_empty.Period), set())
+            set_day.update(range(self._to_day(row_empty.TradeDateBegin), self._to_day(row_empty.TradeDateEnd) + 1))
+
+        list_sinks = [] if bool_dry_run else BarSink.create_sinks(str_data_save_path)
+        list_units = []
+        for _, row in df_log.iterrows():
+            for str_period in list_period:
+                list_units.append({'InstrumentLongID': row['InstrumentLongID'], 'period': str_period, 'stage': "repair",
+                                   'begin': row.get('save_begin_datetime'), 'end': row.get('save_end_datetime'), 'row': row,
+                                   'est_bytes': 0, 'est_seconds': 1.0, 'existing_bytes': 0, 'data_save_path': str_data_save_path,
+                                   'set_skip_day': dict_skip_day.get((row['InstrumentLongID'], str_period), set()),
+                                   'list_sinks': list_sinks, 'dry_run': bool_dry_run, 'list_gap': []})
+        print(f"【修补】{str_instrument_category}: 检查 {len(df_log)} 个合约，周期 {','.join(list_period)}"
+              f"{'（只扫描）' if bool_dry_run else ''}")
+
+        list_result = []
+
+        def func_done(dict_unit, float_elapsed, result):
+            list_record = []
+            for dict_gap in dict_unit['list_gap']:
+                list_result.append({'InstrumentLongID': dict_unit['InstrumentLongID'], 'Period': dict_unit['period'],
+                                    'Kind': dict_gap['kind'], 'StartTime': dict_gap['begin'], 'EndTime': dict_gap['end'],
+                                    'TradeDays': dict_gap['days'], 'OldRows': dict_gap['old_rows'],
+                                    'NewRows': dict_gap.get('rows', 0), 'Status': dict_gap.get('status', "failed")})
+                if not dict_unit['dry_run']:
+                    list_record.append((dict_unit['InstrumentLongID'], dict_unit['period'], self._day_to_str(dict_gap['begin_day']),
+                                        self._day_to_str(dict_gap['end_day']), dict_gap['kind'], dict_gap['begin'], dict_gap['end'],
+                                        dict_gap['old_rows'], dict_gap.get('rows', 0), dict_gap.get('status', "failed")))
+            self.mysql_operator.upsert_gap_repair(list_record)
+
+        self.qmt_operator.work_planner.run(self.qmt_operator.work_planner.schedule(list_units), self._repair_unit, func_done)
+        for obj_sink in list_sinks:
+            obj_sink.report()
+            obj_sink.close()
+        self.market_data_cache.report(f"{str_instrument_category} 修补")
+
+        df_result = pd.DataFrame(list_result, columns=['InstrumentLongID', 'Period', 'Kind', 'StartTime', 'EndTime', 'TradeDays',
+                                                       'OldRows', 'NewRows', 'Status'])
+        float_elapsed = (datetime.now() - time_start).total_seconds()
+        if df_result.empty:
+            print(f"【修补】{str_instrument_category}: 没有发现缺口，耗时 {float_elapsed:.1f}秒")
+            return df_result
+        dict_status = df_result.groupby('Status')['TradeDays'].agg(['count', 'sum']).to_dict('index')
+        print(f"【修补】{str_instrument_category}: {len(df_result)} 个缺口，共 {int(df_result['TradeDays'].sum())} 个交易日，耗时 {float_elapsed:.1f}秒；"
+              + "，".join(f"{k} {v['count']} 个（{v['sum']} 个交易日）" for k, v in dict_status.items()))
+        return df_result
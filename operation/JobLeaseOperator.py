@@ -0,0 +1,300 @@
+import configparser
+import os
+import socket
+import threading
+import time
+import pandas as pd
+from connect.MysqlConnect import MysqlConnect
+from operation.MysqlOperator import MysqlOperator
+from operation.QMTOperator import QMTOperator
+from operation.BarSink import BarSink
+from operation.RunHooks import RunHooks
+from utility import utility
+
+class JobLeaseOperator:
+    """
+    多机分布式下载保存
+
+    协调者（python main.py --distributed）把 (合约, 周期, 时间范围) 工作单元发布到数据库的log_job_lease表，
+    各机器上的worker（python main.py --worker，可在同一台机器上启动多个进程）按租约领取单元：
+        - 领取：SELECT ... FOR UPDATE SKIP LOCKED（或兼容旧版本的UPDATE ... LIMIT），并发的worker不会领到同一单元
+        - 心跳：后台线程（单独的数据库连接）定期延长正在处理的单元的租约，并更新log_job_worker的吞吐量统计；
+                心跳失败时重连并打印，超过半个租约时长没有成功的心跳时暂停领取新单元，直到心跳恢复
+        - 过期：worker失联后租约到期，单元可被其他worker重新领取，超过最多尝试次数后标记为failed
+    每个单元在同一个worker上先下载再保存（下载的数据在该机器的QMT本地缓存中），数据目录应为各机器共享的路径；
+    同一 (合约, 周期) 在一个批次中只有一个单元，保存前确认仍持有该单元的租约（按领取令牌）并延长，
+    租约已被其他worker接管时放弃写入，不同worker不会同时写同一个文件。
+    协调者自身也作为worker领取单元，全部单元结束后由协调者统一更新log_save（一个合约的所有周期都成功才更新）。
+    """
+
+    # 命令行开启分布式模式（覆盖app.ini的[distributed] enable）
+    _bool_override = None
+
+    @classmethod
+    def configure(cls, bool_enable: bool):
+        cls._bool_override = bool_enable
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """是否以分布式模式运行下载保存"""
+        if cls._bool_override is not None:
+            return cls._bool_override
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        return config.getboolean('distributed', 'enable', fallback=False)
+
+    def __init__(self, qmt_operator: QMTOperator, mysql_operator: MysqlOperator, str_worker_id: str = None):
+        """
+        初始化分布式操作器
+
+        Args:
+            qmt_operator: QMT操作器，负责规划、下载和保存单个单元
+            mysql_operator: MySQL操作器，负责读写工作单元表（只在主线程中使用）
+            str_worker_id: worker标识，默认为 主机名-进程号
+        """
+        self.qmt_operator = qmt_operator
+        self.mysql_operator = mysql_operator
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.float_lease_seconds = config.getfloat('distributed', 'lease_seconds', fallback=600)
+        self.float_heartbeat_seconds = config.getfloat('distributed', 'heartbeat_seconds', fallback=30)
+        self.int_max_attempts = config.getint('distributed', 'max_attempts', fallback=3)
+        self.int_claim_batch = config.getint('distributed', 'claim_batch', fallback=1)
+        self.float_poll_seconds = config.getfloat('distributed', 'poll_seconds', fallback=5)
+        self.str_claim_method = config.get('distributed', 'claim_method', fallback='skip_locked')
+        self.str_hostname = socket.gethostname()
+        self.str_worker_id = str_worker_id or f"{self.str_hostname}-{os.getpid()}"
+        self.lock = threading.Lock()
+        # 正在处理的单元（心跳线程延长其租约）
+        self.set_running = set()
+        self.str_batch_id = None
+        # 累计完成单元数, 失败单元数, 写入字节数, 处理耗时
+        self.list_stat = [0, 0, 0, 0.0]
+        # 最近一次心跳成功的时间
+        self.time_heartbeat_ok = time.time()
+        # 各品种的log_save（含时间范围），用于由合约长代码还原工作单元的row
+        self.dict_log = {}
+
+    @staticmethod
+    def make_batch_id(str_instrument_category: str, dt_end: str) -> str:
+        return f"{str_instrument_category}-{dt_end}"
+
+    def publish(self, df_save_log: pd.DataFrame, str_instrument_category: str, dt_init_begin: str, dt_init_end: str) -> str:
+        """
+        规划下载阶段的工作单元并发布到log_job_lease（同一批次重复发布时已有单元保持不变）
+
+        Returns:
+            str: 批次标识
+        """
+        str_batch_id = self.make_batch_id(str_instrument_category, dt_init_end)
+        list_queues = self.qmt_operator.plan_barData(df_save_log, str_instrument_category, "download", dt_init_begin, dt_init_end)
+        list_units = [dict_unit for list_queue in list_queues for dict_unit in list_queue]
+        list_job = [(str_batch_id, str_instrument_category, dict_unit['InstrumentLongID'], dict_unit['period'],
+                     None if dict_unit['begin'] is None else str(dict_unit['begin']), str(dict_unit['end']),
+                     float(dict_unit['est_seconds']), float(dict_unit['est_bytes'])) for dict_unit in list_units]
+        self.mysql_operator.publish_jobs(list_job)
+        print(f"【分布式】批次 {str_batch_id} 发布 {len(list_job)} 个工作单元，"
+              f"预估 {sum(j[7] for j in list_job) / 1024 / 1024:.1f}MB，串行预估耗时 {sum(j[6] for j in list_job):.0f}秒")
+        return str_batch_id
+
+    def _get_row(self, str_instrument_category: str, str_instrument_long_id: str):
+        """合约在log_save中的行（与download_barData中的row相同），缓存中没有时重新查询"""
+        df_log = self.dict_log.get(str_instrument_category)
+        if df_log is None or str_instrument_long_id not in df_log.index:
+            df_log = self.qmt_operator._merge_log_save(self.mysql_operator.get_all_log_save(str_instrument_category), str_instrument_category)
+            df_log = df_log.set_index('InstrumentLongID', drop=False)
+            self.dict_log[str_instrument_category] = df_log
+        return df_log.loc[str_instrument_long_id]
+
+    def _heartbeat_loop(self, event_stop: threading.Event):
+        """
+        心跳线程：使用单独的数据库连接延长租约、更新worker统计
+        连接失败或续租失败时打印并在下一次心跳重连，不退出（退出后租约不再延长，长单元会被其他worker接管）
+        """
+        obj_mysql_connect = MysqlConnect()
+        obj_mysql_operator = MysqlOperator(obj_mysql_connect)
+        try:
+            while not event_stop.wait(self.float_heartbeat_seconds):
+                with self.lock:
+                    list_job_id = list(self.set_running)
+                    list_stat = list(self.list_stat)
+                    str_batch_id = self.str_batch_id
+                if obj_mysql_connect.ping() and obj_mysql_operator.renew_job_lease(self.str_worker_id, list_job_id, self.float_lease_seconds):
+                    with self.lock:
+                        self.time_heartbeat_ok = time.time()
+                    obj_mysql_operator.upsert_job_worker(self.str_worker_id, self.str_hostname, str_batch_id, *list_stat)
+                else:
+                    print(f"【分布式】worker {self.str_worker_id} 心跳失败（{len(list_job_id)} 个处理中的单元未能续租），"
+                          f"{self.float_heartbeat_seconds:.0f}秒后重试，恢复前不领取新单元")
+        finally:
+            obj_mysql_connect.disconnect()
+
+    def is_heartbeat_ok(self) -> bool:
+        """最近半个租约时长内有成功的心跳（否则处理中的单元可能已被其他worker接管）"""
+        with self.lock:
+            return time.time() - self.time_heartbeat_ok < self.float_lease_seconds / 2
+
+    def _process_job(self, row_job, str_data_save_path: str, list_sinks: list, list_cost: list):
+        """
+        处理一个单元：下载，再保存同一时间范围的数据
+
+        Returns:
+            int: 写入字节数；False: 失败
+        """
+        row = self._get_row(row_job['InstrumentCategory'], row_job['InstrumentLongID'])
+        dict_download = {'InstrumentLongID': row_job['InstrumentLongID'], 'period': row_job['Period'], 'stage': "download",
+                         'begin': row_job['BeginDatetime'], 'end': row_job['EndDatetime'], 'row': row,
+                         'est_bytes': row_job['EstBytes'] or 0, 'est_seconds': row_job['EstSeconds'] or 0}
+        dict_save = dict(dict_download, stage="save", list_dividend_type=["none"], list_sinks=list_sinks,
+                         existing_bytes=self._get_existing_bytes(str_data_save_path, row, row_job['Period']))
+        result = None
+        for dict_unit, func_unit in [(dict_download, self.qmt_operator._download_unit), (dict_save, self.qmt_operator._save_unit)]:
+            # 写入sink之前确认仍持有租约并续租，下载期间租约已过期并被其他worker接管的不再写文件
+            if dict_unit is dict_save and not self.mysql_operator.hold_job_lease(int(row_job['JobID']), self.str_worker_id,
+                                                                                 row_job['ClaimToken'], self.float_lease_seconds):
+                print(f"【分布式】{row_job['InstrumentLongID']} {row_job['Period']} 的租约已失效，放弃保存")
+                return False
+            time_start = time.time()
+            with self.qmt_operator.work_planner.memory_governor.admit(dict_unit), RunHooks.unit(dict_unit) as dict_record:
+                result = func_unit(dict_unit)
+                dict_record['result'] = result
+            float_elapsed = time.time() - time_start
+            if result is False:
+                return False
+            float_days = self.qmt_operator.work_planner._days_between(dict_unit['begin'], dict_unit['end'])
+            if result is None or result > 0:
+                list_cost.append((dict_unit['InstrumentLongID'], dict_unit['period'], dict_unit['stage'],
+                                  result / float_days if result else 0.0, float_elapsed / float_days))
+        return result or 0
+
+    def _get_existing_bytes(self, str_data_save_path: str, row, str_period: str) -> int:
+        """已有文件的字节数（用于内存估算），从目录或文件大小获取"""
+        str_file_path = utility.get_bar_file_path(str_data_save_path, row, str_period)
+        catalog = self.qmt_operator.work_planner.catalog
+        dict_entry = catalog.get_entry(str_file_path) if catalog is not None else None
+        if dict_entry is not None:
+            return int(dict_entry['ByteSize'] or 0)
+        if utility.file_exists(str_file_path):
+            return os.path.getsize(utility.resolve_read_path(str_file_path))
+        return 0
+
+    def run_worker(self, str_batch_id: str = None, bool_until_done: bool = True):
+        """
+        领取并处理工作单元，数据保存目录按单元的品种类型取[path]配置
+
+        Args:
+            str_batch_id: 只处理该批次，None为任意未完成的批次
+            bool_until_done: True时批次中没有待处理和处理中的单元后返回；False时一直等待新的批次（Ctrl+C退出）
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        # 品种类型 -> (数据保存目录, sink列表)
+        dict_sinks = {}
+        self.str_batch_id = str_batch_id
+        self.time_heartbeat_ok = time.time()
+        event_stop = threading.Event()
+        thread_heartbeat = threading.Thread(target=self._heartbeat_loop, args=(event_stop,), name="JobLeaseHeartbeat", daemon=True)
+        thread_heartbeat.start()
+        time_worker_start = time.time()
+        time_last_progress = time_worker_start
+        print(f"【分布式】worker {self.str_worker_id} 开始领取工作单元（批次: {str_batch_id or '任意'}）")
+        try:
+            while True:
+                # 心跳异常时领取的单元无法续租，等待心跳线程重连恢复
+                if not self.is_heartbeat_ok():
+                    time.sleep(self.float_poll_seconds)
+                    continue
+                df_job = self.mysql_operator.claim_jobs(self.str_worker_id, self.int_claim_batch, self.float_lease_seconds,
+                                                        self.int_max_attempts, str_batch_id, self.str_claim_method)
+                if df_job.empty:
+                    str_open_batch = self.mysql_operator.get_open_job_batch() if str_batch_id is None else str_batch_id
+                    df_lease = pd.DataFrame() if str_open_batch is None else self.mysql_operator.get_job_lease(str_open_batch)
+                    if bool_until_done and (df_lease.empty or not df_lease['Status'].isin(['pending', 'running']).any()):
+                        break
+                    # 其他worker仍在处理（其租约过期后可以重新领取），或等待新批次，每分钟打印一次进度
+                    if str_open_batch is not None and time.time() - time_last_progress >= 60:
+                        self.print_progress(str_open_batch)
+                        time_last_progress = time.time()
+                    time.sleep(self.float_poll_seconds)
+                    continue
+                with self.lock:
+                    self.set_running.update(int(x) for x in df_job['JobID'])
+                for _, row_job in df_job.iterrows():
+                    with self.lock:
+                        self.str_batch_id = row_job['BatchID']
+                    list_cost = []
+                    time_start = time.time()
+                    if row_job['InstrumentCategory'] not in dict_sinks:
+                        str_data_save_path = config.get('path', 'future_data_path' if row_job['InstrumentCategory'] == "FUTURE" else 'stock_data_path')
+                        dict_sinks[row_job['InstrumentCategory']] = (str_data_save_path, BarSink.create_sinks(str_data_save_path))
+                    try:
+                        result = self._process_job(row_job, *dict_sinks[row_job['InstrumentCategory']], list_cost)
+                        str_error = None if result is not False else "下载或保存失败"
+                    except Exception as e:
+                        result, str_error = False, str(e)
+                    float_elapsed = time.time() - time_start
+                    bool_owned = self.mysql_operator.finish_job(int(row_job['JobID']), self.str_worker_id, result is not False,
+                                                                float_elapsed, int(result or 0), str_error, self.int_max_attempts)
+                    if not bool_owned:
+                        print(f"【分布式】{row_job['InstrumentLongID']} {row_job['Period']} 的租约已过期并被其他worker接管，本次结果不记录")
+                    self.mysql_operator.upsert_plan_cost(list_cost)
+                    with self.lock:
+                        self.set_running.discard(int(row_job['JobID']))
+                        self.list_stat[0 if result is not False else 1] += 1
+                        self.list_stat[2] += int(result or 0)
+                        self.list_stat[3] += float_elapsed
+                        list_stat = list(self.list_stat)
+                    self.mysql_operator.upsert_job_worker(self.str_worker_id, self.str_hostname, row_job['BatchID'], *list_stat)
+        finally:
+            event_stop.set()
+            for _, list_sinks in dict_sinks.values():
+                for obj_sink in list_sinks:
+                    obj_sink.report()
+                    obj_sink.close()
+            self.qmt_operator.market_data_cache.report(f"worker {self.str_worker_id}")
+            self.qmt_operator.work_planner.memory_governor.report(f"worker {self.str_worker_id}")
+        float_total = time.time() - time_worker_start
+        print(f"【分布式】worker {self.str_worker_id} 结束：完成 {self.list_stat[0]} 个，失败 {self.list_stat[1]} 个，"
+              f"写入 {self.list_stat[2] / 1024 / 1024:.1f}MB，耗时 {float_total:.1f}秒（处理 {self.list_stat[3]:.1f}秒）")
+
+    def print_progress(self, str_batch_id: str):
+        """打印批次进度和各worker的吞吐量"""
+        df_lease = self.mysql_operator.get_job_lease(str_batch_id)
+        if df_lease.empty:
+            return
+        dict_status = df_lease['Status'].value_counts().to_dict()
+        print(f"\n【分布式】批次 {str_batch_id}：共 {len(df_lease)} 个单元，" +
+              "，".join(f"{s} {dict_status.get(s, 0)}" for s in ['done', 'running', 'pending', 'failed']) +
+              f"，重试 {int((df_lease['Attempts'] > 1).sum())} 个")
+        df_worker = self.mysql_operator.get_job_worker_stats(str_batch_id)
+        for _, row in df_worker.iterrows():
+            float_span = max(float(row['SpanSeconds'] or 0), 1.0)
+            print(f"  {row['WorkerID']:<32} 完成 {int(row['UnitsDone'] or 0):>5} 失败 {int(row['UnitsFailed'] or 0):>3} "
+                  f"写入 {float(row['ResultBytes']) / 1024 / 1024:>9.1f}MB 处理 {float(row['BusySeconds']):>8.1f}秒 "
+                  f"吞吐 {float(row['UnitsDone'] or 0) / float_span * 60:>7.1f}单元/分钟 {float(row['ResultBytes']) / 1024 / 1024 / float_span:>7.2f}MB/秒 "
+                  f"最近心跳 {row['Heartbeat']}")
+
+    def finalize(self, str_batch_id: str):
+        """
+        批次结束后更新log_save：一个合约的所有单元都成功才更新下载和保存时间范围（失败的合约下次重新下载该范围）
+        """
+        df_lease = self.mysql_operator.get_job_lease(str_batch_id)
+        int_updated = 0
+        for str_id, df_instrument in df_lease.groupby('InstrumentLongID'):
+            if not (df_instrument['Status'] == 'done').all():
+                print(f"【分布式】{str_id} 有未成功的单元（{', '.join(df_instrument.loc[df_instrument['Status'] != 'done', 'Period'])}），不更新保存日志")
+                continue
+            row_job = df_instrument.iloc[0]
+            self.mysql_operator.update_log_save_download(str_id, row_job['BeginDatetime'], row_job['EndDatetime'])
+            self.mysql_operator.update_log_save_save(str_id, row_job['BeginDatetime'], row_job['EndDatetime'])
+            int_updated += 1
+        print(f"【分布式】批次 {str_batch_id} 更新 {int_updated} 个合约的保存日志")
+
+    def run_coordinator(self, df_save_log: pd.DataFrame, str_instrument_category: str, dt_init_begin: str, dt_init_end: str):
+        """发布单元，自身作为worker参与处理，等待全部单元结束后汇总并更新log_save"""
+        time_start = time.time()
+        str_batch_id = self.publish(df_save_log, str_instrument_category, dt_init_begin, dt_init_end)
+        self.run_worker(str_batch_id, bool_until_done=True)
+        self.print_progress(str_batch_id)
+        self.finalize(str_batch_id)
+        print(f"【分布式】批次 {str_batch_id} 完成，总耗时 {time.time() - time_start:.1f}秒")
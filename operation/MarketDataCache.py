@@ -0,0 +1,300 @@
+import configparser
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from xtquant import xtdata
+
+class MarketDataCache:
+    """
+    xtdata行情查询的本地录制/回放缓存
+
+    get_market_data_ex的结果按合约拆开，以 (合约, 周期, 复权类型, 开始时间, 结束时间, 字段, count, fill_data) 的哈希为键
+    存为不压缩的arrow文件（{path}/{键前两位}/{键}.arrow），五档等列表列在读取时还原为Python列表；
+    get_trading_dates等小结果用call()以 (函数名, 参数) 为键存为pkl。
+
+    三种模式（[market_cache] mode，或 python main.py --market-cache 临时指定）：
+        off：直接查询xtdata，不读写缓存
+        record：命中且未过期（ttl_hours）时读缓存，否则查询xtdata并写入缓存；
+                save_barData中途崩溃后用 python main.py --resume 重跑（跳过下载阶段，保存阶段的时间范围与崩溃前相同），
+                已处理的 合约/周期/复权类型 不再重复查询QMT；不带--resume重跑时下载阶段先写入新的结束时间，保存阶段的键全部变化
+        replay：只从缓存读取，不访问QMT（download_history_data跳过），未命中时报错；不检查过期，用于可复现的性能测试
+    流水线中的xtdata查询都经过本缓存（replay模式下不连接QMT）；相同参数结果会随时间变化的查询
+    （板块成分、合约详情、除权因子、锚点日的前复权收盘价等）以bool_fresh=True调用：record模式下总是查询QMT并覆盖缓存，
+    replay模式下照常从缓存读取。
+    缓存总大小超过max_mb时按最近使用时间（命中时更新文件修改时间）删除最旧的文件。
+    """
+
+    SET_MODE = {"off", "record", "replay"}
+
+    # 命令行覆盖的模式
+    _str_override = None
+
+    def __init__(self):
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.str_mode = self.get_mode()
+        if self.str_mode not in self.SET_MODE:
+            raise ValueError(f"[market_cache] mode 只能为 {', '.join(sorted(self.SET_MODE))}，当前为 {self.str_mode}")
+        self.str_path = config.get('market_cache', 'path', fallback='cache/xtdata')
+        self.float_ttl = config.getfloat('market_cache', 'ttl_hours', fallback=0) * 3600
+        self.int_max_bytes = int(config.getfloat('market_cache', 'max_mb', fallback=10240) * 1024 * 1024)
+        self.lock = threading.Lock()
+        # 缓存目录总字节数，第一次写入时扫描得到
+        self.int_total_bytes = None
+        self.dict_stat = {'hit': 0, 'miss': 0, 'hit_bytes': 0, 'write_bytes': 0, 'evict': 0, 'hit_seconds': 0.0, 'miss_seconds': 0.0}
+
+    @classmethod
+    def configure(cls, str_mode: str):
+        """命令行指定模式（覆盖app.ini的[market_cache] mode）"""
+        cls._str_override = str_mode
+
+    @classmethod
+    def get_mode(cls) -> str:
+        """当前模式（命令行指定的优先，其次[market_cache] mode），用于replay时跳过QMT连接"""
+        if cls._str_override:
+            return cls._str_override
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        return config.get('market_cache', 'mode', fallback='off')
+
+    @staticmethod
+    def make_key(*args) -> str:
+        """参数序列化后的sha1作为键"""
+        return hashlib.sha1(json.dumps(args, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+    def _get_file_path(self, str_key: str, str_ext: str) -> str:
+        return os.path.join(self.str_path, str_key[:2], f"{str_key}.{str_ext}")
+
+    def _is_expired(self, float_created: float) -> bool:
+        """replay模式不检查过期"""
+        return self.str_mode == "record" and self.float_ttl > 0 and time.time() - float_created > self.float_ttl
+
+    @staticmethod
+    def _touch(str_file_path: str):
+        """更新修改时间，作为最近使用时间"""
+        try:
+            os.utime(str_file_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _list_column_to_pylist(arr: pa.ChunkedArray) -> list:
+        """arrow列表列 -> Python列表的列表（与QMT返回的一致），等长且无空值时整体reshape"""
+        arr = arr.combine_chunks()
+        if arr.null_count == 0 and len(arr) > 0:
+            arr_offset = arr.offsets.to_numpy()
+            int_width = int(arr_offset[1] - arr_offset[0])
+            if int_width > 0 and (arr_offset[-1] - arr_offset[0]) == int_width * len(arr) and bool((arr_offset[1:] - arr_offset[:-1] == int_width).all()):
+                arr_value = arr.values.slice(arr_offset[0], arr_offset[-1] - arr_offset[0]).to_numpy(zero_copy_only=False)
+                return arr_value.reshape(-1, int_width).tolist()
+        return arr.to_pylist()
+
+    def _read_frame(self, str_file_path: str):
+        """
+        读取缓存的DataFrame
+
+        Returns:
+            DataFrame，不存在或已过期时返回None
+        """
+        try:
+            table = feather.read_table(str_file_path, memory_map=False)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        dict_meta = json.loads(table.schema.metadata[b'market_cache'])
+        if self._is_expired(dict_meta['created']):
+            return None
+        list_list_column = [f.name for f in table.schema if pa.types.is_list(f.type) or pa.types.is_large_list(f.type)]
+        df = table.drop_columns(list_list_column).to_pandas()
+        for str_column in list_list_column:
+            df[str_column] = self._list_column_to_pylist(table.column(str_column))
+        df = df[dict_meta['columns']]
+        self._touch(str_file_path)
+        return df
+
+    def _write_file(self, str_file_path: str, func_write):
+        """先写临时文件再原子替换（中途崩溃不会留下不完整的缓存），并按大小上限清理"""
+        os.makedirs(os.path.dirname(str_file_path), exist_ok=True)
+        str_temp_path = f"{str_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        func_write(str_temp_path)
+        os.replace(str_temp_path, str_file_path)
+        int_bytes = os.path.getsize(str_file_path)
+        with self.lock:
+            self.dict_stat['write_bytes'] += int_bytes
+            if self.int_total_bytes is None:
+                self.int_total_bytes = self._scan()[1]
+            else:
+                self.int_total_bytes += int_bytes
+            if self.int_total_bytes > self.int_max_bytes:
+                self._evict()
+
+    def _write_frame(self, str_file_path: str, df: pd.DataFrame):
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b'market_cache': json.dumps({'created': time.time(), 'columns': list(df.columns)}).encode('utf-8')})
+        self._write_file(str_file_path, lambda str_temp_path: feather.write_feather(table, str_temp_path, compression='uncompressed'))
+
+    def _scan(self) -> tuple:
+        """
+        扫描缓存目录
+
+        Returns:
+            tuple: ([(修改时间, 字节数, 路径)], 总字节数)
+        """
+        list_file = []
+        if os.path.isdir(self.str_path):
+            for entry_dir in os.scandir(self.str_path):
+                if not entry_dir.is_dir():
+                    continue
+                for entry in os.scandir(entry_dir.path):
+                    if entry.name.endswith(('.arrow', '.pkl')):
+                        obj_stat = entry.stat()
+                        list_file.append((obj_stat.st_mtime, obj_stat.st_size, entry.path))
+        return list_file, sum(f[1] for f in list_file)
+
+    def _evict(self):
+        """删除最久未使用的文件直到总大小降到上限的90%（调用方持有锁）"""
+        list_file, self.int_total_bytes = self._scan()
+        for float_mtime, int_size, str_file_path in sorted(list_file):
+            if self.int_total_bytes <= self.int_max_bytes * 0.9:
+                break
+            try:
+                os.remove(str_file_path)
+            except OSError:
+                continue
+            self.int_total_bytes -= int_size
+            self.dict_stat['evict'] += 1
+
+    def _record(self, bool_hit: bool, float_seconds: float, int_bytes: int = 0):
+        with self.lock:
+            str_kind = 'hit' if bool_hit else 'miss'
+            self.dict_stat[str_kind] += 1
+            self.dict_stat[f'{str_kind}_seconds'] += float_seconds
+            self.dict_stat['hit_bytes'] += int_bytes
+
+    def get_market_data_ex(self, list_fields: list, list_code: list, period: str = '1d', start_time: str = '', end_time: str = '',
+                           count: int = -1, dividend_type: str = 'none', fill_data: bool = True, bool_fresh: bool = False) -> dict:
+        """
+        与xtdata.get_market_data_ex相同的参数和返回值（合约 -> DataFrame），按合约读写缓存，
+        未命中的合约合并为一次xtdata查询；bool_fresh时record模式不读缓存，查询结果覆盖缓存
+        """
+        if self.str_mode == "off":
+            return xtdata.get_market_data_ex(list_fields, list_code, period=period, start_time=start_time, end_time=end_time,
+                                             count=count, dividend_type=dividend_type, fill_data=fill_data)
+        dict_result = {}
+        dict_miss = {}
+        for str_code in list_code:
+            time_start = time.perf_counter()
+            str_file_path = self._get_file_path(self.make_key("get_market_data_ex", str_code, period, dividend_type, str(start_time),
+                                                              str(end_time), list(list_fields), count, fill_data), "arrow")
+            df = None if bool_fresh and self.str_mode == "record" else self._read_frame(str_file_path)
+            if df is None:
+                dict_miss[str_code] = str_file_path
+                continue
+            dict_result[str_code] = df
+            self._record(True, time.perf_counter() - time_start, os.path.getsize(str_file_path))
+        if not dict_miss:
+            return dict_result
+        if self.str_mode == "replay":
+            raise KeyError(f"回放缓存未命中: {', '.join(dict_miss)} {period} {dividend_type} {start_time}-{end_time}")
+        time_start = time.perf_counter()
+        dict_fetch = xtdata.get_market_data_ex(list_fields, list(dict_miss), period=period, start_time=start_time, end_time=end_time,
+                                               count=count, dividend_type=dividend_type, fill_data=fill_data)
+        float_fetch = (time.perf_counter() - time_start) / len(dict_miss)
+        for str_code, str_file_path in dict_miss.items():
+            df = dict_fetch.get(str_code)
+            if df is not None:
+                self._write_frame(str_file_path, df)
+                dict_result[str_code] = df
+            self._record(False, float_fetch)
+        return dict_result
+
+    def call(self, str_func: str, *args, bool_fresh: bool = False, **kwargs):
+        """
+        带缓存调用其他xtdata函数（get_trading_dates、get_divid_factors等结果较小的查询），结果存为pkl；
+        bool_fresh时record模式不读缓存，查询结果覆盖缓存
+        """
+        if self.str_mode == "off":
+            return getattr(xtdata, str_func)(*args, **kwargs)
+        time_start = time.perf_counter()
+        str_file_path = self._get_file_path(self.make_key(str_func, args, sorted(kwargs.items())), "pkl")
+        if not (bool_fresh and self.str_mode == "record"):
+            try:
+                with open(str_file_path, 'rb') as f:
+                    float_created, result = pickle.load(f)
+                if not self._is_expired(float_created):
+                    self._touch(str_file_path)
+                    self._record(True, time.perf_counter() - time_start, os.path.getsize(str_file_path))
+                    return result
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+        if self.str_mode == "replay":
+            raise KeyError(f"回放缓存未命中: {str_func}{args}")
+        result = getattr(xtdata, str_func)(*args, **kwargs)
+
+        def write(str_temp_path):
+            with open(str_temp_path, 'wb') as f:
+                pickle.dump((time.time(), result), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._write_file(str_file_path, write)
+        self._record(False, time.perf_counter() - time_start)
+        return result
+
+    def download_history_data(self, str_code: str, str_period: str, start_time: str = '', end_time: str = ''):
+        """回放模式不访问QMT，直接跳过下载"""
+        if self.str_mode == "replay":
+            return
+        xtdata.download_history_data(str_code, str_period, start_time=start_time, end_time=end_time)
+
+    def download_history_data2(self, list_code: list, str_period: str, start_time: str = '', end_time: str = '', callback=None):
+        """批量下载，回放模式不访问QMT，逐个合约回调完成后返回"""
+        if self.str_mode == "replay":
+            for int_idx, str_code in enumerate(list_code):
+                if callback is not None:
+                    callback({'finished': int_idx + 1, 'total': len(list_code), 'stockcode': str_code, 'message': ''})
+            return
+        xtdata.download_history_data2(list_code, str_period, start_time=start_time, end_time=end_time, callback=callback)
+
+    def resolve_run_end(self, dt_now: str) -> str:
+        """
+        本次运行的下载结束时间：record模式记录到缓存目录，replay模式读取录制时的值（与录制时的查询参数一致才能命中），
+        off模式直接返回dt_now
+
+        Args:
+            dt_now: 当前时间，YYYYMMDDHHMMSS
+        """
+        str_file_path = os.path.join(self.str_path, "run_end.pkl")
+        if self.str_mode == "replay":
+            try:
+                with open(str_file_path, 'rb') as f:
+                    return pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                raise KeyError(f"回放缓存未命中: 没有录制的运行结束时间 {str_file_path}")
+        if self.str_mode == "record":
+            os.makedirs(self.str_path, exist_ok=True)
+            str_temp_path = f"{str_file_path}.{os.getpid()}.tmp"
+            with open(str_temp_path, 'wb') as f:
+                pickle.dump(dt_now, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(str_temp_path, str_file_path)
+        return dt_now
+
+    def report(self, str_title: str = ""):
+        """打印本次的命中情况并清零统计"""
+        if self.str_mode == "off":
+            return
+        with self.lock:
+            dict_stat = dict(self.dict_stat)
+            for str_key in self.dict_stat:
+                self.dict_stat[str_key] = 0.0 if str_key.endswith('seconds') else 0
+        int_total = dict_stat['hit'] + dict_stat['miss']
+        if int_total == 0:
+            return
+        print(f"【行情缓存】{str_title}（{self.str_mode}）：命中 {dict_stat['hit']}/{int_total}，"
+              f"读取 {dict_stat['hit_bytes'] / 1024 / 1024:.1f}MB 耗时 {dict_stat['hit_seconds']:.2f}秒；"
+              f"未命中查询QMT耗时 {dict_stat['miss_seconds']:.2f}秒，写入 {dict_stat['write_bytes'] / 1024 / 1024:.1f}MB，"
+              f"清理 {dict_stat['evict']} 个文件")
@@ -0,0 +1,232 @@
+import configparser
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+class MemoryGovernor:
+    """
+    内存调控器
+
+    工作单元开始前按 已有文件字节数 + 预估新增字节数 估算其内存占用（乘以周期的内存膨胀系数和合并系数：
+    读取旧数据、新数据、合并结果和排序副本同时存在），并在运行时跟踪实际峰值：
+        - 准入：当前内存 + 其他运行中单元的预留 + 本单元估算 超过上限时，worker等待其他单元完成（降低并发），
+                至少允许一个单元运行
+        - 分批：估算超过单元预算（上限 x unit_budget_ratio）的保存单元改走按交易日窗口的流式保存路径，
+                流式保存的缓冲上限按当前剩余内存缩小
+        - 学习：单元完成后用实际峰值增量修正该周期的膨胀系数，供后续单元估算
+    实际内存默认取进程RSS（需要psutil，Linux下没有psutil时读取/proc），也可以改为tracemalloc（包含NumPy分配，开销较大）。
+    每个单元的峰值在运行汇总中报告。
+    """
+
+    # 内存中的字节数 / 文件字节数 的初始值：tick的五档列表列在内存中是大量Python对象
+    DICT_DEFAULT_INFLATE = {"tick": 3.0}
+    FLOAT_DEFAULT_INFLATE = 1.5
+    # 合并时同时存在的数据份数（旧数据、新数据、合并结果、排序去重副本）
+    FLOAT_MERGE_FACTOR = 3.0
+
+    def __init__(self):
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.bool_enable = config.getboolean('memory', 'enable', fallback=True)
+        self.str_source = config.get('memory', 'source', fallback='rss')
+        float_ceiling_mb = config.getfloat('memory', 'ceiling_mb', fallback=0)
+        if float_ceiling_mb > 0:
+            self.int_ceiling = int(float_ceiling_mb * 1024 * 1024)
+        else:
+            int_total = self.get_total_memory()
+            self.int_ceiling = None if int_total is None else int(int_total * config.getfloat('memory', 'auto_ceiling_ratio', fallback=0.7))
+        self.float_unit_budget_ratio = config.getfloat('memory', 'unit_budget_ratio', fallback=0.5)
+        self.float_interval = config.getfloat('memory', 'sample_interval_ms', fallback=50) / 1000
+        self.int_report_top_n = config.getint('memory', 'report_top_n', fallback=10)
+
+        self.condition = threading.Condition()
+        # 运行中的单元记录（id -> dict）
+        self.dict_running = {}
+        self.list_record = []
+        self.dict_inflate = dict(self.DICT_DEFAULT_INFLATE)
+        self.int_next_id = 0
+        self.thread_monitor = None
+        if self.bool_enable and self.str_source == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @staticmethod
+    def get_total_memory():
+        """物理内存总量（字节），无法获取时返回None"""
+        if psutil is not None:
+            return psutil.virtual_memory().total
+        try:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (AttributeError, ValueError, OSError):
+            return None
+
+    @staticmethod
+    def get_rss():
+        """当前进程的常驻内存（字节），无法获取时返回None"""
+        if psutil is not None:
+            return psutil.Process().memory_info().rss
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def measure(self):
+        """当前内存（字节）：rss为进程常驻内存；tracemalloc为上次测量以来的分配峰值（测量后重置峰值）"""
+        if self.str_source == "tracemalloc":
+            _, int_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            return int_peak
+        return self.get_rss()
+
+    def measure_current(self):
+        """当前内存（字节），不重置tracemalloc峰值"""
+        if self.str_source == "tracemalloc":
+            return tracemalloc.get_traced_memory()[0]
+        return self.get_rss()
+
+    @staticmethod
+    def estimate_row_bytes(df: pd.DataFrame, int_sample: int = 100) -> float:
+        """
+        按列类型估算每行在内存中的字节数：数值列取itemsize，object列（字符串、五档列表）抽样计算Python对象大小
+
+        Args:
+            df: 数据
+            int_sample: object列的抽样行数
+        """
+        if df is None or df.empty:
+            return 0.0
+        float_bytes = 0.0
+        for sr in [df[c] for c in df.columns] + [df.index.to_series()]:
+            if isinstance(sr.dtype, np.dtype) and sr.dtype != object:
+                float_bytes += sr.dtype.itemsize
+                continue
+            # 指针 + 对象本身（列表再加元素）
+            list_value = sr.iloc[np.linspace(0, len(sr) - 1, min(int_sample, len(sr))).astype(int)].tolist()
+            int_obj = sum(sys.getsizeof(x) + (sum(sys.getsizeof(v) for v in x) if isinstance(x, (list, tuple)) else 0) for x in list_value)
+            float_bytes += 8 + int_obj / max(len(list_value), 1)
+        return float_bytes
+
+    def estimate_unit(self, dict_unit: dict) -> float:
+        """估算保存单元的峰值内存（字节），下载单元数据写入QMT本地缓存，不计入"""
+        if dict_unit.get('stage') != "save":
+            return 0.0
+        float_file_bytes = dict_unit.get('existing_bytes', 0) + dict_unit.get('est_bytes', 0)
+        return float_file_bytes * self.dict_inflate.get(dict_unit['period'], self.FLOAT_DEFAULT_INFLATE) * self.FLOAT_MERGE_FACTOR
+
+    def get_unit_budget(self):
+        """单个单元一次性处理的内存预算（字节），没有上限时为None"""
+        return None if self.int_ceiling is None else self.int_ceiling * self.float_unit_budget_ratio
+
+    def should_stream(self, dict_unit: dict) -> bool:
+        """估算超过单元预算的单元改走流式保存"""
+        float_budget = self.get_unit_budget()
+        return self.bool_enable and float_budget is not None and self.estimate_unit(dict_unit) > float_budget
+
+    def get_flush_bytes(self, int_flush_bytes: int) -> int:
+        """流式保存的缓冲上限：不超过配置值，也不超过当前剩余内存的一半（至少16MB）"""
+        if not self.bool_enable or self.int_ceiling is None:
+            return int_flush_bytes
+        int_rss = self.get_rss()
+        if int_rss is None:
+            return int_flush_bytes
+        return int(min(int_flush_bytes, max((self.int_ceiling - int_rss) / 2, 16 * 1024 * 1024)))
+
+    def _monitor_loop(self):
+        """监控线程：定期测量内存，更新所有运行中单元的峰值"""
+        while True:
+            with self.condition:
+                if not self.dict_running:
+                    self.thread_monitor = None
+                    return
+            int_now = self.measure()
+            if int_now is not None:
+                with self.condition:
+                    for dict_record in self.dict_running.values():
+                        dict_record['peak'] = max(dict_record['peak'], int_now)
+            time.sleep(self.float_interval)
+
+    def _reserved(self) -> float:
+        """运行中单元尚未体现在当前内存中的预留（估算减去已观察到的增量）"""
+        return sum(max(r['estimate'] - (r['peak'] - r['start']), 0) for r in self.dict_running.values())
+
+    @contextmanager
+    def admit(self, dict_unit: dict):
+        """
+        包住一个工作单元：必要时等待内存，执行期间跟踪峰值，结束后记录并修正估算
+        """
+        if not self.bool_enable:
+            yield
+            return
+        float_estimate = self.estimate_unit(dict_unit)
+        float_wait = 0.0
+        with self.condition:
+            time_wait_start = time.time()
+            bool_printed = False
+            while self.int_ceiling is not None and self.dict_running:
+                int_rss = self.get_rss() or 0
+                if int_rss + self._reserved() + float_estimate <= self.int_ceiling:
+                    break
+                if not bool_printed:
+                    print(f"【内存】{dict_unit['InstrumentLongID']} {dict_unit['period']} 预估 {float_estimate / 1024 / 1024:.0f}MB，"
+                          f"当前 {int_rss / 1024 / 1024:.0f}MB，上限 {self.int_ceiling / 1024 / 1024:.0f}MB，等待其他单元完成")
+                    bool_printed = True
+                self.condition.wait(1.0)
+            float_wait = time.time() - time_wait_start
+            int_start = self.measure_current() or 0
+            int_id = self.int_next_id
+            self.int_next_id += 1
+            dict_record = {'InstrumentLongID': dict_unit['InstrumentLongID'], 'period': dict_unit['period'],
+                           'stage': dict_unit.get('stage'), 'estimate': float_estimate, 'start': int_start, 'peak': int_start,
+                           'wait': float_wait, 'concurrent': len(self.dict_running) + 1,
+                           'file_bytes': dict_unit.get('existing_bytes', 0) + dict_unit.get('est_bytes', 0)}
+            self.dict_running[int_id] = dict_record
+            if self.thread_monitor is None:
+                self.thread_monitor = threading.Thread(target=self._monitor_loop, name="MemoryGovernorMonitor", daemon=True)
+                self.thread_monitor.start()
+        try:
+            yield
+        finally:
+            int_end = self.measure()
+            with self.condition:
+                if int_end is not None:
+                    dict_record['peak'] = max(dict_record['peak'], int_end)
+                del self.dict_running[int_id]
+                self.list_record.append(dict_record)
+                self._learn(dict_record)
+                self.condition.notify_all()
+
+    def _learn(self, dict_record: dict):
+        """用实际峰值增量修正该周期的膨胀系数（只增大明显偏小的估算，指数平滑）"""
+        if dict_record['stage'] != "save" or dict_record['file_bytes'] <= 0:
+            return
+        float_observed = (dict_record['peak'] - dict_record['start']) / (dict_record['file_bytes'] * self.FLOAT_MERGE_FACTOR)
+        float_inflate = self.dict_inflate.get(dict_record['period'], self.FLOAT_DEFAULT_INFLATE)
+        if float_observed > float_inflate:
+            self.dict_inflate[dict_record['period']] = 0.7 * float_inflate + 0.3 * float_observed
+
+    def report(self, str_title: str):
+        """打印本阶段各单元的内存峰值汇总并清空记录"""
+        with self.condition:
+            list_record = self.list_record
+            self.list_record = []
+        if not list_record:
+            return
+        df = pd.DataFrame(list_record)
+        df['delta'] = (df['peak'] - df['start']).clip(lower=0)
+        str_ceiling = "无" if self.int_ceiling is None else f"{self.int_ceiling / 1024 / 1024:.0f}MB"
+        print(f"\n【内存】{str_title}：{len(df)} 个单元，进程峰值 {df['peak'].max() / 1024 / 1024:.0f}MB（上限 {str_ceiling}，"
+              f"来源 {self.str_source}），等待内存 {int((df['wait'] > 0.5).sum())} 次共 {df['wait'].sum():.1f}秒")
+        print(f"  {'合约':<16}{'周期':<6}{'预估':>10}{'峰值增量':>10}{'进程峰值':>10}{'并发':>6}")
+        for _, row in df.sort_values('delta', ascending=False).head(self.int_report_top_n).iterrows():
+            print(f"  {row['InstrumentLongID']:<16}{row['period']:<6}{row['estimate'] / 1024 / 1024:>8.0f}MB"
+                  f"{row['delta'] / 1024 / 1024:>8.0f}MB{row['peak'] / 1024 / 1024:>8.0f}MB{row['concurrent']:>6}")
@@ -1,3 +1,4 @@
+import uuid
 import pandas as pd
 from connect.MysqlConnect import MysqlConnect
 
@@ -183,6 +184,94 @@ class MysqlOperator:
             print(f"更新/插入期货合约详情失败: {str(e)}")
             return False
 
+    def init_instrument_hash(self) -> bool:
+        """
+        初始化合约内容哈希表（不存在则创建），用于判断D_base_code中哪些合约需要整行更新
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            create_query = """
+                CREATE TABLE IF NOT EXISTS D_base_code_hash (
+                    InstrumentID VARCHAR(32) NOT NULL,
+                    InstrumentCategory VARCHAR(16),
+                    ContentHash CHAR(32),
+                    PRIMARY KEY (InstrumentID)
+                )
+            """
+            return self.mysql_connect.execute(create_query)
+        except Exception as e:
+            print(f"初始化合约哈希表失败: {str(e)}")
+            return False
+
+    def get_instrument_hash(self, instrument_category: str) -> pd.DataFrame:
+        """
+        获取某一品种类别全部合约的内容哈希
+
+        Args:
+            instrument_category: 品种类型，"FUTURE"或"STOCK"
+
+        Returns:
+            pd.DataFrame: 列为InstrumentID, ContentHash
+        """
+        query = """
+            SELECT InstrumentID, ContentHash
+            FROM D_base_code_hash
+            WHERE InstrumentCategory = %s
+        """
+        return self.mysql_connect.query(query, (instrument_category,))
+
+    def upsert_instrument_hash(self, df: pd.DataFrame, instrument_category: str) -> bool:
+        """
+        批量更新或插入合约内容哈希
+
+        Args:
+            df: 包含InstrumentID和ContentHash列的DataFrame
+            instrument_category: 品种类型，"FUTURE"或"STOCK"
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT INTO D_base_code_hash (InstrumentID, InstrumentCategory, ContentHash)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                InstrumentCategory = VALUES(InstrumentCategory),
+                ContentHash = VALUES(ContentHash)
+        """
+        list_values = [(str_id, instrument_category, str_hash) for str_id, str_hash in zip(df['InstrumentID'], df['ContentHash'])]
+        return self.mysql_connect.executemany(query, list_values)
+
+    def update_instrument_volatile(self, df: pd.DataFrame) -> bool:
+        """
+        批量刷新D_base_code中的易变字段（前收盘、前结算、涨跌停价、昨日持仓量），一次提交
+
+        Args:
+            df: 包含InstrumentID, PreClose, SettlementPrice, UpStopPrice, DownStopPrice, LastVolume列的DataFrame
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            UPDATE D_base_code SET
+                PreClose = %s,
+                SettlementPrice = %s,
+                UpStopPrice = %s,
+                DownStopPrice = %s,
+                LastVolume = %s
+            WHERE InstrumentID = %s
+        """
+        list_values = [
+            (float(pre_close), float(settlement), float(up_stop), float(down_stop), int(last_volume), str_id)
+            for pre_close, settlement, up_stop, down_stop, last_volume, str_id in zip(
+                df['PreClose'], df['SettlementPrice'], df['UpStopPrice'], df['DownStopPrice'], df['LastVolume'], df['InstrumentID'])
+        ]
+        if self.mysql_connect.executemany(query, list_values):
+            print(f"易变字段刷新完成，共 {len(list_values)} 个合约")
+            return True
+        return False
+
     def init_save_log(self, df_future_detail: pd.DataFrame, str_instrument_category: str = "FUTURE") -> pd.DataFrame:
         """
         根据期货合约详细信息创建并保存日志到数据库
@@ -455,6 +544,607 @@ class MysqlOperator:
             print(f"初始化交易所数据失败: {str(e)}")
             return False
 
+    def init_stock_shard_log(self) -> bool:
+        """
+        初始化股票分片运行日志表和复权锚点表（不存在则创建）
+
+        log_stock_shard 记录每个分片（交易所-板块）上次运行的耗时与结束时间，用于轮转和预估耗时；
+        log_stock_divid_anchor 记录每只股票在锚点日的等比前复权收盘价，用于批量检测除权除息。
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            create_shard_query = """
+                CREATE TABLE IF NOT EXISTS log_stock_shard (
+                    ShardID VARCHAR(32) NOT NULL,
+                    CodeCount INT,
+                    LastElapsed DOUBLE,
+                    LastRunEnd VARCHAR(14),
+                    PRIMARY KEY (ShardID)
+                )
+            """
+            create_anchor_query = """
+                CREATE TABLE IF NOT EXISTS log_stock_divid_anchor (
+                    InstrumentLongID VARCHAR(32) NOT NULL,
+                    AnchorDate VARCHAR(8),
+                    AnchorClose DOUBLE,
+                    PRIMARY KEY (InstrumentLongID)
+                )
+            """
+            return self.mysql_connect.execute(create_shard_query) and self.mysql_connect.execute(create_anchor_query)
+        except Exception as e:
+            print(f"初始化股票分片日志表失败: {str(e)}")
+            return False
+
+    def get_stock_shard_log(self) -> pd.DataFrame:
+        """
+        获取所有分片的运行日志
+
+        Returns:
+            pd.DataFrame: 分片运行日志，列为ShardID, CodeCount, LastElapsed, LastRunEnd
+        """
+        query = """
+            SELECT ShardID, CodeCount, LastElapsed, LastRunEnd
+            FROM log_stock_shard
+        """
+        return self.mysql_connect.query(query)
+
+    def update_stock_shard_log(self, str_shard_id: str, int_code_count: int, float_elapsed: float, str_run_end: str) -> bool:
+        """
+        更新或插入分片运行日志
+
+        Args:
+            str_shard_id: 分片ID，如"SH-主板"
+            int_code_count: 分片内股票数量
+            float_elapsed: 本次运行耗时（秒）
+            str_run_end: 本次运行结束时间，格式YYYYMMDDHHMMSS
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT INTO log_stock_shard (ShardID, CodeCount, LastElapsed, LastRunEnd)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                CodeCount = VALUES(CodeCount),
+                LastElapsed = VALUES(LastElapsed),
+                LastRunEnd = VALUES(LastRunEnd)
+        """
+        return self.mysql_connect.execute(query, (str_shard_id, int_code_count, float_elapsed, str_run_end))
+
+    def get_divid_anchor(self, list_instrument_long_id: list) -> pd.DataFrame:
+        """
+        一次查询获取一批股票的复权锚点
+
+        Args:
+            list_instrument_long_id: 股票长代码列表
+
+        Returns:
+            pd.DataFrame: 列为InstrumentLongID, AnchorDate, AnchorClose
+        """
+        if not list_instrument_long_id:
+            return pd.DataFrame(columns=['InstrumentLongID', 'AnchorDate', 'AnchorClose'])
+        str_placeholders = ", ".join(["%s"] * len(list_instrument_long_id))
+        query = f"""
+            SELECT InstrumentLongID, AnchorDate, AnchorClose
+            FROM log_stock_divid_anchor
+            WHERE InstrumentLongID IN ({str_placeholders})
+        """
+        return self.mysql_connect.query(query, tuple(list_instrument_long_id))
+
+    def upsert_divid_anchor(self, list_anchor: list) -> bool:
+        """
+        批量更新或插入复权锚点
+
+        Args:
+            list_anchor: 元素为(InstrumentLongID, AnchorDate, AnchorClose)的列表
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT INTO log_stock_divid_anchor (InstrumentLongID, AnchorDate, AnchorClose)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                AnchorDate = VALUES(AnchorDate),
+                AnchorClose = VALUES(AnchorClose)
+        """
+        return self.mysql_connect.executemany(query, list_anchor)
+
+    def init_plan_cost(self) -> bool:
+        """
+        初始化工作单元历史成本表（不存在则创建），供WorkPlanner估算每个单元的字节数和耗时
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            create_query = """
+                CREATE TABLE IF NOT EXISTS log_plan_cost (
+                    InstrumentLongID VARCHAR(32) NOT NULL,
+                    Period VARCHAR(8) NOT NULL,
+                    Stage VARCHAR(16) NOT NULL,
+                    BytesPerDay DOUBLE,
+                    SecondsPerDay DOUBLE,
+                    PRIMARY KEY (InstrumentLongID, Period, Stage)
+                )
+            """
+            return self.mysql_connect.execute(create_query)
+        except Exception as e:
+            print(f"初始化工作单元成本表失败: {str(e)}")
+            return False
+
+    def get_plan_cost(self) -> pd.DataFrame:
+        """
+        获取全部工作单元的历史成本
+
+        Returns:
+            pd.DataFrame: 列为InstrumentLongID, Period, Stage, BytesPerDay, SecondsPerDay
+        """
+        query = """
+            SELECT InstrumentLongID, Period, Stage, BytesPerDay, SecondsPerDay
+            FROM log_plan_cost
+        """
+        return self.mysql_connect.query(query)
+
+    def upsert_plan_cost(self, list_cost: list) -> bool:
+        """
+        批量更新或插入工作单元历史成本
+
+        Args:
+            list_cost: 元素为(InstrumentLongID, Period, Stage, BytesPerDay, SecondsPerDay)的列表
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT INTO log_plan_cost (InstrumentLongID, Period, Stage, BytesPerDay, SecondsPerDay)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                BytesPerDay = VALUES(BytesPerDay),
+                SecondsPerDay = VALUES(SecondsPerDay)
+        """
+        return self.mysql_connect.executemany(query, list_cost)
+
+
+    def init_job_lease(self) -> bool:
+        """
+        初始化分布式工作单元表（不存在则创建）：
+            log_job_lease: 每行一个 (合约, 周期, 时间范围) 工作单元，worker按租约领取，记录心跳、租约到期时间、重试次数和结果
+            log_job_worker: 每个worker的心跳和吞吐量统计
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            create_job_query = """
+                CREATE TABLE IF NOT EXISTS log_job_lease (
+                    JobID BIGINT NOT NULL AUTO_INCREMENT,
+                    BatchID VARCHAR(64) NOT NULL,
+                    InstrumentCategory VARCHAR(16) NOT NULL,
+                    InstrumentLongID VARCHAR(32) NOT NULL,
+                    Period VARCHAR(8) NOT NULL,
+                    BeginDatetime VARCHAR(25),
+                    EndDatetime VARCHAR(25),
+                    EstSeconds DOUBLE,
+                    EstBytes DOUBLE,
+                    Status VARCHAR(16) NOT NULL DEFAULT 'pending',
+                    WorkerID VARCHAR(64),
+                    ClaimToken VARCHAR(64),
+                    Attempts INT NOT NULL DEFAULT 0,
+                    ClaimTime DATETIME,
+                    Heartbeat DATETIME,
+                    LeaseExpire DATETIME,
+                    FinishTime DATETIME,
+                    ElapsedSeconds DOUBLE,
+                    ResultBytes BIGINT,
+                    LastError VARCHAR(512),
+                    CreateTime DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (JobID),
+                    UNIQUE KEY uk_job_unit (BatchID, InstrumentLongID, Period),
+                    KEY idx_job_claim (Status, LeaseExpire),
+                    KEY idx_job_token (ClaimToken)
+                )
+            """
+            create_worker_query = """
+                CREATE TABLE IF NOT EXISTS log_job_worker (
+                    WorkerID VARCHAR(64) NOT NULL,
+                    Hostname VARCHAR(64),
+                    BatchID VARCHAR(64),
+                    StartTime DATETIME,
+                    Heartbeat DATETIME,
+                    UnitsDone INT NOT NULL DEFAULT 0,
+                    UnitsFailed INT NOT NULL DEFAULT 0,
+                    ResultBytes BIGINT NOT NULL DEFAULT 0,
+                    BusySeconds DOUBLE NOT NULL DEFAULT 0,
+                    PRIMARY KEY (WorkerID)
+                )
+            """
+            return self.mysql_connect.execute(create_job_query) and self.mysql_connect.execute(create_worker_query)
+        except Exception as e:
+            print(f"初始化分布式工作单元表失败: {str(e)}")
+            return False
+
+    def publish_jobs(self, list_job: list) -> bool:
+        """
+        批量发布工作单元，同一批次中已存在的 (合约, 周期) 忽略（重复发布不会产生重复单元）
+
+        Args:
+            list_job: 元素为(BatchID, InstrumentCategory, InstrumentLongID, Period, BeginDatetime, EndDatetime, EstSeconds, EstBytes)的列表
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT IGNORE INTO log_job_lease (BatchID, InstrumentCategory, InstrumentLongID, Period,
+                                              BeginDatetime, EndDatetime, EstSeconds, EstBytes)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        return self.mysql_connect.executemany(query, list_job)
+
+    def claim_jobs(self, str_worker_id: str, int_limit: int, float_lease_seconds: float, int_max_attempts: int,
+                   str_batch_id: str = None, str_method: str = "skip_locked") -> pd.DataFrame:
+        """
+        领取工作单元：待处理的单元，以及租约已过期（worker失联）且未超过重试次数的单元，按预估耗时降序
+
+        时间一律使用数据库的NOW()，各机器的时钟偏差不影响租约。
+        str_method:
+            skip_locked: SELECT ... FOR UPDATE SKIP LOCKED（MySQL 8.0+/MariaDB 10.6+），并发的worker跳过彼此锁定的行，互不等待
+            update: UPDATE ... ORDER BY ... LIMIT 写入本次领取的令牌后按令牌查询（兼容旧版本，并发领取时互相等待行锁）
+
+        Args:
+            str_worker_id: worker标识
+            int_limit: 最多领取的单元数
+            float_lease_seconds: 租约时长（秒）
+            int_max_attempts: 最多尝试次数，租约过期且已达到次数的单元标记为failed
+            str_batch_id: 只领取该批次，None为任意批次
+            str_method: 领取方式
+
+        Returns:
+            pd.DataFrame: 领取到的单元（log_job_lease的行），没有时为空
+        """
+        str_batch_filter = "" if str_batch_id is None else " AND BatchID = %s"
+        tuple_batch = () if str_batch_id is None else (str_batch_id,)
+        str_claimable = f"""
+            (Status = 'pending' OR (Status = 'running' AND LeaseExpire < NOW()))
+            AND Attempts < %s{str_batch_filter}
+        """
+        str_set = """
+            Status = 'running', WorkerID = %s, ClaimToken = %s, Attempts = Attempts + 1,
+            ClaimTime = NOW(), Heartbeat = NOW(), LeaseExpire = DATE_ADD(NOW(), INTERVAL %s SECOND)
+        """
+        str_token = uuid.uuid4().hex
+        with self.mysql_connect.transaction() as cursor:
+            # 租约过期且重试次数已用完的单元不再领取
+            cursor.execute(f"""
+                UPDATE log_job_lease
+                SET Status = 'failed', LastError = '租约过期且已达到最多尝试次数'
+                WHERE Status = 'running' AND LeaseExpire < NOW() AND Attempts >= %s{str_batch_filter}
+            """, (int_max_attempts,) + tuple_batch)
+            if str_method == "skip_locked":
+                cursor.execute(f"""
+                    SELECT JobID FROM log_job_lease
+                    WHERE {str_claimable}
+                    ORDER BY EstSeconds DESC
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                """, (int_max_attempts,) + tuple_batch + (int_limit,))
+                list_job_id = [r[0] for r in cursor.fetchall()]
+                if list_job_id:
+                    cursor.execute(f"""
+                        UPDATE log_job_lease SET {str_set}
+                        WHERE JobID IN ({', '.join(['%s'] * len(list_job_id))})
+                    """, (str_worker_id, str_token, int(float_lease_seconds)) + tuple(list_job_id))
+            else:
+                cursor.execute(f"""
+                    UPDATE log_job_lease SET {str_set}
+                    WHERE {str_claimable}
+                    ORDER BY EstSeconds DESC
+                    LIMIT %s
+                """, (str_worker_id, str_token, int(float_lease_seconds), int_max_attempts) + tuple_batch + (int_limit,))
+            cursor.execute("SELECT * FROM log_job_lease WHERE ClaimToken = %s ORDER BY EstSeconds DESC", (str_token,))
+            list_column = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=list_column)
+
+    def renew_job_lease(self, str_worker_id: str, list_job_id: list, float_lease_seconds: float) -> bool:
+        """
+        心跳：延长本worker正在处理的单元的租约
+
+        Args:
+            str_worker_id: worker标识（租约已被其他worker接管的单元不会被延长）
+            list_job_id: 正在处理的单元
+            float_lease_seconds: 租约时长（秒）
+        """
+        if not list_job_id:
+            return True
+        query = f"""
+            UPDATE log_job_lease
+            SET Heartbeat = NOW(), LeaseExpire = DATE_ADD(NOW(), INTERVAL %s SECOND)
+            WHERE WorkerID = %s AND Status = 'running' AND JobID IN ({', '.join(['%s'] * len(list_job_id))})
+        """
+        return self.mysql_connect.execute(query, (int(float_lease_seconds), str_worker_id) + tuple(list_job_id))
+
+    def hold_job_lease(self, int_job_id: int, str_worker_id: str, str_claim_token: str, float_lease_seconds: float) -> bool:
+        """
+        确认本worker仍持有单元（同一次领取的令牌）并延长其租约，用于写入数据之前
+
+        Returns:
+            bool: 仍持有并已延长返回True；租约已被其他worker接管或数据库不可用时返回False
+        """
+        query = """
+            UPDATE log_job_lease
+            SET Heartbeat = NOW(), LeaseExpire = DATE_ADD(NOW(), INTERVAL %s SECOND)
+            WHERE JobID = %s AND WorkerID = %s AND ClaimToken = %s AND Status = 'running'
+        """
+        try:
+            with self.mysql_connect.transaction() as cursor:
+                cursor.execute(query, (int(float_lease_seconds), int_job_id, str_worker_id, str_claim_token))
+                return cursor.rowcount == 1
+        except Exception as e:
+            print(f"确认工作单元{int_job_id}的租约失败: {str(e)}")
+            return False
+
+    def finish_job(self, int_job_id: int, str_worker_id: str, bool_success: bool, float_elapsed: float,
+                   int_bytes: int = 0, str_error: str = None, int_max_attempts: int = 3) -> bool:
+        """
+        记录单元结果：成功为done；失败时未达到最多尝试次数的回到pending等待重新领取，否则为failed
+
+        Returns:
+            bool: 本worker仍持有该单元并已更新返回True；租约已过期并被其他worker接管时返回False
+        """
+        if bool_success:
+            query = """
+                UPDATE log_job_lease
+                SET Status = 'done', FinishTime = NOW(), ElapsedSeconds = %s, ResultBytes = %s, LeaseExpire = NULL
+                WHERE JobID = %s AND WorkerID = %s AND Status = 'running'
+            """
+            params = (float_elapsed, int_bytes, int_job_id, str_worker_id)
+        else:
+            query = """
+                UPDATE log_job_lease
+                SET Status = IF(Attempts >= %s, 'failed', 'pending'), FinishTime = NOW(), ElapsedSeconds = %s,
+                    LastError = %s, LeaseExpire = NULL
+                WHERE JobID = %s AND WorkerID = %s AND Status = 'running'
+            """
+            params = (int_max_attempts, float_elapsed, (str_error or '')[:512], int_job_id, str_worker_id)
+        try:
+            with self.mysql_connect.transaction() as cursor:
+                cursor.execute(query, params)
+                return cursor.rowcount == 1
+        except Exception as e:
+            print(f"更新工作单元{int_job_id}结果失败: {str(e)}")
+            return False
+
+    def get_job_lease(self, str_batch_id: str) -> pd.DataFrame:
+        """
+        获取一个批次的全部工作单元（读取最新提交的数据，用于轮询进度）
+
+        Returns:
+            pd.DataFrame: log_job_lease的行
+        """
+        with self.mysql_connect.transaction() as cursor:
+            cursor.execute("SELECT * FROM log_job_lease WHERE BatchID = %s", (str_batch_id,))
+            list_column = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=list_column)
+
+    def upsert_job_worker(self, str_worker_id: str, str_hostname: str, str_batch_id: str, int_done: int, int_failed: int,
+                          int_bytes: int, float_busy_seconds: float) -> bool:
+        """
+        更新worker的心跳和累计吞吐量（StartTime只在第一次插入时写入）
+        """
+        query = """
+            INSERT INTO log_job_worker (WorkerID, Hostname, BatchID, StartTime, Heartbeat, UnitsDone, UnitsFailed, ResultBytes, BusySeconds)
+            VALUES (%s, %s, %s, NOW(), NOW(), %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                Hostname = VALUES(Hostname),
+                BatchID = VALUES(BatchID),
+                Heartbeat = NOW(),
+                UnitsDone = VALUES(UnitsDone),
+                UnitsFailed = VALUES(UnitsFailed),
+                ResultBytes = VALUES(ResultBytes),
+                BusySeconds = VALUES(BusySeconds)
+        """
+        return self.mysql_connect.execute(query, (str_worker_id, str_hostname, str_batch_id, int_done, int_failed,
+                                                  int_bytes, float_busy_seconds))
+
+    def get_job_worker_stats(self, str_batch_id: str) -> pd.DataFrame:
+        """
+        按worker汇总一个批次的吞吐量：完成/失败单元数、写入字节数、处理耗时、领取到完成的时间跨度，以及最近心跳
+
+        Returns:
+            pd.DataFrame: 列为WorkerID, Hostname, Heartbeat, UnitsDone, UnitsFailed, ResultBytes, BusySeconds, SpanSeconds
+        """
+        query = """
+            SELECT j.WorkerID, w.Hostname, w.Heartbeat,
+                   SUM(j.Status = 'done') AS UnitsDone,
+                   SUM(j.Status = 'failed') AS UnitsFailed,
+                   COALESCE(SUM(j.ResultBytes), 0) AS ResultBytes,
+                   COALESCE(SUM(j.ElapsedSeconds), 0) AS BusySeconds,
+                   TIMESTAMPDIFF(SECOND, MIN(j.ClaimTime), MAX(j.FinishTime)) AS SpanSeconds
+            FROM log_job_lease j
+            LEFT JOIN log_job_worker w ON w.WorkerID = j.WorkerID
+            WHERE j.BatchID = %s AND j.WorkerID IS NOT NULL
+            GROUP BY j.WorkerID, w.Hostname, w.Heartbeat
+            ORDER BY j.WorkerID
+        """
+        with self.mysql_connect.transaction() as cursor:
+            cursor.execute(query, (str_batch_id,))
+            list_column = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=list_column)
+
+    def get_open_job_batch(self) -> str:
+        """
+        最近一个仍有待处理或处理中单元的批次，没有时返回None
+        """
+        with self.mysql_connect.transaction() as cursor:
+            cursor.execute("""
+                SELECT BatchID FROM log_job_lease
+                WHERE Status IN ('pending', 'running')
+                ORDER BY CreateTime DESC, JobID DESC
+                LIMIT 1
+            """)
+            list_row = cursor.fetchall()
+            return list_row[0][0] if list_row else None
+
+    def init_run_history(self) -> bool:
+        """
+        初始化运行历史表（不存在则创建）：每次运行一行run记录，另有各阶段的stage记录和各工作单元的unit记录
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            create_query = """
+                CREATE TABLE IF NOT EXISTS run_history (
+                    ID BIGINT NOT NULL AUTO_INCREMENT,
+                    RunID VARCHAR(64) NOT NULL,
+                    RecordType VARCHAR(8) NOT NULL,
+                    Stage VARCHAR(32),
+                    InstrumentLongID VARCHAR(32),
+                    Period VARCHAR(8),
+                    StartTime DATETIME(3) NOT NULL,
+                    Seconds DOUBLE,
+                    UnitCount INT,
+                    RowCount BIGINT,
+                    ByteCount BIGINT,
+                    ErrorCount INT,
+                    Host VARCHAR(64),
+                    Detail TEXT,
+                    PRIMARY KEY (ID),
+                    KEY idx_run (RunID),
+                    KEY idx_type_time (RecordType, StartTime)
+                )
+            """
+            return self.mysql_connect.execute(create_query)
+        except Exception as e:
+            print(f"初始化运行历史表失败: {str(e)}")
+            return False
+
+    def insert_run_history(self, list_record: list, int_batch_rows: int = 5000) -> bool:
+        """
+        批量写入运行历史
+
+        Args:
+            list_record: 元素为(RunID, RecordType, Stage, InstrumentLongID, Period, StartTime, Seconds,
+                         UnitCount, RowCount, ByteCount, ErrorCount, Host, Detail)的列表
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT INTO run_history (RunID, RecordType, Stage, InstrumentLongID, Period, StartTime, Seconds,
+                                     UnitCount, RowCount, ByteCount, ErrorCount, Host, Detail)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        bool_success = True
+        for int_start in range(0, len(list_record), int_batch_rows):
+            bool_success = self.mysql_connect.executemany(query, list_record[int_start:int_start + int_batch_rows]) and bool_success
+        return bool_success
+
+    def get_run_history(self, int_runs: int) -> pd.DataFrame:
+        """
+        获取最近int_runs次运行的全部记录
+
+        Returns:
+            pd.DataFrame: run_history的行，附加RunStartTime（所属运行的开始时间）
+        """
+        query = """
+            SELECT h.*, r.StartTime AS RunStartTime
+            FROM run_history h
+            JOIN (
+                SELECT RunID, StartTime FROM run_history
+                WHERE RecordType = 'run'
+                ORDER BY StartTime DESC
+                LIMIT %s
+            ) r ON r.RunID = h.RunID
+        """
+        return self.mysql_connect.query(query, (int(int_runs),))
+
+    def init_gap_repair(self) -> bool:
+        """
+        初始化缺口修补记录表（不存在则创建），每个 (合约, 周期, 缺口交易日范围) 一行
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            create_query = """
+                CREATE TABLE IF NOT EXISTS log_gap_repair (
+                    InstrumentLongID VARCHAR(32) NOT NULL,
+                    Period VARCHAR(8) NOT NULL,
+                    TradeDateBegin DATE NOT NULL,
+                    TradeDateEnd DATE NOT NULL,
+                    Kind VARCHAR(8),
+                    StartTime VARCHAR(14),
+                    EndTime VARCHAR(14),
+                    OldRows INT,
+                    NewRows INT,
+                    Status VARCHAR(8),
+                    RepairTime DATETIME,
+                    PRIMARY KEY (InstrumentLongID, Period, TradeDateBegin, TradeDateEnd)
+                )
+            """
+            return self.mysql_connect.execute(create_query)
+        except Exception as e:
+            print(f"初始化缺口修补记录表失败: {str(e)}")
+            return False
+
+    def get_gap_repair_empty(self, list_instrument_long_id: list, int_retry_days: int = 0) -> pd.DataFrame:
+        """
+        获取已确认QMT也没有数据的缺口
+
+        Args:
+            list_instrument_long_id: 合约长代码列表
+            int_retry_days: 只返回最近int_retry_days天内确认的记录（更早的重新检查），0表示不限
+
+        Returns:
+            pd.DataFrame: 列为InstrumentLongID, Period, TradeDateBegin, TradeDateEnd（YYYYMMDD字符串）
+        """
+        list_column = ['InstrumentLongID', 'Period', 'TradeDateBegin', 'TradeDateEnd']
+        if not list_instrument_long_id:
+            return pd.DataFrame(columns=list_column)
+        query = f"""
+            SELECT InstrumentLongID, Period,
+                   DATE_FORMAT(TradeDateBegin, '%%Y%%m%%d') AS TradeDateBegin,
+                   DATE_FORMAT(TradeDateEnd, '%%Y%%m%%d') AS TradeDateEnd
+            FROM log_gap_repair
+            WHERE Status = 'empty' AND InstrumentLongID IN ({', '.join(['%s'] * len(list_instrument_long_id))})
+        """
+        tuple_param = tuple(list_instrument_long_id)
+        if int_retry_days > 0:
+            query += " AND RepairTime >= NOW() - INTERVAL %s DAY"
+            tuple_param += (int(int_retry_days),)
+        df_result = self.mysql_connect.query(query, tuple_param)
+        return df_result if not df_result.empty else pd.DataFrame(columns=list_column)
+
+    def upsert_gap_repair(self, list_record: list) -> bool:
+        """
+        批量写入缺口修补结果
+
+        Args:
+            list_record: 元素为(InstrumentLongID, Period, TradeDateBegin, TradeDateEnd, Kind, StartTime, EndTime,
+                         OldRows, NewRows, Status)的列表，日期为YYYYMMDD字符串
+
+        Returns:
+            bool: 操作是否成功
+        """
+        query = """
+            INSERT INTO log_gap_repair (InstrumentLongID, Period, TradeDateBegin, TradeDateEnd, Kind, StartTime, EndTime,
+                                        OldRows, NewRows, Status, RepairTime)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE
+                Kind = VALUES(Kind),
+                StartTime = VALUES(StartTime),
+                EndTime = VALUES(EndTime),
+                OldRows = VALUES(OldRows),
+                NewRows = VALUES(NewRows),
+                Status = VALUES(Status),
+                RepairTime = NOW()
+        """
+        return self.mysql_connect.executemany(query, list_record)
+
+
 # 示例使用
 # if __name__ == "__main__":
 #     # 创建数据库连接
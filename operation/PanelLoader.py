@@ -0,0 +1,200 @@
+import configparser
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from operation.BarCatalog import BarCatalog
+from utility import utility
+
+class PanelLoader:
+    """
+    截面面板加载器
+
+    一次加载多个合约同一周期的若干字段，对齐到同一时间轴，返回二维NumPy矩阵（行为时间，列为合约）。
+    文件位置从本地文件目录（catalog）查询，目录中没有的合约再按log_save的合约信息拼出路径；
+    各文件并行读取，时间轴由各合约已排序的时间序列两两归并（k路归并，log k轮）得到，不做反复的DataFrame join。
+    """
+
+    # 同一合约有多种格式时的读取优先级：arrow可以内存映射，i64.pkl不需要解析字符串索引
+    LIST_FORMAT_PRIORITY = ["feather", "pickle_i64", "pickle", "parquet"]
+
+    def __init__(self, mysql_operator=None):
+        """
+        初始化加载器
+
+        Args:
+            mysql_operator: 可选，MySQL操作器，按品种类型加载或目录中没有记录时从log_save获取合约信息
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.int_workers = config.getint('panel', 'workers', fallback=8)
+        self.dict_data_path = {
+            "FUTURE": config.get('path', 'future_data_path'),
+            "STOCK": config.get('path', 'stock_data_path'),
+        }
+        self.mysql_operator = mysql_operator
+        self.catalog = BarCatalog()
+
+    @staticmethod
+    def _to_ms(dt_value):
+        """14位时间字符串 -> 毫秒时间戳（东八区），None保持None"""
+        if dt_value is None:
+            return None
+        return int(pd.Timestamp(datetime.strptime(str(dt_value)[:14], '%Y%m%d%H%M%S')).value // 1000000) - utility.INT_CN_OFFSET_MS
+
+    def get_instrument_ids(self, str_instrument_category: str) -> list:
+        """从log_save获取某品种类型的全部合约"""
+        df_log_save = self.mysql_operator.get_all_log_save(str_instrument_category)
+        return [] if df_log_save.empty else df_log_save['InstrumentLongID'].tolist()
+
+    def resolve_files(self, list_instrument_long_id: list, str_period: str, str_dividend_type: str = "none") -> dict:
+        """
+        查找各合约的文件
+
+        Returns:
+            dict: 合约长代码 -> (逻辑文件路径, 格式)，找不到文件的合约不包含在内
+        """
+        dict_file = {}
+        df_catalog = self.catalog.query(str_period=str_period, str_dividend_type=str_dividend_type)
+        if not df_catalog.empty:
+            df_catalog = df_catalog[df_catalog['InstrumentLongID'].isin(list_instrument_long_id)].copy()
+            df_catalog['priority'] = df_catalog['Format'].map({f: i for i, f in enumerate(self.LIST_FORMAT_PRIORITY)}).fillna(99)
+            for _, row in df_catalog.sort_values('priority').drop_duplicates('InstrumentLongID').iterrows():
+                dict_file[row['InstrumentLongID']] = (row['Path'], row['Format'])
+
+        # 目录中没有记录的合约按log_save拼出pkl路径
+        list_missing = [s for s in list_instrument_long_id if s not in dict_file]
+        if list_missing and self.mysql_operator is not None:
+            df_log_save = self.mysql_operator.get_all_log_save()
+            for _, row in df_log_save[df_log_save['InstrumentLongID'].isin(list_missing)].iterrows():
+                str_data_path = self.dict_data_path.get(row['InstrumentCategory'])
+                if str_data_path is None:
+                    continue
+                str_file_path = utility.get_bar_file_path(str_data_path, row, str_period, str_dividend_type)
+                if utility.file_exists(str_file_path):
+                    dict_file[row['InstrumentLongID']] = (str_file_path, "pickle")
+        return dict_file
+
+    @staticmethod
+    def _read_one(str_file_path: str, str_format: str, list_field: list, int_begin_ms, int_end_ms) -> tuple:
+        """
+        读取单个文件的时间和字段，截取时间范围
+
+        Returns:
+            tuple: (升序且不重复的int64毫秒时间, {字段: float64数组})
+        """
+        if str_format == "feather":
+            table = utility.read_feather_mmap(str_file_path)
+            list_column = [c for c in ['time'] + list_field if c in table.column_names]
+            dict_array = utility.feather_to_numpy(table, list_column)
+            arr_time = dict_array['time'].astype('int64', copy=False)
+        else:
+            str_read_path = utility.resolve_read_path(str_file_path)
+            df = pd.read_parquet(str_read_path) if str_format == "parquet" else pd.read_pickle(str_read_path)
+            arr_time = utility.index_to_epoch_ms(df)
+            dict_array = {c: df[c].to_numpy() for c in list_field if c in df.columns}
+
+        # 文件按时间写入，通常已排序；旧格式的字符串索引可能乱序，此时稳定排序并去重（保留最后一条）
+        arr_order = None
+        if len(arr_time) > 1 and not bool(np.all(np.diff(arr_time) > 0)):
+            arr_order = np.argsort(arr_time, kind='stable')
+            arr_sorted = arr_time[arr_order]
+            arr_keep = np.append(arr_sorted[1:] != arr_sorted[:-1], True)
+            arr_order = arr_order[arr_keep]
+            arr_time = arr_time[arr_order]
+        int_start = 0 if int_begin_ms is None else int(np.searchsorted(arr_time, int_begin_ms, side='left'))
+        int_stop = len(arr_time) if int_end_ms is None else int(np.searchsorted(arr_time, int_end_ms, side='right'))
+
+        dict_value = {}
+        for str_field in list_field:
+            if str_field not in dict_array:
+                dict_value[str_field] = np.full(int_stop - int_start, np.nan)
+                continue
+            arr_value = dict_array[str_field]
+            if arr_order is not None:
+                arr_value = arr_value[arr_order]
+            dict_value[str_field] = np.asarray(arr_value[int_start:int_stop], dtype='float64')
+        return arr_time[int_start:int_stop], dict_value
+
+    @staticmethod
+    def merge_time_axis(list_time: list) -> np.ndarray:
+        """
+        k路归并：各合约已升序的时间序列两两归并，每轮序列数减半，共log k轮，结果升序且不重复
+
+        Args:
+            list_time: 升序int64数组列表
+
+        Returns:
+            np.ndarray: 所有时间的并集
+        """
+        list_merge = [np.asarray(a, dtype='int64') for a in list_time if len(a)]
+        if not list_merge:
+            return np.empty(0, dtype='int64')
+        while len(list_merge) > 1:
+            list_next = []
+            for i in range(0, len(list_merge) - 1, 2):
+                # 两个升序序列拼接后的归并排序（稳定排序会识别出两段有序序列，线性时间完成）
+                arr_merged = np.sort(np.concatenate((list_merge[i], list_merge[i + 1])), kind='stable')
+                list_next.append(arr_merged[np.append(True, arr_merged[1:] != arr_merged[:-1])])
+            if len(list_merge) % 2:
+                list_next.append(list_merge[-1])
+            list_merge = list_next
+        return list_merge[0]
+
+    def load(self, list_instrument_long_id: list = None, str_period: str = "1d", list_field: list = None,
+             dt_begin: str = None, dt_end: str = None, str_instrument_category: str = None,
+             str_dividend_type: str = "none", bool_ffill: bool = False) -> dict:
+        """
+        加载面板数据
+
+        Args:
+            list_instrument_long_id: 合约长代码列表，与str_instrument_category二选一
+            str_period: 周期
+            list_field: 字段列表，默认['close']
+            dt_begin: 开始时间（14位字符串，包含），None表示不限制
+            dt_end: 结束时间（14位字符串，包含），None表示不限制
+            str_instrument_category: 品种类型，"FUTURE"或"STOCK"，从log_save获取全部合约
+            str_dividend_type: 复权类型
+            bool_ffill: 是否用各合约之前最近的值填充缺失（不填充该合约第一条数据之前的部分）
+
+        Returns:
+            dict: time为升序int64毫秒时间轴（长度T），instruments为合约列表（长度N，按输入顺序，没有文件的合约被去掉），
+                  fields为 字段 -> float64矩阵（T x N，缺失为NaN），missing为没有找到文件的合约
+        """
+        list_field = list_field or ['close']
+        if list_instrument_long_id is None:
+            list_instrument_long_id = self.get_instrument_ids(str_instrument_category)
+        dict_file = self.resolve_files(list_instrument_long_id, str_period, str_dividend_type)
+        list_id = [s for s in list_instrument_long_id if s in dict_file]
+        list_missing = [s for s in list_instrument_long_id if s not in dict_file]
+        int_begin_ms, int_end_ms = self._to_ms(dt_begin), self._to_ms(dt_end)
+
+        def read(str_id):
+            str_file_path, str_format = dict_file[str_id]
+            return self._read_one(str_file_path, str_format, list_field, int_begin_ms, int_end_ms)
+
+        with ThreadPoolExecutor(max_workers=max(min(self.int_workers, len(list_id)), 1)) as executor:
+            list_result = list(executor.map(read, list_id))
+
+        arr_time = self.merge_time_axis([arr for arr, _ in list_result])
+        dict_matrix = {f: np.full((len(arr_time), len(list_id)), np.nan) for f in list_field}
+        for j, (arr_instrument_time, dict_value) in enumerate(list_result):
+            arr_row = np.searchsorted(arr_time, arr_instrument_time)
+            for str_field in list_field:
+                dict_matrix[str_field][arr_row, j] = dict_value[str_field]
+
+        if bool_ffill:
+            for str_field in list_field:
+                dict_matrix[str_field] = self.ffill(dict_matrix[str_field])
+        return {'time': arr_time, 'instruments': list_id, 'fields': dict_matrix, 'missing': list_missing}
+
+    @staticmethod
+    def ffill(arr_matrix: np.ndarray) -> np.ndarray:
+        """按列向下填充NaN（向量化：记录每行最近一个非NaN的行号）"""
+        arr_valid = ~np.isnan(arr_matrix)
+        arr_idx = np.where(arr_valid, np.arange(arr_matrix.shape[0])[:, None], 0)
+        np.maximum.accumulate(arr_idx, axis=0, out=arr_idx)
+        arr_filled = arr_matrix[arr_idx, np.arange(arr_matrix.shape[1])]
+        # 第一条数据之前保持NaN
+        arr_filled[~np.maximum.accumulate(arr_valid, axis=0)] = np.nan
+        return arr_filled
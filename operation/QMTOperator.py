@@ -1,18 +1,29 @@
 from datetime import datetime
 import time
 import pandas as pd
-from xtquant import xtdata
 from connect.QMTConnect import QMTConnect
 from connect.MysqlConnect import MysqlConnect
 from operation.MysqlOperator import MysqlOperator
+from operation.WorkPlanner import WorkPlanner
+from operation.BarSink import BarSink
+from operation.MarketDataCache import MarketDataCache
 from utility import utility
 import configparser
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pickle import dump
 import pyarrow as pa
 import pyarrow.parquet as pq
 
 class QMTOperator:
+    # 各品种类型下载和保存的周期
+    DICT_PERIOD = {
+        "FUTURE": ["tick","1m","5m","15m","1h","1d"],
+        "STOCK": ["tick","1m","5m","15m","1h","1d"],
+    }
+
     def __init__(self, qmt_connect: QMTConnect, mysql_connect: MysqlConnect):
         """
         初始化QMT操作器
@@ -23,11 +34,81 @@ class QMTOperator:
         """
         self.qmt_connect = qmt_connect
         self.mysql_operator = MysqlOperator(mysql_connect)
+        self.work_planner = WorkPlanner(self.mysql_operator)
+        # 行情查询的录制/回放缓存（[market_cache]，默认off直接查询xtdata）
+        self.market_data_cache = MarketDataCache()
+        # 流式保存：这些周期按交易日窗口分批获取并落地，缓冲的数据量超过内存上限的一半时写入一次
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.set_stream_period = set(s.strip() for s in config.get('save', 'stream_periods', fallback='tick').split(',') if s.strip())
+        self.int_stream_days = config.getint('save', 'stream_days_per_window', fallback=1)
+        self.int_stream_flush_bytes = int(config.getfloat('save', 'stream_memory_mb', fallback=512) * 1024 * 1024 / 2)
+        # tick的五档列表列是否展开为定长数值列后再落地
+        self.bool_tick_flatten = config.getboolean('save', 'tick_flatten', fallback=False)
+        # 下载阶段每次批量下载的合约数，1为逐个合约下载
+        self.int_download_batch = max(config.getint('download', 'batch_size', fallback=1), 1)
         
+    # 每日变化的合约字段（价格、昨日持仓量、股本），不参与内容哈希，D_base_code中保存的走单独的轻量更新
+    LIST_VOLATILE_FIELD = ['PreClose', 'SettlementPrice', 'UpStopPrice', 'DownStopPrice', 'LastVolume', 'FloatVolume', 'TotalVolume']
+
+    def _fetch_instrument_detail(self, str_code: str) -> dict:
+        """
+        获取单个合约的详细信息（经过行情缓存），返回需要保存的字段，获取失败返回None
+        """
+        dict_detail = self.market_data_cache.call('get_instrument_detail', str_code, True, bool_fresh=True)
+        if not dict_detail:
+            return None
+        return {
+            'InstrumentID': dict_detail.get('InstrumentID', ''),  # 合约代码
+            'ExchangeID': dict_detail.get('ExchangeID', ''),  # 市场简称
+            'InstrumentName': dict_detail.get('InstrumentName', ''),  # 合约名称
+            'ExchangeCode': dict_detail.get('ExchangeCode', ''),  # 交易所产品代码
+            'Abbreviation': dict_detail.get('Abbreviation', ''),  # 合约名称的拼音简写
+            'ProductID': dict_detail.get('ProductID', ''),  # 合约的品种ID(期货)
+            'ProductName': dict_detail.get('ProductName', ''),  # 合约的品种名称(期货)
+            'UnderlyingCode': dict_detail.get('UnderlyingCode', ''),  # 标的合约
+            'CreateDate': dict_detail.get('CreateDate', ''),  # 上市日期(期货)
+            'OpenDate': dict_detail.get('OpenDate', ''),  # IPO日期(股票)
+            'ExpireDate': dict_detail.get('ExpireDate', ''),  # 退市日或者到期日
+            'PreClose': dict_detail.get('PreClose', 0),  # 前收盘价格
+            'SettlementPrice': dict_detail.get('SettlementPrice', 0),  # 前结算价格
+            'UpStopPrice': dict_detail.get('UpStopPrice', 0),  # 当日涨停价
+            'DownStopPrice': dict_detail.get('DownStopPrice', 0),  # 当日跌停价
+            'FloatVolume': dict_detail.get('FloatVolume', 0),  # 流通股本
+            'TotalVolume': dict_detail.get('TotalVolume', 0),  # 总股本
+            'LongMarginRatio': dict_detail.get('LongMarginRatio', 0),  # 多头保证金率
+            'ShortMarginRatio': dict_detail.get('ShortMarginRatio', 0),  # 空头保证金率
+            'PriceTick': dict_detail.get('PriceTick', ''),  # 最小变价单位
+            'VolumeMultiple': dict_detail.get('VolumeMultiple', 0),  # 合约乘数
+            'LastVolume': dict_detail.get('LastVolume', 0),  # 昨日持仓量
+            'DeliveryYear': dict_detail.get('DeliveryYear', ''),  # 交割年份
+            'DeliveryMonth': dict_detail.get('DeliveryMonth', ''),  # 交割月
+            'ChargeType': dict_detail.get('ChargeType', 0),  # 期货和期权手续费方式
+        }
+
+    @classmethod
+    def calc_content_hash(cls, df_detail: pd.DataFrame) -> pd.Series:
+        """
+        计算每个合约除易变字段外的内容哈希
+
+        Args:
+            df_detail: 合并后的合约详细信息
+
+        Returns:
+            pd.Series: 与df_detail同索引的md5十六进制字符串
+        """
+        list_cols = sorted(c for c in df_detail.columns if c not in cls.LIST_VOLATILE_FIELD and c != 'ContentHash')
+        list_hash = [hashlib.md5("|".join(str(v) for v in tuple_row).encode('utf-8')).hexdigest()
+                     for tuple_row in df_detail[list_cols].itertuples(index=False, name=None)]
+        return pd.Series(list_hash, index=df_detail.index, dtype=object)
+
     def get_instrument_detail(self, df_exchange_info: pd.DataFrame, list_instrumentID: list, str_InstrumentCategory: str) -> bool:
         """
         获取合约详细信息并保存到数据库
         
+        合约详情并发获取；只有内容哈希变化（或新增）的合约才整行写入D_base_code，
+        其余合约只通过批量UPDATE刷新前收盘、前结算、涨跌停价、昨日持仓量等易变字段。
+        
         Args:
             df_exchange_info: 交易所信息DataFrame
             list_instrumentID: 对于期货来说是连续合约代码列表 对于股票来说是股票代码
@@ -37,41 +118,17 @@ class QMTOperator:
             bool: 操作是否成功
         """
         try:
-            # 准备存储详细信息的列表
-            list_futures_detail = []
-            
-            # 遍历连续合约获取详细信息
-            print("获取合约详细信息...")
-            for str_future in list_instrumentID:
-                dict_detail = xtdata.get_instrument_detail(str_future, True)
-                if dict_detail:
-                    list_futures_detail.append({
-                        'InstrumentID': dict_detail.get('InstrumentID', ''),  # 合约代码
-                        'ExchangeID': dict_detail.get('ExchangeID', ''),  # 市场简称
-                        'InstrumentName': dict_detail.get('InstrumentName', ''),  # 合约名称
-                        'ExchangeCode': dict_detail.get('ExchangeCode', ''),  # 交易所产品代码
-                        'Abbreviation': dict_detail.get('Abbreviation', ''),  # 合约名称的拼音简写
-                        'ProductID': dict_detail.get('ProductID', ''),  # 合约的品种ID(期货)
-                        'ProductName': dict_detail.get('ProductName', ''),  # 合约的品种名称(期货)
-                        'UnderlyingCode': dict_detail.get('UnderlyingCode', ''),  # 标的合约
-                        'CreateDate': dict_detail.get('CreateDate', ''),  # 上市日期(期货)
-                        'OpenDate': dict_detail.get('OpenDate', ''),  # IPO日期(股票)
-                        'ExpireDate': dict_detail.get('ExpireDate', ''),  # 退市日或者到期日
-                        'PreClose': dict_detail.get('PreClose', 0),  # 前收盘价格
-                        'SettlementPrice': dict_detail.get('SettlementPrice', 0),  # 前结算价格
-                        'UpStopPrice': dict_detail.get('UpStopPrice', 0),  # 当日涨停价
-                        'DownStopPrice': dict_detail.get('DownStopPrice', 0),  # 当日跌停价
-                        'FloatVolume': dict_detail.get('FloatVolume', 0),  # 流通股本
-                        'TotalVolume': dict_detail.get('TotalVolume', 0),  # 总股本
-                        'LongMarginRatio': dict_detail.get('LongMarginRatio', 0),  # 多头保证金率
-                        'ShortMarginRatio': dict_detail.get('ShortMarginRatio', 0),  # 空头保证金率
-                        'PriceTick': dict_detail.get('PriceTick', ''),  # 最小变价单位
-                        'VolumeMultiple': dict_detail.get('VolumeMultiple', 0),  # 合约乘数
-                        'LastVolume': dict_detail.get('LastVolume', 0),  # 昨日持仓量
-                        'DeliveryYear': dict_detail.get('DeliveryYear', ''),  # 交割年份
-                        'DeliveryMonth': dict_detail.get('DeliveryMonth', ''),  # 交割月
-                        'ChargeType': dict_detail.get('ChargeType', 0),  # 期货和期权手续费方式
-                    })
+            # 读取并发数
+            config = configparser.ConfigParser()
+            config.read('./config/app.ini')
+            int_workers = config.getint('download', 'detail_workers', fallback=8)
+
+            # 并发获取合约详细信息，map保持输入顺序
+            print(f"获取合约详细信息，共 {len(list_instrumentID)} 个，并发数 {int_workers}...")
+            time_fetch_start = time.time()
+            with ThreadPoolExecutor(max_workers=int_workers) as executor:
+                list_futures_detail = [d for d in executor.map(self._fetch_instrument_detail, list_instrumentID) if d]
+            print(f"合约详细信息获取完成，耗时: {time.time() - time_fetch_start:.2f}秒")
             
             # 创建DataFrame
             df_futures_detail = pd.DataFrame(list_futures_detail)
@@ -100,142 +157,416 @@ class QMTOperator:
                 df_futures_merged["ExchangeLongCode"] = "" # 交易所产品长代码--主力合约
                 df_futures_merged["InstrumentJQLongID"] = "" # 加权连续合约长代码
 
+            # 与上次保存的内容哈希比较，找出新增或变化的合约
+            df_futures_merged["ContentHash"] = self.calc_content_hash(df_futures_merged)
+            df_hash = self.mysql_operator.get_instrument_hash(str_InstrumentCategory)
+            dict_hash = {} if df_hash.empty else dict(zip(df_hash['InstrumentID'], df_hash['ContentHash']))
+            sr_changed = df_futures_merged['InstrumentID'].map(dict_hash) != df_futures_merged['ContentHash']
+            df_changed = df_futures_merged[sr_changed]
+            df_unchanged = df_futures_merged[~sr_changed]
+            print(f"合约详细信息变化 {len(df_changed)} 个，未变化 {len(df_unchanged)} 个")
             
-            # 将合并后的数据保存到数据库
+            # 将变化的合约整行保存到数据库，未变化的只刷新易变字段
             print("开始保存合约详细信息数据到数据库...")
-            if self.mysql_operator.upsert_futures_detail(df_futures_merged):
-                print("合约详细信息数据保存成功！")
-                return df_futures_merged
-            else:
+            if not self.mysql_operator.upsert_futures_detail(df_changed):
                 print("合约详细信息数据保存失败！")
                 return None
+            self.mysql_operator.upsert_instrument_hash(df_changed, str_InstrumentCategory)
+            self.mysql_operator.update_instrument_volatile(df_unchanged)
+            print("合约详细信息数据保存成功！")
+            return df_futures_merged
             
         except Exception as e:
             print(f"获取合约详细信息失败: {str(e)}")
             return None
 
-    def download_barData(self, df_save_log: pd.DataFrame, str_instrument_category: str = "FUTURE", dt_init_begin: str = None, dt_init_end: str = None):
+    def _merge_log_save(self, df_save_log: pd.DataFrame, str_instrument_category: str) -> pd.DataFrame:
         """
-        下载并保存K线数据
-        
+        将log_save表中的时间范围合并到保存日志上，一次查询代替逐个合约查询
+        """
+        df_log = self.mysql_operator.get_all_log_save(str_instrument_category)
+        df_save_log = df_save_log[df_save_log['InstrumentCategory'] == str_instrument_category]
+        list_time_cols = ['InstrumentLongID', 'init_datetime', 'download_begin_datetime', 'download_end_datetime',
+                          'save_begin_datetime', 'save_end_datetime']
+        df_save_log = df_save_log.drop(columns=[c for c in list_time_cols[1:] if c in df_save_log.columns])
+        df_merged = pd.merge(df_save_log, df_log[list_time_cols], on='InstrumentLongID', how='left')
+        return df_merged.astype(object).where(df_merged.notna(), None)
+
+    def _download_unit(self, dict_unit: dict):
+        """
+        下载单个工作单元（合约 + 周期 + 时间范围），在worker线程中执行
+
+        Returns:
+            None: 下载成功（字节数未知）；False: 下载失败
+        """
+        row = dict_unit['row']
+        i = dict_unit['period']
+        try:
+            print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} {i}周期下载开始")
+            # 下载数据
+            self.market_data_cache.download_history_data(row['InstrumentLongID'], i, start_time=dict_unit['begin'], end_time=dict_unit['end'])
+            return None
+        except Exception as e:
+            print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} {i}周期下载出错: {str(e)}")
+            return False
+
+    def _download_batch_unit(self, dict_batch: dict):
+        """
+        批量下载同一周期、同一时间范围的多个合约（download_history_data2），在worker线程中执行
+        回调中记录每个合约的完成情况，回调报告出错或没有回调的合约再逐个用download_history_data重试；
+        各合约的结果记入dict_batch['dict_result']（None为成功，False为重试后仍失败）
+
+        Returns:
+            0: 全部成功（不按批次记录历史成本，由调用方按合约记录）；False: 有合约失败
+        """
+        list_unit = dict_batch['list_unit']
+        list_code = [dict_unit['InstrumentLongID'] for dict_unit in list_unit]
+        dict_message = {}
+        lock_callback = threading.Lock()
+
+        def on_progress(dict_data):
+            # 回调在xtquant的线程中执行
+            str_code = dict_data.get('stockcode')
+            if str_code:
+                with lock_callback:
+                    dict_message[str_code] = dict_data.get('message') or ''
+
+        print(f"{dict_batch['period']}周期批量下载开始: {len(list_code)} 个合约，{dict_batch['begin']} - {dict_batch['end']}")
+        try:
+            self.market_data_cache.download_history_data2(list_code, dict_batch['period'], start_time=dict_batch['begin'],
+                                                          end_time=dict_batch['end'], callback=on_progress)
+        except Exception as e:
+            print(f"{dict_batch['period']}周期批量下载出错: {str(e)}，逐个合约重试")
+        with lock_callback:
+            dict_message = dict(dict_message)
+        dict_result = {}
+        for dict_unit in list_unit:
+            str_code = dict_unit['InstrumentLongID']
+            if dict_message.get(str_code) == '':
+                dict_result[str_code] = None
+            else:
+                if str_code in dict_message:
+                    print(f"产品：{str_code} {dict_unit['period']}周期批量下载失败: {dict_message[str_code]}，单独重试")
+                dict_result[str_code] = self._download_unit(dict_unit)
+        dict_batch['dict_result'] = dict_result
+        int_failed = sum(1 for result in dict_result.values() if result is False)
+        print(f"{dict_batch['period']}周期批量下载完成: {len(list_code)} 个合约，单独重试 {len(list_code) - sum(1 for m in dict_message.values() if m == '')} 个，"
+              f"失败 {int_failed} 个")
+        return False if int_failed else 0
+
+    def _group_download_batches(self, list_queues: list) -> list:
+        """
+        把下载工作单元按 (周期, 开始时间, 结束时间) 分组，每int_download_batch个合约合并为一个批次单元并重新调度
+
+        Returns:
+            list: 每个worker的批次单元队列，批次单元的list_unit为其中的工作单元
+        """
+        dict_group = {}
+        for list_queue in list_queues:
+            for dict_unit in list_queue:
+                dict_group.setdefault((dict_unit['period'], str(dict_unit['begin']), str(dict_unit['end'])), []).append(dict_unit)
+        list_batch = []
+        for list_unit in dict_group.values():
+            for int_start in range(0, len(list_unit), self.int_download_batch):
+                list_part = list_unit[int_start:int_start + self.int_download_batch]
+                list_batch.append({
+                    'InstrumentLongID': list_part[0]['InstrumentLongID'] if len(list_part) == 1 else f"{list_part[0]['InstrumentLongID']}等{len(list_part)}个",
+                    'period': list_part[0]['period'],
+                    'stage': "download",
+                    'begin': list_part[0]['begin'],
+                    'end': list_part[0]['end'],
+                    'row': list_part[0]['row'],
+                    'est_bytes': sum(dict_unit['est_bytes'] for dict_unit in list_part),
+                    'est_seconds': sum(dict_unit['est_seconds'] for dict_unit in list_part),
+                    'existing_bytes': 0,
+                    'list_unit': list_part,
+                })
+        return self.work_planner.schedule(list_batch)
+
+    def plan_barData(self, df_save_log: pd.DataFrame, str_instrument_category: str = "FUTURE", str_stage: str = "download",
+                     dt_init_begin: str = None, dt_init_end: str = None, list_instrument_long_id: list = None) -> list:
+        """
+        构建某一阶段的工作单元并按LPT调度到各worker
+
         Args:
             df_save_log: 保存日志DataFrame
             str_instrument_category: 品种类型，"FUTURE"为期货，"STOCK"为股票
+            str_stage: "download"或"save"
+            dt_init_begin: 初始下载开始时间
+            dt_init_end: 本次下载结束时间
+            list_instrument_long_id: 可选，只规划这些合约
+
+        Returns:
+            list: 每个worker的工作单元队列
         """
-        # 读取配置文件
         config = configparser.ConfigParser()
         config.read('./config/app.ini')
-        
-        # 获取下载周期
         if str_instrument_category == "FUTURE":
-            list_interpreters = ["tick","1m","5m","15m","1h","1d"]
+            str_data_save_path = config.get('path', 'future_data_path')
         elif str_instrument_category == "STOCK":
-            list_interpreters = ["tick","1m","5m","15m","1h","1d"]
+            str_data_save_path = config.get('path', 'stock_data_path')
+        df_log = self._merge_log_save(df_save_log, str_instrument_category)
+        if list_instrument_long_id is not None:
+            df_log = df_log[df_log['InstrumentLongID'].isin(list_instrument_long_id)]
+        list_units = self.work_planner.build_units(df_log, self.DICT_PERIOD[str_instrument_category], str_stage,
+                                                   str_data_save_path, dt_init_begin, dt_init_end)
+        return self.work_planner.schedule(list_units)
+
+    def download_barData(self, df_save_log: pd.DataFrame, str_instrument_category: str = "FUTURE", dt_init_begin: str = None, dt_init_end: str = None):
+        """
+        下载并保存K线数据
+        
+        先把全部 (合约, 周期, 时间范围) 构建为工作单元，按预估耗时最长优先分配到各worker执行；
+        一个合约的所有周期都完成后更新其下载日志。
+        
+        Args:
+            df_save_log: 保存日志DataFrame
+            str_instrument_category: 品种类型，"FUTURE"为期货，"STOCK"为股票
+        """
         time_total_start = time.time()
-        cnt = 0
-        for _, row in df_save_log.iterrows():
-            # 测试开关
-            # if  row["InstrumentLongID"] not in ["CF00.ZF"]: # ,"ag00.SF"
-            #     continue
-            # 检查是否为指定品种
-            if row['InstrumentCategory'] != str_instrument_category:
-                continue
-                
-            # 记录当前产品开始时间 用于计算当前产品耗时
-            time_product_start = time.time()
-            
-            # 获取当前产品开始结束时间
-            dt_download_begin, dt_download_end, _, _ = self.mysql_operator.get_log_save_by_id(row['InstrumentLongID'])
+        list_queues = self.plan_barData(df_save_log, str_instrument_category, "download", dt_init_begin, dt_init_end)
+        self.work_planner.print_plan(list_queues, f"{str_instrument_category} 下载")
 
-            if dt_download_begin is None:
-                dt_download_begin = dt_init_begin
-                dt_download_end = dt_init_end
-            else:
-                dt_download_begin = dt_download_end
-                dt_download_end = dt_init_end
-                
-            # 下载数据
-            for i in list_interpreters:
-                # 记录当前周期开始时间
-                time_period_start = time.time()
-                try:
-                    print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} {i}周期下载开始")
-                    # 下载数据
-                    xtdata.download_history_data(row['InstrumentLongID'], i, start_time=dt_download_begin, end_time=dt_download_end)
-                    # 计算当前周期耗时
-                    time_period_elapsed = time.time() - time_period_start
-                    print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} {i}周期下载完成，耗时: {time_period_elapsed:.2f}秒")
-                except Exception as e:
-                    print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} {i}周期下载出错: {str(e)}")
-                    continue
-                
-            # 保存记录到数据库
-            self.mysql_operator.update_log_save_download(row['InstrumentLongID'], dt_download_begin, dt_download_end)
-            
-            # 计算并显示当前产品总耗时
-            time_product_elapsed = time.time() - time_product_start
-            cnt += 1
-            print(f"已下载 {cnt} 个产品，本产品总耗时: {time_product_elapsed:.2f}秒")
+        # 每个合约剩余的工作单元数和累计耗时
+        dict_remaining = {}
+        dict_elapsed = {}
+        for list_queue in list_queues:
+            for dict_unit in list_queue:
+                dict_remaining[dict_unit['InstrumentLongID']] = dict_remaining.get(dict_unit['InstrumentLongID'], 0) + 1
+        list_cnt = [0]
+
+        def func_done(dict_unit, float_elapsed, result):
+            row = dict_unit['row']
+            str_id = dict_unit['InstrumentLongID']
+            if result is not False:
+                print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{str_id} {dict_unit['period']}周期下载完成，耗时: {float_elapsed:.2f}秒")
+            dict_elapsed[str_id] = dict_elapsed.get(str_id, 0.0) + float_elapsed
+            dict_remaining[str_id] -= 1
+            if dict_remaining[str_id] == 0:
+                # 保存记录到数据库
+                self.mysql_operator.update_log_save_download(str_id, dict_unit['begin'], dict_unit['end'])
+                list_cnt[0] += 1
+                print(f"已下载 {list_cnt[0]} 个产品，本产品总耗时: {dict_elapsed[str_id]:.2f}秒")
+
+        if self.int_download_batch <= 1:
+            self.work_planner.run(list_queues, self._download_unit, func_done)
+        else:
+            # 批量下载：批次的耗时平均分摊到其中的合约，按合约记录完成情况和历史成本
+            list_cost = []
+
+            def func_batch_done(dict_batch, float_elapsed, result):
+                dict_result = dict_batch.get('dict_result', {})
+                float_unit_elapsed = float_elapsed / len(dict_batch['list_unit'])
+                for dict_unit in dict_batch['list_unit']:
+                    result_unit = dict_result.get(dict_unit['InstrumentLongID'], False)
+                    if result_unit is None:
+                        float_days = self.work_planner._days_between(dict_unit['begin'], dict_unit['end'])
+                        list_cost.append((dict_unit['InstrumentLongID'], dict_unit['period'], "download", 0.0, float_unit_elapsed / float_days))
+                    func_done(dict_unit, float_unit_elapsed, result_unit)
+
+            list_batch_queues = self._group_download_batches(list_queues)
+            print(f"【批量下载】{sum(len(q) for q in list_queues)} 个工作单元合并为 {sum(len(q) for q in list_batch_queues)} 个批次"
+                  f"（每批最多 {self.int_download_batch} 个合约）")
+            self.work_planner.run(list_batch_queues, self._download_batch_unit, func_batch_done)
+            self.mysql_operator.upsert_plan_cost(list_cost)
             
         # 计算并显示总耗时
         time_total_elapsed = time.time() - time_total_start
         print(f"\n所有数据下载完成，总耗时: {time_total_elapsed:.2f}秒")
 
-    def save_barData(self, str_instrument_category: str = "FUTURE"):
+    def _prepare_bar_frame(self, df_temp: pd.DataFrame, str_period: str) -> pd.DataFrame:
+        """以时间为索引，排序去重；开启tick_flatten时展开tick的五档列表列"""
+        df_temp.index = utility.batch_timestamp_to_datetime(df_temp["time"])
+        df_temp = df_temp.sort_index()
+        df_temp = df_temp[~df_temp.index.duplicated(keep='last')] # 将df_temp按照索引排序去重
+        if str_period == "tick" and self.bool_tick_flatten:
+            df_temp = utility.flatten_tick_levels(df_temp)
+        return df_temp
+
+    def _get_trading_windows(self, row, dt_begin: str, dt_end: str) -> list:
+        """按该合约市场的交易日切分时间窗口，获取不到交易日时按自然日切分"""
+        try:
+            list_trading_date = self.market_data_cache.call('get_trading_dates', row['XTExchangeID'], str(dt_begin)[:8], str(dt_end)[:8])
+        except Exception as e:
+            print(f"获取{row['XTExchangeID']}交易日出错: {str(e)}，按自然日切分")
+            list_trading_date = []
+        if not list_trading_date:
+            list_trading_date = [int(ts.value // 1000000) - 8 * 3600 * 1000
+                                 for ts in pd.date_range(str(dt_begin)[:8], str(dt_end)[:8], freq='D')]
+        return utility.split_trading_day_windows(dt_begin, dt_end, list_trading_date, self.int_stream_days)
+
+    def _iter_bar_chunks(self, str_code: str, str_period: str, str_dividend_type: str, list_window: list):
+        """
+        生成器：逐个时间窗口从QMT获取数据
+
+        Yields:
+            (窗口序号, 排序去重后的DataFrame)，没有数据的窗口跳过
+        """
+        for int_idx, (dt_window_begin, dt_window_end) in enumerate(list_window):
+            dict_result = self.market_data_cache.get_market_data_ex([], [str_code], period=str_period, dividend_type=str_dividend_type,
+                                                                    start_time=dt_window_begin, end_time=dt_window_end,
+                                                                    count=-1, fill_data=False)
+            df_temp = dict_result.get(str_code)
+            if df_temp is None or df_temp.empty:
+                continue
+            yield int_idx, self._prepare_bar_frame(df_temp, str_period)
+
+    def _save_stream(self, row, str_period: str, str_dividend_type: str, list_sinks: list, dt_begin: str, dt_end: str) -> int:
         """
-        保存K线数据到本地pkl文件
+        流式保存：按交易日窗口分批获取，缓冲超过int_stream_flush_bytes时合并写入所有sink，
+        内存中只保留一批数据（合并时约为两倍），与时间跨度无关
+
+        Returns:
+            int: 写入后文件增加的字节数
+        """
+        str_code = row['InstrumentLongID']
+        list_window = self._get_trading_windows(row, dt_begin, dt_end)
+        list_buffer = []
+        list_state = [0, 0, 0] # 缓冲字节数, 累计写入字节数, 累计行数
+
+        def flush():
+            if not list_buffer:
+                return
+            df_batch = pd.concat(list_buffer, axis=0) if len(list_buffer) > 1 else list_buffer[0]
+            list_buffer.clear()
+            for obj_sink in list_sinks:
+                list_state[1] += obj_sink.write(df_batch, row, str_period, str_dividend_type)
+            print(f"【流式保存】{str_code} {str_period} {str_dividend_type} 写入 {len(df_batch)} 行，"
+                  f"批次内存 {list_state[0] / 1024 / 1024:.1f}MB")
+            list_state[0] = 0
+
+        for int_idx, df_chunk in self._iter_bar_chunks(str_code, str_period, str_dividend_type, list_window):
+            list_buffer.append(df_chunk)
+            list_state[0] += int(self.work_planner.memory_governor.estimate_row_bytes(df_chunk) * len(df_chunk))
+            list_state[2] += len(df_chunk)
+            print(f"【流式保存】{str_code} {str_period} {str_dividend_type} 窗口 {int_idx + 1}/{len(list_window)} "
+                  f"{list_window[int_idx][0]}-{list_window[int_idx][1]}: {len(df_chunk)} 行，累计 {list_state[2]} 行")
+            # 缓冲上限随剩余内存缩小
+            if list_state[0] >= self.work_planner.memory_governor.get_flush_bytes(self.int_stream_flush_bytes):
+                flush()
+        flush()
+        return list_state[1]
+
+    def _save_unit(self, dict_unit: dict):
+        """
+        保存单个工作单元（合约 + 周期，包含所有复权类型），在worker线程中执行
+        每种复权类型只从QMT获取一次，依次写入所有配置的sink
+
+        Returns:
+            int: 本单元写入后文件增加的字节数；False: 保存失败
+        """
+        row = dict_unit['row']
+        i = dict_unit['period']
+        try:
+            int_bytes = 0
+            # 预估内存超过单元预算的改走流式保存
+            bool_stream = i in self.set_stream_period or self.work_planner.memory_governor.should_stream(dict_unit)
+            if bool_stream and i not in self.set_stream_period:
+                print(f"【内存】{row['InstrumentLongID']} {i} 预估内存 {self.work_planner.memory_governor.estimate_unit(dict_unit) / 1024 / 1024:.0f}MB "
+                      f"超过单元预算，改为流式保存")
+            for dividend_type in dict_unit['list_dividend_type']:
+                    if bool_stream:
+                        int_bytes += self._save_stream(row, i, dividend_type, dict_unit['list_sinks'], dict_unit['begin'], dict_unit['end'])
+                        continue
+                    dict_result = self.market_data_cache.get_market_data_ex([], [row['InstrumentLongID']],
+                                                                            period=i, dividend_type=dividend_type,
+                                                                            start_time=dict_unit['begin'], end_time=dict_unit['end'],
+                                                                            count=-1, fill_data=False)
+                    df_temp = self._prepare_bar_frame(dict_result[row['InstrumentLongID']], i)
+                    # 看是否有row['instrument_CName']-row['InstrumentLongID']目录，没有则创建，然后将df_temp保存到该目录下
+                    # str_dir_path = f"{str_data_save_path}/{row['instrument_CName']}-{row['InstrumentLongID']}"
+                    # if not os.path.exists(str_dir_path):
+                    #     os.makedirs(str_dir_path)
+                    for obj_sink in dict_unit['list_sinks']:
+                        int_bytes += obj_sink.write(df_temp, row, i, dividend_type)
+            return int_bytes
+        except Exception as e:
+            print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} {i}周期保存出错: {str(e)}")
+            return False
+
+    def save_barData(self, str_instrument_category: str = "FUTURE", list_instrument_long_id: list = None,
+                     list_dividend_type: list = None, bool_resume: bool = False):
+        """
+        保存K线数据到本地pkl文件（以及[sink]配置的其他落地方式）
+        
+        与下载相同，按 (合约, 周期) 构建工作单元并按预估耗时最长优先调度；
+        一个合约的所有周期都保存成功后才更新其保存日志。
+        
+        Args:
+            str_instrument_category: 品种类型，"FUTURE"为期货，"STOCK"为股票
+            list_instrument_long_id: 可选，只保存这些合约（用于股票分片），默认保存该品种全部合约
+            list_dividend_type: 可选，覆盖默认的复权类型列表
+            bool_resume: 断点续跑，跳过保存结束时间已等于下载结束时间（崩溃前已保存完成）的合约
+
+        Returns:
+            set: 有周期保存失败的合约长代码（这些合约的保存日志没有更新）
         """
         # 读取配置文件
         config = configparser.ConfigParser()
         config.read('./config/app.ini')
         if str_instrument_category == "FUTURE":
             str_data_save_path = config.get('path', 'future_data_path')
-            list_dividend_type = ["none"] # 期货数据没有前复权，所以只要直接叠加就可以。
-            list_period = ["tick","1m","5m","15m","1h","1d"] # 期货数据下载的周期
+            list_default_dividend_type = ["none"] # 期货数据没有前复权，所以只要直接叠加就可以。
         elif str_instrument_category == "STOCK":
             str_data_save_path = config.get('path', 'stock_data_path')
-            list_dividend_type = ["none","front_ratio"] # 前复权和等比前复权 这里为了节省空间 只保存等比前复权。 "front" 是前复权，"front_ratio" 是等比前复权。
-            list_period = ["tick","1m","5m","15m","1h","1d"] # 为了节约时间 股票数据不下载tick数据
+            list_default_dividend_type = ["none"] # 股票只保存不复权数据，等比前复权/后复权由AdjustFactorOperator按本地复权因子在读取时计算。
+        if list_dividend_type is None:
+            list_dividend_type = list_default_dividend_type
             
         df_log_save = self.mysql_operator.get_all_log_save(str_instrument_category)
-        cnt = 0
-        for _, row in df_log_save.iterrows():
-            # if  row["InstrumentLongID"] not in ["CF00.ZF","ag00.SF"]:
-            #     continue
-
-            try:
-                print(f"【开始保存产品】： {row['InstrumentLongID']} ")
-
-                # 记录当前产品开始时间 用于计算当前产品耗时
-                time_product_start = time.time()
-                # 如果save_end_datetime为None，则使用init_datetime，否则使用save_end_datetime 用于获得最新数据 添加保存
-                dt_save_begin = row['download_begin_datetime']
-                dt_save_end = row['download_end_datetime']
-            
-                for i in list_period:
-                    for dividend_type in list_dividend_type:
-                            dict_result = xtdata.get_market_data_ex([], [row['InstrumentLongID']], 
-                                                                    period=i, dividend_type=dividend_type,
-                                                                    start_time=dt_save_begin, end_time=dt_save_end,
-                                                                    count=-1, fill_data=False)
-                            df_temp = dict_result[row['InstrumentLongID']]
-                            df_temp.index = utility.batch_timestamp_to_datetime(df_temp["time"])
-                            df_temp = df_temp.sort_index()
-                            df_temp = df_temp[~df_temp.index.duplicated(keep='last')] # 将df_temp按照索引排序去重
-                            # 看是否有row['instrument_CName']-row['InstrumentLongID']目录，没有则创建，然后将df_temp保存到该目录下
-                            # str_dir_path = f"{str_data_save_path}/{row['instrument_CName']}-{row['InstrumentLongID']}"
-                            # if not os.path.exists(str_dir_path):
-                            #     os.makedirs(str_dir_path)
-                            str_dir_path = str_data_save_path
-                            str_file_name = f"{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']}-{dividend_type}-{i}.pkl"
-                            utility.append_to_pkl(df_temp,
-                                                  f"{str_dir_path}/{str_file_name}")
-                
-                self.mysql_operator.update_log_save_save(row['InstrumentLongID'], dt_save_begin, dt_save_end)
+        if bool_resume:
+            sr_saved = df_log_save['save_end_datetime'].notna() & (df_log_save['save_end_datetime'] == df_log_save['download_end_datetime'])
+            print(f"【断点续跑】{int(sr_saved.sum())} 个合约已在崩溃前保存完成，跳过")
+            df_log_save = df_log_save[~sr_saved]
+        list_queues = self.plan_barData(df_log_save, str_instrument_category, "save",
+                                        list_instrument_long_id=list_instrument_long_id)
+        list_sinks = BarSink.create_sinks(str_data_save_path)
+        for list_queue in list_queues:
+            for dict_unit in list_queue:
+                dict_unit['list_dividend_type'] = list_dividend_type
+                dict_unit['list_sinks'] = list_sinks
+        self.work_planner.print_plan(list_queues, f"{str_instrument_category} 保存")
+
+        # 每个合约剩余的工作单元数、累计耗时和是否出错
+        dict_remaining = {}
+        dict_elapsed = {}
+        set_failed = set()
+        for list_queue in list_queues:
+            for dict_unit in list_queue:
+                dict_remaining[dict_unit['InstrumentLongID']] = dict_remaining.get(dict_unit['InstrumentLongID'], 0) + 1
+        list_cnt = [0]
+
+        def func_done(dict_unit, float_elapsed, result):
+            str_id = dict_unit['InstrumentLongID']
+            if result is False:
+                set_failed.add(str_id)
+            dict_elapsed[str_id] = dict_elapsed.get(str_id, 0.0) + float_elapsed
+            dict_remaining[str_id] -= 1
+            if dict_remaining[str_id] == 0 and str_id not in set_failed:
+                self.mysql_operator.update_log_save_save(str_id, dict_unit['begin'], dict_unit['end'])
                 # 计算并显示当前产品总耗时
-                time_product_elapsed = time.time() - time_product_start
-                cnt += 1
-                print(f"已保存 {cnt} 个产品，本产品总耗时: {time_product_elapsed:.2f}秒")
-            except Exception as e:
-                print(f"产品：{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']} 保存出错: {str(e)}")
-                continue
+                list_cnt[0] += 1
+                print(f"已保存 {list_cnt[0]} 个产品，本产品总耗时: {dict_elapsed[str_id]:.2f}秒")
+
+        self.work_planner.run(list_queues, self._save_unit, func_done)
+
+        # 输出各sink的写入吞吐量
+        for obj_sink in list_sinks:
+            obj_sink.report()
+            obj_sink.close()
+        # 行情缓存命中情况
+        self.market_data_cache.report(f"{str_instrument_category} 保存")
+        # 各单元内存峰值
+        self.work_planner.memory_governor.report(f"{str_instrument_category} 保存")
+        # 删除被替代超过保留时间的旧快照版本（包括不会再写入的文件，如已到期合约）
+        int_gc_files, int_gc_bytes = utility.gc_snapshots(str_data_save_path)
+        if int_gc_files:
+            print(f"【快照】清理旧版本 {int_gc_files} 个，释放 {int_gc_bytes / 1024 / 1024:.1f}MB")
+
+        # 通知共享内存缓存服务：已保存的合约重新加载
+        if config.getboolean('cache', 'enable', fallback=False):
+            from operation.SharedBarCache import SharedBarCacheClient
+            list_saved = [s for s in dict_remaining if s not in set_failed]
+            if list_saved and SharedBarCacheClient.notify_invalidate(list_saved):
+                print(f"【缓存】已通知缓存服务 {len(list_saved)} 个合约的数据更新")
+        return set_failed
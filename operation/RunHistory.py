@@ -0,0 +1,279 @@
+import configparser
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+class RunHistory:
+    """
+    运行历史和性能退化检测
+
+    每次运行结束（finish）时把结构化记录写入MySQL表run_history：
+        run    一次运行：总耗时、单元数、行数、字节数、错误数，Detail为主机信息（系统、Python版本、CPU数、进程号、命令行）
+        stage  每个阶段：耗时、阶段内单元的合计行数/字节数/错误数
+        unit   每个工作单元（合约 + 周期 + 所在阶段）：耗时、行数、字节数、是否失败
+    行数取各sink写入行数的最大值（同一份数据写入多个sink不重复计），字节数为各文件sink增加的字节数之和。
+
+    report()比较最近一次运行和此前baseline_runs次运行（滚动基线，取中位数）的归一化成本：
+    行数不少于min_rows的记录按 秒/千行，其他（如下载单元）按耗时秒数；超过基线(1 + threshold)倍的阶段和单元列为退化。
+
+    用法与RunProgress相同：
+        RunHistory.start() / RunHistory.finish()        包住一次运行
+        with RunHistory.stage("FUTURE_save"):            当前阶段
+        with RunHistory.unit(dict_unit) as dict_record:  包住每个工作单元，调用方把结果写入'result'（False表示失败）
+        RunHistory.add(str_sink, int_rows, int_bytes)    sink每次写入后累计到当前线程的单元
+    没有开启时都直接返回。
+    """
+
+    # 当前运行中的记录，None表示未开启
+    _obj_active = None
+
+    def __init__(self):
+        self.str_host = socket.gethostname()
+        self.time_start = time.time()
+        self.str_run_id = f"{datetime.fromtimestamp(self.time_start).strftime('%Y%m%d%H%M%S')}-{self.str_host}-{os.getpid()}"
+        self.lock = threading.Lock()
+        self.list_stage = []
+        # 阶段名 -> 阶段记录（同名阶段多次进入时累加）
+        self.dict_stage = {}
+        self.list_unit = []
+        # 当前线程正在处理的单元记录，sink写入时累计到这里
+        self.local = threading.local()
+
+    @classmethod
+    def start(cls):
+        """
+        按[history] enable开始记录，未开启时返回None
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        if not config.getboolean('history', 'enable', fallback=True):
+            return None
+        obj_history = cls()
+        cls._obj_active = obj_history
+        return obj_history
+
+    @classmethod
+    def finish(cls, str_error: str = None):
+        """
+        结束记录并写入run_history
+
+        Args:
+            str_error: 运行异常终止时的错误信息
+        """
+        obj_history = cls._obj_active
+        if obj_history is None:
+            return
+        cls._obj_active = None
+        from connect.MysqlConnect import MysqlConnect
+        from operation.MysqlOperator import MysqlOperator
+        list_record = obj_history.to_records(str_error)
+        obj_mysql_connect = MysqlConnect()
+        try:
+            if not obj_mysql_connect.connect():
+                print(f"【运行历史】连接数据库失败，本次运行的 {len(list_record)} 条记录未保存")
+                return
+            obj_mysql_operator = MysqlOperator(obj_mysql_connect)
+            obj_mysql_operator.init_run_history()
+            if obj_mysql_operator.insert_run_history(list_record):
+                print(f"【运行历史】已保存 {obj_history.str_run_id}，{len(list_record)} 条记录（python main.py --history-report 查看性能退化）")
+        finally:
+            obj_mysql_connect.disconnect()
+
+    @classmethod
+    @contextmanager
+    def stage(cls, str_stage: str):
+        """包住一个处理阶段，阶段中抛出的异常计入该阶段的错误"""
+        obj_history = cls._obj_active
+        if obj_history is None:
+            yield
+            return
+        with obj_history.lock:
+            obj_history.list_stage.append(str_stage)
+            dict_stage = obj_history.dict_stage.setdefault(str_stage, {'time_start': time.time(), 'seconds': 0.0, 'units': 0,
+                                                                       'rows': 0, 'bytes': 0, 'errors': 0, 'error': None})
+        time_start = time.time()
+        try:
+            yield
+        except BaseException as e:
+            with obj_history.lock:
+                dict_stage['errors'] += 1
+                dict_stage['error'] = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            with obj_history.lock:
+                dict_stage['seconds'] += time.time() - time_start
+                obj_history.list_stage.remove(str_stage)
+
+    @classmethod
+    @contextmanager
+    def unit(cls, dict_unit: dict):
+        """
+        包住一个工作单元（在worker线程中执行），调用方把结果写入yield的记录的'result'（False表示失败）
+        """
+        obj_history = cls._obj_active
+        dict_record = {'InstrumentLongID': dict_unit.get('InstrumentLongID'), 'period': dict_unit.get('period'),
+                       'time_start': time.time(), 'dict_sink_rows': {}, 'bytes': 0, 'result': None, 'error': None}
+        if obj_history is None:
+            yield dict_record
+            return
+        with obj_history.lock:
+            dict_record['stage'] = obj_history.list_stage[-1] if obj_history.list_stage else dict_unit.get('stage')
+        # 工作单元内部只处理一个单元，嵌套时恢复外层
+        dict_outer = getattr(obj_history.local, 'dict_record', None)
+        obj_history.local.dict_record = dict_record
+        try:
+            yield dict_record
+        except BaseException as e:
+            dict_record['error'] = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            obj_history.local.dict_record = dict_outer
+            dict_record['seconds'] = time.time() - dict_record['time_start']
+            dict_record['rows'] = max(dict_record['dict_sink_rows'].values(), default=0)
+            bool_error = dict_record['result'] is False or dict_record['error'] is not None
+            with obj_history.lock:
+                obj_history.list_unit.append(dict_record)
+                dict_stage = obj_history.dict_stage.get(dict_record['stage'])
+                if dict_stage is not None:
+                    dict_stage['units'] += 1
+                    dict_stage['rows'] += dict_record['rows']
+                    dict_stage['bytes'] += dict_record['bytes']
+                    dict_stage['errors'] += int(bool_error)
+
+    @classmethod
+    def add(cls, str_sink: str, int_rows: int, int_bytes: int):
+        """累计当前线程的单元由某个sink写入的行数和字节数"""
+        obj_history = cls._obj_active
+        if obj_history is None:
+            return
+        dict_record = getattr(obj_history.local, 'dict_record', None)
+        if dict_record is None:
+            return
+        dict_record['dict_sink_rows'][str_sink] = dict_record['dict_sink_rows'].get(str_sink, 0) + int_rows
+        dict_record['bytes'] += int_bytes
+
+    def get_host_detail(self) -> dict:
+        """主机信息"""
+        return {
+            'platform': platform.platform(),
+            'python': sys.version.split()[0],
+            'cpu_count': os.cpu_count(),
+            'pid': os.getpid(),
+            'argv': sys.argv,
+        }
+
+    def to_records(self, str_error: str = None) -> list:
+        """转换为MysqlOperator.insert_run_history的记录"""
+        with self.lock:
+            dict_stage = {k: dict(v) for k, v in self.dict_stage.items()}
+            list_unit = list(self.list_unit)
+        int_errors = sum(int(r['result'] is False or r['error'] is not None) for r in list_unit) + int(str_error is not None)
+        dict_detail = self.get_host_detail()
+        if str_error is not None:
+            dict_detail['error'] = str_error
+        list_record = [(self.str_run_id, 'run', None, None, None, datetime.fromtimestamp(self.time_start),
+                        time.time() - self.time_start, len(list_unit), sum(r['rows'] for r in list_unit),
+                        sum(r['bytes'] for r in list_unit), int_errors, self.str_host, json.dumps(dict_detail, ensure_ascii=False))]
+        for str_stage, dict_value in dict_stage.items():
+            list_record.append((self.str_run_id, 'stage', str_stage, None, None, datetime.fromtimestamp(dict_value['time_start']),
+                                dict_value['seconds'], dict_value['units'], dict_value['rows'], dict_value['bytes'],
+                                dict_value['errors'], self.str_host, dict_value['error']))
+        for dict_record in list_unit:
+            str_detail = dict_record['error'] or ("失败" if dict_record['result'] is False else None)
+            list_record.append((self.str_run_id, 'unit', dict_record['stage'], dict_record['InstrumentLongID'], dict_record['period'],
+                                datetime.fromtimestamp(dict_record['time_start']), dict_record['seconds'], 1, dict_record['rows'],
+                                dict_record['bytes'], int(str_detail is not None), self.str_host, str_detail))
+        return list_record
+
+    @staticmethod
+    def find_regressions(df_history: pd.DataFrame, int_min_rows: int = 1000, float_threshold: float = 0.5,
+                         int_min_baseline_runs: int = 3, float_min_seconds: float = 5.0) -> tuple:
+        """
+        最近一次运行与此前各次运行（基线，取中位数）的归一化成本比较
+
+        Args:
+            df_history: MysqlOperator.get_run_history的结果
+            int_min_rows: 行数不少于该值时按 秒/千行 比较，否则按耗时秒数
+            float_threshold: 超过基线(1 + float_threshold)倍视为退化
+            int_min_baseline_runs: 基线中至少出现的运行次数
+            float_min_seconds: 本次耗时少于该值的记录不参与比较（避免噪声）
+
+        Returns:
+            tuple: (最近一次运行的run记录, 退化记录DataFrame)，退化记录的列为RecordType, Stage, InstrumentLongID, Period,
+                   Metric, Seconds, RowCount, Cost, BaselineCost, BaselineRuns, Ratio，按Ratio降序
+        """
+        df_run = df_history[df_history['RecordType'] == 'run'].sort_values('StartTime')
+        if df_run.empty:
+            return None, pd.DataFrame()
+        row_latest = df_run.iloc[-1]
+        df = df_history[df_history['RecordType'].isin(['stage', 'unit'])].copy()
+        # 同一次运行中同一阶段/单元出现多次时合并（如分布式模式下重试的单元）
+        list_key = ['RecordType', 'Stage', 'InstrumentLongID', 'Period']
+        df[list_key] = df[list_key].fillna('')
+        df = df.groupby(['RunID'] + list_key, as_index=False)[['Seconds', 'RowCount']].sum()
+        arr_rows = df['RowCount'].to_numpy(dtype='float64')
+        arr_seconds = df['Seconds'].to_numpy(dtype='float64')
+        bool_per_row = arr_rows >= int_min_rows
+        df['Metric'] = np.where(bool_per_row, '秒/千行', '秒')
+        df['Cost'] = np.where(bool_per_row, arr_seconds / np.maximum(arr_rows, 1) * 1000, arr_seconds)
+
+        list_key.append('Metric')
+        df_latest = df[df['RunID'] == row_latest['RunID']]
+        df_baseline = (df[df['RunID'] != row_latest['RunID']].groupby(list_key)['Cost']
+                       .agg(BaselineCost='median', BaselineRuns='count').reset_index())
+        df_compare = df_latest.merge(df_baseline, on=list_key, how='inner')
+        df_compare = df_compare[(df_compare['BaselineRuns'] >= int_min_baseline_runs) & (df_compare['Seconds'] >= float_min_seconds)
+                                & (df_compare['BaselineCost'] > 0)]
+        df_compare = df_compare.assign(Ratio=df_compare['Cost'] / df_compare['BaselineCost'])
+        df_regression = df_compare[df_compare['Ratio'] > 1 + float_threshold].sort_values('Ratio', ascending=False)
+        return row_latest, df_regression[list_key[:4] + ['Metric', 'Seconds', 'RowCount', 'Cost', 'BaselineCost',
+                                                         'BaselineRuns', 'Ratio']].reset_index(drop=True)
+
+    @classmethod
+    def report(cls, mysql_operator, int_baseline_runs: int = None) -> pd.DataFrame:
+        """
+        打印最近一次运行相对滚动基线的性能退化（阶段和工作单元），参数默认取[history]配置
+
+        Returns:
+            pd.DataFrame: 退化记录（见find_regressions）
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        int_baseline_runs = int_baseline_runs or config.getint('history', 'baseline_runs', fallback=10)
+        float_threshold = config.getfloat('history', 'threshold', fallback=0.5)
+        int_top_n = config.getint('history', 'top_n', fallback=30)
+        mysql_operator.init_run_history()
+        df_history = mysql_operator.get_run_history(int_baseline_runs + 1)
+        if df_history.empty:
+            print("【运行历史】没有运行记录")
+            return pd.DataFrame()
+        row_latest, df_regression = cls.find_regressions(df_history, config.getint('history', 'min_rows', fallback=1000), float_threshold,
+                                                         config.getint('history', 'min_baseline_runs', fallback=3),
+                                                         config.getfloat('history', 'min_seconds', fallback=5.0))
+        int_runs = df_history['RunID'].nunique()
+        print(f"\n【运行历史】最近一次运行 {row_latest['RunID']}（{row_latest['StartTime']}，主机 {row_latest['Host']}）："
+              f"耗时 {row_latest['Seconds']:.0f}秒，{row_latest['UnitCount']} 个单元，{row_latest['RowCount']} 行，"
+              f"{row_latest['ByteCount'] / 1024 / 1024:.1f}MB，错误 {row_latest['ErrorCount']}；基线为此前 {int_runs - 1} 次运行")
+        df_error = df_history[(df_history['RunID'] == row_latest['RunID']) & (df_history['ErrorCount'] > 0)
+                              & ((df_history['RecordType'] == 'unit') | df_history['Detail'].notna()) & (df_history['RecordType'] != 'run')]
+        for _, row in df_error.head(int_top_n).fillna('').iterrows():
+            print(f"【运行历史】  错误: {row['Stage']} {row['InstrumentLongID']} {row['Period']} {row['Detail']}")
+        if df_regression.empty:
+            print(f"【运行历史】没有超过基线 {float_threshold * 100:.0f}% 的退化")
+            return df_regression
+        print(f"【运行历史】超过基线 {float_threshold * 100:.0f}% 的退化 {len(df_regression)} 项（按倍数降序）:")
+        print(f"  {'类型':<6} {'阶段':<20} {'合约':<16} {'周期':<5} {'本次':>10} {'基线':>10} {'倍数':>6} {'耗时':>9}  单位")
+        for str_type in ['stage', 'unit']:
+            df_type = df_regression[df_regression['RecordType'] == str_type].head(int_top_n)
+            for _, row in df_type.iterrows():
+                print(f"  {str_type:<6} {row['Stage']:<20} {row['InstrumentLongID']:<16} {row['Period']:<5} {row['Cost']:>10.3f} "
+                      f"{row['BaselineCost']:>10.3f} {row['Ratio']:>6.2f} {row['Seconds']:>8.1f}s  {row['Metric']}")
+        return df_regression
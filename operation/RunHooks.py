@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from operation.StageProfiler import StageProfiler
+from operation.RunProgress import RunProgress
+from operation.RunHistory import RunHistory
+
+class RunHooks:
+    """
+    运行钩子：把分阶段性能分析（StageProfiler）、进度接口（RunProgress）和运行历史（RunHistory）组合在一起，
+    调用方只包一层，新增的钩子只需在这里登记，不会在某个阶段或工作单元遗漏。
+
+    用法：
+        with RunHooks.run() as dict_run:                  包住一次运行，异常终止时自动记录错误，
+                                                           调用方自行处理的中断可写入dict_run['error']
+        with RunHooks.stage("FUTURE_save"):               当前阶段
+        RunHooks.plan(list_queues)                        WorkPlanner.run开始时登记计划
+        with RunHooks.unit(dict_unit) as dict_record:     在worker线程中包住每个工作单元，调用方把结果写入'result'（False表示失败）
+    """
+
+    @staticmethod
+    @contextmanager
+    def run():
+        """包住一次运行：开始各钩子，结束时关闭并写入运行历史"""
+        # 按[profile]配置或命令行开启分阶段性能分析（未开启时各阶段的包装不做任何事）
+        StageProfiler.start()
+        # 本机HTTP状态接口：当前阶段、进度、吞吐量和ETA
+        RunProgress.start()
+        # 结束时把各阶段、各工作单元的耗时/行数/字节数/错误写入run_history
+        RunHistory.start()
+        dict_run = {'error': None}
+        try:
+            yield dict_run
+        except BaseException as e:
+            dict_run['error'] = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            RunProgress.finish()
+            StageProfiler.finish()
+            RunHistory.finish(dict_run['error'])
+
+    @staticmethod
+    @contextmanager
+    def stage(str_stage: str):
+        """包住一个处理阶段"""
+        with StageProfiler.stage(str_stage), RunProgress.stage(str_stage), RunHistory.stage(str_stage):
+            yield
+
+    @staticmethod
+    def plan(list_queues: list):
+        """登记当前阶段的执行计划"""
+        RunProgress.plan(list_queues)
+
+    @staticmethod
+    @contextmanager
+    def unit(dict_unit: dict):
+        """包住一个工作单元，退出时把调用方写入的'result'传给各钩子的单元记录"""
+        dict_record = {'result': None}
+        with StageProfiler.unit(dict_unit), RunProgress.unit(dict_unit) as dict_progress, RunHistory.unit(dict_unit) as dict_history:
+            try:
+                yield dict_record
+            finally:
+                dict_progress['result'] = dict_history['result'] = dict_record['result']
@@ -0,0 +1,274 @@
+import configparser
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class RunProgress:
+    """
+    运行进度和预计剩余时间（本机HTTP状态接口）
+
+    运行期间在[progress] host:port上提供：
+        GET /             文本格式的状态（curl http://127.0.0.1:18870/ 查看）
+        GET /status.json  JSON格式的状态
+    内容包括当前阶段、当前计划的已完成/总单元数、最近若干滑动窗口内的单元/行/字节吞吐量、
+    按计划剩余的预估耗时和实际进度折算的预计剩余时间（ETA），以及处理中耗时最长的单元（超过预估数倍的标记为疑似卡住）。
+
+    用法与StageProfiler相同：
+        RunProgress.start() / RunProgress.finish()       包住一次运行
+        with RunProgress.stage("FUTURE_save"):            当前阶段
+        RunProgress.plan(list_queues)                      WorkPlanner.run开始时登记计划
+        with RunProgress.unit(dict_unit) as dict_record:   WorkPlanner在worker线程中包住每个工作单元
+        RunProgress.add(int_rows, int_bytes)               sink每次写入后累计行数和字节数
+    没有开启时都直接返回。
+    """
+
+    # 当前运行中的进度记录，None表示未开启
+    _obj_active = None
+
+    def __init__(self, list_window: list, int_top_n: int, float_stuck_factor: float, float_stuck_seconds: float):
+        self.list_window = list_window
+        self.int_top_n = int_top_n
+        self.float_stuck_factor = float_stuck_factor
+        self.float_stuck_seconds = float_stuck_seconds
+        self.lock = threading.Lock()
+        self.time_start = time.time()
+        self.list_stage = []
+        # 当前计划：标题、总单元数、worker数、总预估耗时、开始时间，以及已完成的单元数、失败数和预估耗时
+        self.dict_plan = None
+        # 处理中的单元：序号 -> 记录
+        self.dict_running = {}
+        self.int_next_id = 0
+        # (时间, 单元数, 行数, 字节数) 事件，保留最长窗口内的
+        self.deque_event = deque()
+        self.list_total = [0, 0, 0]
+        self.server = None
+
+    @classmethod
+    def start(cls):
+        """
+        按[progress]配置开始记录并启动HTTP状态接口，未开启时返回None
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        if not config.getboolean('progress', 'enable', fallback=True):
+            return None
+        list_window = [int(s) for s in config.get('progress', 'windows_seconds', fallback='10,60,300').split(',') if s.strip()]
+        obj_progress = cls(sorted(list_window), config.getint('progress', 'top_n', fallback=10),
+                           config.getfloat('progress', 'stuck_factor', fallback=5.0),
+                           config.getfloat('progress', 'stuck_min_seconds', fallback=300))
+        str_host = config.get('progress', 'host', fallback='127.0.0.1')
+        int_port = config.getint('progress', 'port', fallback=18870)
+        obj_progress._serve(str_host, int_port)
+        cls._obj_active = obj_progress
+        return obj_progress
+
+    @classmethod
+    def finish(cls):
+        """结束记录并关闭状态接口"""
+        obj_progress = cls._obj_active
+        if obj_progress is None:
+            return
+        cls._obj_active = None
+        if obj_progress.server is not None:
+            obj_progress.server.shutdown()
+            obj_progress.server.server_close()
+
+    def _serve(self, str_host: str, int_port: int):
+        """在后台线程启动HTTP服务，端口被占用（如同一台机器上的多个worker）时改用系统分配的端口"""
+        obj_progress = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                dict_status = obj_progress.snapshot()
+                if self.path.startswith('/status.json'):
+                    bytes_body = json.dumps(dict_status, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+                    str_type = 'application/json; charset=utf-8'
+                elif self.path == '/' or self.path.startswith('/status'):
+                    bytes_body = RunProgress.format_status(dict_status).encode('utf-8')
+                    str_type = 'text/plain; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', str_type)
+                self.send_header('Content-Length', str(len(bytes_body)))
+                self.end_headers()
+                self.wfile.write(bytes_body)
+
+            def log_message(self, format, *args):
+                # 不把访问日志打印到运行日志
+                pass
+
+        for int_try_port in [int_port, 0]:
+            try:
+                self.server = ThreadingHTTPServer((str_host, int_try_port), Handler)
+                break
+            except OSError as e:
+                print(f"【进度】端口 {int_try_port} 不可用: {str(e)}")
+        if self.server is None:
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="RunProgressServer", daemon=True).start()
+        print(f"【进度】状态接口: http://{str_host}:{self.server.server_address[1]}/ （JSON: /status.json）")
+
+    @classmethod
+    @contextmanager
+    def stage(cls, str_stage: str):
+        """包住一个处理阶段"""
+        obj_progress = cls._obj_active
+        if obj_progress is None:
+            yield
+            return
+        with obj_progress.lock:
+            obj_progress.list_stage.append(str_stage)
+        try:
+            yield
+        finally:
+            with obj_progress.lock:
+                obj_progress.list_stage.remove(str_stage)
+
+    @classmethod
+    def plan(cls, list_queues: list):
+        """登记一次WorkPlanner.run的计划（替换上一个计划）"""
+        obj_progress = cls._obj_active
+        if obj_progress is None:
+            return
+        list_units = [dict_unit for list_queue in list_queues for dict_unit in list_queue]
+        with obj_progress.lock:
+            obj_progress.dict_plan = {
+                'title': obj_progress.list_stage[-1] if obj_progress.list_stage else "",
+                'total_units': len(list_units),
+                'workers': max(len([q for q in list_queues if q]), 1),
+                'est_seconds': float(sum(dict_unit.get('est_seconds', 0) for dict_unit in list_units)),
+                'time_start': time.time(),
+                'done_units': 0,
+                'failed_units': 0,
+                'done_est_seconds': 0.0,
+            }
+
+    @classmethod
+    @contextmanager
+    def unit(cls, dict_unit: dict):
+        """
+        包住一个工作单元，调用方把结果写入yield的记录的'result'（False表示失败）
+        """
+        obj_progress = cls._obj_active
+        dict_record = {'InstrumentLongID': dict_unit.get('InstrumentLongID'), 'period': dict_unit.get('period'),
+                       'stage': dict_unit.get('stage'), 'est_seconds': float(dict_unit.get('est_seconds', 0) or 0),
+                       'time_start': time.time(), 'thread': threading.current_thread().name, 'result': None}
+        if obj_progress is None:
+            yield dict_record
+            return
+        with obj_progress.lock:
+            int_id = obj_progress.int_next_id
+            obj_progress.int_next_id += 1
+            obj_progress.dict_running[int_id] = dict_record
+        try:
+            yield dict_record
+        finally:
+            with obj_progress.lock:
+                del obj_progress.dict_running[int_id]
+                if obj_progress.dict_plan is not None:
+                    obj_progress.dict_plan['done_units'] += 1
+                    obj_progress.dict_plan['done_est_seconds'] += dict_record['est_seconds']
+                    if dict_record['result'] is False:
+                        obj_progress.dict_plan['failed_units'] += 1
+                obj_progress._add_event(1, 0, 0)
+
+    @classmethod
+    def add(cls, int_rows: int, int_bytes: int):
+        """累计写入的行数和字节数"""
+        obj_progress = cls._obj_active
+        if obj_progress is None:
+            return
+        with obj_progress.lock:
+            obj_progress._add_event(0, int_rows, int_bytes)
+
+    def _add_event(self, int_units: int, int_rows: int, int_bytes: int):
+        """记录一个事件并丢弃最长窗口以外的（调用方持有锁）"""
+        float_now = time.time()
+        self.deque_event.append((float_now, int_units, int_rows, int_bytes))
+        self.list_total[0] += int_units
+        self.list_total[1] += int_rows
+        self.list_total[2] += int_bytes
+        float_oldest = float_now - (self.list_window[-1] if self.list_window else 0)
+        while self.deque_event and self.deque_event[0][0] < float_oldest:
+            self.deque_event.popleft()
+
+    def snapshot(self) -> dict:
+        """当前状态"""
+        float_now = time.time()
+        with self.lock:
+            list_event = list(self.deque_event)
+            list_stage = list(self.list_stage)
+            dict_plan = None if self.dict_plan is None else dict(self.dict_plan)
+            list_running = [dict(r) for r in self.dict_running.values()]
+            list_total = list(self.list_total)
+
+        # 滑动窗口吞吐量（运行时间不足一个窗口时按实际时长计算）
+        list_rate = []
+        for int_window in self.list_window:
+            float_span = max(min(int_window, float_now - self.time_start), 1e-6)
+            list_in = [e for e in list_event if e[0] >= float_now - int_window]
+            list_rate.append({
+                'window_seconds': int_window,
+                'units_per_second': sum(e[1] for e in list_in) / float_span,
+                'rows_per_second': sum(e[2] for e in list_in) / float_span,
+                'bytes_per_second': sum(e[3] for e in list_in) / float_span,
+            })
+
+        # ETA：剩余预估耗时 / 已完成单元的 预估耗时 / 实际经过时间（已体现并发和预估偏差），没有完成单元时按worker数均分
+        if dict_plan is not None:
+            float_elapsed = float_now - dict_plan['time_start']
+            float_remaining_est = max(dict_plan['est_seconds'] - dict_plan['done_est_seconds'], 0.0)
+            if dict_plan['done_est_seconds'] > 0 and float_elapsed > 0:
+                float_speed = dict_plan['done_est_seconds'] / float_elapsed
+                dict_plan['eta_seconds'] = float_remaining_est / float_speed
+            else:
+                dict_plan['eta_seconds'] = float_remaining_est / dict_plan['workers']
+            dict_plan['elapsed_seconds'] = float_elapsed
+            dict_plan['remaining_units'] = dict_plan['total_units'] - dict_plan['done_units']
+            dict_plan['remaining_est_seconds'] = float_remaining_est
+
+        for dict_record in list_running:
+            dict_record['elapsed_seconds'] = float_now - dict_record['time_start']
+            dict_record['stuck'] = (dict_record['elapsed_seconds'] > self.float_stuck_seconds and
+                                    dict_record['elapsed_seconds'] > dict_record['est_seconds'] * self.float_stuck_factor)
+        list_running.sort(key=lambda r: r['elapsed_seconds'], reverse=True)
+
+        return {
+            'time': float_now,
+            'run_seconds': float_now - self.time_start,
+            'stage': list_stage[-1] if list_stage else None,
+            'stages': list_stage,
+            'plan': dict_plan,
+            'total': {'units': list_total[0], 'rows': list_total[1], 'bytes': list_total[2]},
+            'rates': list_rate,
+            'running_units': len(list_running),
+            'slowest_running': list_running[:self.int_top_n],
+        }
+
+    @staticmethod
+    def format_status(dict_status: dict) -> str:
+        """状态的文本格式"""
+        list_line = [f"运行时长 {dict_status['run_seconds']:.0f}秒，当前阶段: {' > '.join(dict_status['stages']) or '无'}"]
+        dict_plan = dict_status['plan']
+        if dict_plan is not None:
+            float_percent = dict_plan['done_units'] / dict_plan['total_units'] * 100 if dict_plan['total_units'] else 100.0
+            list_line.append(f"计划[{dict_plan['title']}]: 已完成 {dict_plan['done_units']}/{dict_plan['total_units']} 个单元 "
+                             f"({float_percent:.1f}%)，失败 {dict_plan['failed_units']}，已用 {dict_plan['elapsed_seconds']:.0f}秒，"
+                             f"剩余预估 {dict_plan['remaining_est_seconds']:.0f}秒，ETA {dict_plan['eta_seconds']:.0f}秒")
+        dict_total = dict_status['total']
+        list_line.append(f"累计: {dict_total['units']} 个单元，{dict_total['rows']} 行，{dict_total['bytes'] / 1024 / 1024:.1f}MB")
+        for dict_rate in dict_status['rates']:
+            list_line.append(f"最近{dict_rate['window_seconds']:>4}秒: {dict_rate['units_per_second'] * 60:8.1f} 单元/分钟 "
+                             f"{dict_rate['rows_per_second']:10.0f} 行/秒 {dict_rate['bytes_per_second'] / 1024 / 1024:8.2f} MB/秒")
+        list_line.append(f"处理中 {dict_status['running_units']} 个单元，耗时最长的:")
+        for dict_record in dict_status['slowest_running']:
+            list_line.append(f"  {dict_record['InstrumentLongID']:<16} {dict_record['period']:<5} {dict_record['stage'] or '':<9} "
+                             f"已用 {dict_record['elapsed_seconds']:8.1f}秒 预估 {dict_record['est_seconds']:8.1f}秒 "
+                             f"{dict_record['thread']}{' 【疑似卡住】' if dict_record['stuck'] else ''}")
+        return "\n".join(list_line) + "\n"
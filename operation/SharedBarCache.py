@@ -0,0 +1,350 @@
+import configparser
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing import AuthenticationError, shared_memory
+from multiprocessing.connection import Client, Listener
+import numpy as np
+from operation.PanelLoader import PanelLoader
+from utility import utility
+
+def _read_config() -> dict:
+    """读取app.ini的[cache]配置"""
+    config = configparser.ConfigParser()
+    config.read('./config/app.ini')
+    return {
+        'address': (config.get('cache', 'host', fallback='127.0.0.1'), config.getint('cache', 'port', fallback=18861)),
+        'authkey': config.get('cache', 'authkey', fallback='qmt-bar-cache').encode('utf-8'),
+        'memory_bytes': int(config.getfloat('cache', 'memory_mb', fallback=4096) * 1024 * 1024),
+    }
+
+def _attach_shared_memory(str_name: str) -> shared_memory.SharedMemory:
+    """
+    附加到已有的共享内存段
+    Python 3.13之前附加时也会在resource_tracker中登记，客户端进程退出时会把服务端的段删除，因此附加后取消登记
+    """
+    try:
+        return shared_memory.SharedMemory(name=str_name, track=False)
+    except TypeError:
+        obj_shm = shared_memory.SharedMemory(name=str_name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(obj_shm._name, "shared_memory")
+        except Exception:
+            pass
+        return obj_shm
+
+
+class SharedBarCacheServer:
+    """
+    本机共享内存K线缓存服务
+
+    研究进程请求 (合约, 周期, 复权类型, 字段) 时，服务端只加载一次文件，把时间和各字段写入一个共享内存段
+    （各列按64字节对齐依次存放），返回段名和各列的偏移；客户端附加后零拷贝得到NumPy数组。
+        - 引用计数：每个连接acquire加一、release或断开连接时减一
+        - LRU淘汰：总大小超过内存预算时，按最近最少使用顺序释放引用计数为0的段
+        - 失效：acquire时比较文件当前版本（快照清单的current或文件修改时间），保存阶段写入新数据后也会主动通知失效；
+                失效的段不再分配给新的请求，引用计数归零后释放
+        - 加载：文件读取和写入共享内存在服务锁之外进行，同一个键只有一个连接加载（加载中标记），
+                其他请求同一个键的连接等待加载完成，请求其他键和命中缓存的连接不受影响
+    """
+
+    INT_ALIGN = 64
+
+    def __init__(self):
+        dict_config = _read_config()
+        self.address = dict_config['address']
+        self.authkey = dict_config['authkey']
+        self.int_memory_bytes = dict_config['memory_bytes']
+        self.panel_loader = PanelLoader()
+        # key -> entry，按最近使用排序（最后为最近使用）
+        self.dict_entry = OrderedDict()
+        # 已失效但仍有引用的段
+        self.list_stale = []
+        # 正在加载的键 -> {'event': 加载完成事件, 'stale': 加载期间是否被通知失效}
+        self.dict_loading = {}
+        self.int_used_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_version(str_file_path: str) -> str:
+        """文件当前版本：当前物理文件（快照版本）路径和修改时间"""
+        str_read_path = utility.resolve_read_path(str_file_path)
+        return f"{os.path.basename(str_read_path)}@{os.stat(str_read_path).st_mtime_ns}"
+
+    def _load_entry(self, tuple_key: tuple, str_file_path: str, str_format: str, str_version: str) -> dict:
+        """读取文件并写入新的共享内存段"""
+        str_id, str_period, str_dividend_type, tuple_field = tuple_key
+        arr_time, dict_value = self.panel_loader._read_one(str_file_path, str_format, list(tuple_field), None, None)
+        list_array = [('time', arr_time.astype('int64', copy=False))] + [(f, dict_value[f]) for f in tuple_field]
+        list_column = []
+        int_offset = 0
+        for str_name, arr in list_array:
+            list_column.append({'name': str_name, 'offset': int_offset, 'dtype': arr.dtype.str, 'length': len(arr)})
+            int_offset += -(-arr.nbytes // self.INT_ALIGN) * self.INT_ALIGN
+        obj_shm = shared_memory.SharedMemory(create=True, size=max(int_offset, 1))
+        for dict_column, (_, arr) in zip(list_column, list_array):
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=obj_shm.buf, offset=dict_column['offset'])[:] = arr
+        return {'shm': obj_shm, 'columns': list_column, 'version': str_version, 'bytes': obj_shm.size,
+                'refcount': 0, 'key': tuple_key, 'path': str_file_path}
+
+    def _free(self, dict_entry: dict):
+        """释放共享内存段"""
+        dict_entry['shm'].close()
+        dict_entry['shm'].unlink()
+        self.int_used_bytes -= dict_entry['bytes']
+
+    def _evict(self):
+        """超过内存预算时按LRU释放没有引用的段"""
+        for tuple_key in list(self.dict_entry.keys()):
+            if self.int_used_bytes <= self.int_memory_bytes:
+                break
+            dict_entry = self.dict_entry[tuple_key]
+            if dict_entry['refcount'] == 0:
+                del self.dict_entry[tuple_key]
+                self._free(dict_entry)
+                print(f"【缓存】淘汰 {tuple_key[0]} {tuple_key[1]}，释放 {dict_entry['bytes'] / 1024 / 1024:.1f}MB")
+
+    def _retire(self, tuple_key: tuple):
+        """使某个段失效：没有引用立即释放，否则等引用归零"""
+        dict_entry = self.dict_entry.pop(tuple_key)
+        if dict_entry['refcount'] == 0:
+            self._free(dict_entry)
+        else:
+            self.list_stale.append(dict_entry)
+
+    def acquire(self, str_id: str, str_period: str, str_dividend_type: str, list_field: list) -> dict:
+        """获取段描述（必要时加载），引用计数加一"""
+        tuple_key = (str_id, str_period, str_dividend_type, tuple(list_field))
+        dict_file = self.panel_loader.resolve_files([str_id], str_period, str_dividend_type)
+        if str_id not in dict_file:
+            raise FileNotFoundError(f"没有找到 {str_id} {str_period} {str_dividend_type} 的数据文件")
+        str_file_path, str_format = dict_file[str_id]
+        str_version = self.get_version(str_file_path)
+        while True:
+            with self.lock:
+                dict_entry = self.dict_entry.get(tuple_key)
+                if dict_entry is not None and dict_entry['version'] != str_version:
+                    self._retire(tuple_key)
+                    dict_entry = None
+                if dict_entry is not None:
+                    self.dict_entry.move_to_end(tuple_key)
+                    dict_entry['refcount'] += 1
+                    self._evict()
+                    return self._describe(dict_entry)
+                dict_loading = self.dict_loading.get(tuple_key)
+                if dict_loading is None:
+                    dict_loading = {'event': threading.Event(), 'stale': False}
+                    self.dict_loading[tuple_key] = dict_loading
+                    break
+            # 其他连接正在加载同一个键，完成后重新检查（加载失败时由本连接重新加载）
+            dict_loading['event'].wait()
+
+        # 在锁外读取文件并写入共享内存
+        try:
+            dict_entry = self._load_entry(tuple_key, str_file_path, str_format, str_version)
+        except BaseException:
+            with self.lock:
+                self.dict_loading.pop(tuple_key, None)
+            dict_loading['event'].set()
+            raise
+        with self.lock:
+            self.dict_loading.pop(tuple_key, None)
+            self.int_used_bytes += dict_entry['bytes']
+            dict_entry['refcount'] += 1
+            if dict_loading['stale']:
+                # 加载期间被通知失效：本次请求仍使用，引用归零后释放
+                self.list_stale.append(dict_entry)
+            else:
+                if tuple_key in self.dict_entry:
+                    self._retire(tuple_key)
+                self.dict_entry[tuple_key] = dict_entry
+            print(f"【缓存】加载 {str_id} {str_period} {list(list_field)}，{dict_entry['bytes'] / 1024 / 1024:.1f}MB，"
+                  f"已用 {self.int_used_bytes / 1024 / 1024:.1f}MB")
+            self._evict()
+        dict_loading['event'].set()
+        return self._describe(dict_entry)
+
+    @staticmethod
+    def _describe(dict_entry: dict) -> dict:
+        """返回给客户端的段描述"""
+        return {'shm_name': dict_entry['shm'].name, 'columns': dict_entry['columns'], 'version': dict_entry['version']}
+
+    def release(self, str_shm_name: str):
+        """引用计数减一，失效段引用归零时释放"""
+        with self.lock:
+            for dict_entry in list(self.dict_entry.values()) + self.list_stale:
+                if dict_entry['shm'].name == str_shm_name:
+                    dict_entry['refcount'] = max(dict_entry['refcount'] - 1, 0)
+                    if dict_entry in self.list_stale and dict_entry['refcount'] == 0:
+                        self.list_stale.remove(dict_entry)
+                        self._free(dict_entry)
+                    break
+            self._evict()
+
+    def invalidate(self, list_instrument_long_id: list = None):
+        """使合约（None为全部）的段失效，保存阶段发布新数据后调用"""
+        with self.lock:
+            for tuple_key in list(self.dict_entry.keys()):
+                if list_instrument_long_id is None or tuple_key[0] in list_instrument_long_id:
+                    self._retire(tuple_key)
+            for tuple_key, dict_loading in self.dict_loading.items():
+                if list_instrument_long_id is None or tuple_key[0] in list_instrument_long_id:
+                    dict_loading['stale'] = True
+
+    def stats(self) -> dict:
+        """缓存状态"""
+        with self.lock:
+            return {'entries': len(self.dict_entry), 'stale': len(self.list_stale), 'used_bytes': self.int_used_bytes,
+                    'budget_bytes': self.int_memory_bytes,
+                    'refcount': {f"{k[0]} {k[1]}": v['refcount'] for k, v in self.dict_entry.items()}}
+
+    def _serve_connection(self, conn):
+        """处理一个客户端连接，断开时释放该连接持有的所有引用"""
+        list_held = []
+        try:
+            while True:
+                try:
+                    tuple_request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                str_command, tuple_args = tuple_request[0], tuple_request[1:]
+                try:
+                    if str_command == "acquire":
+                        result = self.acquire(*tuple_args)
+                        list_held.append(result['shm_name'])
+                    elif str_command == "release":
+                        self.release(*tuple_args)
+                        if tuple_args[0] in list_held:
+                            list_held.remove(tuple_args[0])
+                        result = True
+                    elif str_command == "invalidate":
+                        self.invalidate(*tuple_args)
+                        result = True
+                    elif str_command == "stats":
+                        result = self.stats()
+                    else:
+                        raise ValueError(f"未知命令: {str_command}")
+                    conn.send(('ok', result))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+        finally:
+            for str_shm_name in list_held:
+                self.release(str_shm_name)
+            conn.close()
+
+    def serve_forever(self):
+        """监听本机端口，每个客户端连接一个线程"""
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"【缓存】服务启动 {self.address[0]}:{self.address[1]}，内存预算 {self.int_memory_bytes / 1024 / 1024:.0f}MB")
+            try:
+                while True:
+                    conn = listener.accept()
+                    threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+            finally:
+                with self.lock:
+                    for dict_entry in list(self.dict_entry.values()) + self.list_stale:
+                        self._free(dict_entry)
+                    self.dict_entry.clear()
+                    self.list_stale.clear()
+
+
+class SharedBarCacheClient:
+    """
+    共享内存K线缓存客户端
+
+    用法:
+        with SharedBarCacheClient() as client:
+            dict_array = client.load("ag00.SF", "1m", ["close", "volume"])
+            dict_array['time'], dict_array['close']  # 只读NumPy数组，直接引用共享内存
+    数组在release（或关闭客户端）之后不可再使用。
+    """
+
+    def __init__(self):
+        dict_config = _read_config()
+        self.conn = Client(dict_config['address'], authkey=dict_config['authkey'])
+        # 段名 -> [SharedMemory, 本客户端load次数]
+        self.dict_shm = {}
+
+    def _call(self, *tuple_request):
+        self.conn.send(tuple_request)
+        str_status, result = self.conn.recv()
+        if str_status != 'ok':
+            raise RuntimeError(result)
+        return result
+
+    def load(self, str_instrument_long_id: str, str_period: str, list_field: list = None, str_dividend_type: str = "none") -> dict:
+        """
+        获取合约的时间和字段数组（零拷贝）
+
+        Returns:
+            dict: 'time'和各字段 -> 只读np.ndarray，'_shm_name'为段名（release时使用）
+        """
+        dict_desc = self._call("acquire", str_instrument_long_id, str_period, str_dividend_type, list(list_field or ['close']))
+        if dict_desc['shm_name'] not in self.dict_shm:
+            self.dict_shm[dict_desc['shm_name']] = [_attach_shared_memory(dict_desc['shm_name']), 0]
+        obj_shm = self.dict_shm[dict_desc['shm_name']][0]
+        self.dict_shm[dict_desc['shm_name']][1] += 1
+        dict_array = {'_shm_name': dict_desc['shm_name']}
+        for dict_column in dict_desc['columns']:
+            arr = np.ndarray((dict_column['length'],), dtype=np.dtype(dict_column['dtype']), buffer=obj_shm.buf, offset=dict_column['offset'])
+            arr.flags.writeable = False
+            dict_array[dict_column['name']] = arr
+        return dict_array
+
+    def release(self, dict_array: dict):
+        """释放load返回的数组（之后不可再使用这些数组）"""
+        str_shm_name = dict_array['_shm_name']
+        dict_array.clear()
+        self._call("release", str_shm_name)
+        list_attached = self.dict_shm.get(str_shm_name)
+        if list_attached is not None:
+            list_attached[1] -= 1
+            if list_attached[1] <= 0:
+                del self.dict_shm[str_shm_name]
+                try:
+                    list_attached[0].close()
+                except BufferError:
+                    # 仍有数组引用该段，进程退出时释放映射
+                    pass
+
+    def stats(self) -> dict:
+        return self._call("stats")
+
+    def close(self):
+        """关闭连接，服务端会释放该连接持有的引用"""
+        self.conn.close()
+        for obj_shm, _ in self.dict_shm.values():
+            try:
+                obj_shm.close()
+            except BufferError:
+                pass
+        self.dict_shm.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def notify_invalidate(list_instrument_long_id: list = None) -> bool:
+        """
+        通知缓存服务使合约的数据失效（保存阶段调用），服务没有运行时直接返回False；
+        认证失败（[cache] authkey与服务不一致）等其他错误打印后返回False，不影响保存阶段
+
+        Args:
+            list_instrument_long_id: 合约列表，None表示全部
+        """
+        try:
+            with SharedBarCacheClient() as client:
+                client._call("invalidate", list_instrument_long_id)
+            return True
+        except ConnectionRefusedError:
+            return False
+        except AuthenticationError as e:
+            print(f"【缓存】通知缓存服务失败，认证失败（检查[cache] authkey与服务端是否一致）: {str(e)}")
+            return False
+        except (OSError, EOFError, RuntimeError) as e:
+            print(f"【缓存】通知缓存服务失败: {str(e)}")
+            return False
@@ -0,0 +1,289 @@
+import configparser
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+class StageProfiler:
+    """
+    分阶段CPU性能分析（可选开启）
+
+    用法：
+        with StageProfiler.stage("FUTURE_save"):     # 包住一个处理阶段
+            ...
+        with StageProfiler.unit(dict_unit):          # WorkPlanner在worker线程中包住每个工作单元
+            ...
+    没有开启时两者都直接返回，不产生开销。
+
+    两种模式：
+        sampling（默认，可在生产环境常开）：后台线程每interval_ms毫秒采集一次所有线程的调用栈（sys._current_frames），
+            样本记入当时最内层的阶段；由样本生成折叠栈文件（.collapsed，可直接交给flamegraph.pl、speedscope等）
+            和pstats文件（.pstats，nc为样本数，tt/ct为样本数乘以采样间隔估计的自身/累计耗时）
+        deterministic：在此基础上每个阶段和每个工作单元用cProfile精确统计，.pstats为cProfile的结果，开销较大，用于排查
+    指定instruments时，这些合约的工作单元另外单独输出 {阶段}.{合约}.pstats/.collapsed。
+    嵌套的阶段互不包含（每个样本/调用只记入最内层阶段）；工作单元计入所在阶段。
+    运行结束（finish）时把各阶段自身耗时最多的函数排名打印到运行日志。
+    """
+
+    # 空闲等待的栈顶函数（线程池空闲worker、等待锁/条件变量），不记入样本
+    SET_IDLE_FUNC = {("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("thread.py", "_worker"),
+                     ("queue.py", "get"), ("selectors.py", "select")}
+
+    # 当前运行中的分析器，None表示未开启
+    _obj_active = None
+    # 命令行覆盖的配置（mode、instruments）
+    _dict_override = {}
+
+    def __init__(self, str_mode: str, float_interval: float, str_output_dir: str, set_instrument: set, int_top_n: int):
+        self.str_mode = str_mode
+        self.float_interval = float_interval
+        self.str_output_dir = str_output_dir
+        self.set_instrument = set_instrument
+        self.int_top_n = int_top_n
+        self.lock = threading.Lock()
+        # 阶段栈（只由进入阶段的线程修改），样本记入栈顶阶段
+        self.list_stage = []
+        # 名称（阶段或 阶段.合约）-> Counter((线程名, 调用栈), 样本数)
+        self.dict_samples = {}
+        # 名称 -> pstats.Stats（deterministic）
+        self.dict_pstats = {}
+        # 线程id -> 正在处理的合约（只记录instruments中的合约）
+        self.dict_thread_unit = {}
+        # 每个线程当前启用的cProfile栈
+        self.local = threading.local()
+        self.dict_code_key = {}
+        self.event_stop = threading.Event()
+        self.thread_sampler = threading.Thread(target=self._sample_loop, name="StageProfilerSampler", daemon=True)
+
+    @classmethod
+    def configure(cls, str_mode: str = None, list_instrument: list = None):
+        """命令行开启分析（覆盖app.ini的[profile]配置）"""
+        if str_mode is not None:
+            cls._dict_override['mode'] = str_mode
+        if list_instrument is not None:
+            cls._dict_override['instruments'] = list_instrument
+
+    @classmethod
+    def start(cls):
+        """
+        按配置开始一次运行的分析，未开启时返回None
+
+        Returns:
+            StageProfiler: 运行中的分析器
+        """
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        str_mode = cls._dict_override.get('mode')
+        if str_mode is None:
+            if not config.getboolean('profile', 'enable', fallback=False):
+                return None
+            str_mode = config.get('profile', 'mode', fallback='sampling')
+        list_instrument = cls._dict_override.get('instruments')
+        if list_instrument is None:
+            list_instrument = [s.strip() for s in config.get('profile', 'instruments', fallback='').split(',') if s.strip()]
+        str_output_dir = os.path.join(config.get('profile', 'output_dir', fallback='logs/profile'), datetime.now().strftime('%Y%m%d_%H%M%S'))
+        os.makedirs(str_output_dir, exist_ok=True)
+        obj_profiler = cls(str_mode, config.getfloat('profile', 'interval_ms', fallback=10) / 1000, str_output_dir,
+                           set(list_instrument), config.getint('profile', 'top_n', fallback=15))
+        obj_profiler.thread_sampler.start()
+        cls._obj_active = obj_profiler
+        print(f"【性能分析】已开启，模式: {str_mode}，采样间隔: {obj_profiler.float_interval * 1000:.0f}ms，"
+              f"单独分析的合约: {sorted(list_instrument) or '无'}，输出目录: {str_output_dir}")
+        return obj_profiler
+
+    @classmethod
+    @contextmanager
+    def stage(cls, str_stage: str):
+        """包住一个处理阶段"""
+        obj_profiler = cls._obj_active
+        if obj_profiler is None:
+            yield
+            return
+        obj_profiler.list_stage.append(str_stage)
+        obj_profile = obj_profiler._push_profile() if obj_profiler.str_mode == "deterministic" else None
+        try:
+            yield
+        finally:
+            if obj_profile is not None:
+                obj_profiler._pop_profile(obj_profile, [str_stage])
+            obj_profiler.list_stage.pop()
+            obj_profiler._write(str_stage)
+
+    @classmethod
+    @contextmanager
+    def unit(cls, dict_unit: dict):
+        """包住一个工作单元（在worker线程中执行）"""
+        obj_profiler = cls._obj_active
+        if obj_profiler is None or not obj_profiler.list_stage:
+            yield
+            return
+        str_stage = obj_profiler.list_stage[-1]
+        str_id = dict_unit.get('InstrumentLongID')
+        bool_selected = str_id in obj_profiler.set_instrument
+        int_ident = threading.get_ident()
+        if bool_selected:
+            with obj_profiler.lock:
+                obj_profiler.dict_thread_unit[int_ident] = str_id
+        obj_profile = obj_profiler._push_profile() if obj_profiler.str_mode == "deterministic" else None
+        try:
+            yield
+        finally:
+            if obj_profile is not None:
+                obj_profiler._pop_profile(obj_profile, [str_stage] + ([f"{str_stage}.{str_id}"] if bool_selected else []))
+            if bool_selected:
+                with obj_profiler.lock:
+                    obj_profiler.dict_thread_unit.pop(int_ident, None)
+                obj_profiler._write(f"{str_stage}.{str_id}")
+
+    @classmethod
+    def finish(cls):
+        """结束分析：停止采样，写出所有文件并打印各阶段热点排名"""
+        obj_profiler = cls._obj_active
+        if obj_profiler is None:
+            return
+        cls._obj_active = None
+        obj_profiler.event_stop.set()
+        obj_profiler.thread_sampler.join()
+        with obj_profiler.lock:
+            list_name = sorted(set(obj_profiler.dict_samples) | set(obj_profiler.dict_pstats))
+        for str_name in list_name:
+            obj_profiler._write(str_name)
+            obj_profiler.print_hotspots(str_name)
+        print(f"【性能分析】结果已保存到: {obj_profiler.str_output_dir}")
+
+    def _push_profile(self) -> cProfile.Profile:
+        """在当前线程启用新的cProfile，暂停外层的"""
+        list_profile = getattr(self.local, 'list_profile', None)
+        if list_profile is None:
+            list_profile = self.local.list_profile = []
+        if list_profile:
+            list_profile[-1].disable()
+        obj_profile = cProfile.Profile()
+        list_profile.append(obj_profile)
+        obj_profile.enable()
+        return obj_profile
+
+    def _pop_profile(self, obj_profile: cProfile.Profile, list_name: list):
+        """停止当前线程的cProfile并合并到各名称的统计，恢复外层的"""
+        obj_profile.disable()
+        list_profile = self.local.list_profile
+        list_profile.pop()
+        with self.lock:
+            for str_name in list_name:
+                if str_name in self.dict_pstats:
+                    self.dict_pstats[str_name].add(obj_profile)
+                else:
+                    self.dict_pstats[str_name] = pstats.Stats(obj_profile)
+        if list_profile:
+            list_profile[-1].enable()
+
+    def _code_key(self, obj_code) -> tuple:
+        """代码对象 -> pstats的函数键 (文件, 行号, 函数名)"""
+        tuple_key = self.dict_code_key.get(obj_code)
+        if tuple_key is None:
+            tuple_key = self.dict_code_key[obj_code] = (obj_code.co_filename, obj_code.co_firstlineno, obj_code.co_name)
+        return tuple_key
+
+    def _sample_loop(self):
+        """采样线程：每个间隔记录一次所有线程（除自身）的调用栈"""
+        int_self = threading.get_ident()
+        while not self.event_stop.wait(self.float_interval):
+            if not self.list_stage:
+                continue
+            try:
+                str_stage = self.list_stage[-1]
+            except IndexError:
+                continue
+            dict_thread_name = {t.ident: t.name for t in threading.enumerate()}
+            list_sample = []
+            for int_ident, frame in sys._current_frames().items():
+                if int_ident == int_self:
+                    continue
+                list_key = []
+                while frame is not None:
+                    list_key.append(self._code_key(frame.f_code))
+                    frame = frame.f_back
+                if not list_key or (os.path.basename(list_key[0][0]), list_key[0][2]) in self.SET_IDLE_FUNC:
+                    continue
+                list_sample.append((int_ident, dict_thread_name.get(int_ident, str(int_ident)), tuple(reversed(list_key))))
+            with self.lock:
+                for int_ident, str_thread_name, tuple_stack in list_sample:
+                    self.dict_samples.setdefault(str_stage, Counter())[(str_thread_name, tuple_stack)] += 1
+                    str_id = self.dict_thread_unit.get(int_ident)
+                    if str_id is not None:
+                        self.dict_samples.setdefault(f"{str_stage}.{str_id}", Counter())[(str_thread_name, tuple_stack)] += 1
+
+    def samples_to_stats(self, counter_sample: Counter) -> dict:
+        """
+        样本 -> pstats格式的统计字典 {(文件, 行号, 函数名): (cc, nc, tt, ct, callers)}
+        nc/cc为函数出现在栈中的样本数，tt为栈顶样本数乘以采样间隔，ct为出现在栈中的样本数乘以采样间隔
+        """
+        dict_stats = {}
+        for (_, tuple_stack), int_cnt in counter_sample.items():
+            float_seconds = int_cnt * self.float_interval
+            set_seen = set()
+            for int_idx, tuple_key in enumerate(tuple_stack):
+                list_value = dict_stats.get(tuple_key)
+                if list_value is None:
+                    list_value = dict_stats[tuple_key] = [0, 0, 0.0, 0.0, {}]
+                if tuple_key not in set_seen:
+                    # 递归函数每个样本只计一次
+                    set_seen.add(tuple_key)
+                    list_value[0] += int_cnt
+                    list_value[1] += int_cnt
+                    list_value[3] += float_seconds
+                if int_idx == len(tuple_stack) - 1:
+                    list_value[2] += float_seconds
+                if int_idx > 0:
+                    tuple_caller = tuple_stack[int_idx - 1]
+                    list_value[4][tuple_caller] = list_value[4].get(tuple_caller, 0) + int_cnt
+        return {k: (v[0], v[1], v[2], v[3], v[4]) for k, v in dict_stats.items()}
+
+    @staticmethod
+    def format_frame(tuple_key: tuple) -> str:
+        """折叠栈中的函数名：函数名 (文件名:行号)"""
+        return f"{tuple_key[2]} ({os.path.basename(tuple_key[0])}:{tuple_key[1]})".replace(";", ":")
+
+    def get_stats(self, str_name: str) -> dict:
+        """名称对应的pstats统计字典（deterministic为cProfile结果，否则由样本生成）"""
+        with self.lock:
+            obj_stats = self.dict_pstats.get(str_name)
+            if obj_stats is not None:
+                return dict(obj_stats.stats)
+            counter_sample = Counter(self.dict_samples.get(str_name, {}))
+        return self.samples_to_stats(counter_sample)
+
+    def _write(self, str_name: str):
+        """写出 名称.pstats 和 名称.collapsed"""
+        str_base = os.path.join(self.str_output_dir, str_name.replace(os.sep, "_"))
+        with self.lock:
+            counter_sample = Counter(self.dict_samples.get(str_name, {}))
+            obj_stats = self.dict_pstats.get(str_name)
+            if obj_stats is not None:
+                obj_stats.dump_stats(str_base + ".pstats")
+        if obj_stats is None and counter_sample:
+            with open(str_base + ".pstats", 'wb') as f:
+                marshal.dump(self.samples_to_stats(counter_sample), f)
+        if counter_sample:
+            with open(str_base + ".collapsed", 'w', encoding='utf-8') as f:
+                for (str_thread_name, tuple_stack), int_cnt in counter_sample.most_common():
+                    f.write(";".join([str_thread_name.replace(";", ":")] + [self.format_frame(k) for k in tuple_stack]) + f" {int_cnt}\n")
+
+    def print_hotspots(self, str_name: str):
+        """打印自身耗时最多的函数"""
+        dict_stats = self.get_stats(str_name)
+        if not dict_stats:
+            return
+        float_total = sum(v[2] for v in dict_stats.values())
+        list_top = sorted(dict_stats.items(), key=lambda item: item[1][2], reverse=True)[:self.int_top_n]
+        print(f"\n【性能分析】{str_name} 热点（{'cProfile' if self.str_mode == 'deterministic' else '采样估计'}，"
+              f"自身耗时合计 {float_total:.2f}秒）:")
+        print(f"  {'自身耗时':>10} {'占比':>7} {'累计耗时':>10}  函数")
+        for tuple_key, (_, _, float_tt, float_ct, _) in list_top:
+            float_ratio = float_tt / float_total * 100 if float_total > 0 else 0.0
+            print(f"  {float_tt:>9.2f}s {float_ratio:>6.1f}% {float_ct:>9.2f}s  {self.format_frame(tuple_key)}")
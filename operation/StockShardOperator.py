@@ -0,0 +1,219 @@
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from operation.MysqlOperator import MysqlOperator
+from operation.QMTOperator import QMTOperator
+from operation.AdjustFactorOperator import AdjustFactorOperator
+from operation.RunHooks import RunHooks
+
+class StockShardOperator:
+    """
+    股票分片下载保存操作器
+
+    将全部A股按 交易所-板块 切分为若干分片，每个分片独立完成 下载 -> 除权检测 -> 保存。
+    只增量追加不复权数据；复权价格由本地复权因子在读取时计算，
+    因此只需对锚点之后出现新除权除息的股票刷新因子文件。
+    整个运行受时间预算约束，放不下的分片留到下次运行优先处理。
+    """
+
+    # 代码前缀 -> 板块名称，按交易所区分
+    DICT_BOARD_PREFIX = {
+        "SH": [("688", "科创板"), ("689", "科创板"), ("60", "主板")],
+        "SZ": [("30", "创业板"), ("00", "主板")],
+    }
+
+    def __init__(self, qmt_operator: QMTOperator, mysql_operator: MysqlOperator):
+        """
+        初始化股票分片操作器
+
+        Args:
+            qmt_operator: QMT操作器，负责下载和保存
+            mysql_operator: MySQL操作器，负责读写分片日志和复权锚点
+        """
+        self.qmt_operator = qmt_operator
+        self.mysql_operator = mysql_operator
+        self.adjust_factor_operator = AdjustFactorOperator(market_data_cache=qmt_operator.market_data_cache)
+
+    @classmethod
+    def get_shard_id(cls, str_instrument_long_id: str) -> str:
+        """
+        根据股票长代码得到分片ID
+
+        Args:
+            str_instrument_long_id: 股票长代码，如"600000.SH"
+
+        Returns:
+            str: 分片ID，如"SH-主板"，无法识别的板块归入"其他"
+        """
+        str_code, str_exchange = str_instrument_long_id.split('.')
+        for str_prefix, str_board in cls.DICT_BOARD_PREFIX.get(str_exchange, []):
+            if str_code.startswith(str_prefix):
+                return f"{str_exchange}-{str_board}"
+        return f"{str_exchange}-其他"
+
+    def build_shards(self, df_save_log: pd.DataFrame) -> dict:
+        """
+        将保存日志按分片切分
+
+        Args:
+            df_save_log: init_save_log返回的股票保存日志
+
+        Returns:
+            dict: 分片ID -> 该分片的保存日志DataFrame
+        """
+        sr_shard_id = df_save_log['InstrumentLongID'].map(self.get_shard_id)
+        return {str_shard_id: df_shard for str_shard_id, df_shard in df_save_log.groupby(sr_shard_id)}
+
+    def detect_divid_changed(self, list_instrument_long_id: list) -> set:
+        """
+        批量检测锚点日之后出现新除权除息的股票
+
+        等比前复权价格以最新一次除权为基准向前调整，只要锚点之后发生过除权除息，
+        锚点日的前复权收盘价就会变化。因此对同一锚点日的所有股票只需一次
+        get_market_data_ex查询，与上次记录的锚点收盘价比较即可。
+        查询经过行情缓存（bool_fresh：锚点日的前复权价格在新除权后会变化，record模式不读旧缓存）。
+
+        Args:
+            list_instrument_long_id: 需要检测的股票长代码列表（应已下载到最新日线）
+
+        Returns:
+            set: 需要刷新复权因子的股票长代码集合（包括没有锚点记录的股票）
+        """
+        df_anchor = self.mysql_operator.get_divid_anchor(list_instrument_long_id)
+        # 没有锚点记录的股票（新上市或首次运行）需要首次获取因子
+        set_changed = set(list_instrument_long_id) - set(df_anchor['InstrumentLongID'])
+
+        # 正常情况下同一分片只有一个锚点日，即一次查询
+        for str_anchor_date, df_group in df_anchor.groupby('AnchorDate'):
+            list_code = df_group['InstrumentLongID'].tolist()
+            dict_result = self.qmt_operator.market_data_cache.get_market_data_ex(['close'], list_code, period='1d', dividend_type='front_ratio',
+                                                                                 start_time=str_anchor_date, end_time=str_anchor_date,
+                                                                                 count=-1, fill_data=False, bool_fresh=True)
+            for str_code, float_anchor_close in zip(list_code, df_group['AnchorClose'].astype(float)):
+                df_close = dict_result.get(str_code)
+                if df_close is None or df_close.empty:
+                    set_changed.add(str_code)
+                    continue
+                float_close = float(df_close['close'].iloc[-1])
+                if not np.isclose(float_close, float_anchor_close, rtol=1e-9, atol=1e-9):
+                    set_changed.add(str_code)
+
+        print(f"【除权检测】共 {len(list_instrument_long_id)} 只股票，需刷新复权因子 {len(set_changed)} 只")
+        return set_changed
+
+    def refresh_divid_anchor(self, list_instrument_long_id: list, dt_end: str) -> bool:
+        """
+        以每只股票最新一根日线作为新锚点，批量写入数据库
+
+        Args:
+            list_instrument_long_id: 股票长代码列表
+            dt_end: 查询截止时间
+
+        Returns:
+            bool: 操作是否成功
+        """
+        dict_result = self.qmt_operator.market_data_cache.get_market_data_ex(['close'], list_instrument_long_id, period='1d',
+                                                                             dividend_type='front_ratio', end_time=dt_end, count=1,
+                                                                             fill_data=False, bool_fresh=True)
+        list_anchor = []
+        for str_code in list_instrument_long_id:
+            df_close = dict_result.get(str_code)
+            if df_close is None or df_close.empty:
+                continue
+            list_anchor.append((str_code, str(df_close.index[-1])[:8], float(df_close['close'].iloc[-1])))
+        return self.mysql_operator.upsert_divid_anchor(list_anchor)
+
+    def estimate_shard_seconds(self, df_shard_log: pd.DataFrame, str_shard_id: str, int_code_count: int,
+                               float_default_seconds_per_code: float) -> float:
+        """
+        根据上次运行的单只股票耗时估算分片耗时
+
+        Args:
+            df_shard_log: 分片运行日志
+            str_shard_id: 分片ID
+            int_code_count: 本次分片股票数量
+            float_default_seconds_per_code: 没有历史记录时的单只股票预估耗时
+
+        Returns:
+            float: 预估耗时（秒）
+        """
+        df_hist = df_shard_log[df_shard_log['ShardID'] == str_shard_id] if not df_shard_log.empty else df_shard_log
+        if df_hist.empty or not df_hist.iloc[0]['CodeCount']:
+            return int_code_count * float_default_seconds_per_code
+        float_seconds_per_code = float(df_hist.iloc[0]['LastElapsed']) / int(df_hist.iloc[0]['CodeCount'])
+        return int_code_count * float_seconds_per_code
+
+    def run(self, df_save_log: pd.DataFrame, dt_init_begin: str, dt_init_end: str,
+            float_time_budget: float, float_default_seconds_per_code: float = 2.0, bool_resume: bool = False):
+        """
+        按分片下载并保存股票数据
+
+        分片按上次运行结束时间从早到晚排序（从未运行的最先），依次处理。
+        开始一个分片前，若已用时间加上该分片预估耗时超出预算，则跳过该分片，留待下次运行
+        （每次运行至少处理一个分片）。
+
+        Args:
+            df_save_log: init_save_log返回的股票保存日志
+            dt_init_begin: 初始下载开始时间
+            dt_init_end: 本次下载结束时间
+            float_time_budget: 本次运行的时间预算（秒）
+            float_default_seconds_per_code: 没有历史记录时的单只股票预估耗时（秒）
+            bool_resume: 断点续跑，跳过下载，按log_save中上次下载的时间范围保存
+        """
+        time_total_start = time.time()
+        dict_shards = self.build_shards(df_save_log)
+        df_shard_log = self.mysql_operator.get_stock_shard_log()
+
+        # 从未运行过的分片排最前，其余按上次运行结束时间升序
+        dict_last_run = {} if df_shard_log.empty else dict(zip(df_shard_log['ShardID'], df_shard_log['LastRunEnd']))
+        list_shard_id = sorted(dict_shards.keys(), key=lambda x: (dict_last_run.get(x) is not None, dict_last_run.get(x) or "", x))
+        print(f"【股票分片】共 {len(list_shard_id)} 个分片，时间预算 {float_time_budget:.0f}秒")
+
+        list_done = []
+        list_skipped = []
+        for str_shard_id in list_shard_id:
+            df_shard = dict_shards[str_shard_id]
+            list_code = df_shard['InstrumentLongID'].tolist()
+            float_estimate = self.estimate_shard_seconds(df_shard_log, str_shard_id, len(list_code), float_default_seconds_per_code)
+            float_used = time.time() - time_total_start
+            # 至少处理一个分片，保证超大分片也能轮转到
+            if list_done and float_used + float_estimate > float_time_budget:
+                print(f"【股票分片】{str_shard_id} 预估耗时 {float_estimate:.0f}秒，已用 {float_used:.0f}秒，超出预算，留待下次运行")
+                list_skipped.append(str_shard_id)
+                continue
+
+            print(f"\n【股票分片】开始处理 {str_shard_id}，共 {len(list_code)} 只股票，预估耗时 {float_estimate:.0f}秒")
+            time_shard_start = time.time()
+
+            # 下载（包含日线，保证除权检测使用最新除权信息）
+            if not bool_resume:
+                with RunHooks.stage("STOCK_download"):
+                    self.qmt_operator.download_barData(df_shard, str_instrument_category="STOCK",
+                                                       dt_init_begin=dt_init_begin, dt_init_end=dt_init_end)
+            # 一次批量查询检测有新除权除息的股票，只刷新这些股票的复权因子
+            with RunHooks.stage("STOCK_adjust_factor"):
+                set_changed_id = self.detect_divid_changed(list_code)
+                set_factor_failed = set_changed_id - set(self.adjust_factor_operator.save_factors(sorted(set_changed_id)))
+            # 不复权数据增量追加
+            with RunHooks.stage("STOCK_save"):
+                set_save_failed = self.qmt_operator.save_barData(str_instrument_category="STOCK", list_instrument_long_id=list_code,
+                                                                 bool_resume=bool_resume)
+            # 只更新因子刷新和保存都成功的股票的锚点；失败的保留旧锚点，下次仍会检测到新的除权除息并刷新因子
+            list_anchor_code = [s for s in list_code if s not in set_factor_failed and s not in set_save_failed]
+            if len(list_anchor_code) < len(list_code):
+                print(f"【除权检测】{len(list_code) - len(list_anchor_code)} 只股票复权因子或数据保存失败，不更新锚点")
+            if list_anchor_code:
+                self.refresh_divid_anchor(list_anchor_code, dt_init_end)
+
+            float_shard_elapsed = time.time() - time_shard_start
+            self.mysql_operator.update_stock_shard_log(str_shard_id, len(list_code), float_shard_elapsed,
+                                                       datetime.now().strftime('%Y%m%d%H%M%S'))
+            list_done.append(str_shard_id)
+            print(f"【股票分片】{str_shard_id} 处理完成，耗时: {float_shard_elapsed:.2f}秒（预估 {float_estimate:.0f}秒）")
+
+        time_total_elapsed = time.time() - time_total_start
+        print(f"\n【股票分片】完成 {len(list_done)} 个分片: {list_done}")
+        if list_skipped:
+            print(f"【股票分片】跳过 {len(list_skipped)} 个分片: {list_skipped}")
+        print(f"【股票分片】总耗时: {time_total_elapsed:.2f}秒")
@@ -0,0 +1,234 @@
+import configparser
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pandas as pd
+from operation.MysqlOperator import MysqlOperator
+from operation.BarCatalog import BarCatalog
+from operation.RunHooks import RunHooks
+from operation.MemoryGovernor import MemoryGovernor
+from utility import utility
+
+class WorkPlanner:
+    """
+    下载/保存工作规划器
+
+    先把一个阶段的全部工作拆成 (合约, 周期, 时间范围) 工作单元，并根据历史运行的数据量估算每个单元的
+    字节数和耗时，再按"最长作业优先"(LPT)分配到各个worker，使整体完成时间（makespan）尽量短。
+    每个单元执行完后记录实际耗时，作为下次估算的依据。
+    """
+
+    # 没有任何历史记录时，各周期每个自然日的预估字节数
+    DICT_DEFAULT_BYTES_PER_DAY = {
+        "tick": 3000000,
+        "1m": 40000,
+        "5m": 8000,
+        "15m": 3000,
+        "1h": 800,
+        "1d": 150,
+    }
+
+    def __init__(self, mysql_operator: MysqlOperator):
+        """
+        初始化规划器
+
+        Args:
+            mysql_operator: MySQL操作器，用于读写历史成本
+        """
+        self.mysql_operator = mysql_operator
+        config = configparser.ConfigParser()
+        config.read('./config/app.ini')
+        self.int_workers = config.getint('plan', 'workers', fallback=1)
+        self.float_bytes_per_second = config.getfloat('plan', 'default_mb_per_second', fallback=5.0) * 1024 * 1024
+        self.float_unit_overhead = config.getfloat('plan', 'unit_overhead_seconds', fallback=0.5)
+        self.lock = threading.Lock()
+        # 本地文件目录：估算时直接查询已有文件的大小和时间范围，不需要打开文件
+        self.catalog = BarCatalog() if config.getboolean('catalog', 'enable', fallback=True) else None
+        # 内存调控：按估算和实际峰值控制并发，单元结束后记录峰值
+        self.memory_governor = MemoryGovernor()
+
+    @staticmethod
+    def _to_datetime(dt_value) -> datetime:
+        """将14位时间字符串或datetime转换为datetime"""
+        if isinstance(dt_value, datetime):
+            return dt_value
+        return datetime.strptime(str(dt_value)[:14], '%Y%m%d%H%M%S')
+
+    @classmethod
+    def _days_between(cls, dt_begin, dt_end) -> float:
+        """两个时间之间的自然日数，至少为1"""
+        if dt_begin is None or dt_end is None or pd.isna(dt_begin) or pd.isna(dt_end):
+            return 1.0
+        return max((cls._to_datetime(dt_end) - cls._to_datetime(dt_begin)).total_seconds() / 86400, 1.0)
+
+    def build_units(self, df_log_save: pd.DataFrame, list_period: list, str_stage: str, str_data_save_path: str,
+                    dt_init_begin: str = None, dt_init_end: str = None) -> list:
+        """
+        构建工作单元列表并估算成本
+
+        下载阶段的时间范围与download_barData一致：从未下载过的从dt_init_begin开始，否则从上次下载结束时间开始，
+        到dt_init_end结束；保存阶段使用log_save中的下载时间范围。保存阶段如果传入dt_init_end（即下载之前的预演），
+        则按即将下载的时间范围估算。
+
+        估算优先级：
+            1. log_plan_cost中该合约周期的历史记录（每日字节数、每日耗时）
+            2. 目录中本地pkl文件的字节数 / 文件覆盖的自然日数（目录中没有记录时用文件大小 / log_save的时间范围），
+               耗时按默认吞吐量换算
+            3. DICT_DEFAULT_BYTES_PER_DAY
+
+        Args:
+            df_log_save: log_save表数据（需包含时间范围列）
+            list_period: 周期列表
+            str_stage: "download"或"save"
+            str_data_save_path: 数据保存目录，用于查找已有文件
+            dt_init_begin: 初始下载开始时间（下载阶段使用）
+            dt_init_end: 本次下载结束时间（下载阶段使用）
+
+        Returns:
+            list: 工作单元字典列表，字段为InstrumentLongID, period, stage, begin, end, row, est_bytes, est_seconds, existing_bytes
+        """
+        df_cost = self.mysql_operator.get_plan_cost()
+        dict_cost = {}
+        if not df_cost.empty:
+            for _, row_cost in df_cost.iterrows():
+                dict_cost[(row_cost['InstrumentLongID'], row_cost['Period'], row_cost['Stage'])] = row_cost
+
+        list_units = []
+        for _, row in df_log_save.iterrows():
+            if str_stage == "download" or dt_init_end is not None:
+                if row.get('download_begin_datetime') is None or pd.isna(row.get('download_begin_datetime')):
+                    dt_begin, dt_end = dt_init_begin, dt_init_end
+                else:
+                    dt_begin, dt_end = row['download_end_datetime'], dt_init_end
+            else:
+                dt_begin, dt_end = row['download_begin_datetime'], row['download_end_datetime']
+            float_days = self._days_between(dt_begin, dt_end)
+
+            for str_period in list_period:
+                row_cost = dict_cost.get((row['InstrumentLongID'], str_period, str_stage))
+                row_save_cost = dict_cost.get((row['InstrumentLongID'], str_period, "save"))
+                str_file_path = utility.get_bar_file_path(str_data_save_path, row, str_period)
+
+                # 字节数：以保存阶段记录的实际增量为准（下载阶段无法直接测量字节数）
+                dict_entry = self.catalog.get_entry(str_file_path) if self.catalog is not None else None
+                if row_save_cost is not None and row_save_cost['BytesPerDay'] > 0:
+                    float_bytes_per_day = float(row_save_cost['BytesPerDay'])
+                elif dict_entry is not None and dict_entry['MinTime'] is not None:
+                    float_bytes_per_day = dict_entry['ByteSize'] / max((dict_entry['MaxTime'] - dict_entry['MinTime']) / 86400000, 1.0)
+                elif utility.file_exists(str_file_path):
+                    float_bytes_per_day = os.path.getsize(utility.resolve_read_path(str_file_path)) / self._days_between(row.get('init_datetime'), row.get('save_end_datetime'))
+                else:
+                    float_bytes_per_day = self.DICT_DEFAULT_BYTES_PER_DAY.get(str_period, 1000)
+                float_est_bytes = float_bytes_per_day * float_days
+                # 已有文件的字节数，保存时需要读入合并，用于内存估算
+                if dict_entry is not None:
+                    int_existing_bytes = int(dict_entry['ByteSize'] or 0)
+                elif str_stage == "save" and utility.file_exists(str_file_path):
+                    int_existing_bytes = os.path.getsize(utility.resolve_read_path(str_file_path))
+                else:
+                    int_existing_bytes = 0
+
+                if row_cost is not None and row_cost['SecondsPerDay'] > 0:
+                    float_est_seconds = float(row_cost['SecondsPerDay']) * float_days
+                else:
+                    float_est_seconds = float_est_bytes / self.float_bytes_per_second + self.float_unit_overhead
+
+                list_units.append({
+                    'InstrumentLongID': row['InstrumentLongID'],
+                    'period': str_period,
+                    'stage': str_stage,
+                    'begin': dt_begin,
+                    'end': dt_end,
+                    'row': row,
+                    'est_bytes': float_est_bytes,
+                    'est_seconds': float_est_seconds,
+                    'existing_bytes': int_existing_bytes,
+                })
+        return list_units
+
+    def schedule(self, list_units: list, int_workers: int = None) -> list:
+        """
+        最长作业优先(LPT)调度：按预估耗时降序，每次分配给当前负载最小的worker
+
+        Args:
+            list_units: 工作单元列表
+            int_workers: worker数量，默认取配置
+
+        Returns:
+            list: 每个worker的工作单元队列（队列内按预估耗时降序）
+        """
+        int_workers = max(int_workers or self.int_workers, 1)
+        list_queues = [[] for _ in range(int_workers)]
+        # 堆元素为 (当前负载, worker序号)
+        list_heap = [(0.0, idx) for idx in range(int_workers)]
+        for dict_unit in sorted(list_units, key=lambda x: x['est_seconds'], reverse=True):
+            float_load, idx = heapq.heappop(list_heap)
+            list_queues[idx].append(dict_unit)
+            heapq.heappush(list_heap, (float_load + dict_unit['est_seconds'], idx))
+        return list_queues
+
+    @staticmethod
+    def print_plan(list_queues: list, str_title: str = ""):
+        """
+        打印计划：总单元数、预估字节数、每个worker的负载和预估完成时间（makespan）
+        """
+        list_units = [dict_unit for list_queue in list_queues for dict_unit in list_queue]
+        float_total_bytes = sum(dict_unit['est_bytes'] for dict_unit in list_units)
+        float_total_seconds = sum(dict_unit['est_seconds'] for dict_unit in list_units)
+        list_loads = [sum(dict_unit['est_seconds'] for dict_unit in list_queue) for list_queue in list_queues]
+        print(f"\n【执行计划】{str_title}")
+        print(f"【执行计划】工作单元: {len(list_units)} 个，预估数据量: {float_total_bytes / 1024 / 1024:.1f}MB，"
+              f"串行预估耗时: {float_total_seconds:.0f}秒")
+        for idx, (list_queue, float_load) in enumerate(zip(list_queues, list_loads)):
+            print(f"【执行计划】worker{idx}: {len(list_queue)} 个单元，预估耗时 {float_load:.0f}秒")
+        print(f"【执行计划】预估完成时间(makespan): {max(list_loads) if list_loads else 0:.0f}秒")
+        # 打印最重的几个单元
+        for dict_unit in sorted(list_units, key=lambda x: x['est_seconds'], reverse=True)[:10]:
+            print(f"【执行计划】  {dict_unit['InstrumentLongID']} {dict_unit['period']} "
+                  f"{dict_unit['begin']} - {dict_unit['end']} 预估 {dict_unit['est_seconds']:.1f}秒 "
+                  f"{dict_unit['est_bytes'] / 1024 / 1024:.2f}MB")
+        return max(list_loads) if list_loads else 0, float_total_bytes
+
+    def run(self, list_queues: list, func_unit, func_done=None):
+        """
+        按计划执行：每个worker一个线程，依次处理自己的队列
+
+        func_unit(dict_unit)在worker线程中执行，不应访问数据库，返回实际字节数（未知返回None，失败返回False）；
+        func_done(dict_unit, float_elapsed, result)在锁内串行执行，可以安全地更新数据库。
+        执行完成后把实际每日耗时、每日字节数写入log_plan_cost，供下次估算。
+
+        Args:
+            list_queues: schedule返回的队列
+            func_unit: 处理单个工作单元的函数
+            func_done: 单元完成后的回调
+        """
+        list_cost = []
+
+        def worker(list_queue):
+            for dict_unit in list_queue:
+                time_unit_start = time.time()
+                with self.memory_governor.admit(dict_unit), RunHooks.unit(dict_unit) as dict_record:
+                    result = func_unit(dict_unit)
+                    dict_record['result'] = result
+                float_elapsed = time.time() - time_unit_start
+                with self.lock:
+                    # 失败或没有新数据的单元不更新历史成本
+                    if result is None or (result is not False and result > 0):
+                        float_days = self._days_between(dict_unit['begin'], dict_unit['end'])
+                        float_bytes_per_day = result / float_days if result else 0.0
+                        list_cost.append((dict_unit['InstrumentLongID'], dict_unit['period'], dict_unit['stage'],
+                                          float_bytes_per_day, float_elapsed / float_days))
+                    if func_done is not None:
+                        func_done(dict_unit, float_elapsed, result)
+
+        list_queues = [list_queue for list_queue in list_queues if list_queue]
+        RunHooks.plan(list_queues)
+        if len(list_queues) == 1:
+            worker(list_queues[0])
+        elif list_queues:
+            with ThreadPoolExecutor(max_workers=len(list_queues)) as executor:
+                list(executor.map(worker, list_queues))
+        self.mysql_operator.upsert_plan_cost(list_cost)
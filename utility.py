@@ -2,21 +2,37 @@ from joblib import dump, load
 import numpy as np
 import pandas as pd
 import os
+import json
+import shutil
+import time
+import threading
+import configparser
 from datetime import datetime, timezone, timedelta
 import pyarrow as pa
 import pyarrow.parquet as pq
+import pyarrow.feather as feather
 
 class utility:
     """数据工具类，用于处理数据保存等操作"""
+
+    # 版本快照目录名和清单后缀
+    STR_SNAPSHOT_DIR = ".snapshots"
+    STR_MANIFEST_SUFFIX = ".manifest.json"
+    # [snapshot]配置，首次使用时读取
+    _dict_snapshot_config = None
+    # 每个逻辑文件一把写锁，保证同一文件的版本号递增
+    _dict_path_lock = {}
+    _lock_path_lock = threading.Lock()
     
     @staticmethod
-    def append_to_pkl(df_new: pd.DataFrame, str_file_path: str) -> bool:
+    def append_to_pkl(df_new: pd.DataFrame, str_file_path: str, dict_stats: dict = None) -> bool:
         """
         将新数据追加到已有的pkl文件中，如果文件不存在则创建新文件
         
         Args:
             df_new (pd.DataFrame): 需要追加的新数据，index为数字格式的字符串（8-19位）
             str_file_path (str): pkl文件路径
+            dict_stats (dict): 可选，传入时填入写入后文件的行数、最小/最大时间（见fill_frame_stats）
             
         Returns:
             bool: 操作是否成功
@@ -37,12 +53,13 @@ class utility:
             # 确保目录存在
             os.makedirs(os.path.dirname(str_file_path), exist_ok=True)
             
-            # 如果文件已存在，读取并追加
-            if os.path.exists(str_file_path):
+            # 如果文件已存在，读取并追加（读取最后一个完整版本）
+            if utility.file_exists(str_file_path):
                 print("文件已存在，读取现有数据...")
-                df_existing = pd.read_pickle(str_file_path)
+                df_existing = pd.read_pickle(utility.resolve_read_path(str_file_path))
                 # 确保现有数据的索引也是字符串类型
                 df_existing.index = df_existing.index.astype(str)
+                df_existing, df_new = utility.align_tick_schema(df_existing, df_new)
                 print(f"现有数据范围: {min(df_existing.index)} 到 {max(df_existing.index)}")
                 print(f"现有数据行数: {len(df_existing)}")
                 
@@ -64,13 +81,15 @@ class utility:
                     print("警告：合并后的数据行数小于现有数据行数！")
                     return False
                 
-                df_combined.to_pickle(str_file_path)
+                utility.commit_file(str_file_path, df_combined.to_pickle)
+                utility.fill_frame_stats(df_combined, dict_stats)
                 print("数据已保存")
             else:
                 print("文件不存在，创建新文件...")
                 # 直接保存
                 df_new = df_new.sort_index()
-                df_new.to_pickle(str_file_path)
+                utility.commit_file(str_file_path, df_new.to_pickle)
+                utility.fill_frame_stats(df_new, dict_stats)
                 print("数据已保存")
             
             return True
@@ -80,6 +99,642 @@ class utility:
             print(f"错误详情: {e.__class__.__name__}")
             return False
 
+    @staticmethod
+    def get_bar_file_path(str_data_save_path: str, row, str_period: str, str_dividend_type: str = "none", str_ext: str = "pkl") -> str:
+        """
+        获取K线数据文件路径：{目录}/{交易所}-{品种名称}-{合约长代码}-{复权类型}-{周期}.{扩展名}
+        
+        Args:
+            str_data_save_path (str): 数据保存目录
+            row: log_save中的合约记录，需包含ExchangeCName, instrument_CName, InstrumentLongID
+            str_period (str): 周期
+            str_dividend_type (str): 复权类型
+            str_ext (str): 扩展名
+        """
+        return f"{str_data_save_path}/{row['ExchangeCName']}-{row['instrument_CName']}-{row['InstrumentLongID']}-{str_dividend_type}-{str_period}.{str_ext}"
+
+    @staticmethod
+    def get_snapshot_config() -> dict:
+        """读取app.ini的[snapshot]配置：enable是否使用版本快照（默认关闭），grace_seconds旧版本被替代后的保留时间"""
+        if utility._dict_snapshot_config is None:
+            config = configparser.ConfigParser()
+            config.read('./config/app.ini')
+            utility._dict_snapshot_config = {
+                'enable': config.getboolean('snapshot', 'enable', fallback=False),
+                'grace_seconds': config.getfloat('snapshot', 'grace_seconds', fallback=3600),
+            }
+        return utility._dict_snapshot_config
+
+    @staticmethod
+    def _get_manifest_path(str_file_path: str) -> str:
+        """逻辑文件对应的快照清单路径：{目录}/.snapshots/{文件名}.manifest.json"""
+        str_dir, str_name = os.path.split(str_file_path)
+        return os.path.join(str_dir, utility.STR_SNAPSHOT_DIR, str_name + utility.STR_MANIFEST_SUFFIX)
+
+    @staticmethod
+    def _fsync_and_replace(str_tmp_path: str, str_file_path: str, int_retries: int = 20):
+        """
+        临时文件落盘后原子替换目标文件
+        Windows下目标文件正被其他进程打开时替换会失败，短暂等待后重试
+        """
+        with open(str_tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        for int_try in range(int_retries):
+            try:
+                os.replace(str_tmp_path, str_file_path)
+                return
+            except PermissionError:
+                if int_try == int_retries - 1:
+                    raise
+                time.sleep(0.5)
+
+    @staticmethod
+    def write_atomic(str_file_path: str, func_write):
+        """
+        写临时文件 -> fsync -> 原子重命名，读者看到的要么是旧文件要么是完整的新文件
+        
+        Args:
+            str_file_path (str): 目标文件路径
+            func_write: func_write(临时文件路径)，写入完整内容
+        """
+        os.makedirs(os.path.dirname(str_file_path) or ".", exist_ok=True)
+        str_tmp_path = f"{str_file_path}.tmp{os.getpid()}_{threading.get_ident()}"
+        try:
+            func_write(str_tmp_path)
+            utility._fsync_and_replace(str_tmp_path, str_file_path)
+        finally:
+            if os.path.exists(str_tmp_path):
+                os.remove(str_tmp_path)
+
+    @staticmethod
+    def read_manifest(str_file_path: str) -> dict:
+        """读取逻辑文件的快照清单，没有清单返回None"""
+        str_manifest_path = utility._get_manifest_path(str_file_path)
+        for int_try in range(5):
+            if not os.path.exists(str_manifest_path):
+                return None
+            try:
+                with open(str_manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (PermissionError, ValueError):
+                # Windows下清单正被替换，稍后重试
+                time.sleep(0.1)
+        return None
+
+    @staticmethod
+    def resolve_read_path(str_file_path: str) -> str:
+        """
+        逻辑文件当前应读取的物理路径：有快照清单时为最后一个完整版本，否则为文件本身
+        读者不需要加锁，清单只在新版本完全写入并落盘后才指向它
+        
+        Args:
+            str_file_path (str): 逻辑文件路径（如utility.get_bar_file_path的返回值）
+        """
+        dict_manifest = utility.read_manifest(str_file_path)
+        if dict_manifest is None:
+            return str_file_path
+        return os.path.join(os.path.dirname(utility._get_manifest_path(str_file_path)), dict_manifest['current'])
+
+    @staticmethod
+    def file_exists(str_file_path: str) -> bool:
+        """逻辑文件是否存在（快照或普通文件）"""
+        return os.path.exists(utility.resolve_read_path(str_file_path))
+
+    @staticmethod
+    def commit_file(str_file_path: str, func_write):
+        """
+        保存逻辑文件的新内容
+        [snapshot] enable时写入新的版本快照：.snapshots/{文件名}.v{版本号} 写完并fsync后更新清单（原子替换），
+        再把原路径的文件原子替换为新版本（硬链接，不支持时复制），并删除被替代超过保留时间的旧版本
+        （本次被替代的版本由gc_snapshots在保留时间之后删除，不依赖该文件的下次写入）；
+        原路径始终保留最新的完整文件，不使用resolve_read_path的外部读者（回测等）不受影响，快照只是在旁边增加的文件。
+        未开启时直接原子替换文件本身，并删除之前开启时留下的清单（读者改为读取原路径，旧版本由gc_snapshots清理）
+        
+        Args:
+            str_file_path (str): 逻辑文件路径
+            func_write: func_write(物理文件路径)，写入完整内容
+        """
+        dict_config = utility.get_snapshot_config()
+        if not dict_config['enable']:
+            utility.write_atomic(str_file_path, func_write)
+            str_manifest_path = utility._get_manifest_path(str_file_path)
+            if os.path.exists(str_manifest_path):
+                with utility._get_path_lock(str_file_path):
+                    try:
+                        os.remove(str_manifest_path)
+                    except OSError:
+                        pass
+            return
+        with utility._get_path_lock(str_file_path):
+            str_name = os.path.basename(str_file_path)
+            str_manifest_path = utility._get_manifest_path(str_file_path)
+            str_snapshot_dir = os.path.dirname(str_manifest_path)
+            os.makedirs(str_snapshot_dir, exist_ok=True)
+            dict_manifest = utility.read_manifest(str_file_path) or {'versions': []}
+            int_version = dict_manifest['versions'][-1]['version'] + 1 if dict_manifest['versions'] else 1
+            str_version_name = f"{str_name}.v{int_version:08d}"
+            # 新版本文件名从未被读者打开过，可以直接写入后重命名
+            str_version_path = os.path.join(str_snapshot_dir, str_version_name)
+            utility.write_atomic(str_version_path, func_write)
+
+            float_now = time.time()
+            dict_manifest['current'] = str_version_name
+            dict_manifest['versions'].append({'version': int_version, 'file': str_version_name, 'created': float_now})
+            dict_manifest['versions'] = utility._prune_versions(str_snapshot_dir, dict_manifest['versions'], float_now,
+                                                                dict_config['grace_seconds'])[0]
+            utility._write_manifest(str_manifest_path, dict_manifest)
+
+            # 原路径原子替换为新版本（版本文件不再修改，可以与原路径共用同一份数据）
+            try:
+                utility.write_atomic(str_file_path, lambda str_tmp_path: utility._link_or_copy(str_version_path, str_tmp_path))
+            except OSError as e:
+                # Windows下原路径正被读取时替换会失败，快照已提交，原路径在下次写入时更新
+                print(f"更新文件{str_file_path}失败（可能正被读取），下次写入时再更新: {str(e)}")
+
+    @staticmethod
+    def _get_path_lock(str_file_path: str) -> threading.Lock:
+        """逻辑文件的进程内锁（写入新版本和清理旧版本互斥）"""
+        with utility._lock_path_lock:
+            return utility._dict_path_lock.setdefault(os.path.abspath(str_file_path), threading.Lock())
+
+    @staticmethod
+    def _write_manifest(str_manifest_path: str, dict_manifest: dict):
+        """原子替换快照清单"""
+        def write_manifest(str_path):
+            with open(str_path, 'w', encoding='utf-8') as f:
+                json.dump(dict_manifest, f, ensure_ascii=False)
+        utility.write_atomic(str_manifest_path, write_manifest)
+
+    @staticmethod
+    def _prune_versions(str_snapshot_dir: str, list_versions: list, float_now: float, float_grace: float) -> tuple:
+        """
+        删除被替代超过保留时间的旧版本（被替代的时间即下一个版本的创建时间），最后一个版本（当前版本）始终保留；
+        正在被读取、无法删除的留到下次
+
+        Returns:
+            tuple: (保留的版本列表, 删除的文件数, 删除的字节数)
+        """
+        list_keep = []
+        int_files = 0
+        int_bytes = 0
+        for int_idx, dict_version in enumerate(list_versions):
+            if int_idx < len(list_versions) - 1 and float_now - list_versions[int_idx + 1]['created'] > float_grace:
+                str_version_path = os.path.join(str_snapshot_dir, dict_version['file'])
+                try:
+                    int_size = os.path.getsize(str_version_path)
+                    os.remove(str_version_path)
+                    int_files += 1
+                    int_bytes += int_size
+                    continue
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    pass
+            list_keep.append(dict_version)
+        return list_keep, int_files, int_bytes
+
+    @staticmethod
+    def gc_snapshots(str_root: str) -> tuple:
+        """
+        清理目录下所有逻辑文件的旧快照版本，不依赖该文件的下次写入（保存阶段结束、服务模式定时和 python main.py --gc-snapshots 调用）
+            - 清单中被替代超过保留时间的版本
+            - 不在任何清单中、修改时间超过保留时间的版本文件（写入中途崩溃或关闭快照后遗留的）
+
+        Args:
+            str_root (str): 数据目录
+
+        Returns:
+            tuple: (删除的文件数, 删除的字节数)
+        """
+        float_grace = utility.get_snapshot_config()['grace_seconds']
+        int_files = 0
+        int_bytes = 0
+        for str_dir, list_dir, list_name in os.walk(str_root):
+            if os.path.basename(str_dir) != utility.STR_SNAPSHOT_DIR:
+                continue
+            set_referenced = set()
+            for str_name in list_name:
+                if not str_name.endswith(utility.STR_MANIFEST_SUFFIX):
+                    continue
+                str_file_path = os.path.join(os.path.dirname(str_dir), str_name[:-len(utility.STR_MANIFEST_SUFFIX)])
+                with utility._get_path_lock(str_file_path):
+                    dict_manifest = utility.read_manifest(str_file_path)
+                    if dict_manifest is None:
+                        continue
+                    list_keep, int_pruned, int_pruned_bytes = utility._prune_versions(str_dir, dict_manifest['versions'], time.time(), float_grace)
+                    if len(list_keep) != len(dict_manifest['versions']):
+                        dict_manifest['versions'] = list_keep
+                        utility._write_manifest(os.path.join(str_dir, str_name), dict_manifest)
+                    int_files += int_pruned
+                    int_bytes += int_pruned_bytes
+                    set_referenced.update(d['file'] for d in list_keep)
+                    set_referenced.add(dict_manifest['current'])
+            # 清单之后再列目录：清单读取之后才写入的新版本修改时间较新，不会被当作遗留文件
+            for entry in os.scandir(str_dir):
+                if (entry.name.endswith(utility.STR_MANIFEST_SUFFIX) or ".tmp" in entry.name or entry.name in set_referenced
+                        or not entry.is_file()):
+                    continue
+                try:
+                    obj_stat = entry.stat()
+                    if time.time() - obj_stat.st_mtime > float_grace:
+                        os.remove(entry.path)
+                        int_files += 1
+                        int_bytes += obj_stat.st_size
+                except OSError:
+                    pass
+        return int_files, int_bytes
+
+    @staticmethod
+    def _link_or_copy(str_src_path: str, str_dst_path: str):
+        """硬链接（不占用额外空间），文件系统不支持时复制"""
+        try:
+            os.link(str_src_path, str_dst_path)
+        except OSError:
+            shutil.copyfile(str_src_path, str_dst_path)
+
+    @staticmethod
+    def iter_logical_files(str_root: str):
+        """
+        遍历目录下的逻辑文件：普通文件，以及.snapshots中有清单的快照文件（返回逻辑路径）
+        
+        Yields:
+            str: 逻辑文件路径
+        """
+        set_seen = set()
+        for str_dir, list_dir, list_name in os.walk(str_root):
+            if os.path.basename(str_dir) == utility.STR_SNAPSHOT_DIR:
+                for str_name in list_name:
+                    if str_name.endswith(utility.STR_MANIFEST_SUFFIX):
+                        str_path = os.path.join(os.path.dirname(str_dir), str_name[:-len(utility.STR_MANIFEST_SUFFIX)])
+                        if str_path not in set_seen:
+                            set_seen.add(str_path)
+                            yield str_path
+                continue
+            for str_name in list_name:
+                str_path = os.path.join(str_dir, str_name)
+                if ".tmp" in str_name or str_path in set_seen:
+                    continue
+                set_seen.add(str_path)
+                yield str_path
+
+    @staticmethod
+    def fill_frame_stats(df: pd.DataFrame, dict_stats: dict):
+        """
+        填入数据的统计信息：rows行数，min_time/max_time最小/最大毫秒时间戳
+        
+        Args:
+            df (pd.DataFrame): 写入文件的完整数据
+            dict_stats (dict): 需要填入的字典，为None时不处理
+        """
+        if dict_stats is None:
+            return
+        arr_ms = utility.index_to_epoch_ms(df) if len(df) else np.empty(0, dtype='int64')
+        dict_stats['rows'] = len(df)
+        dict_stats['min_time'] = int(arr_ms.min()) if len(arr_ms) else None
+        dict_stats['max_time'] = int(arr_ms.max()) if len(arr_ms) else None
+
+    @staticmethod
+    def split_trading_day_windows(dt_begin: str, dt_end: str, list_trading_date_ms, int_days_per_window: int = 1) -> list:
+        """
+        将[dt_begin, dt_end]按交易日切分为首尾相接、互不重叠的时间窗口
+        每个交易日的窗口从前一交易日18:00开始（包含夜盘），到本交易日17:59:59结束
+        
+        Args:
+            dt_begin (str): 开始时间，14位字符串
+            dt_end (str): 结束时间，14位字符串
+            list_trading_date_ms: 交易日列表（毫秒时间戳，xtdata.get_trading_dates的返回值）
+            int_days_per_window (int): 每个窗口包含的交易日数
+            
+        Returns:
+            list: [(窗口开始, 窗口结束), ...]，均为14位字符串
+        """
+        dt_begin_value = datetime.strptime(str(dt_begin)[:14], '%Y%m%d%H%M%S')
+        dt_end_value = datetime.strptime(str(dt_end)[:14], '%Y%m%d%H%M%S')
+        int_days_per_window = max(int(int_days_per_window), 1)
+        list_cut = sorted(set(dt.replace(hour=18, minute=0, second=0, microsecond=0)
+                              for dt in utility.batch_timestamp_to_datetime(list_trading_date_ms)))
+        list_window = []
+        dt_window_begin = dt_begin_value
+        for dt_cut in list_cut[int_days_per_window - 1::int_days_per_window]:
+            if dt_window_begin < dt_cut <= dt_end_value:
+                list_window.append((dt_window_begin.strftime('%Y%m%d%H%M%S'), (dt_cut - timedelta(seconds=1)).strftime('%Y%m%d%H%M%S')))
+                dt_window_begin = dt_cut
+        if dt_window_begin <= dt_end_value:
+            list_window.append((dt_window_begin.strftime('%Y%m%d%H%M%S'), dt_end_value.strftime('%Y%m%d%H%M%S')))
+        return list_window
+
+    @staticmethod
+    def append_to_parquet(df_new: pd.DataFrame, str_file_path: str, dict_stats: dict = None) -> bool:
+        """
+        将新数据追加到已有的parquet文件中，如果文件不存在则创建新文件
+        parquet不支持原地追加，与append_to_pkl相同：读取、合并、按索引排序去重后整体写回
+        
+        Args:
+            df_new (pd.DataFrame): 需要追加的新数据
+            str_file_path (str): parquet文件路径
+            dict_stats (dict): 可选，传入时填入写入后文件的统计信息
+            
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            if df_new is None or df_new.empty:
+                return False
+            df_new.index = df_new.index.astype(str)
+            os.makedirs(os.path.dirname(str_file_path), exist_ok=True)
+            if utility.file_exists(str_file_path):
+                df_existing = pd.read_parquet(utility.resolve_read_path(str_file_path), engine='pyarrow')
+                df_existing.index = df_existing.index.astype(str)
+                df_existing, df_new = utility.align_tick_schema(df_existing, df_new)
+                df_combined = pd.concat([df_existing, df_new], axis=0).sort_index()
+                df_combined = df_combined[~df_combined.index.duplicated(keep='last')]
+            else:
+                df_combined = df_new.sort_index()
+            utility.commit_file(str_file_path, lambda p: df_combined.to_parquet(p, engine='pyarrow', compression='snappy', index=True))
+            utility.fill_frame_stats(df_combined, dict_stats)
+            return True
+        except Exception as e:
+            print(f"保存parquet数据时发生错误: {str(e)}")
+            return False
+
+    @staticmethod
+    def append_to_feather(df_new: pd.DataFrame, str_file_path: str, dict_stats: dict = None) -> bool:
+        """
+        将新数据追加到Arrow IPC（Feather v2）文件，如果文件不存在则创建新文件
+        文件不压缩，读取时可以直接内存映射，不需要反序列化和拷贝
+        
+        Args:
+            df_new (pd.DataFrame): 需要追加的新数据
+            str_file_path (str): arrow文件路径
+            dict_stats (dict): 可选，传入时填入写入后文件的统计信息
+            
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            if df_new is None or df_new.empty:
+                return False
+            df_new.index = df_new.index.astype(str)
+            os.makedirs(os.path.dirname(str_file_path), exist_ok=True)
+            if utility.file_exists(str_file_path):
+                # 不使用内存映射读取旧文件，避免覆盖时文件仍被映射（Windows下无法覆盖）
+                df_existing = feather.read_table(utility.resolve_read_path(str_file_path), memory_map=False).to_pandas()
+                df_existing.index = df_existing.index.astype(str)
+                df_existing, df_new = utility.align_tick_schema(df_existing, df_new)
+                df_combined = pd.concat([df_existing, df_new], axis=0).sort_index()
+                df_combined = df_combined[~df_combined.index.duplicated(keep='last')]
+            else:
+                df_combined = df_new.sort_index()
+            # 写成单个record batch，读取时每列只有一个chunk，可以零拷贝转换为NumPy
+            table = pa.Table.from_pandas(df_combined, preserve_index=True).combine_chunks()
+            utility.commit_file(str_file_path, lambda p: feather.write_feather(table, p, compression='uncompressed', chunksize=max(table.num_rows, 1)))
+            utility.fill_frame_stats(df_combined, dict_stats)
+            return True
+        except Exception as e:
+            print(f"保存arrow数据时发生错误: {str(e)}")
+            return False
+
+    # int64毫秒索引格式的文件扩展名
+    STR_I64_EXT = "i64.pkl"
+    # 东八区偏移（毫秒），字符串/datetime索引是东八区本地时间
+    INT_CN_OFFSET_MS = 8 * 3600 * 1000
+
+    @staticmethod
+    def index_to_epoch_ms(df: pd.DataFrame) -> np.ndarray:
+        """
+        获取数据的int64毫秒时间戳（UTC epoch）
+        优先使用QMT返回的time列，其次为整数索引，否则解析索引：纯数字字符串按YYYYMMDD[HHMMSS[mmm]]解析，其余按日期时间字符串或datetime解析
+        
+        Args:
+            df (pd.DataFrame): K线数据
+            
+        Returns:
+            np.ndarray: int64毫秒时间戳
+        """
+        if 'time' in df.columns and pd.api.types.is_numeric_dtype(df['time']):
+            return df['time'].to_numpy(dtype='int64')
+        if pd.api.types.is_integer_dtype(df.index):
+            # 已经是int64毫秒索引
+            return df.index.to_numpy(dtype='int64')
+        sr_index = pd.Series(df.index.astype(str), dtype=object)
+        arr_digit = sr_index.str.fullmatch(r'\d{8,19}').to_numpy(dtype=bool)
+        arr_datetime = np.empty(len(sr_index), dtype='datetime64[ms]')
+        if arr_digit.any():
+            sr_digit = sr_index[arr_digit].str.ljust(17, '0').str[:17]
+            arr_datetime[arr_digit] = pd.to_datetime(sr_digit, format='%Y%m%d%H%M%S%f').to_numpy(dtype='datetime64[ms]')
+        if (~arr_digit).any():
+            arr_datetime[~arr_digit] = pd.to_datetime(sr_index[~arr_digit], format='mixed').to_numpy(dtype='datetime64[ms]')
+        return arr_datetime.astype('int64') - utility.INT_CN_OFFSET_MS
+
+    @staticmethod
+    def to_i64_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        转换为int64毫秒索引（名为time_ms）、稳定排序并去重（相同时间保留最后一条）的DataFrame
+        """
+        arr_ms = utility.index_to_epoch_ms(df)
+        df_out = df.copy()
+        df_out.index = pd.Index(arr_ms, dtype='int64', name='time_ms')
+        df_out = df_out.iloc[np.argsort(arr_ms, kind='stable')]
+        return df_out[~df_out.index.duplicated(keep='last')]
+
+    @staticmethod
+    def append_to_pkl_i64(df_new: pd.DataFrame, str_file_path: str, dict_stats: dict = None) -> bool:
+        """
+        将新数据追加到int64毫秒索引格式的pkl文件中，如果文件不存在则创建新文件
+        合并时对int64索引排序去重，不再对Python字符串排序
+        
+        Args:
+            df_new (pd.DataFrame): 需要追加的新数据（包含time列或可解析的时间索引）
+            str_file_path (str): 文件路径（扩展名为i64.pkl）
+            dict_stats (dict): 可选，传入时填入写入后文件的统计信息
+            
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            if df_new is None or df_new.empty:
+                return False
+            os.makedirs(os.path.dirname(str_file_path), exist_ok=True)
+            df_new = utility.to_i64_frame(df_new)
+            if utility.file_exists(str_file_path):
+                df_existing = pd.read_pickle(utility.resolve_read_path(str_file_path))
+                df_existing, df_new = utility.align_tick_schema(df_existing, df_new)
+                df_combined = pd.concat([df_existing, df_new], axis=0)
+                df_combined = df_combined.iloc[np.argsort(df_combined.index.to_numpy(), kind='stable')]
+                df_combined = df_combined[~df_combined.index.duplicated(keep='last')]
+            else:
+                df_combined = df_new
+            utility.commit_file(str_file_path, df_combined.to_pickle)
+            utility.fill_frame_stats(df_combined, dict_stats)
+            return True
+        except Exception as e:
+            print(f"保存int64索引数据时发生错误: {str(e)}")
+            return False
+
+    @staticmethod
+    def read_bar_pkl(str_file_path: str) -> pd.DataFrame:
+        """
+        只读兼容读取：原有pkl文件路径已迁移为int64毫秒索引格式、且i64.pkl不比原文件旧时（pickle_i64 sink仍在更新），
+        读取新文件并把索引还原为东八区datetime，使check.py等按原有格式读取的代码不需要修改；
+        没有迁移的文件，或迁移后只有pickle sink在更新（原文件更新）时按原样读取原文件
+        
+        Args:
+            str_file_path (str): 原有pkl文件路径（也可以直接传入i64.pkl路径）
+            
+        Returns:
+            pd.DataFrame: index为东八区datetime（未迁移文件保持原索引）
+        """
+        str_i64_path = str_file_path if str_file_path.endswith(utility.STR_I64_EXT) else str_file_path[:-len("pkl")] + utility.STR_I64_EXT
+        str_i64_read_path = utility.resolve_read_path(str_i64_path)
+        if str_i64_path != str_file_path:
+            str_read_path = utility.resolve_read_path(str_file_path)
+            if not os.path.exists(str_i64_read_path) or (os.path.exists(str_read_path) and
+                                                          os.path.getmtime(str_i64_read_path) < os.path.getmtime(str_read_path)):
+                return pd.read_pickle(str_read_path)
+        df = pd.read_pickle(str_i64_read_path)
+        df.index = pd.DatetimeIndex((df.index.to_numpy(dtype='int64') + utility.INT_CN_OFFSET_MS).astype('datetime64[ms]'))
+        return df
+
+    # tick的五档列表字段（QMT返回每行一个长度为5的列表）和档数
+    LIST_TICK_LEVEL_FIELD = ['askPrice', 'bidPrice', 'askVol', 'bidVol']
+    INT_TICK_LEVELS = 5
+
+    @staticmethod
+    def _tick_level_matrix(sr: pd.Series, str_dtype: str) -> np.ndarray:
+        """列表列 -> [n, 5]数组；长度不足5或为空的行补0（与QMT无挂单时一致）"""
+        list_value = sr.tolist()
+        try:
+            arr = np.asarray(list_value, dtype=str_dtype)
+            if arr.ndim == 2 and arr.shape[1] == utility.INT_TICK_LEVELS:
+                return arr
+        except (ValueError, TypeError):
+            pass
+        arr = np.zeros((len(list_value), utility.INT_TICK_LEVELS), dtype=str_dtype)
+        for i, x in enumerate(list_value):
+            if isinstance(x, (list, tuple, np.ndarray)) and len(x):
+                list_level = list(x)[:utility.INT_TICK_LEVELS]
+                arr[i, :len(list_level)] = list_level
+        return arr
+
+    @staticmethod
+    def is_tick_flattened(df: pd.DataFrame) -> bool:
+        """tick数据的五档是否已展开为定长列"""
+        return f"{utility.LIST_TICK_LEVEL_FIELD[0]}1" in df.columns
+
+    @staticmethod
+    def flatten_tick_levels(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        把tick的五档列表列（askPrice/bidPrice/askVol/bidVol）展开为定长数值列 askPrice1..askPrice5 等，
+        价格为float64，挂单量能放下时为int32否则为int64；没有列表列或已展开时原样返回
+        
+        Args:
+            df (pd.DataFrame): tick数据
+            
+        Returns:
+            pd.DataFrame: 展开后的数据，列表列的位置由对应的5列替换
+        """
+        list_field = [f for f in utility.LIST_TICK_LEVEL_FIELD if f in df.columns and df[f].dtype == object]
+        if not list_field:
+            return df
+        dict_column = {}
+        for str_column in df.columns:
+            if str_column not in list_field:
+                dict_column[str_column] = df[str_column].to_numpy()
+                continue
+            if str_column.endswith("Vol"):
+                arr = utility._tick_level_matrix(df[str_column], 'int64')
+                if arr.size == 0 or (arr.min() >= np.iinfo(np.int32).min and arr.max() <= np.iinfo(np.int32).max):
+                    arr = arr.astype('int32')
+            else:
+                arr = utility._tick_level_matrix(df[str_column], 'float64')
+            for int_level in range(utility.INT_TICK_LEVELS):
+                dict_column[f"{str_column}{int_level + 1}"] = arr[:, int_level]
+        return pd.DataFrame(dict_column, index=df.index)
+
+    @staticmethod
+    def unflatten_tick_levels(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        flatten_tick_levels的逆变换：定长列还原为每行一个列表的列（与QMT返回的格式一致），供按原有格式读取的代码使用
+        
+        Args:
+            df (pd.DataFrame): 展开后的tick数据
+            
+        Returns:
+            pd.DataFrame: 五档为列表列的数据，未展开时原样返回
+        """
+        if not utility.is_tick_flattened(df):
+            return df
+        dict_column = {}
+        for str_column in df.columns:
+            str_field = str_column[:-1]
+            if str_field not in utility.LIST_TICK_LEVEL_FIELD or not str_column[-1:].isdigit():
+                dict_column[str_column] = df[str_column].to_numpy()
+            elif str_column.endswith("1"):
+                dict_column[str_field] = utility.tick_level_array(df, str_field).tolist()
+        return pd.DataFrame(dict_column, index=df.index)
+
+    @staticmethod
+    def tick_level_array(df: pd.DataFrame, str_field: str) -> np.ndarray:
+        """
+        获取某个五档字段的[n, 5]数组（支持已展开和列表两种格式）
+        
+        Args:
+            df (pd.DataFrame): tick数据
+            str_field (str): askPrice、bidPrice、askVol或bidVol
+        """
+        if str_field in df.columns:
+            return utility._tick_level_matrix(df[str_field], 'int64' if str_field.endswith("Vol") else 'float64')
+        return np.column_stack([df[f"{str_field}{i + 1}"].to_numpy() for i in range(utility.INT_TICK_LEVELS)])
+
+    @staticmethod
+    def align_tick_schema(df_existing: pd.DataFrame, df_new: pd.DataFrame) -> tuple:
+        """
+        合并前统一五档的格式：任一方已展开时两者都展开（旧文件在下次写入时迁移为展开格式）
+        
+        Returns:
+            tuple: (df_existing, df_new)
+        """
+        if utility.is_tick_flattened(df_existing) or utility.is_tick_flattened(df_new):
+            return utility.flatten_tick_levels(df_existing), utility.flatten_tick_levels(df_new)
+        return df_existing, df_new
+
+    @staticmethod
+    def read_feather_mmap(str_file_path: str, list_columns: list = None) -> pa.Table:
+        """
+        内存映射方式读取Arrow IPC文件，返回的Table直接引用映射内存，不拷贝数据
+        多个进程读取同一文件时共享操作系统页缓存
+        
+        Args:
+            str_file_path (str): arrow文件路径
+            list_columns (list): 可选，只读取这些列
+            
+        Returns:
+            pa.Table: Arrow表
+        """
+        return feather.read_table(utility.resolve_read_path(str_file_path), columns=list_columns, memory_map=True)
+
+    @staticmethod
+    def feather_to_numpy(table: pa.Table, list_columns: list = None) -> dict:
+        """
+        将Arrow表的数值列转换为NumPy数组
+        单chunk且无空值的数值列返回零拷贝视图（只读），其余列退化为拷贝
+        
+        Args:
+            table (pa.Table): read_feather_mmap返回的表
+            list_columns (list): 可选，只转换这些列
+            
+        Returns:
+            dict: 列名 -> np.ndarray
+        """
+        dict_array = {}
+        for str_column in (list_columns or table.column_names):
+            chunked = table.column(str_column)
+            if chunked.num_chunks == 1 and chunked.null_count == 0 and pa.types.is_primitive(chunked.type):
+                dict_array[str_column] = chunked.chunk(0).to_numpy(zero_copy_only=True)
+            else:
+                dict_array[str_column] = chunked.to_numpy()
+        return dict_array
+
     def batch_timestamp_to_string_17(timestamps):
         """
         批量处理时间戳列表 将毫秒级时间戳转换为17位字符串